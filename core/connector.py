@@ -58,6 +58,9 @@ class Connector:
             """
 
             """
+            # instance attribute access is forwarded, type(proxy)._connector gives the connector
+            _connector = self
+
             def __getattribute__(*args):
                 attr = getattr(self.obj, args[1])
                 if isinstance(attr, InterfaceMethod):
@@ -32,6 +32,7 @@ import sys
 import re
 import time
 import importlib
+import concurrent.futures
 
 from qtpy import QtCore
 from . import config
@@ -41,6 +42,7 @@ from .util.modules import toposort, is_base
 from collections import OrderedDict
 from .logger import register_exception_handler
 from .threadmanager import ThreadManager
+from .statusstore import StatusStore
 
 # try to import RemoteObjectManager. Might fail if rpyc is not installed.
 try:
@@ -51,6 +53,16 @@ from .module import BaseMixin
 from .connector import Connector
 
 
+class ModuleThreadMover(QtCore.QObject):
+    """Moves modules from the thread this object lives in to another thread. A QObject can only
+       be moved to another thread from the thread it lives in.
+    """
+
+    @QtCore.Slot(QtCore.QObject, QtCore.QThread)
+    def moveObject(self, obj, thread):
+        obj.moveToThread(thread)
+
+
 class Manager(QtCore.QObject):
     """The Manager object is responsible for:
       - Loading/configuring device modules and storing their handles
@@ -101,6 +113,12 @@ class Manager(QtCore.QObject):
         self.tree['global'] = OrderedDict()
         self.tree['global']['startup'] = list()
 
+        # load, connect and activation times of started modules for the startup report
+        self.moduleStartupTimes = OrderedDict()
+
+        # binary store for the status variables of all modules (opened on first use)
+        self._statusStore = None
+
         self.hasGui = not args.no_gui
         self.currentDir = None
         self.baseDir = None
@@ -114,6 +132,11 @@ class Manager(QtCore.QObject):
             # Register exception handler
             register_exception_handler(self)
 
+            # Timer for periodic checkpoints of the status variables (see config option
+            # status_checkpoint_interval)
+            self._statusCheckpointTimer = QtCore.QTimer(self)
+            self._statusCheckpointTimer.timeout.connect(self.checkpointStatusVariables)
+
             # Thread management
             self.tm = ThreadManager()
             logger.debug('Main thread is {0}'.format(QtCore.QThread.currentThreadId()))
@@ -167,8 +190,12 @@ class Manager(QtCore.QObject):
                             if (cacertfile is not None) and not os.path.isabs(cacertfile):
                                 cacertfile = os.path.abspath(os.path.join(self.configDir,
                                                                           cacertfile))
+                            array_transport = self.tree['global']['module_server'].get(
+                                'array_transport', True)
+                            array_port = self.tree['global']['module_server'].get(
+                                'array_port', 0)
                             self.rm.createServer(server_address, server_port, certfile, keyfile,
-                                                 cacertfile)
+                                                 cacertfile, array_transport, array_port)
                             # successfully started remote server
                             logger.info('Started server rpyc://{0}:{1}'.format(server_address,
                                                                                server_port))
@@ -179,6 +206,11 @@ class Manager(QtCore.QObject):
                     logger.warning('Deprecated remote server settings. Please update to new '
                                    'style. See documentation.')
 
+            # Periodic checkpoints of the status variables of active modules
+            checkpoint_interval = self.tree['global'].get('status_checkpoint_interval', 0)
+            if checkpoint_interval > 0:
+                self._statusCheckpointTimer.start(int(checkpoint_interval * 1000))
+
             logger.info('Qudi started.')
 
             # Load startup things from config here
@@ -762,7 +794,8 @@ class Manager(QtCore.QObject):
                         defined_module['remote'],
                         certfile=certfile,
                         keyfile=keyfile,
-                        cacertsfile=cacertsfile)
+                        cacertsfile=cacertsfile,
+                        array_compression=defined_module.get('array_compression', None))
                     logger.info('Remote module {0} loaded as {1}.{2}.'
                                 ''.format(defined_module['remote'], base, key))
                     with self.lock:
@@ -940,38 +973,67 @@ class Manager(QtCore.QObject):
           @param string name: module which is going to be activated.
 
         """
+        try:
+            module = self._prepareModuleActivation(base, name)
+            if module is None:
+                return
+            success = self._triggerModuleActivation(module)
+            logger.debug('Activation success: {}'.format(success))
+        except:
+            logger.exception(
+                '{0} module {1}: error during activation:'.format(base, name))
+        QtCore.QCoreApplication.instance().processEvents()
+
+    def _prepareModuleActivation(self, base, name):
+        """Load the status variables of a module and start the thread of a threaded module.
+
+          @param string base: module base package (hardware, logic or gui)
+          @param string name: module which is going to be activated.
+
+          @return object: the module to activate, None if it can not or need not be activated
+        """
         if not self.isModuleLoaded(base, name):
             logger.error('{0} module {1} not loaded.'.format(base, name))
-            return
+            return None
         module = self.tree['loaded'][base][name]
         if module.module_state() != 'deactivated' and (
                 self.isModuleDefined(base, name)
                 and 'remote' in self.tree['defined'][base][name]):
             logger.debug('No need to activate remote module {0}.{1}.'.format(base, name))
-            return
+            return None
         if module.module_state() != 'deactivated':
             logger.error('{0} module {1} not deactivated'.format(base, name))
-            return
-        try:
-            module.setStatusVariables(self.loadStatusVariables(base, name))
-            # start main loop for qt objects
-            if module.is_module_threaded:
-                modthread = self.tm.newThread('mod-{0}-{1}'.format(base, name))
-                module.moveToThread(modthread)
-                modthread.start()
-                success = QtCore.QMetaObject.invokeMethod(
-                    module.module_state,
-                    'trigger',
-                    QtCore.Qt.BlockingQueuedConnection,
-                    QtCore.Q_RETURN_ARG(bool),
-                    QtCore.Q_ARG(str, 'activate'))
-            else:
-                success = module.module_state.activate()  # runs on_activate in main thread
-            logger.debug('Activation success: {}'.format(success))
-        except:
-            logger.exception(
-                '{0} module {1}: error during activation:'.format(base, name))
-        QtCore.QCoreApplication.instance().processEvents()
+            return None
+        module.setStatusVariables(self.loadStatusVariables(base, name))
+        # start main loop for qt objects
+        if module.is_module_threaded:
+            modthread = self.tm.newThread('mod-{0}-{1}'.format(base, name))
+            module.moveToThread(modthread)
+            modthread.start()
+        return module
+
+    @staticmethod
+    def _triggerModuleActivation(module, in_module_thread=None):
+        """Run the activation of a module prepared by _prepareModuleActivation and wait for it.
+           Threaded modules are activated in their own thread, so this can be called from a
+           worker thread to activate several of them at the same time.
+
+          @param object module: the module to activate
+          @param bool in_module_thread: optional, activate the module in the thread it lives in
+                                        (default: only if the module is threaded)
+
+          @return bool: activation success
+        """
+        if in_module_thread is None:
+            in_module_thread = module.is_module_threaded
+        if in_module_thread:
+            return QtCore.QMetaObject.invokeMethod(
+                module.module_state,
+                'trigger',
+                QtCore.Qt.BlockingQueuedConnection,
+                QtCore.Q_RETURN_ARG(bool),
+                QtCore.Q_ARG(str, 'activate'))
+        return module.module_state.activate()  # runs on_activate in main thread
 
     @QtCore.Slot(str, str)
     def deactivateModule(self, base, name):
@@ -1157,19 +1219,26 @@ class Manager(QtCore.QObject):
         for mkey in sorteddeps:
             for mbase in ('hardware', 'logic', 'gui'):
                 if mkey in self.tree['defined'][mbase] and mkey not in self.tree['loaded'][mbase]:
+                    times = self.moduleStartupTimes.setdefault(mkey, OrderedDict())
+                    start_time = time.perf_counter()
                     success = self.loadConfigureModule(mbase, mkey)
+                    times['load'] = time.perf_counter() - start_time
                     if success < 0:
                         logger.warning('Stopping module loading after loading failure.')
                         return -1
                     elif success > 0:
                         logger.warning('Nonfatal loading error, going on.')
+                    start_time = time.perf_counter()
                     success = self.connectModule(mbase, mkey)
+                    times['connect'] = time.perf_counter() - start_time
                     if success < 0:
                         logger.warning('Stopping loading module {0}.{1} after '
                                        'connection failure.'.format(mbase, mkey))
                         return -1
                     if mkey in self.tree['loaded'][mbase]:
+                        start_time = time.perf_counter()
                         self.activateModule(mbase, mkey)
+                        times['activate'] = time.perf_counter() - start_time
                 elif mkey in self.tree['defined'][mbase] and mkey in self.tree['loaded'][mbase]:
                     if self.tree['loaded'][mbase][mkey].module_state() == 'deactivated':
                         self.activateModule(mbase, mkey)
@@ -1254,16 +1323,207 @@ class Manager(QtCore.QObject):
     def startAllConfiguredModules(self):
         """Connect all Qudi modules from the currently loaded configuration and
             activate them.
+
+            If "parallel_startup" is set in the global section of the configuration, the modules
+            are started in layers of modules not depending on each other (see
+            _startModulesParallel).
         """
+        start_time = time.perf_counter()
+        self.moduleStartupTimes.clear()
         deps = self.getAllRecursiveModuleDependencies(self.tree['defined'])
         sorteddeps = toposort(deps)
 
-        for module in sorteddeps:
-            base = self.findBase(module)
-            if self.startModule(base, module) < 0:
-                break
+        if self.tree['global'].get('parallel_startup', False):
+            self._startModulesParallel(sorteddeps, deps)
+        else:
+            for module in sorteddeps:
+                base = self.findBase(module)
+                if self.startModule(base, module) < 0:
+                    break
 
         logger.info('Start all modules finished.')
+        self._logStartupReport(time.perf_counter() - start_time)
+
+    def _startModulesParallel(self, sorteddeps, deps):
+        """Start modules layer by layer. A layer contains the modules whose dependencies are all
+           in the previous layers. The python modules of all Qudi modules are imported in worker
+           threads in advance. Loading and connecting is done in the main thread, while the
+           modules of a layer are activated at the same time (see _activateModuleLayer).
+
+          @param list sorteddeps: topologically sorted names of the modules to start
+          @param dict deps: module dependencies (see getAllRecursiveModuleDependencies)
+
+          @return int: 0 on success, -1 on error
+        """
+        layer_index = dict()
+        layers = list()
+        for mkey in sorteddeps:
+            index = max((layer_index[dep] + 1 for dep in deps.get(mkey, ())), default=0)
+            layer_index[mkey] = index
+            if index == len(layers):
+                layers.append(list())
+            layers[index].append(mkey)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(len(sorteddeps), 1)) as executor:
+            imports = dict()
+            for mkey in sorteddeps:
+                mbase = self.findBase(mkey)
+                if mkey not in self.tree['loaded'][mbase]:
+                    imports[mkey] = executor.submit(self._prefetchModuleImport, mbase, mkey)
+
+            for layer in layers:
+                to_activate = list()
+                for mkey in layer:
+                    mbase = self.findBase(mkey)
+                    if mkey in self.tree['loaded'][mbase]:
+                        if self.tree['loaded'][mbase][mkey].module_state() == 'deactivated':
+                            to_activate.append((mbase, mkey))
+                        continue
+                    times = self.moduleStartupTimes.setdefault(mkey, OrderedDict())
+                    start_time = time.perf_counter()
+                    self._waitForFutures([imports[mkey]])
+                    success = self.loadConfigureModule(mbase, mkey)
+                    times['load'] = time.perf_counter() - start_time
+                    if success < 0:
+                        logger.warning('Stopping module loading after loading failure.')
+                        return -1
+                    elif success > 0:
+                        logger.warning('Nonfatal loading error, going on.')
+                    start_time = time.perf_counter()
+                    success = self.connectModule(mbase, mkey)
+                    times['connect'] = time.perf_counter() - start_time
+                    if success < 0:
+                        logger.warning('Stopping loading module {0}.{1} after '
+                                       'connection failure.'.format(mbase, mkey))
+                        return -1
+                    if mkey in self.tree['loaded'][mbase]:
+                        to_activate.append((mbase, mkey))
+                self._activateModuleLayer(to_activate, executor)
+        return 0
+
+    def _activateModuleLayer(self, modules, executor):
+        """Activate modules not depending on each other at the same time from worker threads.
+           Threaded modules are activated in their own threads. Non-threaded modules are moved
+           to a short-lived thread for the activation and back to the main thread afterwards.
+           Only modules not allowing this (e.g. GUI modules, see
+           BaseMixin.allows_parallel_activation) are activated one after another in the main
+           thread.
+
+          @param list modules: (base, name) tuples of the modules to activate
+          @param concurrent.futures.Executor executor: executor of the worker threads
+        """
+        activations = OrderedDict()
+        activation_threads = list()
+        for mbase, mkey in modules:
+            times = self.moduleStartupTimes.setdefault(mkey, OrderedDict())
+            start_time = time.perf_counter()
+            try:
+                module = self._prepareModuleActivation(mbase, mkey)
+                if module is None:
+                    continue
+                if module.is_module_threaded:
+                    activations[(mbase, mkey)] = executor.submit(
+                        self._timedModuleActivation, module)
+                    continue
+                if module.allows_parallel_activation:
+                    thread_name = 'activate-{0}-{1}'.format(mbase, mkey)
+                    modthread = self.tm.newThread(thread_name)
+                    mover = ModuleThreadMover()
+                    module.moveToThread(modthread)
+                    mover.moveToThread(modthread)
+                    modthread.start()
+                    activation_threads.append((thread_name, mover))
+                    activations[(mbase, mkey)] = executor.submit(
+                        self._timedModuleActivation, module, mover)
+                    continue
+                success = self._triggerModuleActivation(module)
+                logger.debug('Activation success: {}'.format(success))
+            except:
+                logger.exception(
+                    '{0} module {1}: error during activation:'.format(mbase, mkey))
+            times['activate'] = time.perf_counter() - start_time
+
+        self._waitForFutures(activations.values())
+        for thread_name, mover in activation_threads:
+            self.tm.quitThread(thread_name)
+            self.tm.joinThread(thread_name)
+        for (mbase, mkey), future in activations.items():
+            try:
+                success, duration = future.result()
+                self.moduleStartupTimes[mkey]['activate'] = duration
+                logger.debug('Activation success: {}'.format(success))
+            except:
+                logger.exception(
+                    '{0} module {1}: error during activation:'.format(mbase, mkey))
+        QtCore.QCoreApplication.instance().processEvents()
+
+    def _timedModuleActivation(self, module, mover=None):
+        """Activate a module prepared by _prepareModuleActivation in a worker thread.
+
+          @param object module: the module to activate
+          @param ModuleThreadMover mover: optional, mover living in the activation thread the
+                                          non-threaded module has been moved to. The module is
+                                          moved back to the main thread after the activation.
+
+          @return tuple(bool, float): activation success and duration in s
+        """
+        start_time = time.perf_counter()
+        if mover is None:
+            success = self._triggerModuleActivation(module)
+            return success, time.perf_counter() - start_time
+        try:
+            success = self._triggerModuleActivation(module, in_module_thread=True)
+        finally:
+            QtCore.QMetaObject.invokeMethod(
+                mover,
+                'moveObject',
+                QtCore.Qt.BlockingQueuedConnection,
+                QtCore.Q_ARG(QtCore.QObject, module),
+                QtCore.Q_ARG(QtCore.QThread, self.tm.thread))
+        return success, time.perf_counter() - start_time
+
+    def _prefetchModuleImport(self, base, key):
+        """Import the python module of a configured Qudi module, so loading it later on finds
+           the module and its dependencies already imported. Errors are reported on loading.
+
+          @param string base: module base package (hardware, logic or gui)
+          @param string key: module which is going to be loaded
+        """
+        defined_module = self.tree['defined'][base][key]
+        if 'remote' in defined_module or 'module.Class' not in defined_module:
+            return
+        class_name = re.split('\.', defined_module['module.Class'])[-1]
+        module_name = re.sub('.' + class_name + '$', '', defined_module['module.Class'])
+        try:
+            importlib.import_module('{0}.{1}'.format(base, module_name))
+        except Exception:
+            logger.debug('Prefetching the import of {0}.{1} failed, it is imported again on '
+                         'loading.'.format(base, key), exc_info=True)
+
+    @staticmethod
+    def _waitForFutures(futures):
+        """Wait for futures to finish while processing Qt events of the main thread.
+
+          @param iterable futures: concurrent.futures.Future objects to wait for
+        """
+        futures = list(futures)
+        while futures:
+            done, not_done = concurrent.futures.wait(futures, timeout=0.01)
+            futures = list(not_done)
+            QtCore.QCoreApplication.instance().processEvents()
+
+    def _logStartupReport(self, total_time):
+        """Log the load, connect and activation times of the started modules.
+
+          @param float total_time: total startup time in s
+        """
+        lines = ['Startup report ({0:.2f}s in total):'.format(total_time)]
+        for mkey, times in self.moduleStartupTimes.items():
+            lines.append('    {0}: {1}'.format(
+                mkey,
+                ', '.join('{0} {1:.3f}s'.format(step, duration)
+                          for step, duration in times.items())))
+        logger.info('\n'.join(lines))
 
     def getStatusDir(self):
         """ Get the directory where the app state is saved, create it if necessary.
@@ -1275,9 +1535,33 @@ class Manager(QtCore.QObject):
             os.makedirs(appStatusDir)
         return appStatusDir
 
+    def getStatusStore(self):
+        """ Get the store for the status variables of all modules, open it if necessary.
+
+          @return StatusStore: status variable store in the application status directory
+        """
+        if self._statusStore is None:
+            self._statusStore = StatusStore(
+                os.path.join(self.getStatusDir(), 'status_variables.db'))
+        return self._statusStore
+
+    def _closeStatusStore(self):
+        """ Close the status variable store (reopened on the next access).
+        """
+        if self._statusStore is not None:
+            self._statusStore.close()
+            self._statusStore = None
+
+    def _getStatusKey(self, base, module, classname):
+        """ Key of the status variables of a module in the status store and name of the legacy
+            status file (without extension).
+        """
+        return 'status-{0}_{1}_{2}'.format(classname, base, module)
+
     @QtCore.Slot(str, str, dict)
     def saveStatusVariables(self, base, module, variables):
-        """ If a module has status variables, save them to a file in the application status directory.
+        """ If a module has status variables, save them to the status store in the application
+            status directory. Only variables whose value changed since the last save are written.
 
           @param str base: the module category
           @param str module: the unique module name
@@ -1285,18 +1569,20 @@ class Manager(QtCore.QObject):
         """
         if len(variables) > 0:
             try:
-                statusdir = self.getStatusDir()
                 classname = self.tree['loaded'][base][module].__class__.__name__
-                filename = os.path.join(statusdir,
-                                        'status-{0}_{1}_{2}.cfg'.format(classname, base, module))
-                config.save(filename, variables)
+                key = self._getStatusKey(base, module, classname)
+                written = self.getStatusStore().save(key, variables)
+                logger.debug('Saved {0:d} of {1:d} status variables of module {2}.{3}.'.format(
+                    written, len(variables), base, module))
             except:
                 print(variables)
                 logger.exception('Failed to save status variables of module '
                                  '{0}.{1}:\n{2}'.format(base, module, repr(variables)))
 
     def loadStatusVariables(self, base, module):
-        """ If a status variable file exists for a module, load it into a dictionary.
+        """ If status variables are stored for a module, load them into a dictionary.
+            Status files of older qudi versions (YAML) are read if the status store does not
+            contain any variables of the module.
 
           @param str base: the module category
           @param str module: the unique mduel name
@@ -1304,11 +1590,13 @@ class Manager(QtCore.QObject):
           @return dict: dictionary of satus variable names and values
         """
         try:
-            statusdir = self.getStatusDir()
             classname = self.tree['loaded'][base][module].__class__.__name__
-            filename = os.path.join(
-                statusdir, 'status-{0}_{1}_{2}.cfg'.format(classname, base, module))
-            if os.path.isfile(filename):
+            key = self._getStatusKey(base, module, classname)
+            store = self.getStatusStore()
+            filename = os.path.join(self.getStatusDir(), '{0}.cfg'.format(key))
+            if store.has_module(key):
+                variables = store.load(key)
+            elif os.path.isfile(filename):
                 variables = config.load(filename)
             else:
                 variables = OrderedDict()
@@ -1317,14 +1605,41 @@ class Manager(QtCore.QObject):
             variables = OrderedDict()
         return variables
 
+    @QtCore.Slot()
+    def checkpointStatusVariables(self):
+        """ Save the current status variables of all active modules to the status store, so the
+            module states survive a crash. Only variables that changed since the last checkpoint
+            are written.
+            The values are read from the running modules without locking them, threaded modules
+            might change them during the checkpoint.
+        """
+        start = time.perf_counter()
+        written = 0
+        for base, modules in self.tree['loaded'].items():
+            for name, module in modules.items():
+                try:
+                    if not isinstance(module, BaseMixin) or module.module_state() not in (
+                            'idle', 'locked'):
+                        continue
+                    variables = OrderedDict(module._statusVariables)
+                    variables.update(module.dump_status_variables())
+                    if len(variables) > 0:
+                        written += self.getStatusStore().save(
+                            self._getStatusKey(base, name, module.__class__.__name__), variables)
+                except:
+                    logger.exception('Failed to checkpoint status variables of module '
+                                     '{0}.{1}.'.format(base, name))
+        logger.debug('Status checkpoint: {0:d} status variables written in {1:.3f} s.'.format(
+            written, time.perf_counter() - start))
+
     @QtCore.Slot(str, str)
     def removeStatusFile(self, base, module):
         try:
-            statusdir = self.getStatusDir()
             classname = self.tree['defined'][base][
                 module]['module.Class'].split('.')[-1]
-            filename = os.path.join(
-                statusdir, 'status-{0}_{1}_{2}.cfg'.format(classname, base, module))
+            key = self._getStatusKey(base, module, classname)
+            self.getStatusStore().remove(key)
+            filename = os.path.join(self.getStatusDir(), '{0}.cfg'.format(key))
             if os.path.isfile(filename):
                 os.remove(filename)
         except:
@@ -1375,6 +1690,10 @@ class Manager(QtCore.QObject):
                 logger.info('Deactivating module {0}.{1}'.format(base, module))
                 self.deactivateModule(base, module)
             QtCore.QCoreApplication.processEvents()
+        self._statusCheckpointTimer.stop()
+        self._closeStatusStore()
+        if self.rm is not None:
+            self.rm.closeConnections()
         self.sigManagerQuit.emit(self, bool(restart))
 
     @QtCore.Slot(object)
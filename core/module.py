@@ -130,6 +130,10 @@ class BaseMixin(metaclass=ModuleMeta):
     * Reload module data (from saved variables)
     """
     _threaded = False
+    # Non-threaded modules may be activated in a short-lived worker thread during a parallel
+    # startup (see Manager._startModulesParallel). Modules creating Qt objects without parent in
+    # on_activate (e.g. timers) must disable this to be activated in the main thread.
+    _parallel_activation = True
     _connectors = dict()
 
     def __init__(self, manager, name, config=None, callbacks=None, **kwargs):
@@ -233,14 +237,25 @@ class BaseMixin(metaclass=ModuleMeta):
             raise e
         finally:
             # save status vars even if deactivation failed
-            for vname, var in self._stat_vars.items():
-                if hasattr(self, var.var_name):
-                    value = getattr(self, var.var_name)
-                    if not isinstance(value, StatusVar):
-                        if var.representer_function is None:
-                            self._statusVariables[var.name] = value
-                        else:
-                            self._statusVariables[var.name] = var.representer_function(self, value)
+            self._statusVariables.update(self.dump_status_variables())
+
+    def dump_status_variables(self):
+        """ Get the current values of all status variables (converted by their representer).
+        This is used when saving the status variables after deactivation and by the periodic
+        status checkpoints of the manager while the module is active.
+
+            @return OrderedDict: status variable names and values to save
+        """
+        variables = OrderedDict()
+        for vname, var in self._stat_vars.items():
+            if hasattr(self, var.var_name):
+                value = getattr(self, var.var_name)
+                if not isinstance(value, StatusVar):
+                    if var.representer_function is None:
+                        variables[var.name] = value
+                    else:
+                        variables[var.name] = var.representer_function(self, value)
+        return variables
 
     @property
     def log(self):
@@ -257,6 +272,14 @@ class BaseMixin(metaclass=ModuleMeta):
         """
         return self._threaded
 
+    @property
+    def allows_parallel_activation(self):
+        """
+        Returns whether a non-threaded module may be activated in a worker thread during a
+        parallel startup.
+        """
+        return self._parallel_activation
+
     def on_activate(self):
         """ Method called when module is activated. If not overridden
             this method returns an error.
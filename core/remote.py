@@ -23,15 +23,26 @@ top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi
 import logging
 logger = logging.getLogger(__name__)
 
+from qtpy import QtCore
 from qtpy.QtCore import QObject
 from urllib.parse import urlparse
 import ssl
 from .util.models import DictTableModel, ListTableModel
+from .util.network import netobtain, register_array_transport, register_remote_module
 import rpyc
 from rpyc.utils.server import ThreadedServer
 rpyc.core.protocol.DEFAULT_CONFIG['allow_pickle'] = True
+import concurrent.futures
+import numpy as np
 import os
+import socket
+import struct
 import sys
+import threading
+import time
+import uuid
+import zlib
+from collections import OrderedDict, deque
 
 
 class SSLAuthenticator:
@@ -69,8 +80,12 @@ class RemoteObjectManager(QObject):
         self.tm = manager.tm
         self.manager = manager
         self.server = None
-        self.remoteModules = ListTableModel()
-        self.remoteModules.headers[0] = 'Remote Modules'
+        self.arrayServer = None
+        self.remoteModules = RemoteModuleTableModel()
+        # connection pools by module server (host, port, SSL files, array compression)
+        self.connectionPools = dict()
+        self.poolSize = manager.tree['global'].get('remote_pool_size', 4)
+        self._poolLock = threading.Lock()
         self.sharedModules = DictTableModel()
         self.sharedModules.headers[0] = 'Shared Modules'
 
@@ -82,6 +97,8 @@ class RemoteObjectManager(QObject):
             """
             modules = self.sharedModules
             _manager = self.manager
+            # ArrayServer for the transfer of numpy arrays (None if disabled)
+            array_server = None
 
             @classmethod
             def get_service_name(cls):
@@ -121,17 +138,69 @@ class RemoteObjectManager(QObject):
                     else:
                         logger.error('Client requested a module that is not shared.')
                         return None
+
+            def exposed_getArrayPort(self):
+                """ Return the port of the array transfer side channel.
+
+                  @return int: port of the ArrayServer or None if the side channel is disabled
+                """
+                if self.array_server is None:
+                    return None
+                return self.array_server.port
+
+            def exposed_stageArray(self, array, compression=None):
+                """ Prepare a numpy array of this server for the transfer through the side channel.
+
+                  @param numpy.ndarray array: array to transfer (a netref on client side)
+                  @param str compression: optional, compression of the transferred data ('zlib')
+
+                  @return tuple: transfer header (see ArrayServer.stage) or None if the array can
+                                 not be transferred through the side channel
+                """
+                if self.array_server is None:
+                    return None
+                return self.array_server.stage(array, compression)
+
+            def exposed_callBatch(self, name, calls):
+                """ Call several methods of a shared module in a single request.
+
+                  @param str name: unique module name
+                  @param tuple calls: (method name, args, kwargs items) of each call
+
+                  @return tuple: return values of the calls
+                """
+                name = str(name)
+                if name not in self.modules.storage:
+                    raise KeyError('Module {0} is not shared.'.format(name))
+                module = self.modules.storage[name]
+                return tuple(getattr(module, method)(*args, **dict(kwargs))
+                             for method, args, kwargs in calls)
         return RemoteModuleService
 
-    def createServer(self, hostname, port, certfile=None, keyfile=None, cacertfile=None):
+    def createServer(self, hostname, port, certfile=None, keyfile=None, cacertfile=None,
+                     array_transport=True, array_port=0):
         """ Start the rpyc modules server on a given port.
 
           @param int port: port where the server should be running
+          @param bool array_transport: optional, serve numpy arrays through a side channel
+          @param int array_port: optional, port of the array side channel (0: any free port)
         """
+        service = self.makeRemoteService()
+        if array_transport:
+            self.arrayServer = ArrayServer(hostname, array_port, certfile=certfile,
+                                           keyfile=keyfile, cacertsfile=cacertfile)
+            service.array_server = self.arrayServer
+            arraythread = self.tm.newThread('rpyc-array-server')
+            self.arrayServer.moveToThread(arraythread)
+            arraythread.started.connect(self.arrayServer.run)
+            arraythread.start()
+            logger.info('Started array server at {0} on port {1}'
+                        ''.format(hostname, self.arrayServer.port))
+
         thread = self.tm.newThread('rpyc-server')
         if certfile is not None and keyfile is not None:
             self.server = RPyCServer(
-                self.makeRemoteService(),
+                service,
                 hostname,
                 port,
                 keyfile=keyfile,
@@ -140,7 +209,7 @@ class RemoteObjectManager(QObject):
         else:
             if hostname != 'localhost':
                 logger.warning('Remote connection not secured! Use a certificate!')
-            self.server = RPyCServer(self.makeRemoteService(), hostname, port)
+            self.server = RPyCServer(service, hostname, port)
         self.server.moveToThread(thread)
         thread.started.connect(self.server.run)
         thread.start()
@@ -153,6 +222,9 @@ class RemoteObjectManager(QObject):
         if self.server is not None:
             self.server.close()
             self.server = None
+        if self.arrayServer is not None:
+            self.arrayServer.close()
+            self.arrayServer = None
 
     def shareModule(self, name, obj):
         """ Add a module to the list of modules that can be accessed remotely.
@@ -174,22 +246,25 @@ class RemoteObjectManager(QObject):
             logger.error('Module {0} was not shared.'.format(name))
         self.sharedModules.pop(name)
 
-    def getRemoteModuleUrl(self, url, certfile=None, keyfile=None, cacertsfile=None):
+    def getRemoteModuleUrl(self, url, certfile=None, keyfile=None, cacertsfile=None,
+                           array_compression=None):
         """ Get a remote module via its URL.
 
           @param str url: URL pointing to a module hosted b a remote server
           @param str certfile: filename of certificate or None if SSL is not used
           @param str keyfile: filename of key or None if SSL is not used
           @param str cacertsfile: filename of cacerts of None if SSL is not used
+          @param str array_compression: optional, compression of transferred arrays ('zlib')
 
           @return object: remote module
         """
         parsed = urlparse(url)
         name = parsed.path.replace('/', '')
         return self.getRemoteModule(parsed.hostname, parsed.port, name, certfile, keyfile,
-                                    cacertsfile)
+                                    cacertsfile, array_compression)
 
-    def getRemoteModule(self, host, port, name, certfile=None, keyfile=None, cacertsfile=None):
+    def getRemoteModule(self, host, port, name, certfile=None, keyfile=None, cacertsfile=None,
+                        array_compression=None):
         """ Get a remote module via its host, port and name.
 
           @param str host: host that the remote module server is running on
@@ -198,14 +273,32 @@ class RemoteObjectManager(QObject):
           @param str certfile: filename of certificate or None if SSL is not used
           @param str keyfile: filename of key or None if SSL is not used
           @param str cacertsfile: filename of cacerts of None if SSL is not used
+          @param str array_compression: optional, compression of transferred arrays ('zlib')
 
           @return object: remote module
         """
-        module = RemoteModule(host, port, name, certfile=certfile, keyfile=keyfile,
-                              cacertsfile=cacertsfile)
+        key = (host, port, certfile, keyfile, cacertsfile, array_compression)
+        with self._poolLock:
+            pool = self.connectionPools.get(key)
+            if pool is None:
+                pool = RemoteConnectionPool(host, port, self.poolSize, certfile=certfile,
+                                            keyfile=keyfile, cacertsfile=cacertsfile,
+                                            array_compression=array_compression)
+                self.connectionPools[key] = pool
+        module = RemoteModule(pool, name)
         self.remoteModules.append(module)
         return module.module
 
+    def closeConnections(self):
+        """ Close the connections to all remote module servers.
+        """
+        with self._poolLock:
+            for module in self.remoteModules.storage:
+                module.close()
+            for pool in self.connectionPools.values():
+                pool.close()
+            self.connectionPools = dict()
+
 
 class RPyCServer(QObject):
     """ Contains a RPyC server that serves modules to remote computers. Runs in a QThread.
@@ -254,8 +347,113 @@ class RPyCServer(QObject):
 
 class RemoteModule:
     """ This class represents a module on a remote computer and holds a reference to it.
+
+    Every remote module has a connection of its own for the synchronous access through the module
+    netref, the server handles the requests of one connection one after the other. Methods of the
+    module can also be called asynchronously and in batches (several calls in a single round trip)
+    through the connection pool of the module server (see core.util.network.netcall_async and
+    netcall_batch).
     """
-    def __init__(self, host, port, name, certfile=None, keyfile=None, cacertsfile=None):
+    def __init__(self, pool, name):
+        """
+          @param RemoteConnectionPool pool: connections to the module server
+          @param str name: unique name of the remote module
+        """
+        self.pool = pool
+        self.connection = pool.connect()
+        self.arrayTransport = pool.getArrayTransport(self.connection)
+        self.module = self.connection.root.getModule(name)
+        self.name = name
+        try:
+            self.callBatch = self.connection.root.callBatch
+            self.batchSupported = True
+        except AttributeError:
+            self.callBatch = None
+            self.batchSupported = False
+        register_remote_module(self.module, self)
+
+    @property
+    def url(self):
+        return 'rpyc://{0}:{1}/{2}'.format(self.pool.host, self.pool.port, self.name)
+
+    def close(self):
+        """ Unregister the module from the async and batched calls.
+        """
+        register_remote_module(self.module, None)
+
+    def call_async(self, method, *args, **kwargs):
+        """ Call a method of the remote module without waiting for the result.
+
+          @param str method: name of the method to call
+          @param args: positional arguments of the call
+          @param kwargs: keyword arguments of the call
+
+          @return concurrent.futures.Future: future of the return value
+        """
+        return self.pool.submit(self._call_one, method, args, kwargs)
+
+    def call_batch(self, calls, obtain=False):
+        """ Call several methods of the remote module in a single round trip.
+        The calls run one after another on the server, the first failing call raises its exception
+        and the remaining calls are not executed.
+
+          @param iterable calls: (method name, args, kwargs) of each call
+          @param bool obtain: optional, get local copies of the results (see netobtain)
+
+          @return list: return values of the calls in order
+        """
+        return self._call_batch(calls, obtain, self.callBatch)
+
+    def call_batch_async(self, calls, obtain=False):
+        """ Call several methods of the remote module in a single round trip without waiting for
+        the results (see call_batch).
+
+          @param iterable calls: (method name, args, kwargs) of each call
+          @param bool obtain: optional, get local copies of the results (see netobtain)
+
+          @return concurrent.futures.Future: future of the list of return values
+        """
+        return self.pool.submit(self._call_batch, calls, obtain, self.pool.workerCallBatch)
+
+    def _call_one(self, method, args, kwargs):
+        return self._call_batch(((method, args, kwargs), ), False, self.pool.workerCallBatch)[0]
+
+    def _call_batch(self, calls, obtain, call_batch):
+        # kwargs are sent as items, a dict would be passed by reference
+        calls = tuple((str(method), tuple(args), tuple(kwargs.items()))
+                      for method, args, kwargs in calls)
+        if self.batchSupported:
+            results = call_batch(self.name, calls)
+            # the request itself is counted as one call
+            self.pool.stats.addCalls(len(calls) - 1)
+        else:
+            # server without batch support, one round trip per call
+            results = [getattr(self.module, method)(*args, **dict(kwargs))
+                       for method, args, kwargs in calls]
+        if obtain:
+            return [netobtain(result) for result in results]
+        return list(results)
+
+
+class RemoteConnectionPool:
+    """ Connections to a remote module server, shared by all remote modules of the server.
+
+    Each remote module opens its own connection for the module netref and synchronous batches.
+    Asynchronous calls run in a thread pool where each worker thread owns a connection of its own,
+    so up to size calls are in flight in parallel and do not wait for each other on the server.
+    The duration of every request on any of the connections is recorded in stats.
+    """
+    def __init__(self, host, port, size=4, certfile=None, keyfile=None, cacertsfile=None,
+                 array_compression=None):
+        """
+          @param str host: host that the remote module server is running on
+          @param int port: port that the remote module server is listening on
+          @param int size: optional, number of connections for asynchronous calls
+          @param str certfile: filename of certificate or None if SSL is not used
+          @param str keyfile: filename of key or None if SSL is not used
+          @param str cacertsfile: filename of cacerts of None if SSL is not used
+          @param str array_compression: optional, compression of transferred arrays ('zlib')
+        """
         if certfile is not None and keyfile is not None:
             if not os.path.exists(certfile):
                 raise Exception('SSL certificate {0} does not exist.'.format(certfile))
@@ -263,15 +461,447 @@ class RemoteModule:
                 raise Exception('SSL private key file {0} does not exist.'.format(keyfile))
             if (cacertsfile is not None) and (not os.path.exists(cacertsfile)):
                 logger.warning('SSL CA certificates file {0} does not exist.'.format(cacertsfile))
-            self.connection = rpyc.ssl_connect(
-                host,
-                port=port,
+        self.host = host
+        self.port = port
+        self.size = max(1, int(size))
+        self.certfile = certfile
+        self.keyfile = keyfile
+        self.cacertsfile = cacertsfile
+        self.array_compression = array_compression
+        self.stats = RemoteCallStatistics()
+        self.connections = list()
+        # array side channel transports by connection
+        self.arrayTransports = dict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._executor = None
+
+    def connect(self):
+        """ Open a new connection to the module server. Requests through the connection are
+        recorded in stats and numpy arrays are obtained through the array side channel (if the
+        server provides one).
+
+          @return rpyc.Connection: new connection
+        """
+        if self.certfile is not None and self.keyfile is not None:
+            connection = rpyc.ssl_connect(
+                self.host,
+                port=self.port,
                 config={'allow_all_attrs': True},
-                certfile=certfile,
-                keyfile=keyfile,
-                ca_certs=cacertsfile,
+                certfile=self.certfile,
+                keyfile=self.keyfile,
+                ca_certs=self.cacertsfile,
                 cert_reqs=ssl.CERT_REQUIRED)
         else:
-            self.connection = rpyc.connect(host, port, config={'allow_all_attrs': True})
-        self.module = self.connection.root.getModule(name)
-        self.name = name
+            connection = rpyc.connect(self.host, self.port, config={'allow_all_attrs': True})
+        sync_request = connection.sync_request
+        stats = self.stats
+
+        def timed_sync_request(handler, *args):
+            start = time.perf_counter()
+            try:
+                return sync_request(handler, *args)
+            finally:
+                stats.record(time.perf_counter() - start)
+        connection.sync_request = timed_sync_request
+
+        try:
+            array_port = connection.root.getArrayPort()
+        except AttributeError:
+            array_port = None
+        with self._lock:
+            self.connections.append(connection)
+            if array_port is not None:
+                transport = ArrayTransport(connection,
+                                           self.host,
+                                           array_port,
+                                           compression=self.array_compression,
+                                           certfile=self.certfile,
+                                           keyfile=self.keyfile,
+                                           cacertsfile=self.cacertsfile)
+                register_array_transport(connection, transport)
+                self.arrayTransports[connection] = transport
+        return connection
+
+    def getArrayTransport(self, connection):
+        """ Get the array side channel transport of a connection of the pool.
+
+          @param rpyc.Connection connection: connection opened by connect
+
+          @return ArrayTransport: transport or None if the server has no array side channel
+        """
+        with self._lock:
+            return self.arrayTransports.get(connection)
+
+    def submit(self, function, *args):
+        """ Run a function in the thread pool of the connections.
+
+          @param callable function: function to run
+          @param args: arguments of the function
+
+          @return concurrent.futures.Future: future of the return value
+        """
+        with self._lock:
+            if self._executor is None:
+                self._executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self.size,
+                    thread_name_prefix='rpyc-pool-{0}:{1}'.format(self.host, self.port))
+            return self._executor.submit(function, *args)
+
+    def workerCallBatch(self, name, calls):
+        """ Call a batch of methods of a remote module through the connection of the current
+        worker thread (opened on the first call of the thread).
+
+          @param str name: unique name of the remote module
+          @param tuple calls: (method name, args, kwargs items) of each call
+
+          @return tuple: return values of the calls
+        """
+        call_batch = getattr(self._local, 'call_batch', None)
+        if call_batch is None:
+            call_batch = self._local.call_batch = self.connect().root.callBatch
+        return call_batch(name, calls)
+
+    def close(self):
+        """ Stop the thread pool and close all connections.
+        """
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+            for transport in self.arrayTransports.values():
+                transport.close()
+            for connection in self.connections:
+                try:
+                    connection.close()
+                except Exception:
+                    logger.exception('Error while closing connection to {0}:{1}.'
+                                     ''.format(self.host, self.port))
+            self.arrayTransports = dict()
+            self.connections = list()
+
+
+class RemoteCallStatistics:
+    """ Thread safe counters of the requests to a module server: totals and the mean latency and
+    throughput of the last window seconds.
+    """
+    def __init__(self, window=10.0):
+        """
+          @param float window: optional, time span (s) of the mean latency and throughput
+        """
+        self.window = window
+        self.requests = 0
+        self.calls = 0
+        self._recent = deque(maxlen=100000)
+        self._lock = threading.Lock()
+
+    def record(self, seconds, calls=1):
+        """ Record a finished request.
+
+          @param float seconds: duration of the request
+          @param int calls: optional, number of method calls done by the request
+        """
+        with self._lock:
+            self.requests += 1
+            self.calls += calls
+            self._recent.append((time.monotonic(), seconds, calls))
+
+    def addCalls(self, calls):
+        """ Count method calls that did not need a request of their own (batched calls).
+
+          @param int calls: number of calls
+        """
+        with self._lock:
+            self.calls += calls
+            if self._recent:
+                timestamp, seconds, recent_calls = self._recent[-1]
+                self._recent[-1] = (timestamp, seconds, recent_calls + calls)
+
+    def snapshot(self):
+        """ Get the current counters.
+
+          @return dict: total requests and calls, mean latency (s) and calls per second of the
+                        last window seconds
+        """
+        with self._lock:
+            now = time.monotonic()
+            while self._recent and self._recent[0][0] < now - self.window:
+                self._recent.popleft()
+            latencies = [entry[1] for entry in self._recent]
+            recent_calls = sum(entry[2] for entry in self._recent)
+            return {'requests': self.requests,
+                    'calls': self.calls,
+                    'latency': sum(latencies) / len(latencies) if latencies else None,
+                    'calls_per_second': recent_calls / self.window}
+
+
+class RemoteModuleTableModel(ListTableModel):
+    """ Qt model of the remote modules with the latency and throughput of their server connections.
+    """
+    def __init__(self):
+        super().__init__()
+        self.headers = ['Remote Modules', 'Latency', 'Calls/s', 'Requests']
+
+    def data(self, index, role):
+        """ Get data from model for a given cell.
+
+          @param QModelIndex index: cell for which data is requested
+          @param ItemDataRole role: role for which data is requested
+
+          @return QVariant: data for given cell and role
+        """
+        if not index.isValid() or role != QtCore.Qt.DisplayRole:
+            return None
+        module = self.storage[index.row()]
+        if index.column() == 0:
+            return module.url
+        stats = module.pool.stats.snapshot()
+        if index.column() == 1:
+            if stats['latency'] is None:
+                return '-'
+            return '{0:.2f} ms'.format(stats['latency'] * 1e3)
+        elif index.column() == 2:
+            return '{0:.1f}'.format(stats['calls_per_second'])
+        elif index.column() == 3:
+            return str(stats['requests'])
+        return None
+
+    def updateStatistics(self):
+        """ Notify views that the connection statistics changed.
+        """
+        if len(self.storage) > 0:
+            self.dataChanged.emit(self.index(0, 1),
+                                  self.index(len(self.storage) - 1, len(self.headers) - 1))
+
+
+class ArrayServer(QObject):
+    """ Side channel of the module server for the transfer of numpy arrays. Runs in a QThread.
+
+    Obtaining an array of a remote module through rpyc pickles it on the server and unpickles it on
+    the client (and rpyc compresses the messages). Instead, a client stages the array through the
+    rpyc service (see RemoteModuleService.exposed_stageArray) and receives the raw array buffer with
+    a token through a separate socket: 32 byte token -> 8 byte size (big endian) + data.
+    Small arrays are returned directly by the staging call.
+    The staged array is copied once on the server (the module might change it in place after
+    staging). The data is sent directly from the staged buffer and received directly into the
+    memory of the new array (unless compressed).
+    """
+    # Maximum number of staged arrays waiting for transfer
+    max_staged = 16
+    # Arrays up to this size (bytes) are returned with the header instead of through the socket
+    inline_size = 65536
+
+    def __init__(self, host, port=0, certfile=None, keyfile=None, cacertsfile=None):
+        """
+          @param str host: address to listen on
+          @param int port: optional, port to listen on (0: any free port)
+          @param str certfile: filename of certificate or None if SSL is not used
+          @param str keyfile: filename of key or None if SSL is not used
+          @param str cacertsfile: filename of cacerts of None if SSL is not used
+        """
+        super().__init__()
+        if certfile is not None and keyfile is not None:
+            self.authenticator = SSLAuthenticator(server_key_file=keyfile,
+                                                  server_cert_file=certfile,
+                                                  ca_certs=cacertsfile)
+        else:
+            self.authenticator = None
+        self._staged = OrderedDict()
+        self._lock = threading.Lock()
+        self._closed = False
+        # bind right away, so the port is known before the server thread runs
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.socket.bind((host, port))
+        self.socket.listen(8)
+        self.port = self.socket.getsockname()[1]
+
+    def stage(self, array, compression=None):
+        """ Prepare an array for the transfer through the side channel.
+
+          @param numpy.ndarray array: array to transfer
+          @param str compression: optional, compression of the transferred data ('zlib')
+
+          @return tuple: transfer header (token, dtype, shape, order, size, compression, data) or
+                         None if the array can not be transferred as raw buffer. Small arrays are
+                         returned as data (bytes) with token None.
+        """
+        if not isinstance(array, np.ndarray) or array.dtype.fields is not None \
+                or array.dtype.hasobject:
+            return None
+        order = 'F' if array.flags.f_contiguous and not array.flags.c_contiguous else 'C'
+        array = np.array(array, order=order, copy=True)
+        flat = (array.T if order == 'F' else array).reshape(-1).view(np.uint8)
+        if flat.size <= self.inline_size:
+            return None, array.dtype.str, array.shape, order, flat.size, None, flat.tobytes()
+        if compression == 'zlib':
+            payload = zlib.compress(memoryview(flat), 1)
+        else:
+            if compression is not None:
+                logger.warning('Unknown array compression "{0}". Sending uncompressed data.'
+                               ''.format(compression))
+                compression = None
+            payload = memoryview(flat)
+        token = uuid.uuid4().hex
+        with self._lock:
+            self._staged[token] = payload
+            while len(self._staged) > self.max_staged:
+                self._staged.popitem(last=False)
+        return token, array.dtype.str, array.shape, order, flat.size, compression, None
+
+    def run(self):
+        """ Accept side channel connections until the server is closed.
+        """
+        while not self._closed:
+            try:
+                conn, addr = self.socket.accept()
+            except OSError:
+                break
+            threading.Thread(target=self._serve_client,
+                             args=(conn,),
+                             name='rpyc-array-client',
+                             daemon=True).start()
+
+    def close(self):
+        """ Stop the server and drop all staged arrays.
+        """
+        self._closed = True
+        self.socket.close()
+        with self._lock:
+            self._staged.clear()
+
+    def _serve_client(self, conn):
+        """ Send the staged arrays requested by a client until the connection is closed.
+        """
+        try:
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            if self.authenticator is not None:
+                conn, credentials = self.authenticator(conn)
+            while not self._closed:
+                token = _recv_exact(conn, 32)
+                if token is None:
+                    break
+                with self._lock:
+                    payload = self._staged.pop(token.decode(), None)
+                if payload is None:
+                    conn.sendall(struct.pack('>Q', 2**64 - 1))
+                    continue
+                conn.sendall(struct.pack('>Q', payload.nbytes if isinstance(
+                    payload, memoryview) else len(payload)))
+                conn.sendall(payload)
+        except Exception:
+            logger.exception('Error in array side channel connection.')
+        finally:
+            conn.close()
+
+
+class ArrayTransport:
+    """ Client side of the array side channel (see ArrayServer) for one remote module connection.
+        Used by core.util.network.netobtain for netrefs of numpy arrays.
+    """
+    def __init__(self, connection, host, port, compression=None, certfile=None, keyfile=None,
+                 cacertsfile=None):
+        """
+          @param rpyc.Connection connection: rpyc connection to the module server
+          @param str host: host of the module server
+          @param int port: port of the array side channel
+          @param str compression: optional, compression of the transferred data ('zlib')
+          @param str certfile: filename of certificate or None if SSL is not used
+          @param str keyfile: filename of key or None if SSL is not used
+          @param str cacertsfile: filename of cacerts of None if SSL is not used
+        """
+        self.connection = connection
+        self.host = host
+        self.port = port
+        self.compression = compression
+        self.certfile = certfile
+        self.keyfile = keyfile
+        self.cacertsfile = cacertsfile
+        self.socket = None
+        self._lock = threading.Lock()
+        # keep the remote method, so staging needs a single round trip
+        self._stage_array = connection.root.stageArray
+
+    def obtain(self, proxy):
+        """ Copy a remote numpy array to the local host.
+
+          @param proxy: netref of a numpy.ndarray on the module server
+
+          @return numpy.ndarray: local copy of the array
+        """
+        header = self._stage_array(proxy, self.compression)
+        if header is None:
+            return rpyc.utils.classic.obtain(proxy)
+        token, dtype, shape, order, size, compression, data = header
+        if token is None:
+            return np.frombuffer(data, dtype=dtype).reshape(shape, order=order).copy(order)
+        with self._lock:
+            try:
+                sock = self._connect()
+                sock.sendall(token.encode())
+                length = struct.unpack('>Q', _recv_exact(sock, 8))[0]
+                if length == 2**64 - 1:
+                    raise Exception('Array was not staged on the server.')
+                if compression is None:
+                    array = np.empty(shape, dtype=dtype, order=order)
+                    flat = (array.T if order == 'F' else array).reshape(-1).view(np.uint8)
+                    _recv_into(sock, memoryview(flat))
+                    return array
+                data = bytearray(length)
+                _recv_into(sock, memoryview(data))
+                data = zlib.decompress(data, bufsize=size)
+                return np.frombuffer(data, dtype=dtype).reshape(shape, order=order).copy(order)
+            except Exception:
+                logger.exception('Array transfer through side channel failed. Using rpyc.')
+                self.close()
+        return rpyc.utils.classic.obtain(proxy)
+
+    def close(self):
+        """ Close the side channel connection (reconnected on the next transfer).
+        """
+        if self.socket is not None:
+            self.socket.close()
+            self.socket = None
+
+    def _connect(self):
+        if self.socket is None:
+            sock = socket.create_connection((self.host, self.port))
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            if self.certfile is not None and self.keyfile is not None:
+                context = ssl.create_default_context(ssl.Purpose.SERVER_AUTH,
+                                                     cafile=self.cacertsfile)
+                context.check_hostname = False
+                context.verify_mode = ssl.CERT_REQUIRED
+                context.load_cert_chain(certfile=self.certfile, keyfile=self.keyfile)
+                sock = context.wrap_socket(sock)
+            self.socket = sock
+        return self.socket
+
+
+def _recv_exact(sock, size):
+    """ Receive exactly size bytes from a socket. Returns None if the connection was closed
+        before the first byte.
+    """
+    data = bytearray(size)
+    view = memoryview(data)
+    received = 0
+    while received < size:
+        count = sock.recv_into(view[received:])
+        if count == 0:
+            if received == 0:
+                return None
+            raise ConnectionError('Connection closed during transfer.')
+        received += count
+    return bytes(data)
+
+
+def _recv_into(sock, view):
+    """ Receive data from a socket until the (byte) memoryview is filled.
+    """
+    received = 0
+    size = view.nbytes
+    while received < size:
+        count = sock.recv_into(view[received:])
+        if count == 0:
+            raise ConnectionError('Connection closed during transfer.')
+        received += count
@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""
+Binary store for the status variables of qudi modules.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at
+<https://github.com/Ulm-IQO/qudi/>
+"""
+
+import hashlib
+import json
+import logging
+import pickle
+import sqlite3
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class StatusStore:
+    """
+    Stores the status variables of all modules in a single SQLite database (one row per variable).
+
+    Numpy arrays (with a plain numeric dtype) are written as raw binary blobs directly from the
+    array memory without intermediate copies or compression. All other values are pickled.
+    For every variable a digest of the stored data is kept, so saving a module only rewrites the
+    variables whose value has changed since they were loaded or saved the last time.
+
+    The database runs in write-ahead-log mode, so an interrupted save (e.g. a crash) never
+    corrupts the variables written before.
+    """
+
+    def __init__(self, filename):
+        """
+        @param str filename: path of the database file (created if it does not exist)
+        """
+        self._filename = filename
+        self._lock = threading.RLock()
+        # module key -> {variable name: digest} of the data in the database
+        self._digests = dict()
+        self._connection = sqlite3.connect(filename, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute('PRAGMA synchronous=NORMAL')
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS status_variables ('
+                'module TEXT NOT NULL, name TEXT NOT NULL, kind TEXT NOT NULL, meta TEXT, '
+                'data BLOB, digest BLOB, PRIMARY KEY (module, name))')
+
+    @property
+    def filename(self):
+        return self._filename
+
+    def close(self):
+        """ Close the database connection. The store can not be used afterwards. """
+        with self._lock:
+            self._connection.close()
+            self._digests = dict()
+
+    def has_module(self, module):
+        """ Check if any status variables are stored for a module.
+
+          @param str module: module key
+
+          @return bool: True if there are stored variables for the module
+        """
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT 1 FROM status_variables WHERE module=? LIMIT 1', (module,)).fetchone()
+        return row is not None
+
+    def load(self, module):
+        """ Load all status variables of a module.
+
+          @param str module: module key
+
+          @return OrderedDict: status variable names and values
+        """
+        variables = OrderedDict()
+        digests = dict()
+        with self._lock:
+            rows = self._connection.execute(
+                'SELECT name, kind, meta, data, digest FROM status_variables WHERE module=? '
+                'ORDER BY rowid', (module,)).fetchall()
+            for name, kind, meta, data, digest in rows:
+                try:
+                    variables[name] = self._decode(kind, meta, data)
+                except Exception:
+                    logger.exception('Failed to load status variable "{0}" of module {1}.'
+                                     ''.format(name, module))
+                    continue
+                digests[name] = digest
+            self._digests[module] = digests
+        return variables
+
+    def save(self, module, variables):
+        """ Save the status variables of a module. Only changed variables are written.
+        Stored variables of the module that are not contained in variables are removed.
+
+          @param str module: module key
+          @param dict variables: status variable names and values
+
+          @return int: number of variables that have been written
+        """
+        with self._lock:
+            digests = self._digests.get(module)
+            if digests is None:
+                digests = dict(self._connection.execute(
+                    'SELECT name, digest FROM status_variables WHERE module=?',
+                    (module,)).fetchall())
+            new_digests = dict()
+            rows = list()
+            for name, value in variables.items():
+                kind, meta, data = self._encode(value)
+                digest = self._digest(kind, meta, data)
+                new_digests[name] = digest
+                if digests.get(name) != digest:
+                    rows.append((module, name, kind, meta, data, digest))
+            removed = [(module, name) for name in digests if name not in new_digests]
+            if rows or removed:
+                with self._connection:
+                    self._connection.executemany(
+                        'INSERT OR REPLACE INTO status_variables '
+                        '(module, name, kind, meta, data, digest) VALUES (?, ?, ?, ?, ?, ?)', rows)
+                    self._connection.executemany(
+                        'DELETE FROM status_variables WHERE module=? AND name=?', removed)
+            self._digests[module] = new_digests
+        return len(rows)
+
+    def remove(self, module):
+        """ Remove all status variables of a module.
+
+          @param str module: module key
+        """
+        with self._lock, self._connection:
+            self._connection.execute('DELETE FROM status_variables WHERE module=?', (module,))
+            self._digests.pop(module, None)
+
+    @staticmethod
+    def _encode(value):
+        """ Convert a status variable into (kind, meta, data) for the database.
+
+          @param object value: status variable value
+
+          @return tuple(str, str, buffer): kind of encoding, JSON meta data and binary data
+        """
+        if (type(value) is np.ndarray and value.dtype.fields is None
+                and not value.dtype.hasobject):
+            if value.flags.c_contiguous:
+                order, flat = 'C', value.reshape(-1)
+            elif value.flags.f_contiguous:
+                order, flat = 'F', value.T.reshape(-1)
+            else:
+                order, flat = 'C', np.ascontiguousarray(value).reshape(-1)
+            # byte view on the array memory, no copy
+            data = memoryview(flat.view(np.uint8))
+            meta = json.dumps({'dtype': value.dtype.str, 'shape': value.shape, 'order': order})
+            return 'ndarray', meta, data
+        return 'pickle', None, pickle.dumps(value, protocol=4)
+
+    @staticmethod
+    def _decode(kind, meta, data):
+        """ Convert data read from the database back into the status variable value.
+        """
+        if kind == 'ndarray':
+            meta = json.loads(meta)
+            arr = np.frombuffer(data, dtype=np.dtype(meta['dtype']))
+            # copy, the buffer returned by sqlite is read-only
+            return arr.reshape(meta['shape'], order=meta['order']).copy(order=meta['order'])
+        if kind == 'pickle':
+            return pickle.loads(data)
+        raise ValueError('Unknown status variable encoding "{0}".'.format(kind))
+
+    @staticmethod
+    def _digest(kind, meta, data):
+        digest = hashlib.blake2b(kind.encode(), digest_size=16)
+        if meta is not None:
+            digest.update(meta.encode())
+        digest.update(data)
+        return digest.digest()
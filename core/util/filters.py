@@ -19,7 +19,9 @@ Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
 top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
 """
 
+import heapq
 import numpy as np
+from collections import deque
 from scipy.ndimage import minimum_filter1d, maximum_filter1d
 
 import logging
@@ -62,3 +64,128 @@ def scan_blink_correction(image, axis=1):
         np.flip(filt_img, axis), size=2, axis=axis, mode='constant', cval=median)
     # Flip back the image to obtain original orientation and return result.
     return np.flip(filt_img, axis)
+
+
+class SlidingMedian:
+    """
+    Median over a sliding window of the latest values of a data stream.
+
+    The window values are kept in two heaps (max-heap of the lower and min-heap of the upper half)
+    with lazy deletion of the values leaving the window. Adding a value costs O(log(window)) instead
+    of O(window) for calculating the median of the whole window again.
+    The result is identical to numpy.median over the latest window values.
+    """
+
+    def __init__(self, window, initial_value=None):
+        """
+        @param int window: number of latest values to calculate the median of
+        @param float initial_value: optional, value to initially fill the window with. If None the
+                                    window starts empty.
+        """
+        self._window = max(int(window), 1)
+        self._values = deque()
+        self._low = list()  # max-heap (negated values) of the lower half
+        self._high = list()  # min-heap of the upper half
+        self._low_size = 0
+        self._high_size = 0
+        self._delayed = dict()
+        if initial_value is not None:
+            for _ in range(self._window):
+                self.push(initial_value)
+
+    def __len__(self):
+        return len(self._values)
+
+    @property
+    def window(self):
+        return self._window
+
+    @property
+    def median(self):
+        """ The median of the values in the window (NaN if empty).
+        """
+        if self._low_size == 0:
+            return np.nan
+        if self._low_size > self._high_size:
+            return -self._low[0]
+        return (self._high[0] - self._low[0]) / 2
+
+    def push(self, value):
+        """
+        Adds a value to the window. The oldest value is removed if the window is full.
+
+        @param float value: the new value
+
+        @return float: the median of the window values
+        """
+        value = float(value)
+        self._values.append(value)
+        self._insert(value)
+        if len(self._values) > self._window:
+            self._erase(self._values.popleft())
+        # Rebuild the heaps if too many deleted values are waiting to be removed
+        if len(self._low) + len(self._high) > 4 * self._window:
+            self._rebuild()
+        return self.median
+
+    def _insert(self, value):
+        if not self._low or value <= -self._low[0]:
+            heapq.heappush(self._low, -value)
+            self._low_size += 1
+        else:
+            heapq.heappush(self._high, value)
+            self._high_size += 1
+        self._balance()
+        return
+
+    def _erase(self, value):
+        self._delayed[value] = self._delayed.get(value, 0) + 1
+        if value <= -self._low[0]:
+            self._low_size -= 1
+            if value == -self._low[0]:
+                self._prune(self._low, -1)
+        else:
+            self._high_size -= 1
+            if value == self._high[0]:
+                self._prune(self._high, 1)
+        self._balance()
+        return
+
+    def _prune(self, heap, sign):
+        """ Removes deleted values from the top of the heap.
+        """
+        while heap:
+            value = sign * heap[0]
+            count = self._delayed.get(value, 0)
+            if count == 0:
+                break
+            if count == 1:
+                del self._delayed[value]
+            else:
+                self._delayed[value] = count - 1
+            heapq.heappop(heap)
+        return
+
+    def _balance(self):
+        if self._low_size > self._high_size + 1:
+            heapq.heappush(self._high, -heapq.heappop(self._low))
+            self._low_size -= 1
+            self._high_size += 1
+            self._prune(self._low, -1)
+        elif self._low_size < self._high_size:
+            heapq.heappush(self._low, -heapq.heappop(self._high))
+            self._high_size -= 1
+            self._low_size += 1
+            self._prune(self._high, 1)
+        return
+
+    def _rebuild(self):
+        values = sorted(self._values)
+        self._low_size = (len(values) + 1) // 2
+        self._high_size = len(values) - self._low_size
+        self._low = [-value for value in values[:self._low_size]]
+        self._high = values[self._low_size:]
+        heapq.heapify(self._low)
+        heapq.heapify(self._high)
+        self._delayed = dict()
+        return
@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 """
-Check if something is a rpyc remote object and transfer it
+Check if something is a rpyc remote object, transfer it and call remote modules asynchronously
 
 Qudi is free software: you can redistribute it and/or modify
 it under the terms of the GNU General Public License as published by
@@ -19,14 +19,141 @@ Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
 top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
 """
 
+import concurrent.futures
+import weakref
+
 import rpyc.core.netref
 import rpyc.utils.classic
 
+# Side channel transports for numpy arrays by rpyc connection (see core.remote.ArrayTransport)
+_array_transports = weakref.WeakKeyDictionary()
 
-def netobtain(obj):
+# Remote modules (see core.remote.RemoteModule) by id of their netref
+_remote_modules = dict()
+
+
+def register_array_transport(connection, transport):
+    """ Register a side channel transport for numpy arrays of a rpyc connection.
+
+    @param rpyc.Connection connection: connection to a remote module server
+    @param transport: object with a method obtain(netref) returning the local copy of an array
     """
+    _array_transports[connection] = transport
+
+
+def netobtain(obj):
+    """ Get a local copy of an object if it is a rpyc remote object.
+    Numpy arrays are transferred through the array side channel of the module server if available.
+
+    @param object obj: remote object (netref) or local object
+
+    @return object: local copy of obj or obj itself if it is not remote
     """
     if isinstance(obj, rpyc.core.netref.BaseNetref):
+        # check the type of the netref class to avoid a round trip
+        netref_class = type(obj)
+        if netref_class.__name__ == 'ndarray' and netref_class.__module__ == 'numpy':
+            transport = _array_transports.get(object.__getattribute__(obj, '____conn__'))
+            if transport is not None:
+                return transport.obtain(obj)
         return rpyc.utils.classic.obtain(obj)
     else:
         return obj
+
+
+def register_remote_module(proxy, remote_module):
+    """ Register the handler of async and batched calls for a remote module.
+
+    @param proxy: netref of the module on the module server
+    @param remote_module: object with the methods call_async, call_batch and call_batch_async
+                          (see core.remote.RemoteModule) or None to unregister
+    """
+    if remote_module is None:
+        _remote_modules.pop(id(proxy), None)
+    else:
+        _remote_modules[id(proxy)] = remote_module
+
+
+def _get_remote_module(obj):
+    """ Get the registered remote module of a module netref or a connector of a remote module.
+    """
+    # connectors return a proxy object forwarding all attribute access (see core.connector)
+    connector = getattr(type(obj), '_connector', None)
+    if connector is not None:
+        obj = connector.obj
+    return _remote_modules.get(id(obj))
+
+
+def _normalize_calls(calls):
+    """ Convert calls given as method name, (name, args) or (name, args, kwargs) into a tuple of
+    (name, args, kwargs) tuples.
+    """
+    normalized = list()
+    for call in calls:
+        if isinstance(call, str):
+            call = (call, )
+        name, args, kwargs = tuple(call) + ((), {})[len(call) - 1:]
+        normalized.append((name, tuple(args), dict(kwargs)))
+    return tuple(normalized)
+
+
+def netcall_async(obj, method, *args, **kwargs):
+    """ Call a method of a (possibly remote) module without waiting for the result.
+    Remote calls run in parallel on the pooled connections to the module server. Methods of local
+    modules are called right away.
+
+    @param object obj: module, module netref or connector of the module
+    @param str method: name of the method to call
+    @param args: positional arguments of the call
+    @param kwargs: keyword arguments of the call
+
+    @return concurrent.futures.Future: future of the return value
+    """
+    remote_module = _get_remote_module(obj)
+    if remote_module is not None:
+        return remote_module.call_async(method, *args, **kwargs)
+    future = concurrent.futures.Future()
+    try:
+        future.set_result(getattr(obj, method)(*args, **kwargs))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+
+def netcall_batch(obj, calls, obtain=False):
+    """ Call several methods of a (possibly remote) module in a single request.
+    A batch of remote calls costs one round trip to the module server instead of one per call.
+
+    @param object obj: module, module netref or connector of the module
+    @param iterable calls: calls given as method name, (name, args) or (name, args, kwargs)
+    @param bool obtain: optional, get local copies of remote results (see netobtain)
+
+    @return list: return values of the calls in order
+    """
+    calls = _normalize_calls(calls)
+    remote_module = _get_remote_module(obj)
+    if remote_module is not None:
+        return remote_module.call_batch(calls, obtain=obtain)
+    return [getattr(obj, name)(*args, **kwargs) for name, args, kwargs in calls]
+
+
+def netcall_batch_async(obj, calls, obtain=False):
+    """ Call several methods of a (possibly remote) module in a single request without waiting for
+    the results (see netcall_batch).
+
+    @param object obj: module, module netref or connector of the module
+    @param iterable calls: calls given as method name, (name, args) or (name, args, kwargs)
+    @param bool obtain: optional, get local copies of remote results (see netobtain)
+
+    @return concurrent.futures.Future: future of the list of return values
+    """
+    calls = _normalize_calls(calls)
+    remote_module = _get_remote_module(obj)
+    if remote_module is not None:
+        return remote_module.call_batch_async(calls, obtain=obtain)
+    future = concurrent.futures.Future()
+    try:
+        future.set_result(netcall_batch(obj, calls))
+    except Exception as e:
+        future.set_exception(e)
+    return future
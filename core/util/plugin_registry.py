@@ -0,0 +1,418 @@
+# -*- coding: utf-8 -*-
+"""
+This file contains a registry for lazy, on-demand import of plugin modules (e.g. fit methods or
+pulse extraction/analysis methods).
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import ast
+import importlib
+import inspect
+import json
+import logging
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+from core.util.modules import get_home_dir
+
+logger = logging.getLogger(__name__)
+
+# Bump this if the layout of the manifest entries changes. Old manifests are regenerated.
+MANIFEST_VERSION = 1
+
+# Serializes manifest file access of all registries within this process
+_manifest_lock = threading.Lock()
+
+
+def get_default_manifest_path():
+    """ Returns the path of the manifest file shared by all plugin registries.
+
+        @return string: absolute path to the manifest file
+    """
+    return os.path.join(get_home_dir(), '.qudi', 'plugin_manifest.json')
+
+
+def _literal(node):
+    """ Evaluates an AST node of a default value.
+
+        @param ast.AST node: node to evaluate
+
+        @return tuple(bool, object): (True, value) if the node is a literal, (False, None) otherwise
+    """
+    try:
+        value = ast.literal_eval(node)
+        # Make sure the value survives the JSON manifest without changing its type
+        if json.loads(json.dumps(value)) != value or isinstance(value, (tuple, set, dict)):
+            return False, None
+        return True, value
+    except (ValueError, TypeError, SyntaxError):
+        return False, None
+
+
+def _function_info(node):
+    """ Collects the argument names and (literal) default values of a function definition.
+
+        @param ast.FunctionDef node: function definition to inspect
+
+        @return dict: function description for the manifest
+    """
+    args = node.args
+    parameters = list()
+    literal = args.vararg is None and args.kwarg is None
+    positional = args.args
+    defaults = [None] * (len(positional) - len(args.defaults)) + list(args.defaults)
+    for arg, default in zip(positional, defaults):
+        if default is None:
+            parameters.append([arg.arg])
+            continue
+        is_literal, value = _literal(default)
+        literal = literal and is_literal
+        parameters.append([arg.arg, value])
+    if args.kwonlyargs:
+        # Keyword only arguments can not be represented in the manifest parameter list
+        literal = False
+    return {'parameters': parameters, 'literal_defaults': literal}
+
+
+def _dotted_name(node):
+    """ Returns the (dotted) name of a Name/Attribute node or None for other nodes.
+    """
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        parent = _dotted_name(node.value)
+        return None if parent is None else '{0}.{1}'.format(parent, node.attr)
+    return None
+
+
+def index_plugin_file(file_path):
+    """ Parses a python file (without importing it) and indexes its top level functions and classes.
+
+        @param string file_path: path to the python file
+
+        @return dict: manifest entry with the keys 'functions' and 'classes'
+    """
+    with open(file_path, 'rb') as file:
+        tree = ast.parse(file.read(), filename=file_path)
+
+    functions = OrderedDict()
+    classes = OrderedDict()
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            functions[node.name] = _function_info(node)
+        elif isinstance(node, ast.ClassDef):
+            methods = OrderedDict()
+            for item in node.body:
+                if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                    methods[item.name] = _function_info(item)
+            classes[node.name] = {'bases': [_dotted_name(base) for base in node.bases],
+                                  'methods': methods}
+    return {'functions': functions, 'classes': classes}
+
+
+class PluginRegistry:
+    """
+    Index of the top level functions and classes defined in the python modules (*.py files) of
+    one or more plugin directories.
+
+    The index is created by parsing the files instead of importing them and is cached in a
+    manifest file on disk. Only files that have been changed (modification time or size) since the
+    last run are parsed again. The plugin modules themselves are imported when a member is used
+    for the first time (see get_member, LazyPluginAttribute and LazyPluginCallable). A module that
+    has been changed on disk after its import is reloaded on the next call to load_module.
+
+    As before, the plugin directories are appended to sys.path and the modules are imported by
+    their file names, so module names must be unique among all plugin directories.
+    """
+
+    def __init__(self, paths, manifest_path=None):
+        """
+        @param iterable paths: directories containing the plugin modules
+        @param string manifest_path: optional, path of the manifest file (None for default)
+        """
+        self.log = logger
+        self._paths = list()
+        for path in paths:
+            path = os.path.abspath(path)
+            if path not in self._paths:
+                self._paths.append(path)
+        self._manifest_path = get_default_manifest_path() if manifest_path is None else manifest_path
+        self._lock = threading.RLock()
+        # module name -> manifest entry (incl. file path, mtime and size)
+        self._entries = OrderedDict()
+        # module name -> (module, mtime and size of the file at import)
+        self._loaded = dict()
+        self.refresh()
+
+    @property
+    def paths(self):
+        return list(self._paths)
+
+    @property
+    def module_names(self):
+        """ Names of all indexed plugin modules in the order of the plugin paths.
+        """
+        return list(self._entries)
+
+    def refresh(self):
+        """ Updates the index from the plugin directories. Only new or changed files are parsed.
+        The manifest file is rewritten if anything changed.
+        """
+        with self._lock:
+            manifest = self._read_manifest()
+            changed = False
+            entries = OrderedDict()
+            for path in self._paths:
+                if not os.path.isdir(path):
+                    self.log.error('Plugin directory "{0}" does not exist.'.format(path))
+                    continue
+                for file_name in sorted(os.listdir(path)):
+                    file_path = os.path.join(path, file_name)
+                    if not file_name.endswith('.py') or not os.path.isfile(file_path):
+                        continue
+                    stat = os.stat(file_path)
+                    entry = manifest.get(file_path)
+                    if (entry is None or entry.get('mtime') != stat.st_mtime
+                            or entry.get('size') != stat.st_size):
+                        try:
+                            entry = index_plugin_file(file_path)
+                        except (SyntaxError, ValueError, OSError):
+                            self.log.exception('Unable to index plugin module "{0}". It is '
+                                               'ignored.'.format(file_path))
+                            continue
+                        entry['mtime'] = stat.st_mtime
+                        entry['size'] = stat.st_size
+                        manifest[file_path] = entry
+                        changed = True
+                    entry = dict(entry, path=file_path)
+                    module_name = file_name[:-3]
+                    if module_name in entries:
+                        self.log.warning('Plugin module "{0}" exists in more than one plugin '
+                                         'directory. Using "{1}".'.format(module_name, file_path))
+                    entries[module_name] = entry
+            self._entries = entries
+            if changed:
+                self._write_manifest(manifest)
+        return
+
+    def functions(self, predicate=None):
+        """ Returns all indexed top level functions.
+
+            @param callable predicate: optional, filter called with (name, info) for each function
+
+            @return OrderedDict: function name -> (module name, function info dict)
+                                 If names exist in several modules, the last module wins.
+        """
+        members = OrderedDict()
+        for module_name, entry in self._entries.items():
+            for name, info in entry['functions'].items():
+                if predicate is None or predicate(name, info):
+                    members[name] = (module_name, info)
+        return members
+
+    def classes(self, predicate=None):
+        """ Returns all indexed top level classes.
+
+            @param callable predicate: optional, filter called with (name, info) for each class
+
+            @return OrderedDict: class name -> (module name, class info dict with the keys
+                                 'bases' and 'methods')
+        """
+        members = OrderedDict()
+        for module_name, entry in self._entries.items():
+            for name, info in entry['classes'].items():
+                if predicate is None or predicate(name, info):
+                    members[name] = (module_name, info)
+        return members
+
+    def load_module(self, module_name):
+        """ Imports a plugin module (or reloads it if the file has changed since the last import).
+
+            @param string module_name: name of the plugin module
+
+            @return module: the imported module
+        """
+        with self._lock:
+            entry = self._entries[module_name]
+            stat = os.stat(entry['path'])
+            loaded = self._loaded.get(module_name)
+            if loaded is not None and loaded[1] == (stat.st_mtime, stat.st_size):
+                return loaded[0]
+            path = os.path.dirname(entry['path'])
+            if path not in sys.path:
+                sys.path.append(path)
+            # Modules imported before (e.g. by a previous instance) are reloaded to pick up changes
+            imported_before = module_name in sys.modules
+            mod = importlib.import_module(module_name)
+            if imported_before:
+                mod = importlib.reload(mod)
+            self._loaded[module_name] = (mod, (stat.st_mtime, stat.st_size))
+            return mod
+
+    def is_loaded(self, module_name):
+        return module_name in self._loaded
+
+    def get_member(self, module_name, name):
+        """ Returns a member of a plugin module and imports the module if necessary.
+
+            @param string module_name: name of the plugin module
+            @param string name: name of the function or class in the module
+
+            @return object: the requested member
+        """
+        return getattr(self.load_module(module_name), name)
+
+    def _read_manifest(self):
+        with _manifest_lock:
+            try:
+                with open(self._manifest_path, 'r') as file:
+                    manifest = json.load(file, object_pairs_hook=OrderedDict)
+            except FileNotFoundError:
+                return dict()
+            except (OSError, ValueError):
+                self.log.warning('Unable to read plugin manifest "{0}". It will be regenerated.'
+                                 ''.format(self._manifest_path))
+                return dict()
+        if not isinstance(manifest, dict) or manifest.get('version') != MANIFEST_VERSION:
+            return dict()
+        return manifest.get('files', dict())
+
+    def _write_manifest(self, files):
+        with _manifest_lock:
+            try:
+                # Merge with entries written by other registries in the meantime
+                with open(self._manifest_path, 'r') as file:
+                    manifest = json.load(file, object_pairs_hook=OrderedDict)
+                if manifest.get('version') == MANIFEST_VERSION:
+                    manifest['files'].update(files)
+                    files = manifest['files']
+            except (OSError, ValueError, AttributeError, KeyError):
+                pass
+            # Drop entries of files that do not exist anymore
+            files = OrderedDict((k, v) for k, v in files.items() if os.path.isfile(k))
+            tmp_path = '{0}.{1:d}.tmp'.format(self._manifest_path, os.getpid())
+            try:
+                os.makedirs(os.path.dirname(self._manifest_path), exist_ok=True)
+                with open(tmp_path, 'w') as file:
+                    json.dump({'version': MANIFEST_VERSION, 'files': files}, file)
+                os.replace(tmp_path, self._manifest_path)
+            except OSError:
+                self.log.warning('Unable to write plugin manifest "{0}". Plugin modules will be '
+                                 'indexed again on the next start.'.format(self._manifest_path))
+        return
+
+
+def signature_from_info(info, skip_first=True):
+    """ Creates an inspect.Signature from a function info dict of the manifest.
+
+        @param dict info: function info as returned by PluginRegistry.functions/classes
+        @param bool skip_first: optional, skip the first argument (self of methods)
+
+        @return inspect.Signature: the signature or None if the defaults are not known (literal)
+    """
+    if not info['literal_defaults']:
+        return None
+    parameters = info['parameters'][1:] if skip_first else info['parameters']
+    return inspect.Signature(
+        [inspect.Parameter(param[0],
+                           inspect.Parameter.POSITIONAL_OR_KEYWORD,
+                           default=param[1] if len(param) > 1 else inspect.Parameter.empty)
+         for param in parameters])
+
+
+class LazyPluginAttribute:
+    """
+    Class attribute (descriptor) standing in for a plugin function that is attached to a class
+    (like the fit methods of FitLogic). On first access the plugin module is imported and the
+    descriptor replaces itself by the actual function.
+    """
+
+    def __init__(self, registry, module_name, name, owner):
+        """
+        @param PluginRegistry registry: registry of the plugin module
+        @param string module_name: name of the plugin module
+        @param string name: name of the function in the plugin module (and of the attribute)
+        @param type owner: class the function is attached to
+        """
+        self._registry = registry
+        self._module_name = module_name
+        self._name = name
+        self._owner = owner
+
+    def __get__(self, instance, owner):
+        member = self._registry.get_member(self._module_name, self._name)
+        if self._owner.__dict__.get(self._name) is self:
+            setattr(self._owner, self._name, member)
+        if instance is not None and hasattr(member, '__get__'):
+            return member.__get__(instance, owner)
+        return member
+
+    @classmethod
+    def attach(cls, owner, registry, members):
+        """ Attaches plugin functions to a class without importing them.
+
+            @param type owner: class to attach the functions to
+            @param PluginRegistry registry: registry of the plugin modules
+            @param dict members: function name -> (module name, info) (see PluginRegistry.functions)
+        """
+        for name, (module_name, info) in members.items():
+            setattr(owner, name, cls(registry, module_name, name, owner))
+        return
+
+
+class LazyPluginCallable:
+    """
+    Callable proxy for a plugin function or method. The actual callable is only resolved (and the
+    plugin module imported) on the first call. If the signature is known from the manifest,
+    inspect.signature works without resolving the callable.
+    """
+
+    def __init__(self, resolve, name, signature=None):
+        """
+        @param callable resolve: function without arguments returning the actual callable
+        @param string name: name of the callable
+        @param inspect.Signature signature: optional, signature of the callable
+        """
+        self._resolve = resolve
+        self._signature = signature
+        self._target = None
+        self._lock = threading.Lock()
+        self.__name__ = name
+
+    @property
+    def target(self):
+        """ The actual callable (resolved on first access). """
+        if self._target is None:
+            with self._lock:
+                if self._target is None:
+                    self._target = self._resolve()
+        return self._target
+
+    @property
+    def __signature__(self):
+        if self._signature is None:
+            return inspect.signature(self.target)
+        return self._signature
+
+    def __call__(self, *args, **kwargs):
+        return self.target(*args, **kwargs)
+
+    def __repr__(self):
+        return '<{0} {1}>'.format(type(self).__name__, self.__name__)
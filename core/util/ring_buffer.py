@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+This file contains a circular buffer for data traces of a fixed length.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import numpy as np
+
+
+class RingBuffer:
+    """
+    Circular buffer for a trace of fixed length with one or more channels.
+
+    Each sample is stored twice (in the first and second half of an array of twice the trace
+    length). This way the whole trace is always available in chronological order as a view into
+    the buffer without copying/rolling the data, while appending a sample costs O(1).
+    """
+
+    def __init__(self, length, channels=None, dtype=float):
+        """
+        @param int length: number of samples in the trace
+        @param int channels: optional, number of channels (None for a 1D trace)
+        @param dtype: optional, data type of the samples
+        """
+        self._length = max(int(length), 1)
+        self._channels = channels
+        shape = (2 * self._length,) if channels is None else (int(channels), 2 * self._length)
+        self._buffer = np.zeros(shape, dtype=dtype)
+        # Buffer index of the oldest sample
+        self._head = 0
+
+    def __len__(self):
+        return self._length
+
+    @property
+    def data(self):
+        """
+        The trace in chronological order (oldest sample first) as view into the buffer.
+        The view must not be changed, use set_data, append or set_latest instead.
+        """
+        return self._buffer[..., self._head:self._head + self._length]
+
+    def set_data(self, data):
+        """
+        Replaces the whole trace.
+
+        @param numpy.ndarray data: the new trace (shape must be broadcastable to the trace shape)
+        """
+        self._buffer[..., :self._length] = data
+        self._buffer[..., self._length:] = data
+        self._head = 0
+        return
+
+    def append(self, data):
+        """
+        Appends samples to the end of the trace. The oldest samples are dropped.
+
+        @param numpy.ndarray|float data: single sample (scalar or one value per channel) or 2D
+                                         array (channels, samples) / 1D array (samples) of samples
+        """
+        data = np.asarray(data)
+        if self._channels is None:
+            samples = 1 if data.ndim == 0 else data.shape[-1]
+        else:
+            samples = 1 if data.ndim < 2 else data.shape[-1]
+            if data.ndim == 1:
+                data = data[:, np.newaxis]
+        if samples == 1 and data.ndim == 0:
+            self._buffer[self._head] = data
+            self._buffer[self._head + self._length] = data
+            self._head = (self._head + 1) % self._length
+            return
+        self._write(self._head, data[..., -self._length:])
+        self._head = (self._head + min(samples, self._length)) % self._length
+        return
+
+    def set_latest(self, value, samples):
+        """
+        Overwrites the latest samples of the trace with the given value.
+
+        @param numpy.ndarray|float value: value (or one value per channel) to set
+        @param int samples: number of latest samples to overwrite
+        """
+        samples = min(int(samples), self._length)
+        if samples < 1:
+            return
+        value = np.asarray(value)
+        if self._channels is not None and value.ndim == 1:
+            value = value[:, np.newaxis]
+        self._write((self._head - samples) % self._length,
+                    np.broadcast_to(value, self._buffer.shape[:-1] + (samples,)))
+        return
+
+    def _write(self, start, data):
+        """
+        Writes samples to both copies of the buffer starting at buffer index start (< length).
+        """
+        samples = data.shape[-1]
+        first = min(samples, self._length - start)
+        self._buffer[..., start:start + first] = data[..., :first]
+        self._buffer[..., start + self._length:start + self._length + first] = data[..., :first]
+        rest = samples - first
+        if rest > 0:
+            self._buffer[..., :rest] = data[..., first:]
+            self._buffer[..., self._length:self._length + rest] = data[..., first:]
+        return
@@ -28,6 +28,8 @@ import warnings
 class GUIBaseMixin(BaseMixin):
     """This is the GUI base class. It provides functions that every GUI module should have.
     """
+    # Widgets can only be created in the main thread
+    _parallel_activation = False
 
     def show(self):
         warnings.warn('Every GUI module needs to reimplement the show() '
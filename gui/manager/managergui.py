@@ -168,7 +168,9 @@ class ManagerGui(GUIBase):
         # hide remote menu item if rpyc is not available
         self._mw.actionRemoteView.setVisible(self._manager.rm is not None)
         if self._manager.rm is not None:
-            self._mw.remoteWidget.remoteModuleListView.setModel(self._manager.rm.remoteModules)
+            self._mw.remoteWidget.remoteModuleTableView.setModel(self._manager.rm.remoteModules)
+            # latency and throughput of the remote module connections
+            self.checkTimer.timeout.connect(self._manager.rm.remoteModules.updateStatistics)
             if self._manager.remote_server:
                 self._mw.remoteWidget.hostLabel.setText('Server URL:')
                 self._mw.remoteWidget.portLabel.setText(
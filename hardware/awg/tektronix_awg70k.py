@@ -85,6 +85,10 @@ class AWG70K(Base, PulserInterface):
         self.__min_waveform_length = 0
         self.__max_waveform_length = 0
         self.__installed_options = list()
+
+        # Number of samples already written into the preallocated waveform files (keys are the
+        # file paths). Needed to write chunks to their final position in the file.
+        self._samples_written = dict()
         return
 
     def on_activate(self):
@@ -1578,8 +1582,8 @@ class AWG70K(Base, PulserInterface):
     def _write_wfmx(self, filename, analog_samples, marker_bytes, is_first_chunk, is_last_chunk,
                     total_number_of_samples):
         """
-        Appends a sampled chunk of a whole waveform to a wfmx-file. Create the file
-        if it is the first chunk.
+        Writes a sampled chunk of a whole waveform into a wfmx-file. Create and preallocate the
+        file if it is the first chunk.
         If both flags (is_first_chunk, is_last_chunk) are set to TRUE it means
         that the whole ensemble is written as a whole in one big chunk.
 
@@ -1600,54 +1604,49 @@ class AWG70K(Base, PulserInterface):
         @return list: the list contains the string names of the created files for the passed
                       presampled arrays
         """
-        # The memory overhead of the tmp file write/read process in bytes. Only used if wfmx file is
-        # written in chunks in order to avoid excessive memory usage.
-        tmp_bytes_overhead = 16777216  # 16 MB
-
         if not filename.endswith('.wfmx'):
             filename += '.wfmx'
         wfmx_path = os.path.join(self._tmp_work_dir, filename)
-        tmp_path = os.path.join(self._tmp_work_dir, 'digital_tmp.bin')
+        total_number_of_samples = int(total_number_of_samples)
+
+        # File layout: header, float32 analog samples, uint8 marker samples (if present).
+        # The file is preallocated to its final size with the first chunk and each chunk is
+        # written directly to its final position via numpy.memmap. This avoids temporary marker
+        # files and keeps the memory usage bounded by the chunk size.
+        header = self._create_xml_header(total_number_of_samples,
+                                         marker_bytes is not None).encode('utf8')
+        analog_offset = len(header)
+        marker_offset = analog_offset + 4 * total_number_of_samples
 
-        # if it is the first chunk, create the .WFMX file with header.
         if is_first_chunk:
-            # create header
-            header = self._create_xml_header(total_number_of_samples, marker_bytes is not None)
-            # write header
+            self._samples_written[wfmx_path] = 0
             with open(wfmx_path, 'wb') as wfmxfile:
-                wfmxfile.write(header.encode('utf8'))
-            # Check if a tmp digital samples file is present and delete it if necessary.
-            if os.path.isfile(tmp_path):
-                os.remove(tmp_path)
-
-        # append analog samples to the .WFMX file.
-        # Write digital samples in temporary file if not the entire samples are passed at once.
-        with open(wfmx_path, 'ab') as wfmxfile:
-            # append analog samples in binary format. One sample is 4 bytes (np.float32).
-            wfmxfile.write(analog_samples)
-
-        # Write digital samples to tmp file if chunkwise writing is used and it's not the last chunk
-        if not is_last_chunk and marker_bytes is not None:
-            with open(tmp_path, 'ab') as tmp_file:
-                tmp_file.write(marker_bytes)
-
-        # If this is the last chunk, write digital samples from tmp file to wfmx file (if present)
-        # and also append the currently passed digital samples to wfmx file.
-        # Read from tmp file in chunks of tmp_bytes_overhead in order to avoid too much memory
-        # overhead.
-        if is_last_chunk and marker_bytes is not None:
-            with open(wfmx_path, 'ab') as wfmxfile:
-                # Copy over digital samples from tmp file. Delete tmp file afterwards.
-                if os.path.isfile(tmp_path):
-                    with open(tmp_path, 'rb') as tmp_file:
-                        while True:
-                            tmp = tmp_file.read(tmp_bytes_overhead)
-                            if not tmp:
-                                break
-                            wfmxfile.write(tmp)
-                    os.remove(tmp_path)
-                # Append current digital samples array to wfmx file
-                wfmxfile.write(marker_bytes)
+                wfmxfile.write(header)
+                if marker_bytes is None:
+                    wfmxfile.truncate(marker_offset)
+                else:
+                    wfmxfile.truncate(marker_offset + total_number_of_samples)
+
+        start_ind = self._samples_written.get(wfmx_path, 0)
+        chunk_length = analog_samples.size
+
+        # Write analog samples in binary format. One sample is 4 bytes (np.float32).
+        analog_mmap = np.memmap(wfmx_path, dtype='<f4', mode='r+',
+                                offset=analog_offset + 4 * start_ind, shape=(chunk_length,))
+        analog_mmap[:] = analog_samples
+        del analog_mmap
+
+        # Write digital samples. One sample is 1 byte (np.uint8).
+        if marker_bytes is not None:
+            marker_mmap = np.memmap(wfmx_path, dtype='uint8', mode='r+',
+                                    offset=marker_offset + start_ind, shape=(chunk_length,))
+            marker_mmap[:] = marker_bytes
+            del marker_mmap
+
+        if is_last_chunk:
+            self._samples_written.pop(wfmx_path, None)
+        else:
+            self._samples_written[wfmx_path] = start_ind + chunk_length
         return
 
     def _create_xml_header(self, number_of_samples, markers_active):
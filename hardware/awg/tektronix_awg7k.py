@@ -84,6 +84,10 @@ class AWG7k(Base, PulserInterface):
         self._marker_byte_dict = {0: b'\x00', 1: b'\x01', 2: b'\x02', 3: b'\x03'}
         self._event_triggers = {'OFF': 'OFF', 'ON': 'ON'}
 
+        # Number of samples already written into the preallocated waveform files (keys are the
+        # file paths). Needed to write chunks to their final position in the file.
+        self._samples_written = dict()
+
     def on_activate(self):
         """ Initialisation performed during activation of the module.
         """
@@ -1387,8 +1391,8 @@ class AWG7k(Base, PulserInterface):
     def _write_wfm(self, filename, analog_samples, marker_bytes, is_first_chunk, is_last_chunk,
                    total_number_of_samples):
         """
-        Appends a sampled chunk of a whole waveform to a wfm-file. Create the file
-        if it is the first chunk.
+        Writes a sampled chunk of a whole waveform into a wfm-file. Create and preallocate the
+        file if it is the first chunk.
         If both flags (is_first_chunk, is_last_chunk) are set to TRUE it means
         that the whole ensemble is written as a whole in one big chunk.
 
@@ -1406,55 +1410,44 @@ class AWG7k(Base, PulserInterface):
         @param is_last_chunk: bool, indicates if the current chunk is the last
                               write to this file.
         """
-        # The memory overhead of the tmp file write/read process in bytes.
-        tmp_bytes_overhead = 104857600  # 100 MB
-        tmp_samples = tmp_bytes_overhead // 5
-        if tmp_samples > len(analog_samples):
-            tmp_samples = len(analog_samples)
-
         if not filename.endswith('.wfm'):
             filename += '.wfm'
         wfm_path = os.path.join(self._tmp_work_dir, filename)
+        total_number_of_samples = int(total_number_of_samples)
+
+        # One sample consists of 4 bytes (float32) analog value followed by 1 byte markers.
+        sample_dtype = np.dtype([('f0', '<f4'), ('f1', 'uint8')])
+        num_bytes = str(total_number_of_samples * sample_dtype.itemsize)
+        header = 'MAGIC 1000\r\n#{0}{1}'.format(len(num_bytes), num_bytes).encode()
 
-        # if it is the first chunk, create the WFM file with header.
+        # if it is the first chunk, create the WFM file with header and footer and preallocate
+        # the samples in between. Each chunk is then written directly to its final position via
+        # numpy.memmap, so no temporary copy of all samples is needed.
         if is_first_chunk:
+            self._samples_written[wfm_path] = 0
+            # the footer encodes the sample rate, which was used for that file:
+            footer = 'CLOCK {0:16.10E}\r\n'.format(self.get_sample_rate()).encode()
+            samples_size = total_number_of_samples * sample_dtype.itemsize
             with open(wfm_path, 'wb') as wfm_file:
-                # write the first line, which is the header file, if first chunk is passed:
-                num_bytes = str(int(total_number_of_samples * 5))
-                num_digits = str(len(num_bytes))
-                header = 'MAGIC 1000\r\n#{0}{1}'.format(num_digits, num_bytes)
-                wfm_file.write(header.encode())
-
-        # For the WFM file format unfortunately we need to write the digital sampels together
-        # with the analog samples. Therefore we need a temporary copy of all samples for each
-        # analog channel.
-        write_array = np.zeros(tmp_samples, dtype='float32, uint8')
-
-        # Consecutively prepare and write chunks of maximal size tmp_bytes_overhead to file
-        samples_written = 0
-        with open(wfm_path, 'ab') as wfm_file:
-            while samples_written < len(analog_samples):
-                write_end = samples_written + write_array.size
-                # Prepare tmp write array
-                write_array['f0'] = analog_samples[samples_written:write_end]
-                if marker_bytes is not None:
-                    write_array['f1'] = marker_bytes[samples_written:write_end]
-                # Write to file
-                wfm_file.write(write_array)
-                # Increment write counter
-                samples_written = write_end
-                # Reduce write array size if
-                if 0 < total_number_of_samples - samples_written < write_array.size:
-                    write_array.resize(total_number_of_samples - samples_written)
-
-        del write_array
-
-        # append footer if it's the last chunk to write
+                wfm_file.write(header)
+                wfm_file.seek(len(header) + samples_size)
+                wfm_file.write(footer)
+
+        start_ind = self._samples_written.get(wfm_path, 0)
+        chunk_length = analog_samples.size
+
+        samples_mmap = np.memmap(wfm_path, dtype=sample_dtype, mode='r+',
+                                 offset=len(header) + sample_dtype.itemsize * start_ind,
+                                 shape=(chunk_length,))
+        samples_mmap['f0'] = analog_samples
+        if marker_bytes is not None:
+            samples_mmap['f1'] = marker_bytes
+        del samples_mmap
+
         if is_last_chunk:
-            # the footer encodes the sample rate, which was used for that file:
-            footer = 'CLOCK {0:16.10E}\r\n'.format(self.get_sample_rate())
-            with open(wfm_path, 'ab') as wfm_file:
-                wfm_file.write(footer.encode())
+            self._samples_written.pop(wfm_path, None)
+        else:
+            self._samples_written[wfm_path] = start_ind + chunk_length
         return
 
     def sequence_set_waveform(self, waveform_name, step, track):
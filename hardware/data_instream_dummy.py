@@ -507,9 +507,21 @@ class InStreamDummy(Base, DataInStreamInterface):
                                ''.format(self.number_of_channels, buffer.shape[0]))
                 return -1
             number_of_samples = buffer.shape[1] if number_of_samples is None else number_of_samples
-            buffer = buffer.flatten()
+            if number_of_samples > buffer.shape[1]:
+                self.log.error('Number of samples to read ({0:d}) exceeds size of buffer ({1:d}).'
+                               ''.format(number_of_samples, buffer.shape[1]))
+                return -1
+            # Write directly into the rows of the callers array (views, no copy)
+            channel_buffers = [buffer[i, :number_of_samples] for i in range(buffer.shape[0])]
         elif buffer.ndim == 1:
             number_of_samples = (buffer.size // self.number_of_channels) if number_of_samples is None else number_of_samples
+            if number_of_samples * self.number_of_channels > buffer.size:
+                self.log.error('Number of samples to read ({0:d}) exceeds size of buffer ({1:d}).'
+                               ''.format(number_of_samples,
+                                         buffer.size // self.number_of_channels))
+                return -1
+            channel_buffers = [buffer[i * number_of_samples:(i + 1) * number_of_samples] for i in
+                               range(self.number_of_channels)]
         else:
             self.log.error('Buffer must be a 1D or 2D numpy.ndarray.')
             return -1
@@ -524,26 +536,23 @@ class InStreamDummy(Base, DataInStreamInterface):
         if avail_samples > self.buffer_size:
             self._has_overflown = True
 
-        offset = 0
         analog_x = np.arange(number_of_samples, dtype=self.__data_type) / self.__sample_rate
         analog_x *= 2 * np.pi
         analog_x += 2 * np.pi * (self._last_read - self._start_time)
         self._last_read = time.perf_counter()
-        for i, chnl in enumerate(self.__active_channels):
+        for chnl, chnl_buffer in zip(self.__active_channels, channel_buffers):
             if chnl in self._digital_channels:
                 ch_index = self._digital_channels.index(chnl)
                 events_per_bin = self._digital_event_rates[ch_index] / self.__sample_rate
-                buffer[offset:(offset+number_of_samples)] = np.random.poisson(events_per_bin,
-                                                                              number_of_samples)
+                chnl_buffer[:] = np.random.poisson(events_per_bin, number_of_samples)
             else:
                 ch_index = self._analog_channels.index(chnl)
                 amplitude = self._analog_amplitudes[ch_index]
-                np.sin(analog_x, out=buffer[offset:(offset+number_of_samples)])
-                buffer[offset:(offset + number_of_samples)] *= amplitude
+                np.sin(analog_x, out=chnl_buffer)
+                chnl_buffer *= amplitude
                 noise_level = 0.1 * amplitude
                 noise = noise_level - 2 * noise_level * np.random.rand(number_of_samples)
-                buffer[offset:(offset + number_of_samples)] += noise
-            offset += number_of_samples
+                chnl_buffer += noise
         return number_of_samples
 
     def read_available_data_into_buffer(self, buffer):
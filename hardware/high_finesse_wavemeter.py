@@ -105,6 +105,9 @@ class HighFinesseWavemeter(Base,WavemeterInterface):
     _cReturnWavelangthVac        = ctypes.c_long(0x0000)
 
 
+    # the hardware thread created in on_activate must be owned by the main thread
+    _parallel_activation = False
+
     def __init__(self, config, **kwargs):
         super().__init__(config=config, **kwargs)
 
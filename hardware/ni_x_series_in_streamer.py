@@ -642,7 +642,12 @@ class NIXSeriesInStreamer(Base, DataInStreamInterface):
                                ''.format(self.number_of_channels, buffer.shape[0]))
                 return -1
             number_of_samples = buffer.shape[1] if number_of_samples is None else number_of_samples
-            buffer = buffer.flatten()
+            if number_of_samples != buffer.shape[1] or not buffer.flags['C_CONTIGUOUS']:
+                self.log.error('2D buffer must be C-contiguous with the number of samples to read '
+                               'as second dimension. Read failed.')
+                return -1
+            # Flat view on the callers array (no copy) so the samples are written into it
+            buffer = buffer.reshape(-1)
         elif buffer.ndim == 1:
             if number_of_samples is None:
                 number_of_samples = buffer.size // self.number_of_channels
@@ -34,6 +34,9 @@ class ProcessDummy(Base, ProcessInterface, ProcessControlInterface):
         module.Class: 'process_dummy.ProcessDummy'
 
     """
+    # the timer created in on_activate must live in the main thread
+    _parallel_activation = False
+
     def on_activate(self):
         """ Activate module.
         """
@@ -83,6 +83,9 @@ class WavemeterDummy(Base, WavemeterInterface):
 
     sig_handle_timer = QtCore.Signal(bool)
 
+    # the hardware thread created in on_activate must be owned by the main thread
+    _parallel_activation = False
+
     def __init__(self, config, **kwargs):
         super().__init__(config=config, **kwargs)
 
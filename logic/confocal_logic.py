@@ -2,6 +2,14 @@
 """
 This module operates a confocal microsope.
 
+With the optional pipelined scan (config option pipelined_scan) a worker thread drives the
+scanner line by line while the logic thread writes the counts into the image. The scanner itself
+is still operated serially: ConfocalScannerInterface.scan_line is blocking, so each image row
+takes consecutive scan_line calls (scan line and return line, plus the move to the start of the
+first line) and the next line is not queued in the hardware while the current one is read out.
+The pipelining only removes the image processing and the signal round trip through the Qt event
+loop between the lines.
+
 Qudi is free software: you can redistribute it and/or modify
 it under the terms of the GNU General Public License as published by
 the Free Software Foundation, either version 3 of the License, or
@@ -22,6 +30,8 @@ top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi
 from qtpy import QtCore
 from collections import OrderedDict
 from copy import copy
+import functools
+import threading
 import time
 import datetime
 import numpy as np
@@ -31,6 +41,7 @@ import matplotlib.pyplot as plt
 from logic.generic_logic import GenericLogic
 from core.util.mutex import Mutex
 from core.connector import Connector
+from core.configoption import ConfigOption
 from core.statusvariable import StatusVar
 
 
@@ -251,12 +262,29 @@ class ConfocalHistoryEntry(QtCore.QObject):
 class ConfocalLogic(GenericLogic):
     """
     This is the Logic class for confocal scanning.
+
+    Example config for copy-paste:
+
+    scannerlogic:
+        module.Class: 'confocal_logic.ConfocalLogic'
+        pipelined_scan: False  # optional, scan lines in a worker thread. The hardware lines are
+                               # still scanned one after another (see _scan_worker)
+        max_image_update_rate: 20  # optional, max. rate of image update signals (Hz)
+        connect:
+            confocalscanner1: 'scanner_tilt_interfuse'
+            savelogic: 'savelogic'
     """
 
     # declare connectors
     confocalscanner1 = Connector(interface='ConfocalScannerInterface')
     savelogic = Connector(interface='SaveLogic')
 
+    # config options
+    # Scan in a worker thread that only drives the scanner (blocking scan_line calls, no line is
+    # queued in the hardware in advance), the counts are processed in the logic thread.
+    _pipelined_scan = ConfigOption('pipelined_scan', default=False, missing='nothing')
+    _max_image_update_rate = ConfigOption('max_image_update_rate', default=20, missing='nothing')
+
     # status vars
     _clock_frequency = StatusVar('clock_frequency', 500)
     return_slowness = StatusVar(default=50)
@@ -286,6 +314,10 @@ class ConfocalLogic(GenericLogic):
 
     signal_history_event = QtCore.Signal()
 
+    # signals of the scan worker thread (pipelined scan)
+    _sigLineScanned = QtCore.Signal(int, object)
+    _sigScanWorkerFinished = QtCore.Signal(bool)
+
     def __init__(self, config, **kwargs):
         super().__init__(config=config, **kwargs)
 
@@ -300,6 +332,12 @@ class ConfocalLogic(GenericLogic):
         self.depth_img_is_xz = True
         self.permanent_scan = False
 
+        # pipelined scan: precomputed trajectories of the frame and the worker thread
+        self._frame_lines = None
+        self._frame_return_lines = None
+        self._scan_worker_thread = None
+        self._last_image_update = 0
+
     def on_activate(self):
         """ Initialisation performed during activation of the module.
         """
@@ -343,6 +381,8 @@ class ConfocalLogic(GenericLogic):
         self.signal_scan_lines_next.connect(self._scan_line, QtCore.Qt.QueuedConnection)
         self.signal_start_scanning.connect(self.start_scanner, QtCore.Qt.QueuedConnection)
         self.signal_continue_scanning.connect(self.continue_scanner, QtCore.Qt.QueuedConnection)
+        self._sigLineScanned.connect(self._process_scanned_line, QtCore.Qt.QueuedConnection)
+        self._sigScanWorkerFinished.connect(self._scan_worker_finished, QtCore.Qt.QueuedConnection)
 
         self._signal_save_xy.connect(self._save_xy_data, QtCore.Qt.QueuedConnection)
         self._signal_save_depth.connect(self._save_depth_data, QtCore.Qt.QueuedConnection)
@@ -564,6 +604,38 @@ class ConfocalLogic(GenericLogic):
             self.sigImageXYInitialized.emit()
         return 0
 
+    def _build_frame_trajectories(self):
+        """
+        Precomputes the scan line and the return line of each image row of the whole frame for
+        the pipelined scan. The trajectories are stored as 3D arrays (rows, scanner axes, points).
+        They are derived from the image that is scanned (xy or depth), so a continued scan follows
+        its own image even if the other image has been initialized in the meantime.
+        """
+        image = self.depth_image if self._zscan else self.xy_image
+        n_ch = len(self.get_scanner_axes())
+        rows = image.shape[0]
+        rs = self.return_slowness
+
+        self._frame_lines = np.empty((rows, n_ch, image.shape[1]))
+        for axis in range(min(n_ch, 3)):
+            self._frame_lines[:, axis] = image[:, :, axis]
+
+        self._frame_return_lines = np.empty((rows, n_ch, rs))
+        if self.depth_img_is_xz or not self._zscan:
+            self._frame_return_lines[:, 0] = np.linspace(image[0, -1, 0], image[0, 0, 0], rs)
+            if n_ch > 1:
+                self._frame_return_lines[:, 1] = image[:, 0, 1, np.newaxis]
+        else:
+            self._frame_return_lines[:, 0] = image[:, 0, 0, np.newaxis]
+            if n_ch > 1:
+                self._frame_return_lines[:, 1] = np.linspace(image[0, -1, 1], image[0, 0, 1], rs)
+        if n_ch > 2:
+            self._frame_return_lines[:, 2] = image[:, 0, 2, np.newaxis]
+        if n_ch > 3:
+            self._frame_lines[:, 3:] = self._current_a
+            self._frame_return_lines[:, 3:] = self._current_a
+        return
+
     def start_scanner(self):
         """Setting up the scanner device and starts the scanning procedure
 
@@ -595,7 +667,10 @@ class ConfocalLogic(GenericLogic):
             self.set_position('scanner')
             return -1
 
-        self.signal_scan_lines_next.emit()
+        if self._pipelined_scan:
+            self._start_scan_worker()
+        else:
+            self.signal_scan_lines_next.emit()
         return 0
 
     def continue_scanner(self):
@@ -624,7 +699,10 @@ class ConfocalLogic(GenericLogic):
             self.set_position('scanner')
             return -1
 
-        self.signal_scan_lines_next.emit()
+        if self._pipelined_scan:
+            self._start_scan_worker()
+        else:
+            self.signal_scan_lines_next.emit()
         return 0
 
     def kill_scanner(self):
@@ -719,23 +797,7 @@ class ConfocalLogic(GenericLogic):
         # stops scanning
         if self.stopRequested:
             with self.threadlock:
-                self.kill_scanner()
-                self.stopRequested = False
-                self.module_state.unlock()
-                self.signal_xy_image_updated.emit()
-                self.signal_depth_image_updated.emit()
-                self.set_position('scanner')
-                if self._zscan:
-                    self._depth_line_pos = self._scan_counter
-                else:
-                    self._xy_line_pos = self._scan_counter
-                # add new history entry
-                new_history = ConfocalHistoryEntry(self)
-                new_history.snapshot(self)
-                self.history.append(new_history)
-                if len(self.history) > self.max_history_length:
-                    self.history.pop(0)
-                self.history_index = len(self.history) - 1
+                self._finish_scan()
                 return
 
         image = self.depth_image if self._zscan else self.xy_image
@@ -852,6 +914,156 @@ class ConfocalLogic(GenericLogic):
             self.stop_scanning()
             self.signal_scan_lines_next.emit()
 
+    def _finish_scan(self):
+        """ Closes the scanner after the scan has been stopped and adds a history entry.
+        """
+        self.kill_scanner()
+        self.stopRequested = False
+        self.module_state.unlock()
+        self.signal_xy_image_updated.emit()
+        self.signal_depth_image_updated.emit()
+        self.set_position('scanner')
+        if self._zscan:
+            self._depth_line_pos = self._scan_counter
+        else:
+            self._xy_line_pos = self._scan_counter
+        # add new history entry
+        new_history = ConfocalHistoryEntry(self)
+        new_history.snapshot(self)
+        self.history.append(new_history)
+        if len(self.history) > self.max_history_length:
+            self.history.pop(0)
+        self.history_index = len(self.history) - 1
+        return
+
+    def _start_scan_worker(self):
+        """
+        Starts the worker thread of the pipelined scan. The worker thread drives the scanner
+        through the precomputed trajectories of the frame, i.e. the next line is scanned while the
+        counts of the previous line are written into the image by the logic thread. The hardware
+        does not overlap lines: the next line is only started after scan_line has returned.
+        """
+        self._build_frame_trajectories()
+        self._last_image_update = 0
+        self._scan_worker_thread = threading.Thread(target=self._scan_worker,
+                                                    args=(self._scan_counter,),
+                                                    name='confocal scan worker',
+                                                    daemon=True)
+        self._scan_worker_thread.start()
+        return
+
+    def _scan_worker(self, first_line):
+        """
+        Scans the image rows starting at first_line (runs in the scan worker thread).
+        The counts of each row are handed to the logic thread via _sigLineScanned.
+
+        Each row takes the blocking scan_line calls for the scan line and the return line (and
+        the move to the start of the first line) in series. The trajectory of the next line is
+        not queued while the current line is read out, since ConfocalScannerInterface offers no
+        non-blocking scan.
+
+        @param int first_line: index of the first image row to scan
+        """
+        image = self.depth_image if self._zscan else self.xy_image
+        n_ch = len(self.get_scanner_axes())
+        rows = self._frame_lines.shape[0]
+        line_index = first_line
+        move_to_start = True
+        frame_completed = False
+        try:
+            while not self.stopRequested:
+                if move_to_start:
+                    move_to_start = False
+                    # move from the current position to the start of the line, counts are
+                    # thrown away
+                    start_position = [self._current_x, self._current_y, self._current_z,
+                                      self._current_a][:n_ch]
+                    start_line = np.linspace(start_position,
+                                             self._frame_lines[line_index, :, 0],
+                                             self.return_slowness).transpose()
+                    if np.any(self._scanning_device.scan_line(start_line) == -1):
+                        self.log.error('Moving the scanner to the start of line {0:d} failed, '
+                                       'stopping the scan.'.format(line_index))
+                        break
+
+                # adjust z of the line to the current z (may be changed during the scan)
+                if not self._zscan and n_ch > 2 and \
+                        self._frame_lines[line_index, 2, 0] != self._current_z:
+                    self._frame_lines[line_index, 2] = self._current_z
+                    self._frame_return_lines[line_index, 2] = self._current_z
+                    image[line_index, :, 2] = self._current_z
+
+                line_counts = self._scanning_device.scan_line(self._frame_lines[line_index],
+                                                              pixel_clock=True)
+                if np.any(line_counts == -1):
+                    self.log.error('Scanning line {0:d} failed, stopping the scan.'
+                                   ''.format(line_index))
+                    break
+                self._sigLineScanned.emit(line_index, line_counts)
+
+                # return the scanner to the start of next line, counts are thrown away
+                return_line_counts = self._scanning_device.scan_line(
+                    self._frame_return_lines[line_index])
+                if np.any(return_line_counts == -1):
+                    self.log.error('Returning the scanner after line {0:d} failed, stopping the '
+                                   'scan.'.format(line_index))
+                    break
+
+                line_index += 1
+                if line_index >= rows:
+                    if not self.permanent_scan:
+                        frame_completed = True
+                        break
+                    line_index = 0
+                    move_to_start = True
+        except:
+            self.log.exception('The scan went wrong, killing the scanner.')
+        self._sigScanWorkerFinished.emit(frame_completed)
+        return
+
+    def _process_scanned_line(self, line_index, line_counts):
+        """
+        Writes the counts of a scanned image row into the image (logic thread, pipelined scan).
+        Image update signals are emitted with at most max_image_update_rate.
+
+        @param int line_index: index of the image row
+        @param numpy.ndarray line_counts: counts of the row (pixels, channels)
+        """
+        s_ch = len(self.get_scanner_count_channels())
+        image = self.depth_image if self._zscan else self.xy_image
+        image[line_index, :, 3:3 + s_ch] = line_counts
+        self._scan_counter = line_index + 1
+
+        now = time.perf_counter()
+        if now - self._last_image_update >= 1 / self._max_image_update_rate or \
+                self._scan_counter >= image.shape[0]:
+            self._last_image_update = now
+            if self._zscan:
+                self.signal_depth_image_updated.emit()
+            else:
+                self.signal_xy_image_updated.emit()
+        if self._scan_counter >= image.shape[0] and self.permanent_scan:
+            self._scan_counter = 0
+        return
+
+    def _scan_worker_finished(self, frame_completed):
+        """
+        Cleans up after the scan worker thread has finished (logic thread, pipelined scan).
+
+        @param bool frame_completed: True if the last row of the frame has been scanned
+        """
+        self._scan_worker_thread = None
+        with self.threadlock:
+            self._finish_scan()
+        # stop scanning when last line scan was performed and makes scan not continuable
+        if frame_completed:
+            if self._zscan:
+                self._zscan_continuable = False
+            else:
+                self._xyscan_continuable = False
+            self.signal_stop_scanning.emit()
+        return
+
     def save_xy_data(self, colorscale_range=None, percentile_range=None, block=True):
         """ Save the current confocal xy data to file.
 
@@ -906,13 +1118,16 @@ class ConfocalLogic(GenericLogic):
         axes = ['X', 'Y']
         crosshair_pos = [self.get_position()[0], self.get_position()[1]]
 
-        figs = {ch: self.draw_figure(data=self.xy_image[:, :, 3 + n],
+        # The figures are drawn from copies of the images when the files are written
+        figs = {ch: functools.partial(self.draw_figure,
+                                     data=np.array(self.xy_image[:, :, 3 + n]),
                                      image_extent=image_extent,
                                      scan_axis=axes,
                                      cbar_range=colorscale_range,
                                      percentile_range=percentile_range,
                                      crosshair_pos=crosshair_pos)
                 for n, ch in enumerate(self.get_scanner_count_channels())}
+        save_jobs = list()
 
         # Save the image data and figure
         for n, ch in enumerate(self.get_scanner_count_channels()):
@@ -924,14 +1139,14 @@ class ConfocalLogic(GenericLogic):
                 'of entries where the Signal is in counts/s:'] = self.xy_image[:, :, 3 + n]
 
             filelabel = 'confocal_xy_image_{0}'.format(ch.replace('/', ''))
-            self._save_logic.save_data(image_data,
-                                       filepath=filepath,
-                                       timestamp=timestamp,
-                                       parameters=parameters,
-                                       filelabel=filelabel,
-                                       fmt='%.6e',
-                                       delimiter='\t',
-                                       plotfig=figs[ch])
+            save_jobs.append(self._save_logic.save_data_async(image_data,
+                                                              filepath=filepath,
+                                                              timestamp=timestamp,
+                                                              parameters=parameters,
+                                                              filelabel=filelabel,
+                                                              fmt='%.6e',
+                                                              delimiter='\t',
+                                                              plotfig=figs[ch]))
 
         # prepare the full raw data in an OrderedDict:
         data = OrderedDict()
@@ -944,16 +1159,15 @@ class ConfocalLogic(GenericLogic):
 
         # Save the raw data to file
         filelabel = 'confocal_xy_data'
-        self._save_logic.save_data(data,
-                                   filepath=filepath,
-                                   timestamp=timestamp,
-                                   parameters=parameters,
-                                   filelabel=filelabel,
-                                   fmt='%.6e',
-                                   delimiter='\t')
-
-        self.log.debug('Confocal Image saved.')
-        self.signal_xy_data_saved.emit()
+        save_jobs.append(self._save_logic.save_data_async(data,
+                                                          filepath=filepath,
+                                                          timestamp=timestamp,
+                                                          parameters=parameters,
+                                                          filelabel=filelabel,
+                                                          fmt='%.6e',
+                                                          delimiter='\t'))
+
+        self._save_logic.call_when_saved(save_jobs, self.signal_xy_data_saved.emit)
         return
 
     def save_depth_data(self, colorscale_range=None, percentile_range=None, block=True):
@@ -1015,13 +1229,16 @@ class ConfocalLogic(GenericLogic):
                         self.image_z_range[0],
                         self.image_z_range[1]]
 
-        figs = {ch: self.draw_figure(data=self.depth_image[:, :, 3 + n],
+        # The figures are drawn from copies of the images when the files are written
+        figs = {ch: functools.partial(self.draw_figure,
+                                     data=np.array(self.depth_image[:, :, 3 + n]),
                                      image_extent=image_extent,
                                      scan_axis=axes,
                                      cbar_range=colorscale_range,
                                      percentile_range=percentile_range,
                                      crosshair_pos=crosshair_pos)
                 for n, ch in enumerate(self.get_scanner_count_channels())}
+        save_jobs = list()
 
         # Save the image data and figure
         for n, ch in enumerate(self.get_scanner_count_channels()):
@@ -1033,14 +1250,14 @@ class ConfocalLogic(GenericLogic):
                 'of entries where the Signal is in counts/s:'] = self.depth_image[:, :, 3 + n]
 
             filelabel = 'confocal_depth_image_{0}'.format(ch.replace('/', ''))
-            self._save_logic.save_data(image_data,
-                                       filepath=filepath,
-                                       timestamp=timestamp,
-                                       parameters=parameters,
-                                       filelabel=filelabel,
-                                       fmt='%.6e',
-                                       delimiter='\t',
-                                       plotfig=figs[ch])
+            save_jobs.append(self._save_logic.save_data_async(image_data,
+                                                              filepath=filepath,
+                                                              timestamp=timestamp,
+                                                              parameters=parameters,
+                                                              filelabel=filelabel,
+                                                              fmt='%.6e',
+                                                              delimiter='\t',
+                                                              plotfig=figs[ch]))
 
         # prepare the full raw data in an OrderedDict:
         data = OrderedDict()
@@ -1053,16 +1270,15 @@ class ConfocalLogic(GenericLogic):
 
         # Save the raw data to file
         filelabel = 'confocal_depth_data'
-        self._save_logic.save_data(data,
-                                   filepath=filepath,
-                                   timestamp=timestamp,
-                                   parameters=parameters,
-                                   filelabel=filelabel,
-                                   fmt='%.6e',
-                                   delimiter='\t')
-
-        self.log.debug('Confocal Image saved.')
-        self.signal_depth_data_saved.emit()
+        save_jobs.append(self._save_logic.save_data_async(data,
+                                                          filepath=filepath,
+                                                          timestamp=timestamp,
+                                                          parameters=parameters,
+                                                          filelabel=filelabel,
+                                                          fmt='%.6e',
+                                                          delimiter='\t'))
+
+        self._save_logic.call_when_saved(save_jobs, self.signal_depth_data_saved.emit)
         return
 
     def draw_figure(self, data, image_extent, scan_axis=None, cbar_range=None, percentile_range=None,  crosshair_pos=None):
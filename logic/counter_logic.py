@@ -25,11 +25,14 @@ import numpy as np
 import time
 import matplotlib.pyplot as plt
 
+from core.configoption import ConfigOption
 from core.connector import Connector
 from core.statusvariable import StatusVar
 from logic.generic_logic import GenericLogic
 from interface.slow_counter_interface import CountingMode
+from core.util.filters import SlidingMedian
 from core.util.mutex import Mutex
+from core.util.ring_buffer import RingBuffer
 
 
 class CounterLogic(GenericLogic):
@@ -41,6 +44,16 @@ class CounterLogic(GenericLogic):
     @sigmal sigCountGatedNext: ???
 
     @return error: 0 is OK, -1 is error
+
+    Example config for copy-paste:
+
+    counterlogic:
+        module.Class: 'counter_logic.CounterLogic'
+        batch_acquisition: False  # optional, read many samples per loop in continuous mode
+        update_rate: 20  # optional, max. rate of sigCounterUpdated in batch acquisition (Hz)
+        connect:
+            counter1: 'mydummycounter'
+            savelogic: 'savelogic'
     """
     sigCounterUpdated = QtCore.Signal()
 
@@ -66,6 +79,12 @@ class CounterLogic(GenericLogic):
     _count_frequency = StatusVar('count_frequency', 50)
     _saving = StatusVar('saving', False)
 
+    # config options
+    _batch_acquisition = ConfigOption('batch_acquisition', default=False, missing='nothing')
+    _update_rate = ConfigOption('update_rate', default=20, missing='nothing')
+
+    # number of rows the buffer for the data to save grows by (at least)
+    _save_block_size = 65536
 
     def __init__(self, config, **kwargs):
         """ Create CounterLogic object with connectors.
@@ -95,6 +114,15 @@ class CounterLogic(GenericLogic):
         self._counting_mode = CountingMode['CONTINUOUS']
 
         self._saving = False
+
+        # count traces in circular buffers (see countdata and countdata_smoothed)
+        self._countdata_buffer = RingBuffer(self._count_length, channels=1)
+        self._smoothed_buffer = RingBuffer(self._count_length, channels=1)
+        self._sliding_medians = list()
+
+        # columnar buffer (columns, rows) for the data to save, filled up to _save_rows
+        self._save_buffer = None
+        self._save_rows = 0
         return
 
     def on_activate(self):
@@ -112,14 +140,14 @@ class CounterLogic(GenericLogic):
         number_of_detectors = constraints.max_detectors
 
         # initialize data arrays
-        self.countdata = np.zeros([len(self.get_channels()), self._count_length])
-        self.countdata_smoothed = np.zeros([len(self.get_channels()), self._count_length])
+        self._init_count_traces()
         self.rawdata = np.zeros([len(self.get_channels()), self._counting_samples])
         self._already_counted_samples = 0  # For gated counting
-        self._data_to_save = []
+        self._reset_data_to_save()
 
         # Flag to stop the loop
         self.stopRequested = False
+        self._last_update_time = 0
 
         self._saving_start_time = time.time()
 
@@ -140,6 +168,79 @@ class CounterLogic(GenericLogic):
         self.sigCountDataNext.disconnect()
         return
 
+    @property
+    def countdata(self):
+        """
+        The count trace (channels, count_length) in chronological order. This is a view into a
+        circular buffer, copy it if you need to keep the data.
+        """
+        return self._countdata_buffer.data
+
+    @countdata.setter
+    def countdata(self, data):
+        self._countdata_buffer.set_data(data)
+
+    @property
+    def countdata_smoothed(self):
+        """
+        The smoothed count trace (sliding median, channels, count_length) in chronological order.
+        This is a view into a circular buffer, copy it if you need to keep the data.
+        """
+        return self._smoothed_buffer.data
+
+    @countdata_smoothed.setter
+    def countdata_smoothed(self, data):
+        self._smoothed_buffer.set_data(data)
+
+    @property
+    def _data_to_save(self):
+        """
+        The data rows (time, counts per channel) recorded while saving as 2D array (rows, columns).
+        This is a view into the save buffer.
+        """
+        if self._save_buffer is None:
+            return np.empty((0, len(self.get_channels()) + 1))
+        return self._save_buffer[:, :self._save_rows].transpose()
+
+    def _init_count_traces(self):
+        """
+        Initializes the circular buffers of the count traces and the sliding median per channel.
+        """
+        channels = len(self.get_channels())
+        self._countdata_buffer = RingBuffer(self._count_length, channels=channels)
+        self._smoothed_buffer = RingBuffer(self._count_length, channels=channels)
+        self._sliding_medians = [SlidingMedian(self._smooth_window_length, initial_value=0) for _
+                                 in range(channels)]
+        return
+
+    def _reset_data_to_save(self):
+        """
+        Empties the buffer of the data to save. The buffer memory is kept.
+        """
+        self._save_rows = 0
+        return
+
+    def _append_data_to_save(self, rows):
+        """
+        Appends rows of data to the preallocated columnar save buffer. The buffer grows in blocks
+        of at least _save_block_size rows.
+
+        @param numpy.ndarray rows: 2D array (columns, rows) to append
+        """
+        columns, new_rows = rows.shape
+        if self._save_buffer is None or self._save_buffer.shape[0] != columns:
+            self._save_buffer = np.empty((columns, self._save_block_size))
+            self._save_rows = 0
+        elif self._save_rows + new_rows > self._save_buffer.shape[1]:
+            capacity = self._save_buffer.shape[1]
+            capacity += max(self._save_block_size, capacity // 2, new_rows)
+            new_buffer = np.empty((columns, capacity))
+            new_buffer[:, :self._save_rows] = self._save_buffer[:, :self._save_rows]
+            self._save_buffer = new_buffer
+        self._save_buffer[:, self._save_rows:self._save_rows + new_rows] = rows
+        self._save_rows += new_rows
+        return
+
     def get_hardware_constraints(self):
         """
         Retrieve the hardware constrains from the counter device.
@@ -263,7 +364,7 @@ class CounterLogic(GenericLogic):
         @return bool: saving state
         """
         if not resume:
-            self._data_to_save = []
+            self._reset_data_to_save()
             self._saving_start_time = time.time()
 
         self._saving = True
@@ -426,9 +527,7 @@ class CounterLogic(GenericLogic):
 
             # initialising the data arrays
             self.rawdata = np.zeros([len(self.get_channels()), self._counting_samples])
-            self.countdata = np.zeros([len(self.get_channels()), self._count_length])
-            self.countdata_smoothed = np.zeros([len(self.get_channels()), self._count_length])
-            self._sampling_data = np.empty([len(self.get_channels()), self._counting_samples])
+            self._init_count_traces()
 
             # the sample index for gated counting
             self._already_counted_samples = 0
@@ -467,8 +566,9 @@ class CounterLogic(GenericLogic):
                     self.sigCounterUpdated.emit()
                     return
 
-                # read the current counter value
-                self.rawdata = self._counting_device.get_counter(samples=self._counting_samples)
+                # read the current counter value (a batch of samples in batch acquisition mode)
+                self.rawdata = self._counting_device.get_counter(
+                    samples=self._counting_samples * self.samples_per_read)
                 if self.rawdata[0, 0] < 0:
                     self.log.error('The counting went wrong, killing the counter.')
                     self.stopRequested = True
@@ -482,11 +582,28 @@ class CounterLogic(GenericLogic):
                     else:
                         self.log.error('No valid counting mode set! Can not process counter data.')
 
-            # call this again from event loop
-            self.sigCounterUpdated.emit()
+            # call this again from event loop (GUI updates with max. update_rate in batch mode)
+            now = time.perf_counter()
+            if not self._batch_acquisition or self.stopRequested or \
+                    now - self._last_update_time >= 1 / self._update_rate:
+                self._last_update_time = now
+                self.sigCounterUpdated.emit()
             self.sigCountDataNext.emit()
         return
 
+    @property
+    def samples_per_read(self):
+        """
+        Number of count samples (each averaged over counting_samples) read from the hardware per
+        loop. In continuous batch acquisition mode all samples acquired within one GUI update
+        period are read at once, otherwise 1.
+
+        @return int: number of samples per read
+        """
+        if self._batch_acquisition and self._counting_mode == CountingMode['CONTINUOUS']:
+            return max(int(round(self._count_frequency / self._update_rate)), 1)
+        return 1
+
     def save_current_count_trace(self, name_tag=''):
         """ The currently displayed counttrace will be saved.
 
@@ -550,42 +667,44 @@ class CounterLogic(GenericLogic):
 
     def _process_data_continous(self):
         """
-        Processes the raw data from the counting device
+        Processes the raw data from the counting device. The raw data can contain several samples
+        per channel (samples_per_read), all processed at once.
         @return:
         """
-        for i, ch in enumerate(self.get_channels()):
-            # remember the new count data in circular array
-            self.countdata[i, 0] = np.average(self.rawdata[i])
-        # move the array to the left to make space for the new data
-        self.countdata = np.roll(self.countdata, -1, axis=1)
-        # also move the smoothing array
-        self.countdata_smoothed = np.roll(self.countdata_smoothed, -1, axis=1)
-        # calculate the median and save it
-        window = -int(self._smooth_window_length / 2) - 1
-        for i, ch in enumerate(self.get_channels()):
-            self.countdata_smoothed[i, window:] = np.median(self.countdata[i,
-                                                            -self._smooth_window_length:])
+        # average the oversampled counts and append the new count data to the circular trace
+        batch = self.rawdata.shape[1] // self._counting_samples
+        raw_samples = self.rawdata[:, :batch * self._counting_samples].reshape(
+            (self.rawdata.shape[0], batch, self._counting_samples))
+        new_counts = np.mean(raw_samples, axis=2)
+        self._countdata_buffer.append(new_counts)
+
+        # calculate the median of the smoothing window for each new sample. The smoothed value of
+        # a sample is the median of the window centered around it, the latest samples get the
+        # median of the latest window.
+        medians = np.array([[median.push(counts) for counts in channel_counts] for
+                            median, channel_counts in zip(self._sliding_medians, new_counts)])
+        half_window = int(self._smooth_window_length / 2)
+        self._smoothed_buffer.append(medians)
+        self._smoothed_buffer.set_latest(
+            np.concatenate((medians, np.repeat(medians[:, -1:], half_window, axis=1)),
+                           axis=1)[:, -self._count_length:],
+            batch + half_window)
 
         # save the data if necessary
         if self._saving:
-             # if oversampling is necessary
+            # time stamp of each sample (the last sample has just been acquired)
+            timestamps = time.time() - self._saving_start_time - np.arange(
+                batch - 1, -1, -1) / self._count_frequency
+            # if oversampling is necessary, save all samples, else save the average counts
             if self._counting_samples > 1:
-                chans = self.get_channels()
-                self._sampling_data = np.empty([len(chans) + 1, self._counting_samples])
-                self._sampling_data[0, :] = time.time() - self._saving_start_time
-                for i, ch in enumerate(chans):
-                    self._sampling_data[i+1, 0] = self.rawdata[i]
-
-                self._data_to_save.extend(list(self._sampling_data))
-            # if we don't want to use oversampling
+                rows = np.empty((len(new_counts) + 1, batch * self._counting_samples))
+                rows[0] = np.repeat(timestamps, self._counting_samples)
+                rows[1:] = raw_samples.reshape((len(new_counts), -1))
             else:
-                # append tuple to data stream (timestamp, average counts)
-                chans = self.get_channels()
-                newdata = np.empty((len(chans) + 1, ))
-                newdata[0] = time.time() - self._saving_start_time
-                for i, ch in enumerate(chans):
-                    newdata[i+1] = self.countdata[i, -1]
-                self._data_to_save.append(newdata)
+                rows = np.empty((len(new_counts) + 1, batch))
+                rows[0] = timestamps
+                rows[1:] = new_counts
+            self._append_data_to_save(rows)
         return
 
     def _process_data_gated(self):
@@ -607,15 +726,15 @@ class CounterLogic(GenericLogic):
         if self._saving:
             # if oversampling is necessary
             if self._counting_samples > 1:
-                self._sampling_data = np.empty((self._counting_samples, 2))
-                self._sampling_data[:, 0] = time.time() - self._saving_start_time
-                self._sampling_data[:, 1] = self.rawdata[0]
-                self._data_to_save.extend(list(self._sampling_data))
+                rows = np.empty((2, self._counting_samples))
+                rows[0] = time.time() - self._saving_start_time
+                rows[1] = self.rawdata[0]
             # if we don't want to use oversampling
             else:
                 # append tuple to data stream (timestamp, average counts)
-                self._data_to_save.append(np.array((time.time() - self._saving_start_time,
-                                                    self.countdata[-1])))
+                rows = np.array(((time.time() - self._saving_start_time, ),
+                                 (self.countdata[0, -1], )))
+            self._append_data_to_save(rows)
         return
 
     def _process_data_finite_gated(self):
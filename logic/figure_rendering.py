@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+Saving of matplotlib figures, also in separate figure rendering processes of the SaveLogic.
+This module must not import qudi modules or Qt, since it is imported in every spawned rendering
+process.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import datetime
+import matplotlib.pyplot as plt
+import pickle
+
+from matplotlib.backends.backend_pdf import PdfPages
+from PIL import Image
+from PIL import PngImagePlugin
+
+
+def save_figure(plotfig, file_base, metadata, save_pdf=False, save_png=True):
+    """
+    Saves a matplotlib figure as PDF and/or PNG file including metadata and closes the figure.
+
+    @param matplotlib.figure.Figure plotfig: the figure to save
+    @param str file_base: path of the figure files without ending ('_fig.pdf' and '_fig.png'
+                          are appended)
+    @param dict metadata: metadata to attach to the files
+    @param bool save_pdf: optional, save the figure as PDF file
+    @param bool save_png: optional, save the figure as PNG file
+    """
+    try:
+        if save_pdf:
+            # Create the PdfPages object to which we will save the pages:
+            # The with statement makes sure that the PdfPages object is closed properly at
+            # the end of the block, even if an Exception occurs.
+            with PdfPages(file_base + '_fig.pdf') as pdf:
+                pdf.savefig(plotfig, bbox_inches='tight', pad_inches=0.05)
+
+                # We can also set the file's metadata via the PdfPages object:
+                pdf_metadata = pdf.infodict()
+                for key, value in metadata.items():
+                    pdf_metadata[key] = value
+
+        if save_png:
+            # determine the PNG-Filename and save the plain PNG
+            fig_fname_image = file_base + '_fig.png'
+            plotfig.savefig(fig_fname_image, bbox_inches='tight', pad_inches=0.05)
+
+            # Use Pillow (an fork for PIL) to attach metadata to the PNG
+            png_image = Image.open(fig_fname_image)
+            png_metadata = PngImagePlugin.PngInfo()
+            for key, value in metadata.items():
+                # PIL can only handle Strings, so let's convert our times
+                if isinstance(value, datetime.datetime):
+                    value = value.strftime('%Y%m%d-%H%M-%S')
+                png_metadata.add_text(key, str(value))
+
+            # save the picture again, this time including the metadata
+            png_image.save(fig_fname_image, "png", pnginfo=png_metadata)
+    finally:
+        # close matplotlib figure
+        plt.close(plotfig)
+    return
+
+
+def init_render_process():
+    """
+    Initializer of the figure rendering processes of SaveLogic. Figures are only saved to files
+    there, so a non-interactive backend is used.
+    The processes are spawned, i.e. only this module is imported in them (not qudi or Qt).
+    """
+    plt.switch_backend('agg')
+
+
+def render_pickled_figure(figure_bytes, file_base, metadata, save_pdf, save_png):
+    """
+    Unpickles a figure in a figure rendering process and saves it (see save_figure).
+    """
+    save_figure(pickle.loads(figure_bytes), file_base, metadata, save_pdf, save_png)
+    return file_base
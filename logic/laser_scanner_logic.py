@@ -25,6 +25,7 @@ top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi
 
 from collections import OrderedDict
 import datetime
+import functools
 import matplotlib.pyplot as plt
 import numpy as np
 import time
@@ -498,25 +499,29 @@ class LaserScannerLogic(GenericLogic):
         parameters['Scan speed [V/s]'] = self._scan_speed
         parameters['Clock Frequency (Hz)'] = self._clock_frequency
 
-        fig = self.draw_figure(
-            self.scan_matrix,
-            self.plot_x,
-            self.plot_y,
-            self.fit_x,
-            self.fit_y,
+        save_jobs = list()
+        # the figures are drawn from copies of the data when the files are written
+        fig = functools.partial(
+            self.draw_figure,
+            np.array(self.scan_matrix),
+            np.array(self.plot_x),
+            np.array(self.plot_y),
+            np.array(self.fit_x),
+            np.array(self.fit_y),
             cbar_range=colorscale_range,
             percentile_range=percentile_range)
 
-        fig2 = self.draw_figure(
-            self.scan_matrix2,
-            self.plot_x,
-            self.plot_y2,
-            self.fit_x,
-            self.fit_y,
+        fig2 = functools.partial(
+            self.draw_figure,
+            np.array(self.scan_matrix2),
+            np.array(self.plot_x),
+            np.array(self.plot_y2),
+            np.array(self.fit_x),
+            np.array(self.fit_y),
             cbar_range=colorscale_range,
             percentile_range=percentile_range)
 
-        self._save_logic.save_data(
+        save_jobs.append(self._save_logic.save_data_async(
             data,
             filepath=filepath,
             parameters=parameters,
@@ -524,9 +529,9 @@ class LaserScannerLogic(GenericLogic):
             fmt='%.6e',
             delimiter='\t',
             timestamp=timestamp
-        )
+        ))
 
-        self._save_logic.save_data(
+        save_jobs.append(self._save_logic.save_data_async(
             data2,
             filepath=filepath2,
             parameters=parameters,
@@ -535,9 +540,9 @@ class LaserScannerLogic(GenericLogic):
             delimiter='\t',
             timestamp=timestamp,
             plotfig=fig
-        )
+        ))
 
-        self._save_logic.save_data(
+        save_jobs.append(self._save_logic.save_data_async(
             data3,
             filepath=filepath3,
             parameters=parameters,
@@ -546,9 +551,10 @@ class LaserScannerLogic(GenericLogic):
             delimiter='\t',
             timestamp=timestamp,
             plotfig=fig2
-        )
+        ))
 
-        self.log.info('Laser Scan saved to:\n{0}'.format(filepath))
+        self._save_logic.call_when_saved(
+            save_jobs, lambda: self.log.info('Laser Scan saved to:\n{0}'.format(filepath)))
         return 0
 
     def draw_figure(self, matrix_data, freq_data, count_data, fit_freq_vals, fit_count_vals, cbar_range=None, percentile_range=None):
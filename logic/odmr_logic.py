@@ -27,6 +27,7 @@ from interface.microwave_interface import TriggerEdge
 import numpy as np
 import time
 import datetime
+import functools
 import matplotlib.pyplot as plt
 
 from logic.generic_logic import GenericLogic
@@ -52,6 +53,9 @@ class ODMRLogic(GenericLogic):
         'LIST',
         missing='warn',
         converter=lambda x: MicrowaveMode[x.upper()])
+    # Maximum number of sweeps kept in memory as raw data (0: unlimited, the raw data store grows
+    # as needed). Older sweeps are discarded but are still included in the averaged signal.
+    _max_raw_data_lines = ConfigOption('max_raw_data_lines', 0, missing='nothing')
 
     clock_frequency = StatusVar('clock_frequency', 200)
     cw_mw_frequency = StatusVar('cw_mw_frequency', 2870e6)
@@ -128,12 +132,8 @@ class ODMRLogic(GenericLogic):
 
         # Initalize the ODMR data arrays (mean signal and sweep matrix)
         self._initialize_odmr_plots()
-        # Raw data array
-        self.odmr_raw_data = np.zeros(
-            [self.number_of_lines,
-             len(self._odmr_counter.get_odmr_channels()),
-             self.odmr_plot_x.size]
-        )
+        # Raw data store
+        self._initialize_raw_data(self.number_of_lines)
 
         # Switch off microwave and set CW frequency and power
         self.mw_off()
@@ -237,6 +237,131 @@ class ODMRLogic(GenericLogic):
         self.sigOdmrFitUpdated.emit(self.odmr_fit_x, self.odmr_fit_y, {}, current_fit)
         return
 
+    def _initialize_raw_data(self, number_of_lines):
+        """
+        Initializes the circular raw data store for the given number of sweeps together with the
+        running sums of all sweeps and of the last lines_to_average sweeps.
+
+        @param int number_of_lines: number of sweeps to keep in memory
+        """
+        if self._max_raw_data_lines > 0:
+            number_of_lines = min(number_of_lines, self._max_raw_data_lines)
+        capacity = max(number_of_lines, self.number_of_lines, self.lines_to_average + 1)
+        shape = (len(self.get_odmr_channels()), self.odmr_plot_x.size)
+        # Sweeps are stored in reverse order, i.e. the newest sweep is at index _raw_data_head and
+        # older sweeps follow (circularly).
+        self._raw_data = np.zeros((capacity,) + shape)
+        self._raw_data_head = 0
+        self._raw_data_lines = 0
+        self._raw_data_discarded = False
+        self._sweeps_sum = np.zeros(shape)
+        self._average_sum = np.zeros(shape)
+        self._initialize_matrix()
+        return
+
+    def _initialize_matrix(self):
+        """
+        Initializes the ODMR matrix (odmr_plot_xy) with the latest sweeps of the raw data store.
+        Each sweep is stored twice in a buffer of twice the matrix size, so the matrix (newest
+        sweep first) is always a view into the buffer.
+        """
+        lines = self.number_of_lines
+        self._matrix_buffer = np.zeros((2 * lines,) + self._raw_data.shape[1:])
+        newest = self._newest_raw_data(lines)
+        self._matrix_buffer[:len(newest)] = newest
+        self._matrix_buffer[lines:lines + len(newest)] = newest
+        self._matrix_head = 0
+        self.odmr_plot_xy = self._matrix_buffer[:lines]
+        return
+
+    def _grow_raw_data(self, number_of_lines):
+        """
+        Enlarges the raw data store to hold the given number of sweeps. The stored sweeps and the
+        running sums are kept.
+
+        @param int number_of_lines: new number of sweeps to keep in memory
+        """
+        if number_of_lines <= self._raw_data.shape[0]:
+            return
+        raw_data = self._newest_raw_data()
+        self._raw_data = np.zeros((number_of_lines,) + self._raw_data.shape[1:])
+        self._raw_data[:len(raw_data)] = raw_data
+        self._raw_data_head = 0
+        return
+
+    def _newest_raw_data(self, number_of_lines=None):
+        """
+        Returns a copy of the latest sweeps in the raw data store (newest sweep first).
+
+        @param int number_of_lines: optional, maximum number of sweeps to return (default: all)
+
+        @return numpy.ndarray: 3D array (sweeps, channels, frequencies)
+        """
+        lines = self._raw_data_lines
+        if number_of_lines is not None:
+            lines = min(lines, number_of_lines)
+        indices = (self._raw_data_head + np.arange(lines)) % self._raw_data.shape[0]
+        return self._raw_data[indices]
+
+    @property
+    def odmr_raw_data(self):
+        """
+        Raw data of the sweeps kept in memory as 3D array (sweeps, channels, frequencies), the
+        newest sweep first. If more than max_raw_data_lines sweeps have been measured, the oldest
+        sweeps are not included anymore.
+        """
+        return self._newest_raw_data()
+
+    def _add_raw_data_line(self, new_counts):
+        """
+        Adds a new sweep to the raw data store, the matrix and the running sums.
+        Costs O(frequencies) independent of the number of sweeps. A full raw data store is doubled
+        in size (at most to max_raw_data_lines if set).
+
+        @param numpy.ndarray new_counts: 2D array (channels, frequencies) of the new sweep
+        """
+        capacity = self._raw_data.shape[0]
+        if self._raw_data_lines == capacity:
+            if self._max_raw_data_lines <= 0:
+                self._grow_raw_data(2 * capacity)
+            elif capacity < self._max_raw_data_lines:
+                self._grow_raw_data(min(2 * capacity, self._max_raw_data_lines))
+            capacity = self._raw_data.shape[0]
+        # Remove the sweep leaving the averaging window from the running sum
+        if 0 < self.lines_to_average <= self._raw_data_lines:
+            self._average_sum -= self._raw_data[
+                (self._raw_data_head + self.lines_to_average - 1) % capacity]
+        if self._raw_data_lines == capacity and not self._raw_data_discarded:
+            self._raw_data_discarded = True
+            self.log.warning('Raw data store in ODMRLogic is full (max_raw_data_lines: {0:d} '
+                             'sweeps). Raw data of older sweeps is discarded and not saved, the '
+                             'averaged signal still includes them.'.format(capacity))
+        self._raw_data_head = (self._raw_data_head - 1) % capacity
+        self._raw_data[self._raw_data_head] = new_counts
+        self._raw_data_lines = min(self._raw_data_lines + 1, capacity)
+        self._sweeps_sum += new_counts
+        self._average_sum += new_counts
+
+        lines = self.number_of_lines
+        self._matrix_head = (self._matrix_head - 1) % lines
+        self._matrix_buffer[self._matrix_head] = new_counts
+        self._matrix_buffer[self._matrix_head + lines] = new_counts
+        self.odmr_plot_xy = self._matrix_buffer[self._matrix_head:self._matrix_head + lines]
+        return
+
+    def _update_average(self, number_of_sweeps):
+        """
+        Calculates the averaged signal (odmr_plot_y) from the running sums.
+
+        @param int number_of_sweeps: number of sweeps measured in total
+        """
+        if self.lines_to_average <= 0:
+            self.odmr_plot_y = self._sweeps_sum / max(1, number_of_sweeps)
+        else:
+            self.odmr_plot_y = self._average_sum / max(
+                1, min(self.lines_to_average, number_of_sweeps, self._raw_data_lines))
+        return
+
     def set_trigger(self, trigger_pol, frequency):
         """
         Set trigger polarity of external microwave trigger (for list and sweep mode).
@@ -266,20 +391,15 @@ class ODMRLogic(GenericLogic):
 
         @return int: actually set lines to average
         """
-        self.lines_to_average = int(lines_to_average)
+        with self.threadlock:
+            self.lines_to_average = int(lines_to_average)
 
-        if self.lines_to_average <= 0:
-            self.odmr_plot_y = np.mean(
-                self.odmr_raw_data[:max(1, self.elapsed_sweeps), :, :],
-                axis=0,
-                dtype=np.float64
-            )
-        else:
-            self.odmr_plot_y = np.mean(
-                self.odmr_raw_data[:max(1, min(self.lines_to_average, self.elapsed_sweeps)), :, :],
-                axis=0,
-                dtype=np.float64
-            )
+            # The store must keep one sweep more than averaged to update the running sum
+            self._grow_raw_data(self.lines_to_average + 1)
+            if self.lines_to_average > 0:
+                self._average_sum = np.sum(self._newest_raw_data(self.lines_to_average), axis=0,
+                                           dtype=np.float64)
+            self._update_average(self.elapsed_sweeps)
 
         self.sigOdmrPlotsUpdated.emit(self.odmr_plot_x, self.odmr_plot_y, self.odmr_plot_xy)
         self.sigParameterUpdated.emit({'average_length': self.lines_to_average})
@@ -670,11 +790,7 @@ class ODMRLogic(GenericLogic):
                 estimated_number_of_lines = self.number_of_lines
             self.log.debug('Estimated number of raw data lines: {0:d}'
                            ''.format(estimated_number_of_lines))
-            self.odmr_raw_data = np.zeros(
-                [estimated_number_of_lines,
-                 len(self._odmr_counter.get_odmr_channels()),
-                 self.odmr_plot_x.size]
-            )
+            self._initialize_raw_data(estimated_number_of_lines)
             self.sigNextLine.emit()
             return 0
 
@@ -767,45 +883,18 @@ class ODMRLogic(GenericLogic):
                 self.sigNextLine.emit()
                 return
 
-            # Add new count data to raw_data array and append if array is too small
+            # Clear the raw data store and the running sums
             if self._clearOdmrData:
-                self.odmr_raw_data[:, :, :] = 0
+                self._initialize_raw_data(self._raw_data.shape[0])
                 self._clearOdmrData = False
-            if self.elapsed_sweeps == (self.odmr_raw_data.shape[0] - 1):
-                expanded_array = np.zeros(self.odmr_raw_data.shape)
-                self.odmr_raw_data = np.concatenate((self.odmr_raw_data, expanded_array), axis=0)
-                self.log.warning('raw data array in ODMRLogic was not big enough for the entire '
-                                 'measurement. Array will be expanded.\nOld array shape was '
-                                 '({0:d}, {1:d}), new shape is ({2:d}, {3:d}).'
-                                 ''.format(self.odmr_raw_data.shape[0] - self.number_of_lines,
-                                           self.odmr_raw_data.shape[1],
-                                           self.odmr_raw_data.shape[0],
-                                           self.odmr_raw_data.shape[1]))
-
-            # shift data in the array "up" and add new data at the "bottom"
-            self.odmr_raw_data = np.roll(self.odmr_raw_data, 1, axis=0)
-
-            self.odmr_raw_data[0] = new_counts
-
-            # Add new count data to mean signal
-            if self._clearOdmrData:
-                self.odmr_plot_y[:, :] = 0
-
-            if self.lines_to_average <= 0:
-                self.odmr_plot_y = np.mean(
-                    self.odmr_raw_data[:max(1, self.elapsed_sweeps), :, :],
-                    axis=0,
-                    dtype=np.float64
-                )
-            else:
-                self.odmr_plot_y = np.mean(
-                    self.odmr_raw_data[:max(1, min(self.lines_to_average, self.elapsed_sweeps)), :, :],
-                    axis=0,
-                    dtype=np.float64
-                )
+            # Rebuild the matrix if the number of matrix lines has been changed
+            if self.odmr_plot_xy.shape[0] != self.number_of_lines:
+                self._grow_raw_data(self.number_of_lines)
+                self._initialize_matrix()
 
-            # Set plot slice of matrix
-            self.odmr_plot_xy = self.odmr_raw_data[:self.number_of_lines, :, :]
+            # Add new count data to the circular raw data store and the running sums/mean signal
+            self._add_raw_data_line(new_counts)
+            self._update_average(self.elapsed_sweeps + 1)
 
             # Update elapsed time/sweeps
             self.elapsed_sweeps += 1
@@ -883,6 +972,8 @@ class ODMRLogic(GenericLogic):
         if tag is None:
             tag = ''
 
+        raw_data = self.odmr_raw_data
+        save_jobs = list()
         for nch, channel in enumerate(self.get_odmr_channels()):
             # first save raw data for each channel
             if len(tag) > 0:
@@ -891,24 +982,26 @@ class ODMRLogic(GenericLogic):
                 filelabel_raw = 'ODMR_data_ch{0}_raw'.format(nch)
 
             data_raw = OrderedDict()
-            data_raw['count data (counts/s)'] = self.odmr_raw_data[:self.elapsed_sweeps, nch, :]
+            data_raw['count data (counts/s)'] = raw_data[:self.elapsed_sweeps, nch, :]
             parameters = OrderedDict()
             parameters['Microwave CW Power (dBm)'] = self.cw_mw_power
             parameters['Microwave Sweep Power (dBm)'] = self.sweep_mw_power
             parameters['Run Time (s)'] = self.run_time
             parameters['Number of frequency sweeps (#)'] = self.elapsed_sweeps
+            # less than the number of sweeps if older sweeps have been discarded
+            parameters['Number of saved sweeps (#)'] = len(data_raw['count data (counts/s)'])
             parameters['Start Frequencies (Hz)'] = self.mw_starts
             parameters['Stop Frequencies (Hz)'] = self.mw_stops
             parameters['Step sizes (Hz)'] = self.mw_steps
             parameters['Clock Frequencies (Hz)'] = self.clock_frequency
             parameters['Channel'] = '{0}: {1}'.format(nch, channel)
-            self._save_logic.save_data(data_raw,
-                                       filepath=filepath,
-                                       parameters=parameters,
-                                       filelabel=filelabel_raw,
-                                       fmt='%.6e',
-                                       delimiter='\t',
-                                       timestamp=timestamp)
+            save_jobs.append(self._save_logic.save_data_async(data_raw,
+                                                              filepath=filepath,
+                                                              parameters=parameters,
+                                                              filelabel=filelabel_raw,
+                                                              fmt='%.6e',
+                                                              delimiter='\t',
+                                                              timestamp=timestamp))
 
             # now create a plot for each scan range
             data_start_ind = 0
@@ -946,20 +1039,23 @@ class ODMRLogic(GenericLogic):
                         parameters[name] = str(param)
                 # add all fit parameter to the saved data:
 
-                fig = self.draw_figure(nch, ii,
-                                       cbar_range=colorscale_range,
-                                       percentile_range=percentile_range)
-
-                self._save_logic.save_data(data,
-                                           filepath=filepath,
-                                           parameters=parameters,
-                                           filelabel=filelabel,
-                                           fmt='%.6e',
-                                           delimiter='\t',
-                                           timestamp=timestamp,
-                                           plotfig=fig)
-
-        self.log.info('ODMR data saved to:\n{0}'.format(filepath))
+                # the figure is drawn from a copy of the data when the file is written
+                fig = functools.partial(self._plot_figure,
+                                        cbar_range=colorscale_range,
+                                        percentile_range=percentile_range,
+                                        **self._get_figure_data(nch, ii))
+
+                save_jobs.append(self._save_logic.save_data_async(data,
+                                                                  filepath=filepath,
+                                                                  parameters=parameters,
+                                                                  filelabel=filelabel,
+                                                                  fmt='%.6e',
+                                                                  delimiter='\t',
+                                                                  timestamp=timestamp,
+                                                                  plotfig=fig))
+
+        self._save_logic.call_when_saved(
+            save_jobs, lambda: self.log.info('ODMR data saved to:\n{0}'.format(filepath)))
         return
 
     def draw_figure(self, channel_number, freq_range, cbar_range=None, percentile_range=None):
@@ -973,6 +1069,18 @@ class ODMRLogic(GenericLogic):
 
         @return: fig fig: a matplotlib figure object to be saved to file.
         """
+        return self._plot_figure(cbar_range=cbar_range,
+                                 percentile_range=percentile_range,
+                                 **self._get_figure_data(channel_number, freq_range))
+
+    def _get_figure_data(self, channel_number, freq_range):
+        """ Copies the data needed to draw the summary figure (see _plot_figure).
+
+        @param int channel_number: the ODMR channel to draw
+        @param int freq_range: index of the frequency range to draw
+
+        @return dict: keyword arguments of _plot_figure holding the data
+        """
         key = 'channel: {0}, range: {1}'.format(channel_number, freq_range)
         freq_data = self.frequency_lists[freq_range]
         lengths = [len(freq_range) for freq_range in self.frequency_lists]
@@ -986,12 +1094,25 @@ class ODMRLogic(GenericLogic):
         ind_start = cumulative_sum[freq_range]
         ind_end = cumulative_sum[freq_range + 1]
         count_data = self.odmr_plot_y[channel_number][ind_start:ind_end]
-        fit_freq_vals = self.frequency_lists[freq_range]
         if key in self.fits_performed:
             fit_count_vals = self.fits_performed[key][2].eval()
         else:
             fit_count_vals = 0.0
         matrix_data = self.select_odmr_matrix_data(self.odmr_plot_xy, channel_number, freq_range)
+        return {'freq_data': np.array(freq_data),
+                'count_data': np.array(count_data),
+                'fit_count_vals': fit_count_vals,
+                'matrix_data': np.array(matrix_data),
+                'number_of_lines': self.number_of_lines}
+
+    def _plot_figure(self, freq_data, count_data, fit_count_vals, matrix_data, number_of_lines,
+                     cbar_range=None, percentile_range=None):
+        """ Plots the summary figure from data copied by _get_figure_data. Only uses the passed
+        data, so it can be called in the background while the measurement continues.
+
+        @return: fig fig: a matplotlib figure object to be saved to file.
+        """
+        fit_freq_vals = freq_data
 
         # If no colorbar range was given, take full range of data
         if cbar_range is None:
@@ -1054,7 +1175,7 @@ class ODMRLogic(GenericLogic):
             extent=[np.min(freq_data),
                     np.max(freq_data),
                     0,
-                    self.number_of_lines
+                    number_of_lines
                     ],
             aspect='auto',
             interpolation='nearest')
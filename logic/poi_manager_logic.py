@@ -26,12 +26,14 @@ import numpy as np
 import time
 
 from collections import OrderedDict
+from core.configoption import ConfigOption
 from core.connector import Connector
 from core.statusvariable import StatusVar
 from datetime import datetime
 from logic.generic_logic import GenericLogic
 from qtpy import QtCore
 from core.util.mutex import Mutex
+from scipy import ndimage
 
 
 class RegionOfInterest:
@@ -353,6 +355,17 @@ class PoiManagerLogic(GenericLogic):
 
     """
     This is the Logic class for mapping and tracking bright features in the confocal scan.
+
+    Example config for copy-paste:
+
+    poimanagerlogic:
+        module.Class: 'poi_manager_logic.PoiManagerLogic'
+        spot_max_elongation: 2.0  # optional, max. ratio of the principal axes of found spots
+        spot_max_area: 4.0  # optional, max. spot area in units of the area of a POI diameter circle
+        connect:
+            scannerlogic: 'scannerlogic'
+            optimiserlogic: 'optimizerlogic'
+            savelogic: 'savelogic'
     """
 
     # declare connectors
@@ -360,6 +373,10 @@ class PoiManagerLogic(GenericLogic):
     scannerlogic = Connector(interface='ConfocalLogic')
     savelogic = Connector(interface='SaveLogic')
 
+    # config options (shape criteria of auto_catch_poi, 0 disables the criterion)
+    _spot_max_elongation = ConfigOption('spot_max_elongation', 2.0, missing='nothing')
+    _spot_max_area = ConfigOption('spot_max_area', 4.0, missing='nothing')
+
     # status vars
     _roi = StatusVar(default=dict())  # Notice constructor and representer further below
     _refocus_period = StatusVar(default=120)
@@ -1188,71 +1205,126 @@ class PoiManagerLogic(GenericLogic):
         arr_size = int(spot_size / pixel_size)
         return arr_size
 
-    def _is_spot_shape(self, local_arr):
-        unspot_e = 0
-        ensem_e = 0
-        len_arr = len(local_arr)
-        mid_f = int(0.5 * len_arr)
-        hm_local_arr = local_arr[mid_f].mean()
-        vm_local_arr = local_arr[:, mid_f].mean()
-        for i in range(0, len_arr):
-            if local_arr[i].mean() > hm_local_arr:
-                ensem_e += 1
-            if local_arr[:, i].mean() > vm_local_arr:
-                ensem_e += 1
-            if hm_local_arr > vm_local_arr * 1.2:
-                unspot_e += 1
-            if vm_local_arr > hm_local_arr * 1.2:
-                unspot_e += 1
-        if ensem_e > 4:
-            return False
-        elif unspot_e > 1:
-            return False
-        else:
-            return True
-
-    def _local_max(self, scan):
-        scan = np.asarray(scan, order="C")  # scan has to be a 2-D array
-        filter_size = self._spot_filter(scan)
-        scan_m = scan.mean()
-        mid_f = int(filter_size / 2)
-        xc = []
-        yc = []
-        for i in range(0, len(scan) - filter_size):
-            for j in range(0, len(scan[i]) - filter_size):
-                local_arr = scan[i:i + filter_size, j:j + filter_size]
-                local_arr = np.asarray(local_arr)
-                arr_threshold = scan_m * self._poi_threshold * 0.5
-                if scan[i + mid_f][j + mid_f] == local_arr.max() and self._is_spot_shape(local_arr) and local_arr.mean() > arr_threshold:
-                    xc.append(i + mid_f)
-                    yc.append(j + mid_f)
-        return xc, yc
+    def _find_spots(self, scan):
+        """ Finds bright and round spots in a scan image.
+
+        Candidates are the maxima within a window of the spot size (poi_diameter) that exceed
+        poi_threshold times the image mean, while the mean of the window exceeds half of that.
+        Adjacent maxima of equal height are merged by connected-component labeling. The spot
+        position is the centroid of the window around the maximum weighted with the counts above
+        the threshold (subpixel resolution). Spots are rejected if this weighted window is
+        elongated by more than spot_max_elongation (ratio of the principal axes) or if their area
+        above the threshold exceeds spot_max_area times the area of a spot with poi_diameter.
+
+        @param numpy.ndarray scan: 2D scan image (first index x, second index y)
+
+        @return tuple: x and y pixel coordinates (float arrays) of the spots and dict with
+                       candidate statistics and run times of the detection steps
+        """
+        report = OrderedDict()
+        start_time = time.perf_counter()
+        scan = np.asarray(scan, dtype=float)
+        filter_size = max(self._spot_filter(scan), 1)
+        half_size = filter_size // 2
+        threshold = scan.mean() * self._poi_threshold
+        report['filter_size'] = filter_size
+
+        # Local maxima above the threshold with a sufficiently bright neighbourhood
+        is_max = scan == ndimage.maximum_filter(scan, size=filter_size, mode='nearest')
+        window_mean = ndimage.uniform_filter(scan, size=filter_size, mode='nearest')
+        above = scan > threshold
+        candidates = is_max & above & (window_mean > 0.5 * threshold)
+        report['time_filters'] = time.perf_counter() - start_time
+
+        # Merge plateaus of equal maxima into a single candidate each
+        peak_labels, peak_count = ndimage.label(candidates)
+        report['candidates'] = peak_count
+        if peak_count == 0:
+            report['spots'] = 0
+            report['time_total'] = time.perf_counter() - start_time
+            return np.zeros(0), np.zeros(0), report
+        peaks = np.array(ndimage.center_of_mass(candidates, peak_labels,
+                                                np.arange(1, peak_count + 1)))
+        peaks = np.rint(peaks).astype(int)
+
+        # Area above the threshold per spot (shared evenly by all peaks within a region)
+        region_labels = ndimage.label(above)[0]
+        peak_regions = region_labels[peaks[:, 0], peaks[:, 1]]
+        region_area = np.bincount(region_labels.ravel())
+        peaks_per_region = np.bincount(peak_regions, minlength=region_area.size)
+        spot_area = region_area[peak_regions] / peaks_per_region[peak_regions]
+        report['time_labeling'] = time.perf_counter() - start_time - report['time_filters']
+
+        # Weighted centroid and second moments of the window around every peak
+        offsets = np.arange(-half_size, filter_size - half_size)
+        rows = peaks[:, 0, np.newaxis] + offsets
+        cols = peaks[:, 1, np.newaxis] + offsets
+        valid_rows = (rows >= 0) & (rows < scan.shape[0])
+        valid_cols = (cols >= 0) & (cols < scan.shape[1])
+        windows = scan[np.clip(rows, 0, scan.shape[0] - 1)[:, :, np.newaxis],
+                       np.clip(cols, 0, scan.shape[1] - 1)[:, np.newaxis, :]]
+        weights = np.clip(windows - threshold, 0, None)
+        weights *= valid_rows[:, :, np.newaxis] & valid_cols[:, np.newaxis, :]
+        total = weights.sum(axis=(1, 2))
+        row_pos = rows[:, :, np.newaxis].astype(float)
+        col_pos = cols[:, np.newaxis, :].astype(float)
+        x_pos = (weights * row_pos).sum(axis=(1, 2)) / total
+        y_pos = (weights * col_pos).sum(axis=(1, 2)) / total
+        row_dev = row_pos - x_pos[:, np.newaxis, np.newaxis]
+        col_dev = col_pos - y_pos[:, np.newaxis, np.newaxis]
+        var_x = (weights * row_dev ** 2).sum(axis=(1, 2)) / total
+        var_y = (weights * col_dev ** 2).sum(axis=(1, 2)) / total
+        cov_xy = (weights * row_dev * col_dev).sum(axis=(1, 2)) / total
+
+        # Shape criteria
+        var_mean = (var_x + var_y) / 2
+        var_diff = np.sqrt(((var_x - var_y) / 2) ** 2 + cov_xy ** 2)
+        # The variances are at least the variance of a single pixel (1/12), so spots of only a few
+        # (e.g. collinear) pixels above threshold are treated as round.
+        major = np.maximum(var_mean + var_diff, 1 / 12)
+        minor = np.maximum(var_mean - var_diff, 1 / 12)
+        elongation = np.sqrt(major / minor)
+        accepted = np.ones(peak_count, dtype=bool)
+        if self._spot_max_elongation > 0:
+            accepted &= elongation <= self._spot_max_elongation
+        if self._spot_max_area > 0:
+            accepted &= spot_area <= self._spot_max_area * np.pi / 4 * filter_size ** 2
+        report['spots'] = int(np.count_nonzero(accepted))
+        report['time_centroids'] = (time.perf_counter() - start_time - report['time_filters']
+                                    - report['time_labeling'])
+        report['time_total'] = time.perf_counter() - start_time
+        return x_pos[accepted], y_pos[accepted], report
 
     def auto_catch_poi(self):
+        """ Adds a POI for every spot found in the ROI scan image (see _find_spots).
+        """
+        if self.roi_scan_image is None:
+            self.log.error('Unable to find POIs. No ROI scan image present.')
+            return
+        start_time = time.perf_counter()
         scan_image = self.roi_scan_image.T
         x_range = self.roi_scan_image_extent[0]
         y_range = self.roi_scan_image_extent[1]
-        x_axis = np.arange(x_range[0], x_range[1], (x_range[1] - x_range[0]) / len(scan_image))
-        y_axis = np.arange(y_range[0], y_range[1], (y_range[1] - y_range[0]) / len(scan_image[0]))
+        x_step = (x_range[1] - x_range[0]) / scan_image.shape[0]
+        y_step = (y_range[1] - y_range[0]) / scan_image.shape[1]
 
-        for i in range(0, len(scan_image)):
-            for j in range(0, len(scan_image[i])):
-                scan_image[i][j] = int(scan_image[i][j])  # data here somehow needs to be reset, otherwise shit happens.
+        xc, yc, report = self._find_spots(scan_image)
 
-        threshold = scan_image.mean() * self._poi_threshold
-
-        xc1, yc1 = self._local_max(scan_image)
-        xc2 = []
-        yc2 = []
-        for i in range(0, len(xc1)):
-            if scan_image[xc1[i], yc1[i]] > threshold:
-                xc2.append(xc1[i])
-                yc2.append(yc1[i])
-
-        pois = np.zeros((len(xc2), 3))
         z = self.scanner_position[2]
-        for i in range(0, len(pois)):
-            pois[i] = [x_axis[xc2[i]], y_axis[yc2[i]], z]
-            self.add_poi(pois[i])
-            if self.poi_nametag is None:
-                time.sleep(0.1)
\ No newline at end of file
+        # Generic POI names are created from the current time, so make them unique here
+        name_prefix = datetime.now().strftime('poi_%Y%m%d%H%M%S%f')
+        for i, (x_pixel, y_pixel) in enumerate(zip(xc, yc)):
+            name = None if self.poi_nametag is not None else '{0}_{1:d}'.format(name_prefix, i)
+            self.add_poi([x_range[0] + x_pixel * x_step, y_range[0] + y_pixel * y_step, z],
+                         name=name)
+
+        self.log.info('Found {0:d} POIs ({1:d} candidates) in {2:.3f}s. Filters: {3:.3f}s, '
+                      'labeling: {4:.3f}s, centroids and shapes: {5:.3f}s, total including adding '
+                      'POIs: {6:.3f}s.'.format(report['spots'],
+                                              report['candidates'],
+                                              report['time_total'],
+                                              report.get('time_filters', 0),
+                                              report.get('time_labeling', 0),
+                                              report.get('time_centroids', 0),
+                                              time.perf_counter() - start_time))
+        return
@@ -20,12 +20,12 @@ top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi
 """
 
 import os
-import sys
 import inspect
-import importlib
+import functools
 
 from core.util.modules import get_main_dir
 from core.util.helpers import natural_sort
+from core.util.plugin_registry import PluginRegistry, LazyPluginCallable, signature_from_info
 
 
 class PulseAnalyzerBase:
@@ -98,14 +98,14 @@ class PulseAnalyzer(PulseAnalyzerBase):
         if isinstance(pulsedmeasurementlogic.analysis_import_path, str):
             path_list.append(pulsedmeasurementlogic.analysis_import_path)
 
-        # Import analysis modules and get a list of analyzer classes
-        analyzer_classes = self.__import_external_analyzers(paths=path_list)
+        # Index analysis modules without importing them. The analyzer classes are imported and
+        # instantiated when one of their analysis methods is used for the first time.
+        self.__measurement_logic = pulsedmeasurementlogic
+        self.__analyzer_instances = dict()
+        self.__registry = PluginRegistry([path for path in path_list if self.__check_path(path)])
 
-        # create an instance of each class and put them in a temporary list
-        analyzer_instances = [cls(pulsedmeasurementlogic) for cls in analyzer_classes]
-
-        # add references to all analysis methods in each instance to a dict
-        self.__populate_method_dict(instance_list=analyzer_instances)
+        # add lazy references to all analysis methods of the analyzer classes to a dict
+        self.__populate_method_dict()
 
         # populate "_parameters" dictionary from analysis method signatures
         self.__populate_parameter_dict()
@@ -233,56 +233,53 @@ class PulseAnalyzer(PulseAnalyzerBase):
                 kwargs_dict[name] = default
         return kwargs_dict
 
-    def __import_external_analyzers(self, paths):
+    def __check_path(self, path):
         """
-        Helper method to import all modules from directories contained in paths.
-        Find all classes in those modules that inherit exclusively from PulseAnalyzerBase class
-        and return a list of them.
+        Helper method to check if an import path for analysis modules exists.
 
-        @param iterable paths: iterable containing paths to import modules from
-        @return list: A list of imported valid analyzer classes
+        @param str path: path to check
+        @return bool: True if the path exists, False otherwise
         """
-        class_list = list()
-        for path in paths:
-            if not os.path.exists(path):
-                self.log.error('Unable to import analysis methods from "{0}".\n'
-                               'Path does not exist.'.format(path))
-                continue
-            # Get all python modules to import from.
-            # The assumption is that in the directory pulse_analysis_methods, there are
-            # *.py files, which contain only analyzer classes!
-            module_list = [name[:-3] for name in os.listdir(path) if
-                           os.path.isfile(os.path.join(path, name)) and name.endswith('.py')]
-
-            # append import path to sys.path
-            if path not in sys.path:
-                sys.path.append(path)
-
-            # Go through all modules and create instances of each class found.
-            for module_name in module_list:
-                # import module
-                mod = importlib.import_module('{0}'.format(module_name))
-                importlib.reload(mod)
-                # get all analyzer class references defined in the module
-                tmp_list = [m[1] for m in inspect.getmembers(mod, self.__is_analyzer_class)]
-                # append to class_list
-                class_list.extend(tmp_list)
-        return class_list
-
-    def __populate_method_dict(self, instance_list):
+        if not os.path.exists(path):
+            self.log.error('Unable to import analysis methods from "{0}".\n'
+                           'Path does not exist.'.format(path))
+            return False
+        return True
+
+    def __get_analyzer_instance(self, module_name, class_name):
         """
-        Helper method to populate the dictionaries containing all references to callable analysis
-        methods contained in analyzer instances passed to this method.
+        Helper method to import an analyzer class and create an instance of it on first use.
 
-        @param list instance_list: List containing instances of analyzer classes
+        @param str module_name: name of the analysis module containing the class
+        @param str class_name: name of the analyzer class
+        @return object: the (single) instance of the analyzer class
+        """
+        key = (module_name, class_name)
+        if key not in self.__analyzer_instances:
+            cls = self.__registry.get_member(module_name, class_name)
+            self.__analyzer_instances[key] = cls(self.__measurement_logic)
+        return self.__analyzer_instances[key]
+
+    def __populate_method_dict(self):
+        """
+        Helper method to populate the dictionary containing references to all callable analysis
+        methods of the analyzer classes found in the analysis modules.
+        The references resolve the bound analysis methods on the first call.
         """
         self._analysis_methods = dict()
-        for instance in instance_list:
-            for method_name, method_ref in inspect.getmembers(instance, inspect.ismethod):
+        for class_name, (module_name, info) in self.__registry.classes(
+                self.__is_analyzer_class_info).items():
+            for method_name, method_info in info['methods'].items():
                 if method_name.startswith('analyse_'):
-                    self._analysis_methods[method_name[8:]] = method_ref
+                    resolve = functools.partial(self.__get_bound_method,
+                                                module_name, class_name, method_name)
+                    self._analysis_methods[method_name[8:]] = LazyPluginCallable(
+                        resolve, method_name, signature_from_info(method_info))
         return
 
+    def __get_bound_method(self, module_name, class_name, method_name):
+        return getattr(self.__get_analyzer_instance(module_name, class_name), method_name)
+
     def __populate_parameter_dict(self):
         """
         Helper method to populate the dictionary containing all possible keyword arguments from all
@@ -294,13 +291,14 @@ class PulseAnalyzer(PulseAnalyzerBase):
         return
 
     @staticmethod
-    def __is_analyzer_class(obj):
+    def __is_analyzer_class_info(name, info):
         """
-        Helper method to check if an object is a valid analyzer class.
+        Helper method to check if a class indexed by the plugin registry (not imported yet) is a
+        valid analyzer class.
 
-        @param object obj: object to check
-        @return bool: True if obj is a valid analyzer class, False otherwise
+        @param str name: name of the class
+        @param dict info: class info from the plugin registry
+        @return bool: True if the class is a valid analyzer class, False otherwise
         """
-        if inspect.isclass(obj):
-            return PulseAnalyzerBase in obj.__bases__ and len(obj.__bases__) == 1
-        return False
+        return len(info['bases']) == 1 and info['bases'][0] is not None and (
+            info['bases'][0].rsplit('.', 1)[-1] == PulseAnalyzerBase.__name__)
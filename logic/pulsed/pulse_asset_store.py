@@ -0,0 +1,275 @@
+# -*- coding: utf-8 -*-
+
+"""
+This file contains the Qudi asset store used by the SequenceGeneratorLogic to persist the created
+pulse objects (PulseBlock, PulseBlockEnsemble, PulseSequence) in a single indexed SQLite file.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import os
+import pickle
+import shutil
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+class PulseAssetStore:
+    """
+    Single-file store for pickled pulse objects indexed by asset type and name.
+
+    Asset types are the file extensions formerly used for the per-object pickle files, i.e.
+    'block', 'ensemble' and 'sequence'. Objects are only de-serialized on request (see
+    LazyAssetDict). Each save/delete is committed immediately unless it happens within a batch()
+    context, in which case all changes are committed in a single transaction at the end.
+
+    The store can be used from multiple threads.
+    """
+    _schema = 'CREATE TABLE IF NOT EXISTS assets (' \
+              'type TEXT NOT NULL, name TEXT NOT NULL, data BLOB NOT NULL, ' \
+              'PRIMARY KEY (type, name))'
+
+    def __init__(self, filepath):
+        """
+        @param str filepath: path of the SQLite database file (created if not present)
+        """
+        self._filepath = filepath
+        self._connection = None
+        self._lock = threading.RLock()
+        self._batch_depth = 0
+
+    @property
+    def filepath(self):
+        return self._filepath
+
+    @property
+    def is_open(self):
+        return self._connection is not None
+
+    def open(self):
+        """ Opens (and creates if necessary) the database file.
+        """
+        with self._lock:
+            if self._connection is None:
+                self._connection = sqlite3.connect(self._filepath, check_same_thread=False)
+                self._connection.execute(self._schema)
+                self._connection.commit()
+        return
+
+    def close(self):
+        """ Commits pending changes and closes the database file.
+        """
+        with self._lock:
+            if self._connection is not None:
+                self._connection.commit()
+                self._connection.close()
+                self._connection = None
+                self._batch_depth = 0
+        return
+
+    @contextmanager
+    def batch(self):
+        """
+        Context manager deferring the commit of all saves/deletes to the end of the context.
+        Batches can be nested, the changes are committed when the outermost batch is left.
+        """
+        with self._lock:
+            self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._batch_depth -= 1
+                if self._batch_depth == 0 and self._connection is not None:
+                    self._connection.commit()
+
+    def names(self, asset_type):
+        """
+        Returns the names of all stored assets of a type without de-serializing them.
+
+        @param str asset_type: the asset type ('block', 'ensemble' or 'sequence')
+        @return list: names of the stored assets
+        """
+        with self._lock:
+            cursor = self._connection.execute('SELECT name FROM assets WHERE type=?',
+                                              (asset_type,))
+            return [row[0] for row in cursor]
+
+    def load(self, asset_type, name):
+        """
+        De-serializes a single asset.
+
+        Errors during de-serialization (e.g. pickle.UnpicklingError or ModuleNotFoundError) are
+        propagated to the caller.
+
+        @param str asset_type: the asset type ('block', 'ensemble' or 'sequence')
+        @param str name: the name of the asset
+        @return object: the de-serialized asset or None if no asset by that name is stored
+        """
+        with self._lock:
+            row = self._connection.execute('SELECT data FROM assets WHERE type=? AND name=?',
+                                           (asset_type, name)).fetchone()
+        if row is None:
+            return None
+        return pickle.loads(row[0])
+
+    def save(self, asset_type, name, asset):
+        """
+        Serializes and stores a single asset. An existing asset by the same name is replaced.
+
+        @param str asset_type: the asset type ('block', 'ensemble' or 'sequence')
+        @param str name: the name of the asset
+        @param object asset: the object to store
+        """
+        data = pickle.dumps(asset, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._connection.execute('INSERT OR REPLACE INTO assets VALUES (?, ?, ?)',
+                                     (asset_type, name, sqlite3.Binary(data)))
+            self._commit()
+        return
+
+    def delete(self, asset_type, name):
+        """
+        Removes a single asset from the store (if present).
+
+        @param str asset_type: the asset type ('block', 'ensemble' or 'sequence')
+        @param str name: the name of the asset
+        """
+        with self._lock:
+            self._connection.execute('DELETE FROM assets WHERE type=? AND name=?',
+                                     (asset_type, name))
+            self._commit()
+        return
+
+    def migrate_directory(self, directory, asset_types=('block', 'ensemble', 'sequence'),
+                          backup_dir_name='migrated_pickle_files'):
+        """
+        One-shot import of per-object pickle files (<name>.<asset_type>) from a directory.
+        The pickled data is copied into the store as is (without de-serialization) and the
+        imported files are moved into a backup sub-directory afterwards.
+
+        @param str directory: the directory containing the pickle files
+        @param iterable asset_types: the asset types (file extensions) to import
+        @param str backup_dir_name: name of the sub-directory to move imported files into
+
+        @return int: the number of imported files
+        """
+        with os.scandir(directory) as scan:
+            files = [(f.path, f.name) for f in scan if
+                     f.is_file() and os.path.splitext(f.name)[1][1:] in asset_types]
+        if not files:
+            return 0
+
+        with self.batch():
+            for path, filename in files:
+                name, extension = os.path.splitext(filename)
+                with open(path, 'rb') as file:
+                    data = file.read()
+                with self._lock:
+                    self._connection.execute('INSERT OR REPLACE INTO assets VALUES (?, ?, ?)',
+                                             (extension[1:], name, sqlite3.Binary(data)))
+
+        backup_dir = os.path.join(directory, backup_dir_name)
+        os.makedirs(backup_dir, exist_ok=True)
+        for path, filename in files:
+            shutil.move(path, os.path.join(backup_dir, filename))
+        return len(files)
+
+    def _commit(self):
+        if self._batch_depth == 0:
+            self._connection.commit()
+        return
+
+
+class _NotLoaded:
+    """ Placeholder for assets in a LazyAssetDict that have not been de-serialized yet.
+    """
+    def __repr__(self):
+        return '<not loaded>'
+
+
+NOT_LOADED = _NotLoaded()
+
+
+class LazyAssetDict(OrderedDict):
+    """
+    OrderedDict of pulse objects by name that only de-serializes an object on first access.
+
+    Keys are known from the start (names from the PulseAssetStore index) while the values are
+    placeholders until they are accessed. The loader callable is then used to de-serialize the
+    object. If the loader returns None (e.g. broken data) the entry is removed.
+    Iterating over the keys (e.g. natural_sort(lazy_dict) or "name in lazy_dict") does not load
+    anything, values() and items() load all objects.
+    """
+    def __init__(self, loader, names=None):
+        """
+        @param callable loader: callable taking the name and returning the de-serialized object
+        @param iterable names: the names of the (not yet loaded) objects
+        """
+        super().__init__()
+        self._loader = loader
+        if names is not None:
+            for name in names:
+                super().__setitem__(name, NOT_LOADED)
+
+    def __getitem__(self, name):
+        value = super().__getitem__(name)
+        if value is NOT_LOADED:
+            value = self._loader(name)
+            if value is None:
+                super().__delitem__(name)
+                raise KeyError(name)
+            super().__setitem__(name, value)
+        return value
+
+    def get(self, name, default=None):
+        try:
+            return self[name]
+        except KeyError:
+            return default
+
+    def pop(self, name, *args):
+        try:
+            self[name]
+        except KeyError:
+            pass
+        return super().pop(name, *args)
+
+    def values(self):
+        self.load_all()
+        return super().values()
+
+    def items(self):
+        self.load_all()
+        return super().items()
+
+    def copy(self):
+        self.load_all()
+        return OrderedDict(super().items())
+
+    def load_all(self):
+        """ De-serializes all objects that have not been loaded yet.
+        """
+        for name in list(self.keys()):
+            if super().__getitem__(name) is NOT_LOADED:
+                self.get(name)
+        return
+
+    def __reduce__(self):
+        return OrderedDict, (), None, None, iter(self.items())
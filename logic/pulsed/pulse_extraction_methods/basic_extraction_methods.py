@@ -19,8 +19,9 @@ Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
 top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
 """
 
+import time
 import numpy as np
-from scipy import ndimage
+from scipy import ndimage, signal
 
 from logic.pulsed.pulse_extractor import PulseExtractorBase
 
@@ -31,6 +32,9 @@ class BasicPulseExtractor(PulseExtractorBase):
     """
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        # Flank indices found by ungated_conv_deriv_fast in the last call together with the pulse
+        # layout they belong to. Used to skip the global flank search if the flanks are stable.
+        self._fast_flank_cache = dict()
 
     def gated_conv_deriv(self, count_data, conv_std_dev=20.0, flank_width=0):
         """
@@ -254,6 +258,147 @@ class BasicPulseExtractor(PulseExtractorBase):
         return_dict['laser_indices_falling'] = falling_ind
         return return_dict
 
+    def ungated_conv_deriv_fast(self, count_data, conv_std_dev=20.0):
+        """ Detects the laser pulses in the ungated timetrace data and extracts them.
+        Vectorized variant of ungated_conv_deriv intended for long timetraces with many laser
+        pulses.
+
+        @param numpy.ndarray count_data: The raw timetrace data (1D) from an ungated fast counter
+        @param float conv_std_dev: The standard deviation of the gaussian used for smoothing
+
+        @return dict: The extracted laser pulses of the timetrace as well as the indices for rising
+                      and falling flanks. The key "extraction_time" holds the runtime of this call
+                      in seconds.
+
+        Procedure:
+            Edge Detection:
+            ---------------
+
+            The timetrace is smoothed with a gaussian filter of width conv_std_dev and derived
+            (same as in ungated_conv_deriv). Instead of searching and masking the flanks one after
+            another, all local maxima (minima) of the derivative are found in one pass with a
+            non-maximum suppression distance of 2*conv_std_dev. The number_of_lasers highest
+            (lowest) of them are used as rising (falling) flanks.
+
+            Each flank position is then refined within +-conv_std_dev using the derivative of the
+            timetrace smoothed with a fixed standard deviation of 10 bins. This reference
+            derivative is only calculated in small windows around the flanks.
+
+            If the same flanks have been found in two consecutive calls for the same pulse layout
+            (timetrace length, number of lasers and conv_std_dev), the global search is skipped
+            and only the refinement is performed around the previous flanks. As soon as a flank
+            moves, the global search is performed again.
+        """
+        start_time = time.perf_counter()
+        # Create return dictionary
+        return_dict = {'laser_counts_arr': np.empty(0, dtype='int64'),
+                       'laser_indices_rising': np.empty(0, dtype='int64'),
+                       'laser_indices_falling': np.empty(0, dtype='int64'),
+                       'extraction_time': 0.0}
+
+        number_of_lasers = self.measurement_settings.get('number_of_lasers')
+        if not isinstance(number_of_lasers, int):
+            return return_dict
+
+        window = max(int(conv_std_dev), 1)
+        layout = (count_data.size, number_of_lasers, conv_std_dev)
+        cache = self._fast_flank_cache
+
+        flanks = None
+        if cache.get('layout') == layout and cache.get('stable'):
+            # Refine around the previous flanks and skip the global search if nothing moved
+            rising_ind = self._refine_flanks(count_data, cache['rising'], window, True)
+            falling_ind = self._refine_flanks(count_data, cache['falling'], window, False)
+            if np.array_equal(rising_ind, cache['rising']) and np.array_equal(falling_ind,
+                                                                              cache['falling']):
+                flanks = rising_ind, falling_ind
+
+        if flanks is None:
+            # apply gaussian filter to remove noise and compute the gradient of the timetrace
+            try:
+                conv_deriv = np.gradient(
+                    ndimage.filters.gaussian_filter1d(count_data.astype(float), conv_std_dev))
+            except:
+                conv_deriv = np.zeros(count_data.size)
+
+            # Find all flank candidates at once with non-maximum suppression
+            distance = max(int(2 * conv_std_dev), 1)
+            rising_cand = signal.find_peaks(conv_deriv, distance=distance)[0]
+            falling_cand = signal.find_peaks(-conv_deriv, distance=distance)[0]
+
+            # if gaussian smoothing or derivative failed or not enough flanks are present, return
+            # only zeros to indicate a failed pulse extraction.
+            if not conv_deriv.any() or min(rising_cand.size,
+                                           falling_cand.size) < number_of_lasers:
+                self._fast_flank_cache = dict()
+                return_dict['laser_counts_arr'] = np.zeros((number_of_lasers, 10), dtype='int64')
+                return_dict['extraction_time'] = time.perf_counter() - start_time
+                return return_dict
+
+            # Keep the number_of_lasers most pronounced flanks
+            rising_cand = rising_cand[np.argsort(conv_deriv[rising_cand])[::-1][:number_of_lasers]]
+            falling_cand = falling_cand[np.argsort(conv_deriv[falling_cand])[:number_of_lasers]]
+            rising_ind = np.sort(self._refine_flanks(count_data, rising_cand, window, True))
+            falling_ind = np.sort(self._refine_flanks(count_data, falling_cand, window, False))
+
+            # Consider the flanks stable if they did not change since the last call
+            stable = (cache.get('layout') == layout and
+                      np.array_equal(rising_ind, cache.get('rising')) and
+                      np.array_equal(falling_ind, cache.get('falling')))
+            self._fast_flank_cache = {'layout': layout,
+                                      'rising': rising_ind,
+                                      'falling': falling_ind,
+                                      'stable': stable}
+        else:
+            rising_ind, falling_ind = flanks
+
+        # find the maximum laser length to use as size for the laser array
+        laser_length = max(int(np.max(falling_ind - rising_ind)), 0)
+
+        # slice the detected laser pulses of the timetrace according to the found rising edge.
+        # Bins beyond the end of the timetrace are filled with zeros.
+        indices = rising_ind[:, np.newaxis] + np.arange(laser_length)
+        laser_arr = count_data[np.minimum(indices, count_data.size - 1)].astype('int64')
+        laser_arr[indices >= count_data.size] = 0
+
+        return_dict['laser_counts_arr'] = laser_arr
+        return_dict['laser_indices_rising'] = rising_ind
+        return_dict['laser_indices_falling'] = falling_ind
+        return_dict['extraction_time'] = time.perf_counter() - start_time
+        return return_dict
+
+    @staticmethod
+    def _refine_flanks(count_data, flank_indices, window, rising, ref_std_dev=10):
+        """
+        Refines flank positions by searching the extremum of the derivative of the timetrace
+        smoothed with a small gaussian filter (ref_std_dev) in the range
+        [flank_index - window, flank_index + window) around each flank.
+        The smoothed derivative is only calculated in these ranges (plus the filter margin).
+
+        @param numpy.ndarray count_data: The raw timetrace data (1D)
+        @param numpy.ndarray flank_indices: The approximate flank positions
+        @param int window: Half width of the search range in bins
+        @param bool rising: Search for rising (maximum) or falling (minimum) flanks
+        @param float ref_std_dev: The standard deviation of the gaussian used for smoothing
+
+        @return numpy.ndarray: The refined flank indices (int64)
+        """
+        flank_indices = np.asarray(flank_indices, dtype='int64')
+        # filter margin needed to get the same result as when filtering the entire timetrace
+        margin = int(4.0 * ref_std_dev + 0.5) + 1
+        offsets = np.arange(-window - margin, window + margin)
+        indices = flank_indices[:, np.newaxis] + offsets
+        windows = count_data[np.clip(indices, 0, count_data.size - 1)].astype(float)
+        ref_deriv = np.gradient(ndimage.filters.gaussian_filter1d(windows, ref_std_dev, axis=1),
+                                axis=1)
+        ref_deriv = ref_deriv[:, margin:-margin]
+        if not rising:
+            ref_deriv = -ref_deriv
+        # Exclude positions outside of the timetrace
+        inner_indices = indices[:, margin:-margin]
+        ref_deriv[(inner_indices < 0) | (inner_indices >= count_data.size)] = -np.inf
+        return inner_indices[np.arange(flank_indices.size), np.argmax(ref_deriv, axis=1)]
+
     def ungated_threshold(self, count_data, count_threshold=10, min_laser_length=200e-9,
                           threshold_tolerance=20e-9):
         """
@@ -298,38 +443,34 @@ class BasicPulseExtractor(PulseExtractorBase):
         min_laser_length = round(min_laser_length / counter_bin_width)
 
         # get all bin indices with counts > threshold value
-        bigger_indices = np.where(count_data >= count_threshold)[0]
-
-        # get all indices with consecutive numbering (bin chains not interrupted by
-        # values < threshold
-        index_list = np.split(bigger_indices,
-                              np.where(np.diff(bigger_indices) >= threshold_tolerance)[0] + 1)
-        for i, index_group in enumerate(index_list):
-            if index_group.size > 0:
-                start, end = index_list[i][0], index_list[i][-1]
-                index_list[i] = np.arange(start, end + 1)
-        consecutive_indices_unfiltered = index_list
+        bigger_indices = np.flatnonzero(count_data >= count_threshold)
+
+        # get start and end indices of all bin chains not interrupted by more than
+        # threshold_tolerance values < threshold
+        chain_breaks = np.flatnonzero(np.diff(bigger_indices) >= threshold_tolerance)
+        if bigger_indices.size > 0:
+            starts = bigger_indices[np.concatenate(([0], chain_breaks + 1))]
+            ends = bigger_indices[np.concatenate((chain_breaks, [bigger_indices.size - 1]))]
+        else:
+            starts = ends = np.empty(0, dtype='int64')
 
         # sort out all groups shorter than minimum laser length
-        consecutive_indices = [item for item in consecutive_indices_unfiltered if
-                               len(item) > min_laser_length]
+        lengths = ends - starts + 1
+        long_enough = lengths > min_laser_length
+        starts, ends, lengths = starts[long_enough], ends[long_enough], lengths[long_enough]
 
         # Check if the number of lasers matches the number of remaining index groups
-        if number_of_lasers != len(consecutive_indices):
+        if number_of_lasers != starts.size or starts.size == 0:
             return return_dict
 
-        # determine max length of laser pulse and initialize laser array
-        max_laser_length = max([index_array.size for index_array in consecutive_indices])
-        return_dict['laser_counts_arr'] = np.zeros((number_of_lasers, max_laser_length),
-                                                   dtype='int64')
-
         # fill laser array with slices of raw data array. Also populate the rising/falling index
         # arrays
-        for i, index_group in enumerate(consecutive_indices):
-            return_dict['laser_indices_rising'][i] = index_group[0]
-            return_dict['laser_indices_falling'][i] = index_group[-1]
-            return_dict['laser_counts_arr'][i, :index_group.size] = count_data[index_group]
-
+        indices = starts[:, np.newaxis] + np.arange(lengths.max())
+        laser_arr = count_data[np.minimum(indices, count_data.size - 1)].astype('int64')
+        laser_arr[indices > ends[:, np.newaxis]] = 0
+        return_dict['laser_indices_rising'] = starts.astype('int64')
+        return_dict['laser_indices_falling'] = ends.astype('int64')
+        return_dict['laser_counts_arr'] = laser_arr
         return return_dict
 
     def ungated_gated_conv_deriv(self, count_data, conv_std_dev=20.0, delay=5e-7, safety=2e-7):
@@ -20,12 +20,13 @@ top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi
 """
 
 import os
-import sys
 import inspect
-import importlib
+import functools
+import numpy as np
 
 from core.util.modules import get_main_dir
 from core.util.helpers import natural_sort
+from core.util.plugin_registry import PluginRegistry, LazyPluginCallable, signature_from_info
 
 
 class PulseExtractorBase:
@@ -93,20 +94,28 @@ class PulseExtractor(PulseExtractorBase):
         # Currently selected extraction method
         self._current_extraction_method = None
 
+        # Extraction cache settings and state (see _cached_extraction)
+        self._cache_enabled = bool(pulsedmeasurementlogic.extraction_cache or
+                                   pulsedmeasurementlogic.incremental_analysis)
+        self._cache_check_interval = max(
+            int(pulsedmeasurementlogic.extraction_cache_check_interval), 1)
+        self._cache_tolerance = max(int(pulsedmeasurementlogic.extraction_cache_tolerance), 0)
+        self._extraction_cache = dict()
+
         # import path for extraction modules from default directory (logic.pulse_extraction_methods)
         path_list = [os.path.join(get_main_dir(), 'logic', 'pulsed', 'pulse_extraction_methods')]
         # import path for extraction modules from non-default directory if a path has been given
         if isinstance(pulsedmeasurementlogic.extraction_import_path, str):
             path_list.append(pulsedmeasurementlogic.extraction_import_path)
 
-        # Import extraction modules and get a list of extractor classes
-        extractor_classes = self.__import_external_extractors(paths=path_list)
-
-        # create an instance of each class and put them in a temporary list
-        extractor_instances = [cls(pulsedmeasurementlogic) for cls in extractor_classes]
+        # Index extraction modules without importing them. The extractor classes are imported and
+        # instantiated when one of their extraction methods is used for the first time.
+        self.__measurement_logic = pulsedmeasurementlogic
+        self.__extractor_instances = dict()
+        self.__registry = PluginRegistry([path for path in path_list if self.__check_path(path)])
 
-        # add references to all extraction methods in each instance to a dict
-        self.__populate_method_dicts(instance_list=extractor_instances)
+        # add lazy references to all extraction methods of the extractor classes to a dict
+        self.__populate_method_dicts()
 
         # populate "_parameters" dictionary from extraction method signatures
         self.__populate_parameter_dict()
@@ -202,14 +211,21 @@ class PulseExtractor(PulseExtractorBase):
         settings_dict['method'] = self._current_extraction_method
         return settings_dict
 
-    def extract_laser_pulses(self, count_data):
+    def extract_laser_pulses(self, count_data, delta_data=None):
         """
         Wrapper method to call the currently selected extraction method with count_data and the
         appropriate keyword arguments.
 
+        If delta_data is given and the extraction cache is locked, only the laser pulses contained
+        in delta_data are sliced out. The result dictionary then contains the additional item
+        'is_delta': True.
+
         @param numpy.ndarray count_data: 1D (ungated) or 2D (gated) numpy array (dtype='int64')
                                          containing the timetrace to extract laser pulses from.
-        @return dict: result dictionary of the extraction method
+        @param numpy.ndarray delta_data: optional, counts of count_data acquired since the last
+                                         call (same shape as count_data)
+        @return dict: result dictionary of the extraction method. If it contains the runtime of
+                      the method (key 'extraction_time', seconds), it is logged (debug level).
         """
         if count_data.ndim > 1 and not self.is_gated:
             self.log.error('"is_gated" flag is set to False but the count data to extract laser '
@@ -223,7 +239,169 @@ class PulseExtractor(PulseExtractorBase):
         else:
             extraction_method = self._ungated_extraction_methods[self._current_extraction_method]
         kwargs = self._get_extraction_method_kwargs(extraction_method)
-        return extraction_method(count_data=count_data, **kwargs)
+        if self._cache_enabled:
+            return_dict = self._cached_extraction(extraction_method, count_data, kwargs, delta_data)
+        else:
+            return_dict = extraction_method(count_data=count_data, **kwargs)
+
+        # Report the runtime if the extraction method measured it
+        if 'extraction_time' in return_dict:
+            self.log.debug('Laser pulse extraction "{0}" took {1:.3e} s.'
+                           ''.format(self._current_extraction_method,
+                                     return_dict['extraction_time']))
+        return return_dict
+
+    def clear_extraction_cache(self):
+        """
+        Discards the cached flank indices. The next call of extract_laser_pulses will run the full
+        extraction method again.
+        """
+        self._extraction_cache = dict()
+        return
+
+    def _cached_extraction(self, extraction_method, count_data, kwargs, delta_data=None):
+        """
+        Calls the extraction method and caches the returned flank indices once they are stable,
+        i.e. unchanged (within self._cache_tolerance bins) in two consecutive calls and sufficient
+        to reproduce the extracted laser pulses by slicing count_data.
+        While the cache is locked, the laser pulses are only sliced out of count_data (as a
+        read-only view if possible). Every self._cache_check_interval calls the full extraction is
+        run again as drift check. The cache is discarded if the flanks moved or if the extraction
+        settings, fast counter settings, number of lasers or the sampled sequence changed.
+
+        @param callable extraction_method: the extraction method to call
+        @param numpy.ndarray count_data: the raw data to extract laser pulses from
+        @param dict kwargs: keyword arguments for the extraction method
+        @param numpy.ndarray delta_data: optional, sliced instead of count_data if the cache is
+                                         locked
+
+        @return dict: result dictionary of the extraction method (or the cache)
+        """
+        key = self._get_extraction_cache_key(count_data, kwargs)
+        cache = self._extraction_cache
+        if cache.get('key') != key:
+            cache = {'key': key, 'indices': None, 'slicing': None, 'ticks': 0}
+            self._extraction_cache = cache
+
+        if cache['slicing'] is not None:
+            cache['ticks'] += 1
+            if cache['ticks'] >= self._cache_check_interval:
+                cache['ticks'] = 0
+                return_dict = extraction_method(count_data=count_data, **kwargs)
+                indices = (np.array(return_dict.get('laser_indices_rising')),
+                           np.array(return_dict.get('laser_indices_falling')))
+                if not self._flanks_unchanged(indices, cache['indices']):
+                    self.log.debug('Laser flanks drifted. Discarding cached flank indices.')
+                    cache['indices'] = indices
+                    cache['slicing'] = None
+                    return return_dict
+            # Keep slicing with the locked flank indices
+            rising, falling, laser_length = cache['slicing']
+            if delta_data is not None and delta_data.shape == count_data.shape:
+                return {'laser_counts_arr': self._slice_laser_pulses(delta_data, rising,
+                                                                     laser_length),
+                        'laser_indices_rising': rising,
+                        'laser_indices_falling': falling,
+                        'is_delta': True}
+            return {'laser_counts_arr': self._slice_laser_pulses(count_data, rising,
+                                                                 laser_length),
+                    'laser_indices_rising': rising,
+                    'laser_indices_falling': falling}
+
+        return_dict = extraction_method(count_data=count_data, **kwargs)
+        indices = (np.array(return_dict.get('laser_indices_rising')),
+                   np.array(return_dict.get('laser_indices_falling')))
+        unchanged = self._flanks_unchanged(indices, cache['indices'])
+        cache['indices'] = indices
+
+        if unchanged:
+            # Lock the cache if the result can be reproduced by slicing count_data
+            laser_arr = np.asarray(return_dict.get('laser_counts_arr'))
+            if laser_arr.ndim == 2:
+                rising, falling = indices
+                laser_length = laser_arr.shape[1]
+                try:
+                    sliced = self._slice_laser_pulses(count_data, rising, laser_length)
+                except (IndexError, TypeError, ValueError):
+                    sliced = None
+                if sliced is not None and np.array_equal(sliced, laser_arr):
+                    cache['slicing'] = (rising, falling, laser_length)
+                    cache['ticks'] = 0
+        return return_dict
+
+    def _flanks_unchanged(self, indices, cached_indices):
+        """
+        Checks if the flank indices did not move by more than self._cache_tolerance bins.
+
+        @param tuple indices: rising and falling flank index arrays
+        @param tuple cached_indices: previous rising and falling flank index arrays (or None)
+
+        @return bool: True if the flanks are unchanged (within tolerance), False otherwise
+        """
+        if cached_indices is None:
+            return False
+        for new, old in zip(indices, cached_indices):
+            if new.shape != old.shape:
+                return False
+            if new.size > 0 and np.max(np.abs(new.astype('int64') - old)) > self._cache_tolerance:
+                return False
+        return True
+
+    def _get_extraction_cache_key(self, count_data, kwargs):
+        """
+        Returns a hashable description of everything the flank positions depend on.
+        """
+        laser_bins = np.asarray(self.sampling_information.get('laser_rising_bins', tuple()))
+        return (self._current_extraction_method,
+                tuple(sorted(kwargs.items())),
+                count_data.shape,
+                tuple(sorted(self.fast_counter_settings.items())),
+                self.measurement_settings.get('number_of_lasers'),
+                self.sampling_information.get('name'),
+                laser_bins.tobytes())
+
+    @staticmethod
+    def _slice_laser_pulses(count_data, rising, laser_length):
+        """
+        Slices the laser pulses out of the raw data.
+
+        Ungated (1D) data: Each laser pulse starts at the corresponding entry of the rising flank
+        index array and is laser_length bins long (zero-padded at the end of count_data). For
+        equidistant laser pulses a read-only strided view into count_data is returned instead of
+        a copy.
+        Gated (2D) data: All gates are sliced from the scalar rising flank index with
+        laser_length bins.
+
+        @param numpy.ndarray count_data: the raw data
+        @param numpy.ndarray rising: rising flank indices
+        @param int laser_length: number of bins per laser pulse
+
+        @return numpy.ndarray: 2D array of laser pulses (dtype int64)
+        """
+        if count_data.ndim == 2 and rising.ndim == 0:
+            start = int(rising)
+            laser_arr = count_data[:, start:start + laser_length].astype('int64', copy=False)
+            if laser_arr.shape[1] != laser_length:
+                raise ValueError('Laser pulses exceed gated count data.')
+            laser_arr = laser_arr.view()
+            laser_arr.flags.writeable = False
+            return laser_arr
+        elif count_data.ndim == 1 and rising.ndim == 1 and rising.size > 0:
+            step = rising[1] - rising[0] if rising.size > 1 else 0
+            equidistant = rising.size == 1 or np.all(np.diff(rising) == step)
+            if (equidistant and count_data.dtype == np.int64 and rising[0] >= 0 and step >= 0
+                    and rising[-1] + laser_length <= count_data.size):
+                laser_arr = np.lib.stride_tricks.as_strided(
+                    count_data[rising[0]:],
+                    shape=(rising.size, laser_length),
+                    strides=(step * count_data.strides[0], count_data.strides[0]),
+                    writeable=False)
+            else:
+                indices = rising[:, np.newaxis] + np.arange(laser_length)
+                laser_arr = count_data[np.minimum(indices, count_data.size - 1)].astype('int64')
+                laser_arr[indices >= count_data.size] = 0
+            return laser_arr
+        raise ValueError('Unable to slice laser pulses with the given flank indices.')
 
     def _get_extraction_method_kwargs(self, method):
         """
@@ -250,59 +428,60 @@ class PulseExtractor(PulseExtractorBase):
                 kwargs_dict[name] = default
         return kwargs_dict
 
-    def __import_external_extractors(self, paths):
+    def __check_path(self, path):
         """
-        Helper method to import all modules from directories contained in paths.
-        Find all classes in those modules that inherit exclusively from PulseExtractorBase class
-        and return a list of them.
+        Helper method to check if an import path for extraction modules exists.
 
-        @param iterable paths: iterable containing paths to import modules from
-        @return list: A list of imported valid extractor classes
+        @param str path: path to check
+        @return bool: True if the path exists, False otherwise
         """
-        class_list = list()
-        for path in paths:
-            if not os.path.exists(path):
-                self.log.error('Unable to import extraction methods from "{0}".\n'
-                               'Path does not exist.'.format(path))
-                continue
-            # Get all python modules to import from.
-            # The assumption is that in the directory pulse_extraction_methods, there are
-            # *.py files, which contain only extractor classes!
-            module_list = [name[:-3] for name in os.listdir(path) if
-                           os.path.isfile(os.path.join(path, name)) and name.endswith('.py')]
-
-            # append import path to sys.path
-            if path not in sys.path:
-                sys.path.append(path)
-
-            # Go through all modules and create instances of each class found.
-            for module_name in module_list:
-                # import module
-                mod = importlib.import_module('{0}'.format(module_name))
-                importlib.reload(mod)
-                # get all extractor class references defined in the module
-                tmp_list = [m[1] for m in inspect.getmembers(mod, self.is_extractor_class)]
-                # append to class_list
-                class_list.extend(tmp_list)
-        return class_list
-
-    def __populate_method_dicts(self, instance_list):
-        """
-        Helper method to populate the dictionaries containing all references to callable extraction
-        methods contained in extractor instances passed to this method.
-
-        @param list instance_list: List containing instances of extractor classes
+        if not os.path.exists(path):
+            self.log.error('Unable to import extraction methods from "{0}".\n'
+                           'Path does not exist.'.format(path))
+            return False
+        return True
+
+    def __get_extractor_instance(self, module_name, class_name):
+        """
+        Helper method to import an extractor class and create an instance of it on first use.
+
+        @param str module_name: name of the extraction module containing the class
+        @param str class_name: name of the extractor class
+        @return object: the (single) instance of the extractor class
+        """
+        key = (module_name, class_name)
+        if key not in self.__extractor_instances:
+            cls = self.__registry.get_member(module_name, class_name)
+            self.__extractor_instances[key] = cls(self.__measurement_logic)
+        return self.__extractor_instances[key]
+
+    def __populate_method_dicts(self):
+        """
+        Helper method to populate the dictionaries containing references to all callable extraction
+        methods of the extractor classes found in the extraction modules.
+        The references resolve the bound extraction methods on the first call.
         """
         self._ungated_extraction_methods = dict()
         self._gated_extraction_methods = dict()
-        for instance in instance_list:
-            for method_name, method_ref in inspect.getmembers(instance, inspect.ismethod):
+        for class_name, (module_name, info) in self.__registry.classes(
+                self.is_extractor_class_info).items():
+            for method_name, method_info in info['methods'].items():
                 if method_name.startswith('gated_'):
-                    self._gated_extraction_methods[method_name[6:]] = method_ref
+                    method_dict, name = self._gated_extraction_methods, method_name[6:]
                 elif method_name.startswith('ungated_'):
-                    self._ungated_extraction_methods[method_name[8:]] = method_ref
+                    method_dict, name = self._ungated_extraction_methods, method_name[8:]
+                else:
+                    continue
+                resolve = functools.partial(self.__get_bound_method,
+                                            module_name, class_name, method_name)
+                method_dict[name] = LazyPluginCallable(resolve,
+                                                       method_name,
+                                                       signature_from_info(method_info))
         return
 
+    def __get_bound_method(self, module_name, class_name, method_name):
+        return getattr(self.__get_extractor_instance(module_name, class_name), method_name)
+
     def __populate_parameter_dict(self):
         """
         Helper method to populate the dictionary containing all possible keyword arguments from all
@@ -326,3 +505,16 @@ class PulseExtractor(PulseExtractorBase):
         if inspect.isclass(obj):
             return PulseExtractorBase in obj.__bases__ and len(obj.__bases__) == 1
         return False
+
+    @staticmethod
+    def is_extractor_class_info(name, info):
+        """
+        Helper method to check if a class indexed by the plugin registry (not imported yet) is a
+        valid extractor class.
+
+        @param str name: name of the class
+        @param dict info: class info from the plugin registry
+        @return bool: True if the class is a valid extractor class, False otherwise
+        """
+        return len(info['bases']) == 1 and info['bases'][0] is not None and (
+            info['bases'][0].rsplit('.', 1)[-1] == PulseExtractorBase.__name__)
@@ -25,6 +25,7 @@ import numpy as np
 import copy
 import time
 import datetime
+import functools
 import matplotlib.pyplot as plt
 
 from core.connector import Connector
@@ -57,6 +58,26 @@ class PulsedMeasurementLogic(GenericLogic):
     analysis_import_path = ConfigOption(name='additional_analysis_path', default=None)
     # Optional file type descriptor for saving raw data to file
     _raw_data_save_type = ConfigOption(name='raw_data_save_type', default='text')
+    # Flag to enable the laser pulse extraction cache. Once the laser flanks are stable, the laser
+    # pulses are only sliced out of the raw data with the cached flank indices.
+    extraction_cache = ConfigOption(name='extraction_cache', default=False, missing='nothing')
+    # Number of analysis ticks after which the cached flank indices are checked for drift by
+    # running the full extraction again.
+    extraction_cache_check_interval = ConfigOption(name='extraction_cache_check_interval',
+                                                   default=10,
+                                                   missing='nothing')
+    # Maximum number of bins the laser flanks may jitter between analysis ticks while still being
+    # considered stable by the laser pulse extraction cache.
+    extraction_cache_tolerance = ConfigOption(name='extraction_cache_tolerance',
+                                              default=0,
+                                              missing='nothing')
+    # Flag to enable the incremental analysis. Only the counts acquired since the last analysis
+    # tick are added to the raw data and (with stable laser flanks) to the running laser pulse sums
+    # instead of extracting the laser pulses from the full raw data each time.
+    # Implies the laser pulse extraction cache.
+    incremental_analysis = ConfigOption(name='incremental_analysis',
+                                        default=False,
+                                        missing='nothing')
 
     # status variables
     # ext. microwave settings
@@ -139,6 +160,7 @@ class PulsedMeasurementLogic(GenericLogic):
 
         self._saved_raw_data = OrderedDict()  # temporary saved raw data
         self._recalled_raw_data_tag = None  # the currently recalled raw data dict key
+        self._previous_fc_data = None  # last fast counter data received (incremental analysis)
 
         # Paused measurement flag
         self.__is_paused = False
@@ -777,6 +799,7 @@ class PulsedMeasurementLogic(GenericLogic):
 
                 # initialize data arrays
                 self._initialize_data_arrays()
+                self._previous_fc_data = None
 
                 # recall stashed raw data
                 if stashed_raw_data_tag in self._saved_raw_data:
@@ -1148,6 +1171,9 @@ class PulsedMeasurementLogic(GenericLogic):
             return
 
     def _extract_laser_pulses(self):
+        if self.incremental_analysis:
+            return self._extract_laser_pulses_incremental()
+
         # Get counter raw data (including recalled raw data from previous measurement)
         fc_data, info_dict = self._get_raw_data()
         self.raw_data = fc_data
@@ -1159,6 +1185,59 @@ class PulsedMeasurementLogic(GenericLogic):
         self.laser_data = return_dict['laser_counts_arr']
         return
 
+    def _extract_laser_pulses_incremental(self):
+        """
+        Incremental version of _extract_laser_pulses.
+        Only the difference between the current and the previously received fast counter data is
+        added in-place to self.raw_data (recalled raw data is only added once at the first tick).
+        As long as the PulseExtractor flank indices are cached, only the laser pulses of this
+        difference are sliced and added to the running laser pulse sums in self.laser_data.
+        Otherwise (first ticks, drift checks, settings changes) the laser pulses are extracted from
+        the full raw data.
+        """
+        fc_data, info_dict = self._get_raw_data(add_recalled_data=False)
+        self.__elapsed_sweeps = info_dict['elapsed_sweeps']
+        self.__elapsed_time = info_dict['elapsed_time']
+
+        delta_data = self._accumulate_raw_data(fc_data)
+        return_dict = self._pulseextractor.extract_laser_pulses(self.raw_data,
+                                                                delta_data=delta_data)
+        if return_dict.get('is_delta') and self.laser_data.shape == return_dict[
+                'laser_counts_arr'].shape:
+            np.add(self.laser_data, return_dict['laser_counts_arr'], out=self.laser_data)
+        else:
+            # Copy into a writeable array holding the running laser pulse sums
+            self.laser_data = np.array(return_dict['laser_counts_arr'], dtype='int64')
+        return
+
+    def _accumulate_raw_data(self, fc_data):
+        """
+        Adds the counts acquired since the last call to self.raw_data in-place.
+        If there is no previous fast counter data or it can not be continued (shape changed or
+        counts decreased, e.g. after a fast counter restart) self.raw_data is re-initialized from
+        fc_data and recalled raw data.
+
+        @param numpy.ndarray fc_data: the accumulated count data received from the fast counter
+
+        @return numpy.ndarray|None: the counts acquired since the last call or None if
+                                    self.raw_data has been re-initialized
+        """
+        fc_data = np.array(fc_data, dtype='int64')
+        previous = self._previous_fc_data
+        self._previous_fc_data = fc_data
+
+        if previous is not None and previous.shape == fc_data.shape and \
+                self.raw_data.shape == fc_data.shape:
+            delta_data = fc_data - previous
+            if delta_data.min(initial=0) >= 0:
+                np.add(self.raw_data, delta_data, out=self.raw_data)
+                return delta_data
+            self.log.warning('Fast counter data decreased since last analysis. Re-initializing '
+                             'incremental analysis.')
+
+        self.raw_data = self._add_recalled_raw_data(fc_data.copy())
+        return None
+
     def _analyze_laser_pulses(self):
         # analyze pulses and get data points for signal array. Also check if extraction
         # worked (non-zero array returned).
@@ -1170,10 +1249,14 @@ class PulsedMeasurementLogic(GenericLogic):
             tmp_error = np.zeros(self.laser_data.shape[0])
         return tmp_signal, tmp_error
 
-    def _get_raw_data(self):
+    def _get_raw_data(self, add_recalled_data=True):
         """
         Get the raw count data from the fast counting hardware and perform sanity checks.
         Also add recalled raw data to the newly received data.
+
+        @param bool add_recalled_data: Add recalled raw data to the count data (True) or only to
+                                       the elapsed sweeps and time (False)
+
         @return tuple(numpy.ndarray, info_dict): The count data (1D for ungated, 2D for gated counter) and
                                                  info_dict with keys 'elapsed_sweeps' and 'elapsed_time'
         """
@@ -1201,22 +1284,36 @@ class PulsedMeasurementLogic(GenericLogic):
             #               ''.format(self._recalled_raw_data_tag))
             elapsed_sweeps += self._saved_raw_data[self._recalled_raw_data_tag][1]['elapsed_sweeps']
             elapsed_time += self._saved_raw_data[self._recalled_raw_data_tag][1]['elapsed_time']
-            if not fc_data.any():
-                self.log.warning('Only zeros received from fast counter!\n'
-                                 'Using recalled raw data only.')
-                fc_data = self._saved_raw_data[self._recalled_raw_data_tag][0]
-            elif self._saved_raw_data[self._recalled_raw_data_tag][0].shape == fc_data.shape:
-                self.log.debug('Recalled raw data has the same shape as current data.')
-                fc_data = self._saved_raw_data[self._recalled_raw_data_tag][0] + fc_data
-            else:
-                self.log.warning('Recalled raw data has not the same shape as current data.'
-                                 '\nDid NOT add recalled raw data to current time trace.')
+            if add_recalled_data:
+                fc_data = self._add_recalled_raw_data(fc_data)
         elif not fc_data.any():
             self.log.warning('Only zeros received from fast counter!')
             fc_data = np.zeros(fc_data.shape, dtype='int64')
 
         return fc_data, {'elapsed_sweeps': elapsed_sweeps, 'elapsed_time': elapsed_time}
 
+    def _add_recalled_raw_data(self, fc_data):
+        """
+        Adds the currently recalled raw data (if any) to the count data.
+
+        @param numpy.ndarray fc_data: count data received from the fast counter
+
+        @return numpy.ndarray: count data including recalled raw data
+        """
+        if self._saved_raw_data.get(self._recalled_raw_data_tag) is None:
+            return fc_data
+        if not fc_data.any():
+            self.log.warning('Only zeros received from fast counter!\n'
+                             'Using recalled raw data only.')
+            fc_data = self._saved_raw_data[self._recalled_raw_data_tag][0].copy()
+        elif self._saved_raw_data[self._recalled_raw_data_tag][0].shape == fc_data.shape:
+            self.log.debug('Recalled raw data has the same shape as current data.')
+            fc_data = self._saved_raw_data[self._recalled_raw_data_tag][0] + fc_data
+        else:
+            self.log.warning('Recalled raw data has not the same shape as current data.'
+                             '\nDid NOT add recalled raw data to current time trace.')
+        return fc_data
+
     def _initialize_data_arrays(self):
         """
         Initializing the signal, error, laser and raw data arrays.
@@ -1286,14 +1383,14 @@ class PulsedMeasurementLogic(GenericLogic):
             parameters['gated counting'] = self.fast_counter_settings['is_gated']
             parameters['extraction parameters'] = self.extraction_settings
 
-            self.savelogic().save_data(data,
-                                       timestamp=timestamp,
-                                       parameters=parameters,
-                                       filepath=filepath,
-                                       filelabel=filelabel,
-                                       filetype='text',
-                                       fmt='%d',
-                                       delimiter='\t')
+            self.savelogic().save_data_async(data,
+                                             timestamp=timestamp,
+                                             parameters=parameters,
+                                             filepath=filepath,
+                                             filelabel=filelabel,
+                                             filetype='text',
+                                             fmt='%d',
+                                             delimiter='\t')
 
         #####################################################################
         ####                Save measurement data                        ####
@@ -1341,228 +1438,15 @@ class PulsedMeasurementLogic(GenericLogic):
             parameters['fast counter settings'] = self.fast_counter_settings
 
             if save_figure:
-                # Prepare the figure to save as a "data thumbnail"
-                plt.style.use(self.savelogic().mpl_qd_style)
-
-                # extract the possible colors from the colorscheme:
-                prop_cycle = self.savelogic().mpl_qd_style['axes.prop_cycle']
-                colors = {}
-                for i, color_setting in enumerate(prop_cycle):
-                    colors[i] = color_setting['color']
-
-                # scale the x_axis for plotting
-                max_val = np.max(self.signal_data[0])
-                scaled_float = units.ScaledFloat(max_val)
-                counts_prefix = scaled_float.scale
-                x_axis_scaled = self.signal_data[0] / scaled_float.scale_val
-
-                # Create the figure object
-                if self._alternative_data_type and self._alternative_data_type != 'None':
-                    fig, (ax1, ax2) = plt.subplots(2, 1)
-                else:
-                    fig, ax1 = plt.subplots()
-
-                if with_error:
-                    ax1.errorbar(x=x_axis_scaled, y=self.signal_data[1],
-                                 yerr=self.measurement_error[1], fmt='-o',
-                                 linestyle=':', linewidth=0.5, color=colors[0],
-                                 ecolor=colors[1], capsize=3, capthick=0.9,
-                                 elinewidth=1.2, label='data trace 1')
-
-                    if self._alternating:
-                        ax1.errorbar(x=x_axis_scaled, y=self.signal_data[2],
-                                     yerr=self.measurement_error[2], fmt='-D',
-                                     linestyle=':', linewidth=0.5, color=colors[3],
-                                     ecolor=colors[4],  capsize=3, capthick=0.7,
-                                     elinewidth=1.2, label='data trace 2')
-                else:
-                    ax1.plot(x_axis_scaled, self.signal_data[1], '-o', color=colors[0],
-                             linestyle=':', linewidth=0.5, label='data trace 1')
-
-                    if self._alternating:
-                        ax1.plot(x_axis_scaled, self.signal_data[2], '-o',
-                                 color=colors[3], linestyle=':', linewidth=0.5,
-                                 label='data trace 2')
-
-                # Do not include fit curve if there is no fit calculated.
-                if self.signal_fit_data.size != 0 and np.sum(np.abs(self.signal_fit_data[1])) > 0:
-                    x_axis_fit_scaled = self.signal_fit_data[0] / scaled_float.scale_val
-                    ax1.plot(x_axis_fit_scaled, self.signal_fit_data[1],
-                             color=colors[2], marker='None', linewidth=1.5,
-                             label='fit')
-
-                    # add then the fit result to the plot:
-
-                    # Parameters for the text plot:
-                    # The position of the text annotation is controlled with the
-                    # relative offset in x direction and the relative length factor
-                    # rel_len_fac of the longest entry in one column
-                    rel_offset = 0.02
-                    rel_len_fac = 0.011
-                    entries_per_col = 24
-
-                    # create the formatted fit text:
-                    if hasattr(self.fit_result, 'result_str_dict'):
-                        result_str = units.create_formatted_output(self.fit_result.result_str_dict)
-                    else:
-                        result_str = ''
-                    # do reverse processing to get each entry in a list
-                    entry_list = result_str.split('\n')
-                    # slice the entry_list in entries_per_col
-                    chunks = [entry_list[x:x+entries_per_col] for x in range(0, len(entry_list), entries_per_col)]
-
-                    is_first_column = True  # first entry should contain header or \n
-
-                    for column in chunks:
-
-                        max_length = max(column, key=len)   # get the longest entry
-                        column_text = ''
-
-                        for entry in column:
-                            column_text += entry + '\n'
-
-                        column_text = column_text[:-1]  # remove the last new line
-
-                        heading = ''
-                        if is_first_column:
-                            heading = 'Fit results:'
-
-                        column_text = heading + '\n' + column_text
-
-                        ax1.text(1.00 + rel_offset, 0.99, column_text,
-                                 verticalalignment='top',
-                                 horizontalalignment='left',
-                                 transform=ax1.transAxes,
-                                 fontsize=12)
-
-                        # the rel_offset in position of the text is a linear function
-                        # which depends on the longest entry in the column
-                        rel_offset += rel_len_fac * len(max_length)
-
-                        is_first_column = False
-
-                # handle the save of the alternative data plot
-                if self._alternative_data_type and self._alternative_data_type != 'None':
-
-                    # scale the x_axis for plotting
-                    max_val = np.max(self.signal_alt_data[0])
-                    scaled_float = units.ScaledFloat(max_val)
-                    x_axis_prefix = scaled_float.scale
-                    x_axis_ft_scaled = self.signal_alt_data[0] / scaled_float.scale_val
-
-                    # since no ft units are provided, make a small work around:
-                    if self._alternative_data_type == 'FFT':
-                        if self._data_units[0] == 's':
-                            inverse_cont_var = 'Hz'
-                        elif self._data_units[0] == 'Hz':
-                            inverse_cont_var = 's'
-                        else:
-                            inverse_cont_var = '(1/{0})'.format(self._data_units[0])
-                        x_axis_ft_label = 'FT {0} ({1}{2})'.format(
-                            self._data_labels[0], x_axis_prefix, inverse_cont_var)
-                        y_axis_ft_label = 'FT({0}) (arb. u.)'.format(self._data_labels[1])
-                        ft_label = 'FT of data trace 1'
-                    else:
-                        if self._data_units[0]:
-                            x_axis_ft_label = '{0} ({1}{2})'.format(self._data_labels[0], x_axis_prefix,
-                                                                    self._data_units[0])
-                        else:
-                            x_axis_ft_label = '{0}'.format(self._data_labels[0])
-                        if self._data_units[1]:
-                            y_axis_ft_label = '{0} ({1})'.format(self._data_labels[1], self._data_units[1])
-                        else:
-                            y_axis_ft_label = '{0}'.format(self._data_labels[1])
-
-                        ft_label = '{0} of data traces'.format(self._alternative_data_type)
-
-                    ax2.plot(x_axis_ft_scaled, self.signal_alt_data[1], '-o',
-                             linestyle=':', linewidth=0.5, color=colors[0],
-                             label=ft_label)
-                    if self._alternating and len(self.signal_alt_data) > 2:
-                        ax2.plot(x_axis_ft_scaled, self.signal_alt_data[2], '-D',
-                                 linestyle=':', linewidth=0.5, color=colors[3],
-                                 label=ft_label.replace('1', '2'))
-
-                    ax2.set_xlabel(x_axis_ft_label)
-                    ax2.set_ylabel(y_axis_ft_label)
-                    ax2.legend(bbox_to_anchor=(0., 1.02, 1., .102), loc=3, ncol=2,
-                               mode="expand", borderaxespad=0.)
-
-                    if (self.signal_fit_alt_data.size != 0
-                            and np.sum(np.abs(self.signal_fit_alt_data[1])) > 0):
-                        x_axis_fit_scaled = self.signal_fit_alt_data[0] / scaled_float.scale_val
-                        ax2.plot(x_axis_fit_scaled, self.signal_fit_alt_data[1],
-                                 color=colors[2], marker='None', linewidth=1.5,
-                                 label='secondary fit')
-
-                        # add then the fit result to the plot:
-
-                        # Parameters for the text plot:
-                        # The position of the text annotation is controlled with the
-                        # relative offset in x direction and the relative length factor
-                        # rel_len_fac of the longest entry in one column
-                        rel_offset = 0.02
-                        rel_len_fac = 0.011
-                        entries_per_col = 24
-
-                        # create the formatted fit text:
-                        if hasattr(self.alt_fit_result, 'result_str_dict'):
-                            result_str = units.create_formatted_output(self.alt_fit_result.result_str_dict)
-                        else:
-                            result_str = ''
-                        # do reverse processing to get each entry in a list
-                        entry_list = result_str.split('\n')
-                        # slice the entry_list in entries_per_col
-                        chunks = [entry_list[x:x+entries_per_col] for x in range(0, len(entry_list), entries_per_col)]
-
-                        is_first_column = True  # first entry should contain header or \n
-
-                        for column in chunks:
-                            max_length = max(column, key=len)   # get the longest entry
-                            column_text = ''
-
-                            for entry in column:
-                                column_text += entry + '\n'
-
-                            column_text = column_text[:-1]  # remove the last new line
-
-                            heading = ''
-                            if is_first_column:
-                                heading = 'Fit results:'
-
-                            column_text = heading + '\n' + column_text
-
-                            ax2.text(1.00 + rel_offset, 0.99, column_text,
-                                     verticalalignment='top',
-                                     horizontalalignment='left',
-                                     transform=ax2.transAxes,
-                                     fontsize=12)
-
-                            # the rel_offset in position of the text is a linear function
-                            # which depends on the longest entry in the column
-                            rel_offset += rel_len_fac * len(max_length)
-
-                            is_first_column = False
-
-                ax1.set_xlabel(
-                    '{0} ({1}{2})'.format(self._data_labels[0], counts_prefix, self._data_units[0]))
-                if self._data_units[1]:
-                    ax1.set_ylabel('{0} ({1})'.format(self._data_labels[1], self._data_units[1]))
-                else:
-                    ax1.set_ylabel('{0}'.format(self._data_labels[1]))
-
-                fig.tight_layout()
-                ax1.legend(bbox_to_anchor=(0., 1.02, 1., .102), loc=3, ncol=2,
-                           mode="expand", borderaxespad=0.)
-                # plt.legend(bbox_to_anchor=(0., 1.02, 1., .102), loc=3, ncol=2,
-                #            mode="expand", borderaxespad=0.)
+                # the figure is drawn from a copy of the data when the file is written
+                fig = functools.partial(self._plot_figure, **self._get_figure_data(with_error))
             else:
                 fig = None
 
-            self.savelogic().save_data(data, timestamp=timestamp,
-                                       parameters=parameters, fmt='%.15e',
-                                       filepath=filepath, filelabel=filelabel, filetype='text',
-                                       delimiter='\t', plotfig=fig)
+            self.savelogic().save_data_async(data, timestamp=timestamp,
+                                             parameters=parameters, fmt='%.15e',
+                                             filepath=filepath, filelabel=filelabel, filetype='text',
+                                             delimiter='\t', plotfig=fig)
 
         #####################################################################
         ####                Save raw data timetrace                      ####
@@ -1584,13 +1468,256 @@ class PulsedMeasurementLogic(GenericLogic):
         parameters['Approx. measurement time (s)'] = self.__elapsed_time
         parameters['Measurement sweeps'] = self.__elapsed_sweeps
 
-        self.savelogic().save_data(data, timestamp=timestamp,
-                                   parameters=parameters, fmt='%d',
-                                   filepath=filepath, filelabel=filelabel,
-                                   filetype=self._raw_data_save_type,
-                                   delimiter='\t')
+        self.savelogic().save_data_async(data, timestamp=timestamp,
+                                         parameters=parameters, fmt='%d',
+                                         filepath=filepath, filelabel=filelabel,
+                                         filetype=self._raw_data_save_type,
+                                         delimiter='\t')
         return filepath
 
+    def _get_figure_data(self, with_error):
+        """ Copies the data needed to draw the measurement figure (see _plot_figure).
+
+        @param bool with_error: select whether errors should be plotted
+
+        @return dict: keyword arguments of _plot_figure holding the data
+        """
+        if hasattr(self.fit_result, 'result_str_dict'):
+            fit_result_str = units.create_formatted_output(self.fit_result.result_str_dict)
+        else:
+            fit_result_str = ''
+        if hasattr(self.alt_fit_result, 'result_str_dict'):
+            alt_fit_result_str = units.create_formatted_output(self.alt_fit_result.result_str_dict)
+        else:
+            alt_fit_result_str = ''
+        return {'with_error': with_error,
+                'signal_data': np.array(self.signal_data),
+                'measurement_error': np.array(self.measurement_error),
+                'signal_fit_data': np.array(self.signal_fit_data),
+                'fit_result_str': fit_result_str,
+                'signal_alt_data': np.array(self.signal_alt_data),
+                'signal_fit_alt_data': np.array(self.signal_fit_alt_data),
+                'alt_fit_result_str': alt_fit_result_str,
+                'alternating': self._alternating,
+                'alternative_data_type': self._alternative_data_type,
+                'data_labels': tuple(self._data_labels),
+                'data_units': tuple(self._data_units)}
+
+    def _plot_figure(self, with_error, signal_data, measurement_error, signal_fit_data,
+                     fit_result_str, signal_alt_data, signal_fit_alt_data, alt_fit_result_str,
+                     alternating, alternative_data_type, data_labels, data_units):
+        """ Plots the measurement figure from data copied by _get_figure_data. Only uses the passed
+        data, so it can be called in the background while the measurement continues.
+
+        @return: fig fig: a matplotlib figure object to be saved to file.
+        """
+        # Prepare the figure to save as a "data thumbnail"
+        plt.style.use(self.savelogic().mpl_qd_style)
+
+        # extract the possible colors from the colorscheme:
+        prop_cycle = self.savelogic().mpl_qd_style['axes.prop_cycle']
+        colors = {}
+        for i, color_setting in enumerate(prop_cycle):
+            colors[i] = color_setting['color']
+
+        # scale the x_axis for plotting
+        max_val = np.max(signal_data[0])
+        scaled_float = units.ScaledFloat(max_val)
+        counts_prefix = scaled_float.scale
+        x_axis_scaled = signal_data[0] / scaled_float.scale_val
+
+        # Create the figure object
+        if alternative_data_type and alternative_data_type != 'None':
+            fig, (ax1, ax2) = plt.subplots(2, 1)
+        else:
+            fig, ax1 = plt.subplots()
+
+        if with_error:
+            ax1.errorbar(x=x_axis_scaled, y=signal_data[1],
+                         yerr=measurement_error[1], fmt='-o',
+                         linestyle=':', linewidth=0.5, color=colors[0],
+                         ecolor=colors[1], capsize=3, capthick=0.9,
+                         elinewidth=1.2, label='data trace 1')
+
+            if alternating:
+                ax1.errorbar(x=x_axis_scaled, y=signal_data[2],
+                             yerr=measurement_error[2], fmt='-D',
+                             linestyle=':', linewidth=0.5, color=colors[3],
+                             ecolor=colors[4],  capsize=3, capthick=0.7,
+                             elinewidth=1.2, label='data trace 2')
+        else:
+            ax1.plot(x_axis_scaled, signal_data[1], '-o', color=colors[0],
+                     linestyle=':', linewidth=0.5, label='data trace 1')
+
+            if alternating:
+                ax1.plot(x_axis_scaled, signal_data[2], '-o',
+                         color=colors[3], linestyle=':', linewidth=0.5,
+                         label='data trace 2')
+
+        # Do not include fit curve if there is no fit calculated.
+        if signal_fit_data.size != 0 and np.sum(np.abs(signal_fit_data[1])) > 0:
+            x_axis_fit_scaled = signal_fit_data[0] / scaled_float.scale_val
+            ax1.plot(x_axis_fit_scaled, signal_fit_data[1],
+                     color=colors[2], marker='None', linewidth=1.5,
+                     label='fit')
+
+            # add then the fit result to the plot:
+
+            # Parameters for the text plot:
+            # The position of the text annotation is controlled with the
+            # relative offset in x direction and the relative length factor
+            # rel_len_fac of the longest entry in one column
+            rel_offset = 0.02
+            rel_len_fac = 0.011
+            entries_per_col = 24
+
+            # do reverse processing to get each entry in a list
+            entry_list = fit_result_str.split('\n')
+            # slice the entry_list in entries_per_col
+            chunks = [entry_list[x:x+entries_per_col] for x in range(0, len(entry_list), entries_per_col)]
+
+            is_first_column = True  # first entry should contain header or \n
+
+            for column in chunks:
+
+                max_length = max(column, key=len)   # get the longest entry
+                column_text = ''
+
+                for entry in column:
+                    column_text += entry + '\n'
+
+                column_text = column_text[:-1]  # remove the last new line
+
+                heading = ''
+                if is_first_column:
+                    heading = 'Fit results:'
+
+                column_text = heading + '\n' + column_text
+
+                ax1.text(1.00 + rel_offset, 0.99, column_text,
+                         verticalalignment='top',
+                         horizontalalignment='left',
+                         transform=ax1.transAxes,
+                         fontsize=12)
+
+                # the rel_offset in position of the text is a linear function
+                # which depends on the longest entry in the column
+                rel_offset += rel_len_fac * len(max_length)
+
+                is_first_column = False
+
+        # handle the save of the alternative data plot
+        if alternative_data_type and alternative_data_type != 'None':
+
+            # scale the x_axis for plotting
+            max_val = np.max(signal_alt_data[0])
+            scaled_float = units.ScaledFloat(max_val)
+            x_axis_prefix = scaled_float.scale
+            x_axis_ft_scaled = signal_alt_data[0] / scaled_float.scale_val
+
+            # since no ft units are provided, make a small work around:
+            if alternative_data_type == 'FFT':
+                if data_units[0] == 's':
+                    inverse_cont_var = 'Hz'
+                elif data_units[0] == 'Hz':
+                    inverse_cont_var = 's'
+                else:
+                    inverse_cont_var = '(1/{0})'.format(data_units[0])
+                x_axis_ft_label = 'FT {0} ({1}{2})'.format(
+                    data_labels[0], x_axis_prefix, inverse_cont_var)
+                y_axis_ft_label = 'FT({0}) (arb. u.)'.format(data_labels[1])
+                ft_label = 'FT of data trace 1'
+            else:
+                if data_units[0]:
+                    x_axis_ft_label = '{0} ({1}{2})'.format(data_labels[0], x_axis_prefix,
+                                                            data_units[0])
+                else:
+                    x_axis_ft_label = '{0}'.format(data_labels[0])
+                if data_units[1]:
+                    y_axis_ft_label = '{0} ({1})'.format(data_labels[1], data_units[1])
+                else:
+                    y_axis_ft_label = '{0}'.format(data_labels[1])
+
+                ft_label = '{0} of data traces'.format(alternative_data_type)
+
+            ax2.plot(x_axis_ft_scaled, signal_alt_data[1], '-o',
+                     linestyle=':', linewidth=0.5, color=colors[0],
+                     label=ft_label)
+            if alternating and len(signal_alt_data) > 2:
+                ax2.plot(x_axis_ft_scaled, signal_alt_data[2], '-D',
+                         linestyle=':', linewidth=0.5, color=colors[3],
+                         label=ft_label.replace('1', '2'))
+
+            ax2.set_xlabel(x_axis_ft_label)
+            ax2.set_ylabel(y_axis_ft_label)
+            ax2.legend(bbox_to_anchor=(0., 1.02, 1., .102), loc=3, ncol=2,
+                       mode="expand", borderaxespad=0.)
+
+            if (signal_fit_alt_data.size != 0
+                    and np.sum(np.abs(signal_fit_alt_data[1])) > 0):
+                x_axis_fit_scaled = signal_fit_alt_data[0] / scaled_float.scale_val
+                ax2.plot(x_axis_fit_scaled, signal_fit_alt_data[1],
+                         color=colors[2], marker='None', linewidth=1.5,
+                         label='secondary fit')
+
+                # add then the fit result to the plot:
+
+                # Parameters for the text plot:
+                # The position of the text annotation is controlled with the
+                # relative offset in x direction and the relative length factor
+                # rel_len_fac of the longest entry in one column
+                rel_offset = 0.02
+                rel_len_fac = 0.011
+                entries_per_col = 24
+
+                # do reverse processing to get each entry in a list
+                entry_list = alt_fit_result_str.split('\n')
+                # slice the entry_list in entries_per_col
+                chunks = [entry_list[x:x+entries_per_col] for x in range(0, len(entry_list), entries_per_col)]
+
+                is_first_column = True  # first entry should contain header or \n
+
+                for column in chunks:
+                    max_length = max(column, key=len)   # get the longest entry
+                    column_text = ''
+
+                    for entry in column:
+                        column_text += entry + '\n'
+
+                    column_text = column_text[:-1]  # remove the last new line
+
+                    heading = ''
+                    if is_first_column:
+                        heading = 'Fit results:'
+
+                    column_text = heading + '\n' + column_text
+
+                    ax2.text(1.00 + rel_offset, 0.99, column_text,
+                             verticalalignment='top',
+                             horizontalalignment='left',
+                             transform=ax2.transAxes,
+                             fontsize=12)
+
+                    # the rel_offset in position of the text is a linear function
+                    # which depends on the longest entry in the column
+                    rel_offset += rel_len_fac * len(max_length)
+
+                    is_first_column = False
+
+        ax1.set_xlabel(
+            '{0} ({1}{2})'.format(data_labels[0], counts_prefix, data_units[0]))
+        if data_units[1]:
+            ax1.set_ylabel('{0} ({1})'.format(data_labels[1], data_units[1]))
+        else:
+            ax1.set_ylabel('{0}'.format(data_labels[1]))
+
+        fig.tight_layout()
+        ax1.legend(bbox_to_anchor=(0., 1.02, 1., .102), loc=3, ncol=2,
+                   mode="expand", borderaxespad=0.)
+        # plt.legend(bbox_to_anchor=(0., 1.02, 1., .102), loc=3, ncol=2,
+        #            mode="expand", borderaxespad=0.)
+        return fig
+
     def _compute_alt_data(self):
         """
         Performing transformations on the measurement data (e.g. fourier transform).
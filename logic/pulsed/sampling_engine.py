@@ -0,0 +1,557 @@
+# -*- coding: utf-8 -*-
+
+"""
+This file contains the Qudi sampling engine used by the SequenceGeneratorLogic to calculate the
+samples of a PulseBlockEnsemble chunk by chunk, optionally in parallel on a thread or process pool.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import math
+import multiprocessing
+import threading
+import numpy as np
+from fractions import Fraction
+from collections import deque, OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from logic.pulsed.sampling_functions import SamplingFunctions
+
+
+class ElementSampleCache:
+    """
+    Content-addressed LRU cache for the (normalized float32) samples of a single sampling function
+    instance on a single analog channel.
+
+    The cache key consists of the sampling function dict representation, the number of samples,
+    the sample rate, the channel amplitude and the phase-relevant time offset in bins:
+        - no offset for functions independent of the absolute time (e.g. Idle, DC),
+        - the offset modulo the common period (in bins) for functions periodic in the absolute time
+          (see SamplingBase.periodic_params),
+        - the full offset for everything else.
+    Without rotating frame the offset is constant during sampling of an ensemble, so all
+    repetitions of the same element hit the cache.
+
+    Cache misses are sampled exactly like the serial sampling loop. Cache hits for periodic
+    functions at different offsets can differ from a fresh calculation by floating point rounding
+    of the time array only.
+
+    The cache is thread-safe and evicts least recently used entries once max_bytes is exceeded.
+    """
+
+    # Largest common period (in bins) considered for the offset reduction
+    _max_period_denominator = 10**7
+
+    def __init__(self, max_bytes=0):
+        """
+        @param int max_bytes: memory limit of the cached samples in bytes. 0 disables the cache.
+        """
+        self._max_bytes = max(int(max_bytes), 0)
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._period_bins = dict()
+        self._current_bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @property
+    def enabled(self):
+        return self._max_bytes > 0
+
+    @property
+    def statistics(self):
+        with self._lock:
+            return {'hits': self._hits,
+                    'misses': self._misses,
+                    'evictions': self._evictions,
+                    'entries': len(self._entries),
+                    'bytes': self._current_bytes}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._period_bins.clear()
+            self._current_bytes = 0
+
+    def get_samples(self, sampling_function, length, offset_bin, sample_rate, amplitude):
+        """
+        Returns the normalized samples of a sampling function either from cache or by calculating
+        them.
+
+        @param SamplingBase sampling_function: sampling function instance to sample
+        @param int length: number of samples
+        @param int offset_bin: absolute time offset of the first sample in bins
+        @param float sample_rate: sample rate in samples/s
+        @param float amplitude: peak-to-peak amplitude of the channel used for normalization
+
+        @return numpy.ndarray: float32 samples normalized to the channel amplitude (read-only)
+        """
+        func_repr = sampling_function.get_dict_representation()
+        func_key = (func_repr['name'], tuple(sorted(func_repr['params'].items())))
+        key = (func_key,
+               length,
+               self._reduce_offset(sampling_function, func_key, offset_bin, sample_rate),
+               sample_rate,
+               amplitude)
+
+        with self._lock:
+            samples = self._entries.get(key)
+            if samples is not None:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return samples
+            self._misses += 1
+
+        time_arr = (offset_bin + np.arange(length, dtype='float64')) / sample_rate
+        samples = np.empty(length, dtype='float32')
+        samples[:] = sampling_function.get_samples(time_arr) / (amplitude / 2)
+        del time_arr
+        samples.flags.writeable = False
+
+        if samples.nbytes <= self._max_bytes:
+            with self._lock:
+                if key not in self._entries:
+                    self._entries[key] = samples
+                    self._current_bytes += samples.nbytes
+                while self._current_bytes > self._max_bytes:
+                    old_key, old_samples = self._entries.popitem(last=False)
+                    self._current_bytes -= old_samples.nbytes
+                    self._evictions += 1
+        return samples
+
+    def _reduce_offset(self, sampling_function, func_key, offset_bin, sample_rate):
+        periodic_params = getattr(sampling_function, 'periodic_params', None)
+        if periodic_params is None:
+            return offset_bin
+        if len(periodic_params) == 0:
+            return None
+
+        period_key = (func_key, sample_rate)
+        period = self._period_bins.get(period_key)
+        if period is None:
+            period = 1
+            for param in periodic_params:
+                ratio = getattr(sampling_function, param) / sample_rate
+                frac = Fraction(ratio).limit_denominator(self._max_period_denominator)
+                if float(frac) != ratio:
+                    # frequency is no rational multiple of the sample rate. Do not reduce offset.
+                    period = 0
+                    break
+                period = period * frac.denominator // math.gcd(period, frac.denominator)
+            self._period_bins[period_key] = period
+        return offset_bin % period if period > 0 else offset_bin
+
+
+def sample_element_range(pieces, length, analog_channels, digital_channels, sample_rate,
+                         analog_amplitudes, analog_out=None, digital_out=None, cache=None):
+    """
+    Calculates the samples for a contiguous range of PulseBlockElement pieces.
+
+    A piece is a tuple (element, number_of_samples, offset_bin) describing the part of a
+    PulseBlockElement that falls into the range. The time array of each piece is created exactly
+    like in the serial sampling loop so the resulting samples are bit-identical.
+    Consecutive pieces using the same sampling function class are evaluated in one vectorized call
+    (see SamplingFunctions.get_samples_batch).
+
+    @param list pieces: list of (PulseBlockElement, int, int) tuples in chronological order
+    @param int length: total number of samples in this range
+    @param iterable analog_channels: analog channel descriptors to sample
+    @param iterable digital_channels: digital channel descriptors to sample
+    @param float sample_rate: sample rate in samples/s
+    @param dict analog_amplitudes: peak-to-peak amplitudes (values) for analog channels (keys)
+    @param dict analog_out: optional, preallocated float32 arrays (or views) to write into
+    @param dict digital_out: optional, preallocated bool arrays (or views) to write into
+    @param ElementSampleCache cache: optional, cache to get repeatedly used samples from
+
+    @return (dict, dict): analog and digital sample arrays (keys are channel descriptors)
+    """
+    if analog_out is None:
+        analog_out = {chnl: np.empty(length, dtype='float32') for chnl in analog_channels}
+    if digital_out is None:
+        digital_out = {chnl: np.empty(length, dtype=bool) for chnl in digital_channels}
+
+    write_index = 0
+    for element, samples_to_add, offset_bin in pieces:
+        digital_high = element.digital_high
+        for chnl in digital_high:
+            digital_out[chnl][write_index:write_index + samples_to_add] = digital_high[chnl]
+        if cache is not None:
+            pulse_function = element.pulse_function
+            for chnl in analog_channels:
+                if chnl not in pulse_function:
+                    # channel not defined for this element, idle
+                    analog_out[chnl][write_index:write_index + samples_to_add] = 0
+                    continue
+                analog_out[chnl][write_index:write_index + samples_to_add] = cache.get_samples(
+                    pulse_function[chnl],
+                    samples_to_add,
+                    offset_bin,
+                    sample_rate,
+                    analog_amplitudes[chnl])
+        write_index += samples_to_add
+
+    if cache is not None or not analog_channels or not pieces:
+        return analog_out, digital_out
+
+    lengths = [piece[1] for piece in pieces]
+    time_arr = create_time_array(pieces, length, sample_rate)
+
+    # Evaluate all sampling functions of a channel with the (vectorized) batch API. The float64
+    # work buffer is shared by all channels.
+    buffer = np.empty((2, length), dtype='float64')
+    idle = None
+    for chnl in analog_channels:
+        functions = [piece[0].pulse_function.get(chnl) for piece in pieces]
+        if any(function is None for function in functions):
+            # channel not defined for some elements, idle
+            if idle is None:
+                idle = SamplingFunctions.Idle()
+            functions = [idle if function is None else function for function in functions]
+        SamplingFunctions.get_samples_batch(functions,
+                                            time_arr,
+                                            lengths,
+                                            analog_out[chnl],
+                                            analog_amplitudes[chnl] / 2,
+                                            buffer)
+    del time_arr, buffer
+    return analog_out, digital_out
+
+
+def create_time_array(pieces, length, sample_rate):
+    """
+    Creates the concatenated floating point time array for a contiguous range of PulseBlockElement
+    pieces (see sample_element_range). Each piece starts at its own offset_bin in the rotating
+    frame. Since all values are integers before the division, this is identical to creating the
+    time arrays piece by piece.
+
+    @param list pieces: list of (PulseBlockElement, int, int) tuples in chronological order
+    @param int length: total number of samples in this range
+    @param float sample_rate: sample rate in samples/s
+
+    @return numpy.ndarray: float64 time array with length elements
+    """
+    time_arr = np.arange(length, dtype='float64')
+    piece_start = 0
+    for element, samples_to_add, offset_bin in pieces:
+        time_arr[piece_start:piece_start + samples_to_add] += offset_bin - piece_start
+        piece_start += samples_to_add
+    time_arr /= sample_rate
+    return time_arr
+
+
+def plan_ensemble_chunks(ensemble, blocks, elements_length_bins, array_length, offset_bin=0,
+                         ranges_per_chunk=1):
+    """
+    Splits the element timeline of a PulseBlockEnsemble into write chunks of array_length samples
+    (the last chunk may be shorter). Each chunk is further split into up to ranges_per_chunk
+    independent ranges that can be sampled concurrently.
+    Ranges are only split at element piece boundaries, so every sampling function sees exactly the
+    same time arrays as in the serial sampling loop.
+
+    This is a generator in order to avoid holding the plan of very large ensembles in memory.
+
+    @param PulseBlockEnsemble ensemble: the ensemble to plan
+    @param dict blocks: PulseBlock instances (values) used in the ensemble by name (keys)
+    @param numpy.ndarray elements_length_bins: element lengths as returned by
+                                               analyze_block_ensemble
+    @param int array_length: the maximum number of samples per write chunk
+    @param int offset_bin: start bin offset for the rotating frame
+    @param int ranges_per_chunk: maximum number of ranges each chunk is split into
+
+    @return generator: yielding tuples (chunk_length, ranges, offset_bin) with ranges being a list of
+                       (range_start, range_length, pieces) and offset_bin being the bin offset
+                       after this chunk.
+    """
+    total_samples = int(np.sum(elements_length_bins))
+    processed_samples = 0
+    chunk_length = min(array_length, total_samples)
+    chunk_pieces = list()
+    chunk_fill = 0
+    element_count = 0
+
+    for block_name, reps in ensemble.block_list:
+        block = blocks[block_name]
+        for rep_no in range(reps + 1):
+            for element in block.element_list:
+                element_length_bins = int(elements_length_bins[element_count])
+                element_samples_written = 0
+                while element_samples_written != element_length_bins:
+                    samples_to_add = min(chunk_length - chunk_fill,
+                                         element_length_bins - element_samples_written)
+                    chunk_pieces.append((element, samples_to_add, offset_bin))
+                    element_samples_written += samples_to_add
+                    chunk_fill += samples_to_add
+                    processed_samples += samples_to_add
+                    # if the rotating frame should be preserved (default) increment the offset
+                    # counter for the time array.
+                    if ensemble.rotating_frame:
+                        offset_bin += samples_to_add
+
+                    if chunk_fill == chunk_length:
+                        yield (chunk_length,
+                               _split_chunk(chunk_pieces, chunk_length, ranges_per_chunk),
+                               offset_bin)
+                        chunk_pieces = list()
+                        chunk_fill = 0
+                        chunk_length = min(array_length, total_samples - processed_samples)
+                element_count += 1
+    return
+
+
+def _split_chunk(pieces, chunk_length, ranges_per_chunk):
+    """
+    Groups the pieces of a chunk into contiguous ranges of roughly equal number of samples.
+
+    @return list: list of tuples (range_start, range_length, pieces)
+    """
+    if ranges_per_chunk <= 1 or len(pieces) <= 1:
+        return [(0, chunk_length, pieces)]
+
+    target_length = chunk_length / ranges_per_chunk
+    ranges = list()
+    range_start = 0
+    range_length = 0
+    range_pieces = list()
+    for piece in pieces:
+        range_pieces.append(piece)
+        range_length += piece[1]
+        if range_start + range_length >= target_length * (len(ranges) + 1):
+            ranges.append((range_start, range_length, range_pieces))
+            range_start += range_length
+            range_length = 0
+            range_pieces = list()
+    if range_pieces:
+        ranges.append((range_start, range_length, range_pieces))
+    return ranges
+
+
+def _init_sampling_process(sampling_function_paths):
+    """
+    Initializer of the sampling worker processes. Spawned processes start with a fresh interpreter,
+    so the sampling function modules have to be imported (and their directories added to sys.path)
+    before PulseBlockElements can be unpickled.
+
+    @param list sampling_function_paths: directories to import the sampling functions from
+    """
+    SamplingFunctions.import_sampling_functions(sampling_function_paths)
+
+
+class SamplingProcessPool:
+    """
+    Pool of sampling worker processes (spawn context) with the submit/shutdown interface of the
+    concurrent.futures executors.
+
+    multiprocessing.Pool is used since ProcessPoolExecutor does not support an initializer before
+    Python 3.7. Submitted calls can not be cancelled, the results of calls no longer needed are
+    discarded.
+    """
+
+    def __init__(self, workers, sampling_function_paths):
+        """
+        @param int workers: number of worker processes
+        @param list sampling_function_paths: directories to import the sampling functions from
+        """
+        self._pool = multiprocessing.get_context('spawn').Pool(
+            processes=workers,
+            initializer=_init_sampling_process,
+            initargs=(list(sampling_function_paths), ))
+
+    def submit(self, fn, *args):
+        """
+        Calls fn(*args) in a worker process.
+
+        @return Future: future of the return value
+        """
+        future = Future()
+        future.set_running_or_notify_cancel()
+        self._pool.apply_async(fn, args, callback=future.set_result,
+                               error_callback=future.set_exception)
+        return future
+
+    def shutdown(self, wait=True):
+        self._pool.close()
+        if wait:
+            self._pool.join()
+
+
+class SamplingEngine:
+    """
+    Calculates the sample chunks of a PulseBlockEnsemble, either inline (serial) or on a pool of
+    worker threads/processes.
+
+    Chunks are yielded in chronological order. While the consumer writes chunk N to the pulse
+    generator, the following chunk is already being calculated by the pool. Since at most
+    prefetch_chunks + 1 chunks are held in memory, the memory limit set by the
+    SequenceGeneratorLogic ConfigOption "overhead_bytes" is only exceeded by this factor.
+
+    Thread pools write directly into the preallocated chunk arrays. Numpy releases the GIL for
+    most of the array arithmetic, so this usually scales well for sine-based sampling functions.
+    Process pools (spawn context) circumvent the GIL entirely but need to pickle the
+    PulseBlockElements and transfer the sample ranges back. The worker processes import the
+    sampling functions from sampling_function_paths when they start.
+
+    Optionally an ElementSampleCache is used to copy the samples of repeated elements instead of
+    recalculating them. The cache is not available for process pools.
+    """
+
+    def __init__(self, workers=0, pool_type='thread', prefetch_chunks=1, cache_bytes=0,
+                 sampling_function_paths=None):
+        """
+        @param int workers: number of workers in the pool. 0 disables the pool (serial sampling).
+        @param str pool_type: 'thread' or 'process'
+        @param int prefetch_chunks: number of chunks to calculate in advance
+        @param int cache_bytes: memory limit of the element sample cache. 0 disables the cache.
+        @param list sampling_function_paths: directories of the sampling function modules, needed
+                                             by the worker processes of a process pool
+        """
+        self._workers = max(int(workers), 0)
+        self._pool_type = pool_type
+        self._sampling_function_paths = list(sampling_function_paths or ())
+        self._prefetch_chunks = max(int(prefetch_chunks), 1)
+        self._executor = None
+        self._cache = ElementSampleCache(max_bytes=cache_bytes)
+
+    @property
+    def workers(self):
+        return self._workers
+
+    @property
+    def is_parallel(self):
+        return self._executor is not None
+
+    @property
+    def cache(self):
+        """ The ElementSampleCache in use or None if caching is disabled. """
+        if self._cache.enabled and (self._executor is None or self._pool_type != 'process'):
+            return self._cache
+        return None
+
+    def start(self):
+        """ Creates the worker pool (if workers > 0). """
+        if self._executor is not None or self._workers < 1:
+            return
+        if self._pool_type == 'process':
+            self._executor = SamplingProcessPool(self._workers, self._sampling_function_paths)
+        elif self._pool_type == 'thread':
+            self._executor = ThreadPoolExecutor(max_workers=self._workers,
+                                                thread_name_prefix='sampling_engine')
+        else:
+            raise ValueError('Unknown sampling pool type "{0}". Valid types are "thread" and '
+                             '"process".'.format(self._pool_type))
+
+    def shutdown(self):
+        """ Shuts the worker pool down (if present). """
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def sample_chunks(self, chunk_plan, analog_channels, digital_channels, sample_rate,
+                      analog_amplitudes):
+        """
+        Generator yielding the sampled chunks of a chunk plan (see plan_ensemble_chunks).
+
+        @param iterable chunk_plan: chunk plan as yielded by plan_ensemble_chunks
+        @param iterable analog_channels: analog channel descriptors to sample
+        @param iterable digital_channels: digital channel descriptors to sample
+        @param float sample_rate: sample rate in samples/s
+        @param dict analog_amplitudes: peak-to-peak amplitudes for analog channels
+
+        @return generator: yielding (chunk_length, analog_samples, digital_samples, offset_bin)
+        """
+        analog_channels = tuple(analog_channels)
+        digital_channels = tuple(digital_channels)
+        cache = self.cache
+        if self._executor is None:
+            for chunk_length, ranges, offset_bin in chunk_plan:
+                analog_samples, digital_samples = self._allocate(chunk_length,
+                                                                 analog_channels,
+                                                                 digital_channels)
+                for range_start, range_length, pieces in ranges:
+                    analog_out, digital_out = self._get_views(
+                        analog_samples, digital_samples, range_start, range_length)
+                    sample_element_range(pieces, range_length, analog_channels,
+                                         digital_channels, sample_rate, analog_amplitudes,
+                                         analog_out, digital_out, cache)
+                yield chunk_length, analog_samples, digital_samples, offset_bin
+            return
+
+        chunk_plan = iter(chunk_plan)
+        pending = deque()
+        try:
+            while True:
+                # Keep the pool busy with the next chunks while the current one is consumed
+                while len(pending) <= self._prefetch_chunks:
+                    chunk = next(chunk_plan, None)
+                    if chunk is None:
+                        break
+                    pending.append(self._submit_chunk(chunk, analog_channels, digital_channels,
+                                                      sample_rate, analog_amplitudes, cache))
+                if not pending:
+                    break
+                chunk_length, analog_samples, digital_samples, offset_bin, futures = pending.popleft()
+                for range_start, future in futures:
+                    analog_range, digital_range = future.result()
+                    if self._pool_type == 'process':
+                        for chnl, samples in analog_range.items():
+                            analog_samples[chnl][range_start:range_start + len(samples)] = samples
+                        for chnl, samples in digital_range.items():
+                            digital_samples[chnl][range_start:range_start + len(samples)] = samples
+                yield chunk_length, analog_samples, digital_samples, offset_bin
+        finally:
+            # Cancel all calculations not needed anymore (e.g. upload failed)
+            for chunk in pending:
+                for range_start, future in chunk[-1]:
+                    future.cancel()
+
+    def _submit_chunk(self, chunk, analog_channels, digital_channels, sample_rate,
+                      analog_amplitudes, cache):
+        chunk_length, ranges, offset_bin = chunk
+        analog_samples, digital_samples = self._allocate(chunk_length,
+                                                         analog_channels,
+                                                         digital_channels)
+        futures = list()
+        for range_start, range_length, pieces in ranges:
+            if self._pool_type == 'process':
+                analog_out, digital_out = None, None
+            else:
+                analog_out, digital_out = self._get_views(
+                    analog_samples, digital_samples, range_start, range_length)
+            future = self._executor.submit(sample_element_range,
+                                           pieces,
+                                           range_length,
+                                           analog_channels,
+                                           digital_channels,
+                                           sample_rate,
+                                           analog_amplitudes,
+                                           analog_out,
+                                           digital_out,
+                                           cache)
+            futures.append((range_start, future))
+        return chunk_length, analog_samples, digital_samples, offset_bin, futures
+
+    @staticmethod
+    def _allocate(length, analog_channels, digital_channels):
+        analog_samples = {chnl: np.empty(length, dtype='float32') for chnl in analog_channels}
+        digital_samples = {chnl: np.empty(length, dtype=bool) for chnl in digital_channels}
+        return analog_samples, digital_samples
+
+    @staticmethod
+    def _get_views(analog_samples, digital_samples, start, length):
+        analog_out = {chnl: arr[start:start + length] for chnl, arr in analog_samples.items()}
+        digital_out = {chnl: arr[start:start + length] for chnl, arr in digital_samples.items()}
+        return analog_out, digital_out
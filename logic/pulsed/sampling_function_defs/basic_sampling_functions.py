@@ -29,6 +29,8 @@ class Idle(SamplingBase):
     """
     Object representing an idle element (zero voltage)
     """
+    periodic_params = ()
+
     def __init__(self):
         pass
 
@@ -37,11 +39,17 @@ class Idle(SamplingBase):
         samples_arr = np.zeros(len(time_array))
         return samples_arr
 
+    @classmethod
+    def get_samples_batch(cls, functions, time_array, lengths, out, norm=1.0, buffer=None):
+        out[:] = 0
+        return out
+
 
 class DC(SamplingBase):
     """
     Object representing an DC element (constant voltage)
     """
+    periodic_params = ()
     params = OrderedDict()
     params['voltage'] = {'unit': 'V', 'init': 0.0, 'min': -np.inf, 'max': +np.inf, 'type': float}
 
@@ -54,18 +62,27 @@ class DC(SamplingBase):
 
     @staticmethod
     def _get_dc(time_array, voltage):
-        samples_arr = np.zeros(len(time_array)) + voltage
+        samples_arr = np.full(len(time_array), voltage, dtype='float64')
         return samples_arr
 
     def get_samples(self, time_array):
         samples_arr = self._get_dc(time_array, self.voltage)
         return samples_arr
 
+    @classmethod
+    def get_samples_batch(cls, functions, time_array, lengths, out, norm=1.0, buffer=None):
+        start = 0
+        for function, length in zip(functions, lengths):
+            out[start:start + length] = function.voltage / norm
+            start += length
+        return out
+
 
 class Sin(SamplingBase):
     """
     Object representing a sine wave element
     """
+    periodic_params = ('frequency',)
     params = OrderedDict()
     params['amplitude'] = {'unit': 'V', 'init': 0.0, 'min': 0.0, 'max': np.inf, 'type': float}
     params['frequency'] = {'unit': 'Hz', 'init': 2.87e9, 'min': 0.0, 'max': np.inf, 'type': float}
@@ -96,11 +113,23 @@ class Sin(SamplingBase):
         samples_arr = self._get_sine(time_array, self.amplitude, self.frequency, phase_rad)
         return samples_arr
 
+    @classmethod
+    def get_samples_batch(cls, functions, time_array, lengths, out, norm=1.0, buffer=None):
+        samples_arr = cls._get_sine_batch(time_array,
+                                          lengths,
+                                          [func.amplitude for func in functions],
+                                          [func.frequency for func in functions],
+                                          [np.pi * func.phase / 180 for func in functions],
+                                          buffer[0])
+        np.divide(samples_arr, norm, out=out, casting='same_kind')
+        return out
+
 
 class DoubleSinSum(SamplingBase):
     """
     Object representing a double sine wave element (Superposition of two sine waves; NOT normalized)
     """
+    periodic_params = ('frequency_1', 'frequency_2')
     params = OrderedDict()
     params['amplitude_1'] = {'unit': 'V', 'init': 0.0, 'min': 0.0, 'max': np.inf, 'type': float}
     params['frequency_1'] = {'unit': 'Hz', 'init': 2.87e9, 'min': 0.0, 'max': np.inf, 'type': float}
@@ -154,11 +183,30 @@ class DoubleSinSum(SamplingBase):
         samples_arr += self._get_sine(time_array, self.amplitude_2, self.frequency_2, phase_rad)
         return samples_arr
 
+    @classmethod
+    def get_samples_batch(cls, functions, time_array, lengths, out, norm=1.0, buffer=None):
+        samples_arr = cls._get_sine_batch(time_array,
+                                          lengths,
+                                          [func.amplitude_1 for func in functions],
+                                          [func.frequency_1 for func in functions],
+                                          [np.pi * func.phase_1 / 180 for func in functions],
+                                          buffer[0])
+        tmp_arr = cls._get_sine_batch(time_array,
+                                      lengths,
+                                      [func.amplitude_2 for func in functions],
+                                      [func.frequency_2 for func in functions],
+                                      [np.pi * func.phase_2 / 180 for func in functions],
+                                      buffer[1])
+        np.add(samples_arr, tmp_arr, out=samples_arr)
+        np.divide(samples_arr, norm, out=out, casting='same_kind')
+        return out
+
 
 class DoubleSinProduct(SamplingBase):
     """
     Object representing a double sine wave element (Product of two sine waves; NOT normalized)
     """
+    periodic_params = ('frequency_1', 'frequency_2')
     params = OrderedDict()
     params['amplitude_1'] = {'unit': 'V', 'init': 0.0, 'min': 0.0, 'max': np.inf, 'type': float}
     params['frequency_1'] = {'unit': 'Hz', 'init': 2.87e9, 'min': 0.0, 'max': np.inf, 'type': float}
@@ -212,12 +260,31 @@ class DoubleSinProduct(SamplingBase):
         samples_arr *= self._get_sine(time_array, self.amplitude_2, self.frequency_2, phase_rad)
         return samples_arr
 
+    @classmethod
+    def get_samples_batch(cls, functions, time_array, lengths, out, norm=1.0, buffer=None):
+        samples_arr = cls._get_sine_batch(time_array,
+                                          lengths,
+                                          [func.amplitude_1 for func in functions],
+                                          [func.frequency_1 for func in functions],
+                                          [np.pi * func.phase_1 / 180 for func in functions],
+                                          buffer[0])
+        tmp_arr = cls._get_sine_batch(time_array,
+                                      lengths,
+                                      [func.amplitude_2 for func in functions],
+                                      [func.frequency_2 for func in functions],
+                                      [np.pi * func.phase_2 / 180 for func in functions],
+                                      buffer[1])
+        np.multiply(samples_arr, tmp_arr, out=samples_arr)
+        np.divide(samples_arr, norm, out=out, casting='same_kind')
+        return out
+
 
 class TripleSinSum(SamplingBase):
     """
     Object representing a linear combination of three sines
     (Superposition of three sine waves; NOT normalized)
     """
+    periodic_params = ('frequency_1', 'frequency_2', 'frequency_3')
     params = OrderedDict()
     params['amplitude_1'] = {'unit': 'V', 'init': 0.0, 'min': 0.0, 'max': np.inf, 'type': float}
     params['frequency_1'] = {'unit': 'Hz', 'init': 2.87e9, 'min': 0.0, 'max': np.inf, 'type': float}
@@ -292,12 +359,38 @@ class TripleSinSum(SamplingBase):
         samples_arr += self._get_sine(time_array, self.amplitude_3, self.frequency_3, phase_rad)
         return samples_arr
 
+    @classmethod
+    def get_samples_batch(cls, functions, time_array, lengths, out, norm=1.0, buffer=None):
+        samples_arr = cls._get_sine_batch(time_array,
+                                          lengths,
+                                          [func.amplitude_1 for func in functions],
+                                          [func.frequency_1 for func in functions],
+                                          [np.pi * func.phase_1 / 180 for func in functions],
+                                          buffer[0])
+        tmp_arr = cls._get_sine_batch(time_array,
+                                      lengths,
+                                      [func.amplitude_2 for func in functions],
+                                      [func.frequency_2 for func in functions],
+                                      [np.pi * func.phase_2 / 180 for func in functions],
+                                      buffer[1])
+        np.add(samples_arr, tmp_arr, out=samples_arr)
+        tmp_arr = cls._get_sine_batch(time_array,
+                                      lengths,
+                                      [func.amplitude_3 for func in functions],
+                                      [func.frequency_3 for func in functions],
+                                      [np.pi * func.phase_3 / 180 for func in functions],
+                                      buffer[1])
+        np.add(samples_arr, tmp_arr, out=samples_arr)
+        np.divide(samples_arr, norm, out=out, casting='same_kind')
+        return out
+
 
 class TripleSinProduct(SamplingBase):
     """
     Object representing a wave element composed of the product of three sines
     (Product of three sine waves; NOT normalized)
     """
+    periodic_params = ('frequency_1', 'frequency_2', 'frequency_3')
     params = OrderedDict()
     params['amplitude_1'] = {'unit': 'V', 'init': 0.0, 'min': 0.0, 'max': np.inf, 'type': float}
     params['frequency_1'] = {'unit': 'Hz', 'init': 2.87e9, 'min': 0.0, 'max': np.inf, 'type': float}
@@ -372,6 +465,31 @@ class TripleSinProduct(SamplingBase):
         samples_arr *= self._get_sine(time_array, self.amplitude_3, self.frequency_3, phase_rad)
         return samples_arr
 
+    @classmethod
+    def get_samples_batch(cls, functions, time_array, lengths, out, norm=1.0, buffer=None):
+        samples_arr = cls._get_sine_batch(time_array,
+                                          lengths,
+                                          [func.amplitude_1 for func in functions],
+                                          [func.frequency_1 for func in functions],
+                                          [np.pi * func.phase_1 / 180 for func in functions],
+                                          buffer[0])
+        tmp_arr = cls._get_sine_batch(time_array,
+                                      lengths,
+                                      [func.amplitude_2 for func in functions],
+                                      [func.frequency_2 for func in functions],
+                                      [np.pi * func.phase_2 / 180 for func in functions],
+                                      buffer[1])
+        np.multiply(samples_arr, tmp_arr, out=samples_arr)
+        tmp_arr = cls._get_sine_batch(time_array,
+                                      lengths,
+                                      [func.amplitude_3 for func in functions],
+                                      [func.frequency_3 for func in functions],
+                                      [np.pi * func.phase_3 / 180 for func in functions],
+                                      buffer[1])
+        np.multiply(samples_arr, tmp_arr, out=samples_arr)
+        np.divide(samples_arr, norm, out=out, casting='same_kind')
+        return out
+
 
 class Chirp(SamplingBase):
     """
@@ -424,6 +542,7 @@ class AllenEberlyChirp(SamplingBase):
     L. Allen and J. H. Eberly, Optical Resonance and Two-Level Atoms Dover, New York, 1987,
     Analytical solution is given in: F. T. Hioe, Phys. Rev. A 30, 2100 (1984).
     """
+    periodic_params = ()
     params = OrderedDict()
     params['amplitude'] = {'unit': 'V', 'init': 0.0, 'min': 0.0, 'max': np.inf, 'type': float}
     params['phase'] = {'unit': '°', 'init': 0.0, 'min': -360, 'max': 360, 'type': float}
@@ -25,6 +25,7 @@ import importlib
 import sys
 import inspect
 import copy
+import itertools
 import logging
 import numpy as np
 from collections import OrderedDict
@@ -104,6 +105,12 @@ class SamplingBase:
     """
     params = OrderedDict()
     log = logging.getLogger(__name__)
+    # Names of the frequency parameters (in Hz) the samples are periodic in with respect to the
+    # absolute time. This allows the sample cache of the SequenceGeneratorLogic to reuse samples
+    # for time offsets differing by a multiple of the common period.
+    # An empty tuple denotes samples that do not depend on the absolute time at all.
+    # None (default) denotes an unknown or non-periodic dependence on the absolute time.
+    periodic_params = None
 
     def __repr__(self):
         kwargs = []
@@ -144,6 +151,75 @@ class SamplingBase:
             dict_repr['params'][param] = getattr(self, param)
         return dict_repr
 
+    @classmethod
+    def get_samples_batch(cls, functions, time_array, lengths, out, norm=1.0, buffer=None):
+        """
+        Evaluates many instances of this sampling function class in a single call.
+
+        The time arrays of all instances are concatenated in time_array. The samples of each
+        instance are divided by norm and written into the respective slice of the preallocated
+        output array out (usually a float32 view into the waveform chunk).
+
+        This default implementation simply calls get_samples for each instance. Sampling function
+        classes can override this method with a vectorized implementation that must yield the same
+        samples as get_samples. Intermediate float64 results should be calculated in place in
+        buffer instead of allocating new arrays.
+
+        @param list functions: instances of this sampling function class
+        @param numpy.ndarray time_array: concatenated float64 time arrays of all instances
+        @param list lengths: number of samples (int) for each instance
+        @param numpy.ndarray out: output array with len(time_array) elements to write into
+        @param float norm: divisor applied to the samples before writing them to out
+        @param numpy.ndarray buffer: float64 work array of shape (2, len(time_array))
+
+        @return numpy.ndarray: out
+        """
+        start = 0
+        for function, length in zip(functions, lengths):
+            stop = start + length
+            out[start:stop] = function.get_samples(time_array[start:stop]) / norm
+            start = stop
+        return out
+
+    @staticmethod
+    def _get_sine_batch(time_array, lengths, amplitudes, frequencies, phases, out):
+        """
+        Helper method to calculate amplitude * sin(2*pi*frequency*time + phase) for many segments
+        of the concatenated time_array at once. The parameters (phases in rad) are given per
+        segment and are evaluated in the same order as in the single element implementation.
+
+        The samples are calculated in place in out, so no temporary arrays are created.
+        Consecutive segments of equal length are evaluated together as rows of a 2D view.
+
+        @return numpy.ndarray: out (float64 array with len(time_array) elements)
+        """
+        start = 0
+        segment = 0
+        for length, group in itertools.groupby(lengths):
+            count = len(list(group))
+            stop = start + count * length
+            if count == 1:
+                samples = out[start:stop]
+                times = time_array[start:stop]
+                amplitude = amplitudes[segment]
+                angular_frequency = 2 * np.pi * frequencies[segment]
+                phase = phases[segment]
+            else:
+                samples = out[start:stop].reshape(count, length)
+                times = time_array[start:stop].reshape(count, length)
+                params = slice(segment, segment + count)
+                amplitude = np.array(amplitudes[params], dtype='float64')[:, np.newaxis]
+                angular_frequency = 2 * np.pi * np.array(frequencies[params],
+                                                         dtype='float64')[:, np.newaxis]
+                phase = np.array(phases[params], dtype='float64')[:, np.newaxis]
+            np.multiply(times, angular_frequency, out=samples)
+            np.add(samples, phase, out=samples)
+            np.sin(samples, out=samples)
+            np.multiply(samples, amplitude, out=samples)
+            start = stop
+            segment += count
+        return out
+
 
 class SamplingFunctions:
     """
@@ -188,6 +264,44 @@ class SamplingFunctions:
         cls.parameters = param_dict
         return
 
+    @staticmethod
+    def get_samples_batch(functions, time_array, lengths, out, norm=1.0, buffer=None):
+        """
+        Evaluates a chronological list of sampling function instances (e.g. of all elements in a
+        waveform chunk on one channel) into the preallocated output array out.
+
+        Consecutive instances of the same sampling function class are evaluated in a single
+        vectorized call of the class method get_samples_batch (see SamplingBase).
+
+        @param list functions: sampling function instances
+        @param numpy.ndarray time_array: concatenated float64 time arrays of all instances
+        @param list lengths: number of samples (int) for each instance
+        @param numpy.ndarray out: output array with len(time_array) elements to write into
+        @param float norm: divisor applied to the samples before writing them to out
+        @param numpy.ndarray buffer: optional, float64 work array of shape (2, len(time_array)).
+                                     Pass it in to reuse it for several calls.
+
+        @return numpy.ndarray: out
+        """
+        if buffer is None:
+            buffer = np.empty((2, len(time_array)), dtype='float64')
+        run_start = 0
+        sample_start = 0
+        for index in range(1, len(functions) + 1):
+            if index < len(functions) and type(functions[index]) is type(functions[run_start]):
+                continue
+            run_length = sum(lengths[run_start:index])
+            type(functions[run_start]).get_samples_batch(
+                functions[run_start:index],
+                time_array[sample_start:sample_start + run_length],
+                lengths[run_start:index],
+                out[sample_start:sample_start + run_length],
+                norm,
+                buffer[:, sample_start:sample_start + run_length])
+            sample_start += run_length
+            run_start = index
+        return out
+
     @staticmethod
     def __get_sf_method(sf_ref):
         return lambda *args, **kwargs: sf_ref(*args, **kwargs)
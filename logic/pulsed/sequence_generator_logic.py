@@ -23,10 +23,12 @@ top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi
 import numpy as np
 import os
 import pickle
+import hashlib
 import time
 import copy
 import traceback
 import datetime
+import functools
 
 from qtpy import QtCore
 from collections import OrderedDict
@@ -41,6 +43,8 @@ from logic.generic_logic import GenericLogic
 from logic.pulsed.pulse_objects import PulseBlock, PulseBlockEnsemble, PulseSequence
 from logic.pulsed.pulse_objects import PulseObjectGenerator, PulseBlockElement
 from logic.pulsed.sampling_functions import SamplingFunctions
+from logic.pulsed.sampling_engine import SamplingEngine, plan_ensemble_chunks
+from logic.pulsed.pulse_asset_store import PulseAssetStore, LazyAssetDict
 from interface.pulser_interface import SequenceOption
 
 
@@ -76,6 +80,20 @@ class SequenceGeneratorLogic(GenericLogic):
                                                    missing='nothing')
     _info_on_estimated_upload_time = ConfigOption(name='info_on_estimated_upload_time', default=60, missing='nothing')
     _disable_bench_prompt = ConfigOption(name='disable_benchmark_prompt', default=False, missing='nothing')
+    # Number of worker threads/processes used to calculate the waveform samples.
+    # 0 means sampling is done serially in the logic thread.
+    _sampling_workers = ConfigOption(name='sampling_workers', default=0, missing='nothing')
+    # Type of the sampling worker pool. Can be 'thread' or 'process'.
+    _sampling_pool_type = ConfigOption(name='sampling_pool_type', default='thread', missing='nothing')
+    # Memory limit in bytes of the LRU cache for samples of repeatedly occurring elements.
+    # 0 disables the cache.
+    _sampling_cache_bytes = ConfigOption(name='sampling_cache_bytes', default=0, missing='nothing')
+    # Flag to enable change tracking. Waveforms whose PulseBlockEnsemble (incl. PulseBlocks) and
+    # pulse generator settings did not change since the last upload are not sampled again.
+    _incremental_sampling = ConfigOption(name='incremental_sampling', default=False, missing='nothing')
+
+    # File name of the pulse object store inside the assets storage directory
+    _asset_store_filename = 'pulsed_assets.db'
 
     # status vars
     # Global parameters describing the channel usage and common parameters used during pulsed object
@@ -142,9 +160,19 @@ class SequenceGeneratorLogic(GenericLogic):
         # A flag indicating if sampling of a sequence is in progress
         self.__sequence_generation_in_progress = False
 
+        # Sampling information (incl. fingerprint) of waveforms sampled with a name tag, i.e. not
+        # named after the PulseBlockEnsemble (rotating frame sequences). Keys are the name tags.
+        self._tagged_sampling_information = dict()
+
         # Get instance of PulseObjectGenerator which takes care of collecting all predefined methods
         self._pog = None
 
+        # Engine calculating the sample chunks of PulseBlockEnsembles (optionally in parallel)
+        self._sampling_engine = None
+
+        # Single-file store for the serialized pulse objects
+        self._asset_store = None
+
         # The created pulse objects (PulseBlock, PulseBlockEnsemble, PulseSequence) are saved in
         # these dictionaries. The keys are the names.
         self._saved_pulse_blocks = OrderedDict()
@@ -195,14 +223,23 @@ class SequenceGeneratorLogic(GenericLogic):
                 self.log.error('ConfigOption additional_sampling_functions_path needs to either be a string or '
                                'a list of strings.')
         SamplingFunctions.import_sampling_functions(sf_path_list)
+        self._sampling_function_paths = sf_path_list
 
         # Read back settings from device and update instance variables accordingly
         self._read_settings_from_device()
 
-        # Update saved blocks/ensembles/sequences from serialized files
-        self._saved_pulse_blocks = OrderedDict()
-        self._saved_pulse_block_ensembles = OrderedDict()
-        self._saved_pulse_sequences = OrderedDict()
+        # Open the asset store and import pulse objects from old-style pickle files (if present)
+        self._asset_store = PulseAssetStore(
+            os.path.join(self._assets_storage_dir, self._asset_store_filename))
+        self._asset_store.open()
+        migrated = self._asset_store.migrate_directory(self._assets_storage_dir)
+        if migrated > 0:
+            self.log.info('Migrated {0:d} pulse object files from "{1}" into asset store "{2}".'
+                          ''.format(migrated, self._assets_storage_dir,
+                                    self._asset_store.filepath))
+
+        # Update saved blocks/ensembles/sequences from the asset store. The objects are loaded
+        # lazily on first access.
         self._update_blocks_from_file()
         self._update_ensembles_from_file()
         self._update_sequences_from_file()
@@ -210,6 +247,23 @@ class SequenceGeneratorLogic(GenericLogic):
         # Get instance of PulseObjectGenerator which takes care of collecting all predefined methods
         self._pog = PulseObjectGenerator(sequencegeneratorlogic=self)
 
+        # Start the sampling engine worker pool (if configured)
+        self._sampling_engine = SamplingEngine(
+            workers=self._sampling_workers,
+            pool_type=self._sampling_pool_type,
+            cache_bytes=self._sampling_cache_bytes,
+            sampling_function_paths=self._sampling_function_paths)
+        try:
+            self._sampling_engine.start()
+        except ValueError:
+            self.log.exception('Unable to start sampling worker pool. Falling back to serial '
+                               'sampling.')
+            self._sampling_engine = SamplingEngine(workers=0,
+                                                   cache_bytes=self._sampling_cache_bytes)
+        if self._sampling_cache_bytes > 0 and self._sampling_engine.cache is None:
+            self.log.warning('Element sample cache is not available for sampling process pools. '
+                             'Sampling without cache.')
+
         self.__sequence_generation_in_progress = False
 
         return
@@ -217,6 +271,12 @@ class SequenceGeneratorLogic(GenericLogic):
     def on_deactivate(self):
         """ Deinitialisation performed during deactivation of the module.
         """
+        if self._sampling_engine is not None:
+            self._sampling_engine.shutdown()
+            self._sampling_engine = None
+        if self._asset_store is not None:
+            self._asset_store.close()
+            self._asset_store = None
         return
 
     # @_saved_pulse_blocks.constructor
@@ -463,14 +523,18 @@ class SequenceGeneratorLogic(GenericLogic):
             return -1
         self.pulsegenerator().clear_all()
         # Delete all sampling information from all PulseBlockEnsembles and PulseSequences
-        for seq_name in self.saved_pulse_sequences:
-            seq = self.saved_pulse_sequences[seq_name]
-            seq.sampling_information = dict()
-            self.save_sequence(seq)
-        for ens_name in self.saved_pulse_block_ensembles:
-            ens = self.saved_pulse_block_ensembles[ens_name]
-            ens.sampling_information = dict()
-            self.save_ensemble(ens)
+        self._tagged_sampling_information = dict()
+        with self._asset_store.batch():
+            for seq_name in tuple(self.saved_pulse_sequences):
+                seq = self.saved_pulse_sequences.get(seq_name)
+                if seq is not None:
+                    seq.sampling_information = dict()
+                    self.save_sequence(seq)
+            for ens_name in tuple(self.saved_pulse_block_ensembles):
+                ens = self.saved_pulse_block_ensembles.get(ens_name)
+                if ens is not None:
+                    ens.sampling_information = dict()
+                    self.save_ensemble(ens)
         self.sigAvailableWaveformsUpdated.emit(self.sampled_waveforms)
         self.sigAvailableSequencesUpdated.emit(self.sampled_sequences)
         self.sigLoadedAssetUpdated.emit('', '')
@@ -759,74 +823,61 @@ class SequenceGeneratorLogic(GenericLogic):
             del (self._saved_pulse_blocks[name])
 
         # Delete from disk
-        filepath = os.path.join(self._assets_storage_dir, '{0}.block'.format(name))
-        if os.path.exists(filepath):
-            os.remove(filepath)
+        self._asset_store.delete('block', name)
 
         self.sigBlockDictUpdated.emit(self.saved_pulse_blocks)
         return
 
     def _load_block_from_file(self, block_name):
         """
-        De-serializes a PulseBlock instance from file.
+        De-serializes a PulseBlock instance from the asset store.
 
         @param str block_name: The name of the PulseBlock instance to de-serialize
         @return PulseBlock: The de-serialized PulseBlock instance
         """
         block = None
-        filepath = os.path.join(self._assets_storage_dir, '{0}.block'.format(block_name))
-        if os.path.exists(filepath):
-            try:
-                with open(filepath, 'rb') as file:
-                    block = pickle.load(file)
-            except pickle.UnpicklingError:
-                self.log.error('Failed to de-serialize PulseBlock "{0}" from file.'
-                               ''.format(block_name))
-                os.remove(filepath)
-            except ModuleNotFoundError:
-                self.log.error('Failed to de-serialize PulseBlock "{0}" from file because of missing dependencies.\n'
-                               'For better debugging I dumped the traceback to debug.'.format(block_name))
-                self.log.debug('{0!s}'.format(traceback.format_exc()))
+        try:
+            block = self._asset_store.load('block', block_name)
+        except pickle.UnpicklingError:
+            self.log.error('Failed to de-serialize PulseBlock "{0}" from file.'
+                           ''.format(block_name))
+            self._asset_store.delete('block', block_name)
+        except ModuleNotFoundError:
+            self.log.error('Failed to de-serialize PulseBlock "{0}" from file because of missing dependencies.\n'
+                           'For better debugging I dumped the traceback to debug.'.format(block_name))
+            self.log.debug('{0!s}'.format(traceback.format_exc()))
         return block
 
     def _update_blocks_from_file(self):
         """
-        Update the saved_pulse_blocks dict by de-serializing stored file.
+        Update the saved_pulse_blocks dict from the asset store index. The PulseBlock instances
+        are de-serialized on first access.
         """
-        # Get all files in asset directory ending on ".block" and extract a sorted list of
-        # PulseBlock names
-        with os.scandir(self._assets_storage_dir) as scan:
-            names = natural_sort(f.name[:-6] for f in scan if f.is_file and f.name.endswith('.block'))
-
-        # Load all blocks from file
-        for block_name in names:
-            block = self._load_block_from_file(block_name)
-            if block is not None:
-                self._saved_pulse_blocks[block_name] = block
+        names = natural_sort(self._asset_store.names('block'))
+        self._saved_pulse_blocks = LazyAssetDict(self._load_block_from_file, names)
 
         self.sigBlockDictUpdated.emit(self._saved_pulse_blocks)
         return
 
     def _save_block_to_file(self, block):
         """
-        Saves a single PulseBlock instance to file by serialization using pickle.
+        Saves a single PulseBlock instance to the asset store by serialization using pickle.
 
         @param PulseBlock block: The PulseBlock instance to be saved
         """
-        filename = '{0}.block'.format(block.name)
         try:
-            with open(os.path.join(self._assets_storage_dir, filename), 'wb') as file:
-                pickle.dump(block, file)
+            self._asset_store.save('block', block.name, block)
         except:
             self.log.error('Failed to serialize PulseBlock "{0}" to file.'.format(block.name))
         return
 
     def _save_blocks_to_file(self):
         """
-        Saves the saved_pulse_blocks dict items to files.
+        Saves the saved_pulse_blocks dict items to the asset store.
         """
-        for block in self._saved_pulse_blocks.values():
-            self._save_block_to_file(block)
+        with self._asset_store.batch():
+            for block in self._saved_pulse_blocks.values():
+                self._save_block_to_file(block)
         return
 
     def save_ensemble(self, ensemble):
@@ -866,68 +917,60 @@ class SequenceGeneratorLogic(GenericLogic):
             del self._saved_pulse_block_ensembles[name]
 
         # Delete from disk
-        filepath = os.path.join(self._assets_storage_dir, '{0}.ensemble'.format(name))
-        if os.path.exists(filepath):
-            os.remove(filepath)
+        self._asset_store.delete('ensemble', name)
 
         self.sigEnsembleDictUpdated.emit(self.saved_pulse_block_ensembles)
         return
 
-    def _load_ensemble_from_file(self, ensemble_name):
+    def _load_ensemble_from_file(self, ensemble_name, sampled_waveforms=None):
         """
-        De-serializes a PulseBlockEnsemble instance from file.
+        De-serializes a PulseBlockEnsemble instance from the asset store.
+        Outdated sampling information (waveforms no longer present on the pulse generator) is
+        deleted.
 
         @param str ensemble_name: The name of the PulseBlockEnsemble instance to de-serialize
+        @param set sampled_waveforms: optional, waveform names on the pulse generator (queried from
+                                      the device if not given)
         @return PulseBlockEnsemble: The de-serialized PulseBlockEnsemble instance
         """
         ensemble = None
-        filepath = os.path.join(self._assets_storage_dir, '{0}.ensemble'.format(ensemble_name))
-        if os.path.exists(filepath):
-            try:
-                with open(filepath, 'rb') as file:
-                    ensemble = pickle.load(file)
-            except pickle.UnpicklingError:
-                self.log.error('Failed to de-serialize PulseBlockEnsemble "{0}" from file. '
-                               'Deleting broken file.'.format(ensemble_name))
-                os.remove(filepath)
+        try:
+            ensemble = self._asset_store.load('ensemble', ensemble_name)
+        except pickle.UnpicklingError:
+            self.log.error('Failed to de-serialize PulseBlockEnsemble "{0}" from file. '
+                           'Deleting broken file.'.format(ensemble_name))
+            self._asset_store.delete('ensemble', ensemble_name)
+        if ensemble is not None and ensemble.sampling_information.get('waveforms'):
+            if sampled_waveforms is None:
+                sampled_waveforms = set(self.sampled_waveforms)
+            waveform_set = set(ensemble.sampling_information['waveforms'])
+            if not sampled_waveforms.issuperset(waveform_set):
+                ensemble.sampling_information = dict()
         return ensemble
 
     def _update_ensembles_from_file(self):
         """
-        Update the saved_pulse_block_ensembles dict from temporary file.
+        Update the saved_pulse_block_ensembles dict from the asset store index. The
+        PulseBlockEnsemble instances are de-serialized on first access.
         """
-        # Get all files in asset directory ending on ".ensemble" and extract a sorted list of
-        # PulseBlockEnsemble names
-        with os.scandir(self._assets_storage_dir) as scan:
-            names = natural_sort(f.name[:-9] for f in scan if f.is_file and f.name.endswith('.ensemble'))
-
-        # Get all waveforms currently stored on pulser hardware in order to delete outdated
-        # sampling_information dicts
-        sampled_waveforms = set(self.sampled_waveforms)
-
-        # Load all ensembles from file
-        for ensemble_name in names:
-            ensemble = self._load_ensemble_from_file(ensemble_name)
-            if ensemble is not None:
-                if ensemble.sampling_information.get('waveforms'):
-                    waveform_set = set(ensemble.sampling_information['waveforms'])
-                    if not sampled_waveforms.issuperset(waveform_set):
-                        ensemble.sampling_information = dict()
-                self._saved_pulse_block_ensembles[ensemble_name] = ensemble
+        names = natural_sort(self._asset_store.names('ensemble'))
+        # Query the pulse generator once per update instead of once per loaded ensemble
+        loader = functools.partial(self._load_ensemble_from_file,
+                                   sampled_waveforms=frozenset(self.sampled_waveforms))
+        self._saved_pulse_block_ensembles = LazyAssetDict(loader, names)
 
         self.sigEnsembleDictUpdated.emit(self.saved_pulse_block_ensembles)
         return
 
     def _save_ensemble_to_file(self, ensemble):
         """
-        Saves a single PulseBlockEnsemble instance to file by serialization using pickle.
+        Saves a single PulseBlockEnsemble instance to the asset store by serialization using
+        pickle.
 
         @param PulseBlockEnsemble ensemble: The PulseBlockEnsemble instance to be saved
         """
-        filename = '{0}.ensemble'.format(ensemble.name)
         try:
-            with open(os.path.join(self._assets_storage_dir, filename), 'wb') as file:
-                pickle.dump(ensemble, file)
+            self._asset_store.save('ensemble', ensemble.name, ensemble)
         except:
             self.log.error('Failed to serialize PulseBlockEnsemble "{0}" to file.'
                            ''.format(ensemble.name))
@@ -935,10 +978,11 @@ class SequenceGeneratorLogic(GenericLogic):
 
     def _save_ensembles_to_file(self):
         """
-        Saves the saved_pulse_block_ensembles dict items to files.
+        Saves the saved_pulse_block_ensembles dict items to the asset store.
         """
-        for ensemble in self.saved_pulse_block_ensembles.values():
-            self._save_ensemble_to_file(ensemble)
+        with self._asset_store.batch():
+            for ensemble in self.saved_pulse_block_ensembles.values():
+                self._save_ensemble_to_file(ensemble)
         return
 
     def save_sequence(self, sequence):
@@ -983,34 +1027,38 @@ class SequenceGeneratorLogic(GenericLogic):
             del self._saved_pulse_sequences[name]
 
         # Delete from disk
-        filepath = os.path.join(self._assets_storage_dir, '{0}.sequence'.format(name))
-        if os.path.exists(filepath):
-            os.remove(filepath)
+        self._asset_store.delete('sequence', name)
 
         self.sigSequenceDictUpdated.emit(self.saved_pulse_sequences)
         return
 
-    def _load_sequence_from_file(self, sequence_name):
+    def _load_sequence_from_file(self, sequence_name, sampled_sequences=None,
+                                 sampled_waveforms=None):
         """
-        De-serializes a PulseSequence instance from file.
+        De-serializes a PulseSequence instance from the asset store.
+        Outdated sampling information (sequence or waveforms no longer present on the pulse
+        generator) is deleted.
 
         @param str sequence_name: The name of the PulseSequence instance to de-serialize
+        @param set sampled_sequences: optional, sequence names on the pulse generator (queried from
+                                      the device if not given)
+        @param set sampled_waveforms: optional, waveform names on the pulse generator (queried from
+                                      the device if not given)
         @return PulseSequence: The de-serialized PulseSequence instance
         """
-        filepath = os.path.join(self._assets_storage_dir, '{0}.sequence'.format(sequence_name))
-        if os.path.exists(filepath):
-            try:
-                with open(filepath, 'rb') as file:
-                    sequence = pickle.load(file)
-                # FIXME: Due to the pickling the dict namespace merging gets lost on the way.
-                # Restored it here but a better way needs to be found.
-                for step in range(len(sequence)):
-                    sequence[step].__dict__ = sequence[step]
-            except pickle.UnpicklingError:
-                self.log.error('Failed to de-serialize PulseSequence "{0}" from file.'
-                               ''.format(sequence_name))
-                os.remove(filepath)
-                return None
+        try:
+            sequence = self._asset_store.load('sequence', sequence_name)
+        except pickle.UnpicklingError:
+            self.log.error('Failed to de-serialize PulseSequence "{0}" from file.'
+                           ''.format(sequence_name))
+            self._asset_store.delete('sequence', sequence_name)
+            return None
+        if sequence is None:
+            return None
+        # FIXME: Due to the pickling the dict namespace merging gets lost on the way.
+        # Restored it here but a better way needs to be found.
+        for step in range(len(sequence)):
+            sequence[step].__dict__ = sequence[step]
 
         # Conversion for backwards compatibility
         if len(sequence) > 0 and not isinstance(sequence[0].flag_high, list):
@@ -1033,7 +1081,7 @@ class SequenceGeneratorLogic(GenericLogic):
                     self.log.error('Failed to de-serialize PulseSequence "{0}" from file.'
                                    '"flag_high" step parameter is of unknown type'
                                    ''.format(sequence_name))
-                    os.remove(filepath)
+                    self._asset_store.delete('sequence', sequence_name)
                     return None
 
                 # Try to convert "flag_trigger" step parameter
@@ -1049,60 +1097,57 @@ class SequenceGeneratorLogic(GenericLogic):
                     self.log.error('Failed to de-serialize PulseSequence "{0}" from file.'
                                    '"flag_trigger" step parameter is of unknown type'
                                    ''.format(sequence_name))
-                    os.remove(filepath)
+                    self._asset_store.delete('sequence', sequence_name)
                     return None
             self._save_sequence_to_file(sequence)
+
+        # Delete outdated sampling information
+        if sampled_sequences is None:
+            sampled_sequences = set(self.sampled_sequences)
+        if sequence.name not in sampled_sequences:
+            sequence.sampling_information = dict()
+        elif sequence.sampling_information:
+            if sampled_waveforms is None:
+                sampled_waveforms = set(self.sampled_waveforms)
+            waveform_set = set(sequence.sampling_information['waveforms'])
+            if not sampled_waveforms.issuperset(waveform_set):
+                sequence.sampling_information = dict()
         return sequence
 
     def _update_sequences_from_file(self):
         """
-        Update the saved_pulse_sequences dict from files.
-        """
-        # Get all files in asset directory ending on ".sequence" and extract a sorted list of
-        # PulseSequence names
-        with os.scandir(self._assets_storage_dir) as scan:
-            names = natural_sort(f.name[:-9] for f in scan if f.is_file and f.name.endswith('.sequence'))
-
-        # Get all waveforms and sequences currently stored on pulser hardware in order to delete
-        # outdated sampling_information dicts
-        sampled_waveforms = set(self.sampled_waveforms)
-        sampled_sequences = set(self.sampled_sequences)
-
-        # Load all sequences from file
-        for sequence_name in names:
-            sequence = self._load_sequence_from_file(sequence_name)
-            if sequence is not None:
-                if sequence.name not in sampled_sequences:
-                    sequence.sampling_information = dict()
-                elif sequence.sampling_information:
-                    waveform_set = set(sequence.sampling_information['waveforms'])
-                    if not sampled_waveforms.issuperset(waveform_set):
-                        sequence.sampling_information = dict()
-                self._saved_pulse_sequences[sequence_name] = sequence
+        Update the saved_pulse_sequences dict from the asset store index. The PulseSequence
+        instances are de-serialized on first access.
+        """
+        names = natural_sort(self._asset_store.names('sequence'))
+        # Query the pulse generator once per update instead of once per loaded sequence
+        loader = functools.partial(self._load_sequence_from_file,
+                                   sampled_sequences=frozenset(self.sampled_sequences),
+                                   sampled_waveforms=frozenset(self.sampled_waveforms))
+        self._saved_pulse_sequences = LazyAssetDict(loader, names)
 
         self.sigSequenceDictUpdated.emit(self.saved_pulse_sequences)
         return
 
     def _save_sequence_to_file(self, sequence):
         """
-        Saves a single PulseSequence instance to file by serialization using pickle.
+        Saves a single PulseSequence instance to the asset store by serialization using pickle.
 
         @param PulseSequence sequence: The PulseSequence instance to be saved
         """
-        filename = '{0}.sequence'.format(sequence.name)
         try:
-            with open(os.path.join(self._assets_storage_dir, filename), 'wb') as file:
-                pickle.dump(sequence, file)
+            self._asset_store.save('sequence', sequence.name, sequence)
         except:
             self.log.error('Failed to serialize PulseSequence "{0}" to file.'.format(sequence.name))
         return
 
     def _save_sequences_to_file(self):
         """
-        Saves the saved_pulse_sequences dict items to files.
+        Saves the saved_pulse_sequences dict items to the asset store.
         """
-        for sequence in self.saved_pulse_sequences.values():
-            self._save_sequence_to_file(sequence)
+        with self._asset_store.batch():
+            for sequence in self.saved_pulse_sequences.values():
+                self._save_sequence_to_file(sequence)
         return
 
     def generate_predefined_sequence(self, predefined_sequence_name, kwargs_dict):
@@ -1136,23 +1181,32 @@ class SequenceGeneratorLogic(GenericLogic):
             self.sigPredefinedSequenceGenerated.emit(None, False)
             return
 
-        # Save objects
-        for block in blocks:
-            self.save_block(block)
-        for ensemble in ensembles:
-            ensemble.sampling_information = dict()
-            self.save_ensemble(ensemble)
-
-        if self.pulse_generator_constraints.sequence_option == SequenceOption.FORCED and len(sequences) < 1:
-            self.log.info('Adding default sequence for: {0:s}'.format(predefined_sequence_name))
-            self._add_default_sequence(ensembles, sequences)
-            if len(sequences) > 0:
-                self.log.debug('New default PulseSequence is: {0:s} length {1:d}'
-                               ''.format(sequences[0].name, len(sequences)))
-
-        for sequence in sequences:
-            sequence.sampling_information = dict()
-            self.save_sequence(sequence)
+        # Save objects. All objects are written to the asset store in one transaction.
+        with self._asset_store.batch():
+            for block in blocks:
+                self.save_block(block)
+            for ensemble in ensembles:
+                ensemble.sampling_information = dict()
+                # Keep the sampling information of unchanged PulseBlockEnsembles in change tracking
+                # mode so they are not sampled again.
+                if self._incremental_sampling:
+                    old_ensemble = self._saved_pulse_block_ensembles.get(ensemble.name)
+                    fingerprint = self._get_ensemble_fingerprint(ensemble)
+                    if old_ensemble is not None and self._sampling_is_up_to_date(
+                            old_ensemble.sampling_information, fingerprint):
+                        ensemble.sampling_information = old_ensemble.sampling_information
+                self.save_ensemble(ensemble)
+
+            if self.pulse_generator_constraints.sequence_option == SequenceOption.FORCED and len(sequences) < 1:
+                self.log.info('Adding default sequence for: {0:s}'.format(predefined_sequence_name))
+                self._add_default_sequence(ensembles, sequences)
+                if len(sequences) > 0:
+                    self.log.debug('New default PulseSequence is: {0:s} length {1:d}'
+                                   ''.format(sequences[0].name, len(sequences)))
+
+            for sequence in sequences:
+                sequence.sampling_information = dict()
+                self.save_sequence(sequence)
 
         created_name = gen_params.get('name') if 'name' not in kwargs_dict else kwargs_dict['name']
         self.sigPredefinedSequenceGenerated.emit(created_name, len(sequences) > 0)
@@ -1649,6 +1703,72 @@ class SequenceGeneratorLogic(GenericLogic):
         # Return error code
         return -1 if ensembles_missing else 0
 
+    def _get_ensemble_fingerprint(self, ensemble, offset_bin=0):
+        """
+        Creates a fingerprint of a PulseBlockEnsemble together with all its PulseBlocks and all
+        settings the sampled waveform depends on (pulse generator settings, laser/gate channel and
+        the rotating frame offset).
+        An idle extension appended to match the waveform granularity is ignored, since it only
+        depends on the rest of the ensemble and the pulse generator settings. So the fingerprint is
+        the same before and after the extension.
+
+        @param PulseBlockEnsemble ensemble: The PulseBlockEnsemble to create the fingerprint for
+        @param int offset_bin: The rotating frame offset the ensemble is sampled with
+
+        @return str: The fingerprint (SHA-1 hex digest)
+        """
+        settings = self.pulse_generator_settings
+        # The upload speed is a benchmark result and not a setting affecting the samples
+        del settings['upload_speed']
+        block_list = list(ensemble.block_list)
+        while block_list and tuple(block_list[-1]) == ('idle_extension', 0):
+            block_list.pop()
+        blocks = dict()
+        for block_name, reps in block_list:
+            block = self._saved_pulse_blocks.get(block_name)
+            blocks[block_name] = None if block is None else block.get_dict_representation()
+        fingerprint_dict = {'block_list': block_list,
+                            'rotating_frame': ensemble.rotating_frame,
+                            'offset_bin': offset_bin if ensemble.rotating_frame else 0,
+                            'blocks': blocks,
+                            'pulse_generator_settings': settings,
+                            'laser_channel': self.generation_parameters['laser_channel'],
+                            'gate_channel': self.generation_parameters['gate_channel']}
+        return hashlib.sha1(repr(self._canonicalize(fingerprint_dict)).encode()).hexdigest()
+
+    @classmethod
+    def _canonicalize(cls, obj):
+        """
+        Helper method to convert nested containers into a representation with a well-defined order
+        (e.g. sets and dicts are sorted) in order to create reproducible fingerprints.
+        """
+        if isinstance(obj, dict):
+            return tuple(sorted((str(key), cls._canonicalize(val)) for key, val in obj.items()))
+        if isinstance(obj, (set, frozenset)):
+            return tuple(sorted(repr(cls._canonicalize(val)) for val in obj))
+        if isinstance(obj, (list, tuple)):
+            return tuple(cls._canonicalize(val) for val in obj)
+        if isinstance(obj, np.ndarray):
+            return tuple(obj.tolist())
+        return obj
+
+    def _sampling_is_up_to_date(self, sampling_information, fingerprint):
+        """
+        Checks if a sampling_information dict has been created with the given fingerprint and if all
+        associated waveforms are still present on the pulse generator.
+
+        @param dict sampling_information: sampling information of the waveform to check
+        @param str fingerprint: the current fingerprint of the PulseBlockEnsemble
+
+        @return bool: True if the waveforms do not need to be sampled again, False otherwise
+        """
+        if not sampling_information or sampling_information.get('fingerprint') != fingerprint:
+            return False
+        waveforms = sampling_information.get('waveforms')
+        if not waveforms:
+            return False
+        return set(self.sampled_waveforms).issuperset(waveforms)
+
     @QtCore.Slot(str)
     def sample_pulse_block_ensemble(self, ensemble, offset_bin=0, name_tag=None):
         """ General sampling of a PulseBlockEnsemble object, which serves as the construction plan.
@@ -1688,6 +1808,11 @@ class SequenceGeneratorLogic(GenericLogic):
         In other words: The whole sample arrays are never created at any time. This results in more
         function calls and general overhead causing much longer time to complete.
 
+        If the ConfigOption "sampling_workers" is set, the chunks (and independent element ranges
+        within each chunk) are calculated on a thread or process pool (see
+        logic.pulsed.sampling_engine). The next chunk is calculated while the current one is
+        written to the device. The resulting samples are identical to serial sampling.
+
         In addition the pulse_block_ensemble gets analyzed and important parameters used during
         sampling get stored in the ensemble object "sampling_information" attribute.
         It is a dictionary containing:
@@ -1716,6 +1841,27 @@ class SequenceGeneratorLogic(GenericLogic):
         # Set the waveform name (excluding the device specific channel naming suffix, i.e. '_ch1')
         waveform_name = name_tag if name_tag else ensemble.name
 
+        # In change tracking mode skip sampling if nothing changed since the last upload
+        fingerprint = None
+        if self._incremental_sampling:
+            fingerprint = self._get_ensemble_fingerprint(ensemble, offset_bin)
+            if waveform_name == ensemble.name:
+                sampling_information = ensemble.sampling_information
+            else:
+                sampling_information = self._tagged_sampling_information.get(waveform_name)
+            if self._sampling_is_up_to_date(sampling_information, fingerprint):
+                self.log.info('PulseBlockEnsemble "{0}" did not change since last sampling. '
+                              'Keeping waveforms "{1}" on device.'.format(ensemble.name,
+                                                                         waveform_name))
+                ensemble_info = sampling_information.copy()
+                del ensemble_info['pulse_generator_settings']
+                if ensemble.rotating_frame:
+                    offset_bin += ensemble_info['number_of_samples']
+                if not self.__sequence_generation_in_progress:
+                    self.module_state.unlock()
+                self.sigSampleEnsembleComplete.emit(ensemble)
+                return offset_bin, list(ensemble_info['waveforms']), ensemble_info
+
         # check for old waveforms associated with the ensemble and delete them from pulse generator.
         self._delete_waveform_by_nametag(waveform_name)
 
@@ -1789,24 +1935,6 @@ class SequenceGeneratorLogic(GenericLogic):
             self.sigSampleEnsembleComplete.emit(None)
             return -1, list(), dict()
 
-        # Allocate the sample arrays that are used for a single write command
-        analog_samples = dict()
-        digital_samples = dict()
-        try:
-            for chnl in ensemble_info['analog_channels']:
-                analog_samples[chnl] = np.empty(array_length, dtype='float32')
-            for chnl in ensemble_info['digital_channels']:
-                digital_samples[chnl] = np.empty(array_length, dtype=bool)
-        except MemoryError:
-            self.log.error('Sampling of PulseBlockEnsemble "{0}" failed due to a MemoryError.\n'
-                           'The sample array needed is too large to allocate in memory.\n'
-                           'Try using the overhead_bytes ConfigOption to limit memory usage.'
-                           ''.format(ensemble.name))
-            if not self.__sequence_generation_in_progress:
-                self.module_state.unlock()
-            self.sigSampleEnsembleComplete.emit(None)
-            return -1, list(), dict()
-
         t_est_upload = self._benchmark_write.estimate_time(ensemble_info['number_of_samples'])
         if t_est_upload > self._info_on_estimated_upload_time:
             now = datetime.datetime.now()
@@ -1814,119 +1942,98 @@ class SequenceGeneratorLogic(GenericLogic):
                           " {0:%Y-%m-%d %H:%M:%S} ({1:d} s)".format(
                 (now + datetime.timedelta(0, t_est_upload)), int(t_est_upload)))
 
+        # Remember cache statistics to report cache usage of this ensemble only
+        sample_cache = self._sampling_engine.cache
+        cache_stats = sample_cache.statistics if sample_cache is not None else None
+
         # integer to keep track of the sampls already processed
         processed_samples = 0
-        # Index to keep track of the samples written into the preallocated samples array
-        array_write_index = 0
-        # Keep track of the number of elements already written
-        element_count = 0
         # set of written waveform names on the device
         written_waveforms = set()
-        # Iterate over all blocks within the PulseBlockEnsemble object
-        for block_name, reps in ensemble.block_list:
-            block = self.get_block(block_name)
-            # Iterate over all repetitions of the current block
-            for rep_no in range(reps + 1):
-                # Iterate over the PulseBlockElement instances inside the current block
-                for element in block.element_list:
-                    digital_high = element.digital_high
-                    pulse_function = element.pulse_function
-                    element_length_bins = ensemble_info['elements_length_bins'][element_count]
-
-                    # Indicator on how many samples of this element have been written already
-                    element_samples_written = 0
-
-                    while element_samples_written != element_length_bins:
-                        samples_to_add = min(array_length - array_write_index,
-                                             element_length_bins - element_samples_written)
-                        # create floating point time array for the current element inside rotating
-                        # frame if analog samples are to be calculated.
-                        if pulse_function:
-                            time_arr = (offset_bin + np.arange(
-                                samples_to_add, dtype='float64')) / self.__sample_rate
-
-                        # Calculate respective part of the sample arrays
-                        for chnl in digital_high:
-                            digital_samples[chnl][array_write_index:array_write_index + samples_to_add] = digital_high[
-                                chnl]
-                        for chnl in pulse_function:
-                            analog_samples[chnl][array_write_index:array_write_index + samples_to_add] = pulse_function[
-                                                                                                             chnl].get_samples(
-                                time_arr) / (self.__analog_levels[0][chnl] / 2)
-
-                        # Free memory
-                        if pulse_function:
-                            del time_arr
-
-                        element_samples_written += samples_to_add
-                        array_write_index += samples_to_add
-                        processed_samples += samples_to_add
-                        # if the rotating frame should be preserved (default) increment the offset
-                        # counter for the time array.
-                        if ensemble.rotating_frame:
-                            offset_bin += samples_to_add
-
-                        # Check if the temporary sample array is full and write to the device if so.
-                        if array_write_index == array_length:
-                            # Set first/last chunk flags
-                            is_first_chunk = array_write_index == processed_samples
-                            is_last_chunk = processed_samples == ensemble_info['number_of_samples']
-                            written_samples, wfm_list = self.pulsegenerator().write_waveform(
-                                name=waveform_name,
-                                analog_samples=analog_samples,
-                                digital_samples=digital_samples,
-                                is_first_chunk=is_first_chunk,
-                                is_last_chunk=is_last_chunk,
-                                total_number_of_samples=ensemble_info['number_of_samples'])
-
-                            # Update written waveforms set
-                            written_waveforms.update(wfm_list)
-
-                            # check if write process was successful
-                            if written_samples != array_length:
-                                self.log.error('Sampling of block "{0}" in ensemble "{1}" failed. '
-                                               'Write to device was unsuccessful.\nThe number of '
-                                               'actually written samples ({2:d}) does not match '
-                                               'the number of samples staged to write ({3:d}).'
-                                               ''.format(block_name, ensemble.name, written_samples,
-                                                         array_length))
-                                if not self.__sequence_generation_in_progress:
-                                    self.module_state.unlock()
-                                self.sigAvailableWaveformsUpdated.emit(self.sampled_waveforms)
-                                self.sigSampleEnsembleComplete.emit(None)
-                                return -1, list(), dict()
-
-                            # Reset array write start pointer
-                            array_write_index = 0
-
-                            # check if the temporary write array needs to be truncated for the next
-                            # part. (because it is the last part of the ensemble to write which can
-                            # be shorter than the previous chunks)
-                            if array_length > ensemble_info['number_of_samples'] - processed_samples:
-                                array_length = ensemble_info['number_of_samples'] - processed_samples
-                                analog_samples = dict()
-                                digital_samples = dict()
-                                for chnl in ensemble_info['analog_channels']:
-                                    analog_samples[chnl] = np.empty(array_length, dtype='float32')
-                                for chnl in ensemble_info['digital_channels']:
-                                    digital_samples[chnl] = np.empty(array_length, dtype=bool)
-
-                    # Increment element index
-                    element_count += 1
+        # Split the element timeline into write chunks and let the sampling engine calculate them.
+        # If a worker pool is configured, the next chunk is calculated while the current one is
+        # written to the device.
+        chunk_plan = plan_ensemble_chunks(
+            ensemble=ensemble,
+            blocks={name: self.get_block(name) for name, reps in ensemble.block_list},
+            elements_length_bins=ensemble_info['elements_length_bins'],
+            array_length=array_length,
+            offset_bin=offset_bin,
+            ranges_per_chunk=max(self._sampling_engine.workers, 1))
+        sampled_chunks = self._sampling_engine.sample_chunks(
+            chunk_plan=chunk_plan,
+            analog_channels=ensemble_info['analog_channels'],
+            digital_channels=ensemble_info['digital_channels'],
+            sample_rate=self.__sample_rate,
+            analog_amplitudes=self.__analog_levels[0])
+        try:
+            for chunk_length, analog_samples, digital_samples, offset_bin in sampled_chunks:
+                processed_samples += chunk_length
+                # Set first/last chunk flags
+                is_first_chunk = chunk_length == processed_samples
+                is_last_chunk = processed_samples == ensemble_info['number_of_samples']
+                written_samples, wfm_list = self.pulsegenerator().write_waveform(
+                    name=waveform_name,
+                    analog_samples=analog_samples,
+                    digital_samples=digital_samples,
+                    is_first_chunk=is_first_chunk,
+                    is_last_chunk=is_last_chunk,
+                    total_number_of_samples=ensemble_info['number_of_samples'])
+
+                # Update written waveforms set
+                written_waveforms.update(wfm_list)
+
+                # check if write process was successful
+                if written_samples != chunk_length:
+                    self.log.error('Sampling of ensemble "{0}" failed. Write to device was '
+                                   'unsuccessful.\nThe number of actually written samples ({1:d}) '
+                                   'does not match the number of samples staged to write ({2:d}).'
+                                   ''.format(ensemble.name, written_samples, chunk_length))
+                    if not self.__sequence_generation_in_progress:
+                        self.module_state.unlock()
+                    self.sigAvailableWaveformsUpdated.emit(self.sampled_waveforms)
+                    self.sigSampleEnsembleComplete.emit(None)
+                    return -1, list(), dict()
+        except MemoryError:
+            self.log.error('Sampling of PulseBlockEnsemble "{0}" failed due to a MemoryError.\n'
+                           'The sample array needed is too large to allocate in memory.\n'
+                           'Try using the overhead_bytes ConfigOption to limit memory usage.'
+                           ''.format(ensemble.name))
+            if not self.__sequence_generation_in_progress:
+                self.module_state.unlock()
+            self.sigSampleEnsembleComplete.emit(None)
+            return -1, list(), dict()
+        finally:
+            sampled_chunks.close()
 
         # Save sampling related parameters to the sampling_information container within the
         # PulseBlockEnsemble.
         # This step is only performed if the resulting waveforms are named by the PulseBlockEnsemble
         # and not by a sequence nametag
+        if fingerprint is not None:
+            ensemble_info['fingerprint'] = fingerprint
         if waveform_name == ensemble.name:
             ensemble.sampling_information = dict()
             ensemble.sampling_information.update(ensemble_info)
             ensemble.sampling_information['pulse_generator_settings'] = self.pulse_generator_settings
             ensemble.sampling_information['waveforms'] = natural_sort(written_waveforms)
             self.save_ensemble(ensemble)
+        else:
+            sampling_information = ensemble_info.copy()
+            sampling_information['pulse_generator_settings'] = self.pulse_generator_settings
+            sampling_information['waveforms'] = natural_sort(written_waveforms)
+            self._tagged_sampling_information[waveform_name] = sampling_information
 
+        if sample_cache is None:
+            cache_info = ''
+        else:
+            new_cache_stats = sample_cache.statistics
+            cache_info = ' (element cache: {0:d} hits, {1:d} misses, {2:.1f} MB used)'.format(
+                new_cache_stats['hits'] - cache_stats['hits'],
+                new_cache_stats['misses'] - cache_stats['misses'],
+                new_cache_stats['bytes'] / 2**20)
         self.log.info('Time needed for sampling and writing PulseBlockEnsemble {0} to device: {1} sec'
-                      ''.format(ensemble.name, int(np.rint(time.time() - start_time))))
+                      '{2}'.format(ensemble.name, int(np.rint(time.time() - start_time)), cache_info))
         self.log.debug('Estimated {:.3f} s from current estimated write speed {:.2f} MSa/s'
                        ' from {} benchmarks'.format(
             self._benchmark_write.estimate_time(ensemble_info['number_of_samples']),
@@ -2105,6 +2212,7 @@ class SequenceGeneratorLogic(GenericLogic):
         wfm_to_delete = [wfm for wfm in self.sampled_waveforms if
                          wfm.rsplit('_', 1)[0] == nametag]
         self._delete_waveform(wfm_to_delete)
+        self._tagged_sampling_information.pop(nametag, None)
         # Erase sampling information if a PulseBlockEnsemble by the same name can be found in saved
         # ensembles
         if nametag in self.saved_pulse_block_ensembles:
@@ -19,25 +19,37 @@ Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
 top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
 """
 
+import concurrent.futures
+import copy
 from cycler import cycler
 import datetime
-import inspect
+import functools
 import logging
 import matplotlib.pyplot as plt
+import multiprocessing
 import numpy as np
 import os
+import pickle
+import queue
+import struct
 import sys
+import threading
 import time
 
 from collections import OrderedDict
 from core.configoption import ConfigOption
 from core.util import units
+from logic.figure_rendering import init_render_process, render_pickled_figure, save_figure
 from core.util.mutex import Mutex
 from core.util.network import netobtain
 from logic.generic_logic import GenericLogic
-from matplotlib.backends.backend_pdf import PdfPages
-from PIL import Image
-from PIL import PngImagePlugin
+from qtpy import QtCore
+
+# h5py is only needed to save data in HDF5 files (filetype 'hdf5'). Might fail if not installed.
+try:
+    import h5py
+except ImportError:
+    h5py = None
 
 
 class DailyLogHandler(logging.FileHandler):
@@ -115,6 +127,396 @@ class FunctionImplementationError(Exception):
         return repr(self.value)
 
 
+class SaveDataStream:
+    """
+    Data file to which rows of data can be appended in chunks, e.g. to stream long recordings to
+    disk instead of keeping them in memory. Instances are created by SaveLogic.open_data_stream.
+
+    For filetype 'hdf5' all rows are appended to the resizable 2D dataset "data" in the HDF5 file.
+    The parameters are stored as attributes of the file and the column names as attribute
+    "columns" of the dataset. For filetype 'npy' the rows are appended to a binary numpy file
+    (readable with numpy.load) and the header is saved in a separate text file
+    <filename>_params.dat. For filetype 'text' the rows are appended to a text file with the same
+    header as written by SaveLogic.save_data.
+    Parameters only known at the end of a recording can be added with add_parameters.
+
+    Instances are not thread-safe, i.e. all rows must be appended from the same thread (see
+    ThreadedDataStream for appending from a background thread).
+    """
+
+    def __init__(self, file_path, columns, header='', attributes=None, filetype='hdf5',
+                 dtype=float, compression=False, chunk_size=1024, fmt='%.15e', delimiter='\t'):
+        """
+        @param str file_path: full path of the file to create
+        @param list columns: names of the data columns
+        @param str header: header of the text file (filetype 'text' and 'npy' only)
+        @param dict attributes: attributes to save in the HDF5 file (filetype 'hdf5' only)
+        @param str filetype: file format to stream data to ('hdf5', 'npy' or 'text')
+        @param dtype: data type of the data (filetype 'hdf5' and 'npy' only)
+        @param bool|str compression: compress the data (True for gzip or the name of the h5py
+                                     compression filter), filetype 'hdf5' only
+        @param int chunk_size: number of rows per HDF5 chunk (filetype 'hdf5' only)
+        @param str|list fmt: format specifier(s) for the data (filetype 'text' only)
+        @param str delimiter: column delimiter (filetype 'text' only)
+        """
+        self._file_path = file_path
+        self._columns = list(columns)
+        self._filetype = filetype
+        self._header = header
+        self._fmt = fmt
+        self._delimiter = delimiter
+        self._dtype = np.dtype(dtype)
+        self._rows_written = 0
+        self._dataset = None
+        self._npy_header_size = 0
+
+        if filetype == 'hdf5':
+            if h5py is None:
+                raise ImportError('Streaming data to HDF5 file requires the package "h5py".')
+            if compression is True:
+                compression = 'gzip'
+            self._file = h5py.File(file_path, 'w')
+            if attributes:
+                for key, value in attributes.items():
+                    self._file.attrs[key] = hdf5_attribute_value(value)
+            self._dataset = self._file.create_dataset(
+                'data',
+                shape=(0, len(self._columns)),
+                maxshape=(None, len(self._columns)),
+                chunks=(max(int(chunk_size), 1), len(self._columns)),
+                dtype=dtype,
+                compression=compression if compression else None)
+            self._dataset.attrs['columns'] = hdf5_attribute_value(self._columns)
+        elif filetype == 'npy':
+            self._write_npy_params()
+            self._file = open(file_path, 'wb')
+            # Reserve a header large enough for any number of rows. Updated on flush and close.
+            self._npy_header_size = 64 * ((len(self._npy_header_dict(10 ** 20)) + 75) // 64)
+            self._file.write(self._npy_header())
+        elif filetype == 'text':
+            self._file = open(file_path, 'wb')
+            header += self._delimiter.join(self._columns)
+            np.savetxt(self._file, [], header=header, comments='#')
+        else:
+            raise ValueError('Unknown filetype "{0}" to stream data to. Valid filetypes are '
+                             '"hdf5", "npy" and "text".'.format(filetype))
+        return
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def file_path(self):
+        return self._file_path
+
+    @property
+    def columns(self):
+        return self._columns.copy()
+
+    @property
+    def rows_written(self):
+        return self._rows_written
+
+    @property
+    def closed(self):
+        return self._file is None
+
+    def append(self, data):
+        """
+        Appends rows of data to the file.
+
+        @param numpy.ndarray data: 2D array (rows, columns) or 1D array (a single row) to append
+
+        @return int: total number of rows written to the file
+        """
+        data = np.asarray(data)
+        if data.ndim == 1:
+            data = data[np.newaxis, :]
+        if data.ndim != 2 or data.shape[1] != len(self._columns):
+            raise ValueError('Data to append must have {0:d} columns.'.format(len(self._columns)))
+        if data.shape[0] == 0:
+            return self._rows_written
+
+        if self._dataset is not None:
+            new_size = self._rows_written + data.shape[0]
+            self._dataset.resize(new_size, axis=0)
+            self._dataset[self._rows_written:new_size] = data
+        elif self._filetype == 'npy':
+            self._file.write(np.ascontiguousarray(data, dtype=self._dtype).data)
+        else:
+            np.savetxt(self._file, data, fmt=self._fmt, delimiter=self._delimiter)
+        self._rows_written += data.shape[0]
+        return self._rows_written
+
+    def flush(self):
+        """ Flushes all appended data to disk.
+        """
+        if self._file is not None:
+            if self._filetype == 'npy':
+                self._update_npy_header()
+            self._file.flush()
+        return
+
+    def close(self):
+        """ Flushes all data and closes the file.
+        """
+        if self._file is not None:
+            if self._filetype == 'npy':
+                self._update_npy_header()
+            self._file.close()
+            self._file = None
+            self._dataset = None
+        return
+
+    def add_parameters(self, parameters):
+        """
+        Adds parameters to the saved parameters, e.g. the stop time of a recording.
+        For filetype 'hdf5' they are added to the attributes of the file, for filetype 'npy' to the
+        parameters in <filename>_params.dat and for filetype 'text' they are appended as comment
+        lines after the data written so far.
+
+        @param dict parameters: the parameters to add
+        """
+        if not parameters or self._file is None:
+            return
+        if self._filetype == 'hdf5':
+            for key, value in parameters.items():
+                self._file.attrs[str(key)] = hdf5_attribute_value(value)
+            return
+
+        lines = ''
+        for key, value in parameters.items():
+            if isinstance(value, float):
+                lines += '{0}: {1:.16e}\n'.format(key, value)
+            else:
+                lines += '{0}: {1}\n'.format(key, value)
+        if self._filetype == 'npy':
+            data_section = self._header.rfind('\nData:')
+            if data_section < 0:
+                data_section = len(self._header)
+            self._header = self._header[:data_section] + lines + self._header[data_section:]
+            self._write_npy_params()
+        else:
+            np.savetxt(self._file, [], header=lines.rstrip('\n'), comments='#')
+        return
+
+    def _write_npy_params(self):
+        header = self._header + self._delimiter.join(self._columns)
+        with open(os.path.splitext(self._file_path)[0] + '_params.dat', 'wb') as file:
+            np.savetxt(file, [], header=header, comments='#')
+        return
+
+    def _npy_header_dict(self, rows):
+        return '{{\'descr\': {0!r}, \'fortran_order\': False, \'shape\': ({1:d}, {2:d}), }}' \
+               ''.format(self._dtype.str, rows, len(self._columns))
+
+    def _npy_header(self):
+        """
+        Returns the header of the .npy file (format version 1.0) for the rows written so far,
+        padded to the reserved header size.
+        """
+        header = self._npy_header_dict(self._rows_written)
+        header = header.ljust(self._npy_header_size - 11) + '\n'
+        return b'\x93NUMPY\x01\x00' + struct.pack('<H', len(header)) + header.encode('latin1')
+
+    def _update_npy_header(self):
+        position = self._file.tell()
+        self._file.seek(0)
+        self._file.write(self._npy_header())
+        self._file.seek(position)
+        return
+
+
+class ThreadedDataStream:
+    """
+    Wrapper of a SaveDataStream appending the data from a dedicated writer thread.
+
+    Data frames are handed over to the writer thread through a bounded queue, i.e. append never
+    blocks and the memory used is limited. If the queue is full because the data can not be
+    written fast enough, the frame is dropped and counted in the statistics.
+    Closing the stream does not wait for the writer thread (unless requested). The writer thread
+    writes all data still queued and closes the file afterwards.
+    """
+
+    def __init__(self, stream, queue_size=100, on_closed=None):
+        """
+        @param SaveDataStream stream: the data stream to append data to
+        @param int queue_size: maximum number of data frames waiting to be written
+        @param callable on_closed: optional, called from the writer thread with this stream and
+                                   the figure passed to close after the file has been closed
+        """
+        self._stream = stream
+        self._on_closed = on_closed
+        self._final_parameters = None
+        self._plotfig = None
+        self._callback = None
+        self._queue = queue.Queue(maxsize=max(int(queue_size), 1))
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+        self._frames_written = 0
+        self._dropped_frames = 0
+        self._dropped_rows = 0
+        self._max_queue_depth = 0
+        self._error = None
+        self._thread = threading.Thread(target=self._write_loop,
+                                        name='data stream writer',
+                                        daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close(wait=True)
+
+    @property
+    def file_path(self):
+        return self._stream.file_path
+
+    @property
+    def columns(self):
+        return self._stream.columns
+
+    @property
+    def rows_written(self):
+        return self._stream.rows_written
+
+    @property
+    def closed(self):
+        """ True if the writer thread has finished and the file is closed.
+        """
+        return not self._thread.is_alive()
+
+    @property
+    def error(self):
+        """ The exception raised while writing data (if any). No data is written afterwards.
+        """
+        return self._error
+
+    @property
+    def statistics(self):
+        """
+        Backpressure statistics of the writer thread.
+
+        @return dict: queue_depth (frames waiting), max_queue_depth, frames_written, rows_written,
+                      dropped_frames and dropped_rows
+        """
+        with self._lock:
+            return {'queue_depth': self._queue.qsize(),
+                    'max_queue_depth': self._max_queue_depth,
+                    'frames_written': self._frames_written,
+                    'rows_written': self._stream.rows_written,
+                    'dropped_frames': self._dropped_frames,
+                    'dropped_rows': self._dropped_rows}
+
+    def append(self, data):
+        """
+        Queues rows of data to be appended to the file. Never blocks.
+        The data must not be changed by the caller afterwards (pass a copy if necessary).
+
+        @param numpy.ndarray data: 2D array (rows, columns) or 1D array (a single row) to append
+
+        @return bool: True if the data has been queued, False if it has been dropped
+        """
+        rows = 1 if np.ndim(data) == 1 else len(data)
+        if self._stop_event.is_set() or self._error is not None:
+            with self._lock:
+                self._dropped_frames += 1
+                self._dropped_rows += rows
+            return False
+        try:
+            self._queue.put_nowait(data)
+        except queue.Full:
+            with self._lock:
+                self._dropped_frames += 1
+                self._dropped_rows += rows
+            return False
+        with self._lock:
+            self._max_queue_depth = max(self._max_queue_depth, self._queue.qsize())
+        return True
+
+    def close(self, wait=False, timeout=None, parameters=None, plotfig=None, callback=None):
+        """
+        Stops accepting data. The writer thread writes the data still queued, adds the parameters
+        and closes the file.
+
+        @param bool wait: optional, wait for the writer thread to finish
+        @param float timeout: optional, maximum time in seconds to wait
+        @param dict parameters: optional, parameters to add to the file (see
+                                SaveDataStream.add_parameters)
+        @param plotfig: optional, matplotlib figure (or callable returning it) to save with the
+                        file (see SaveLogic.open_data_stream)
+        @param callable callback: optional, called from the writer thread with this stream when
+                                  the file (and figure) has been saved
+        """
+        if not self._stop_event.is_set():
+            self._final_parameters = parameters
+            self._plotfig = plotfig
+            self._callback = callback
+        self._stop_event.set()
+        if wait:
+            self._thread.join(timeout)
+        return
+
+    def _write_loop(self):
+        try:
+            while True:
+                try:
+                    data = self._queue.get(timeout=0.1)
+                except queue.Empty:
+                    if self._stop_event.is_set():
+                        break
+                    continue
+                if self._error is not None:
+                    continue
+                try:
+                    self._stream.append(data)
+                except Exception as e:
+                    self._error = e
+                    continue
+                with self._lock:
+                    self._frames_written += 1
+            if self._error is None:
+                try:
+                    self._stream.add_parameters(self._final_parameters)
+                except Exception as e:
+                    self._error = e
+        finally:
+            self._stream.close()
+            if self._on_closed is not None:
+                self._on_closed(self, self._plotfig)
+            if self._callback is not None:
+                self._callback(self)
+        return
+
+
+def hdf5_attribute_value(value):
+    """
+    Converts a parameter value into a data type that can be stored as HDF5 attribute.
+    Numbers, strings and numeric arrays are stored as they are, lists of strings as string arrays
+    and everything else as its string representation.
+
+    @param value: the parameter value
+
+    @return: the value to store as HDF5 attribute
+    """
+    if isinstance(value, (str, bool, int, float, np.number, np.bool_)):
+        return value
+    if isinstance(value, (list, tuple, np.ndarray)):
+        try:
+            arr = np.asarray(value)
+        except ValueError:
+            return str(value)
+        if arr.dtype.kind in 'biuf':
+            return arr
+        if arr.dtype.kind == 'U' and h5py is not None:
+            return arr.astype(h5py.string_dtype())
+    return str(value)
+
+
 class SaveLogic(GenericLogic):
 
     """
@@ -129,6 +531,8 @@ class SaveLogic(GenericLogic):
         log_into_daily_directory: True
         save_pdf: True
         save_png: True
+        async_save: False  # write the files of save_data_async in a background thread
+        render_processes: 0  # number of processes rendering figures (needs async_save)
     """
 
     _win_data_dir = ConfigOption('win_data_directory', 'C:/Data/')
@@ -136,6 +540,11 @@ class SaveLogic(GenericLogic):
     log_into_daily_directory = ConfigOption('log_into_daily_directory', False, missing='warn')
     save_pdf = ConfigOption('save_pdf', False)
     save_png = ConfigOption('save_png', True)
+    async_save = ConfigOption('async_save', False, missing='nothing')
+    render_processes = ConfigOption('render_processes', 0, missing='nothing')
+
+    # Emitted with the path of the data file and a success flag when a save_data_async job is done
+    sigDataSaved = QtCore.Signal(str, bool)
 
     # Matplotlib style definition for saving plots
     mpl_qd_style = {
@@ -202,6 +611,10 @@ class SaveLogic(GenericLogic):
 
         self._daily_loghandler = None
 
+        # Writer thread and figure rendering processes of save_data_async
+        self._write_executor = None
+        self._render_pool = None
+
     def on_activate(self):
         """ Definition, configuration and initialisation of the SaveLogic.
         """
@@ -217,11 +630,29 @@ class SaveLogic(GenericLogic):
         else:
             self._daily_loghandler = None
 
+        if self.async_save:
+            self._write_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+            if self.render_processes > 0:
+                # The processes are spawned (not forked) since this process already runs other
+                # threads, which may hold locks (e.g. of logging or matplotlib) while forking.
+                # Only logic.figure_rendering is imported in them.
+                self._render_pool = multiprocessing.get_context('spawn').Pool(
+                    self.render_processes, initializer=init_render_process)
+
     def on_deactivate(self):
         if self._daily_loghandler is not None:
             # removes the log handler logging into the daily directory
             logging.getLogger().removeHandler(self._daily_loghandler)
 
+        # finish all pending save jobs
+        if self._write_executor is not None:
+            self._write_executor.shutdown(wait=True)
+            self._write_executor = None
+        if self._render_pool is not None:
+            self._render_pool.close()
+            self._render_pool.join()
+            self._render_pool = None
+
     @property
     def dailylog(self):
         """
@@ -238,7 +669,8 @@ class SaveLogic(GenericLogic):
         self._daily_loghandler.setLevel(level)
 
     def save_data(self, data, filepath=None, parameters=None, filename=None, filelabel=None,
-                  timestamp=None, filetype='text', fmt='%.15e', delimiter='\t', plotfig=None):
+                  timestamp=None, filetype='text', fmt='%.15e', delimiter='\t', plotfig=None,
+                  compression=True):
         """
         General save routine for data.
 
@@ -284,7 +716,11 @@ class SaveLogic(GenericLogic):
                                    filename and a timestamp, because then the timestamp will be
                                    ignored.
         @param string filetype: optional, the file format the data should be saved in. Valid inputs
-                                are 'text', 'xml' and 'npz'. Default is 'text'.
+                                are 'text', 'npz' and 'hdf5'. Default is 'text'.
+                                For 'npz' the data is saved in <filename>.npz and the parameters in
+                                a separate text file <filename>_params.dat.
+                                For 'hdf5' (requires h5py) each data item is saved as dataset in
+                                <filename>.h5 and the parameters as attributes of the file.
         @param string or list of strings fmt: optional, format specifier for saved data. See python
                                               documentation for
                                               "Format Specification Mini-Language". If you want for
@@ -299,6 +735,12 @@ class SaveLogic(GenericLogic):
                                               behaviour or failure to save right away.
         @param string delimiter: optional, insert here the delimiter, like '\n' for new line, '\t'
                                  for tab, ',' for a comma ect.
+        @param matplotlib.figure.Figure|callable plotfig: optional, figure to save as PNG/PDF next
+                                                        to the data file or a callable without
+                                                        arguments returning the figure.
+        @param bool|str compression: optional, compress the data in binary files (filetype 'npz'
+                                     and 'hdf5'). For 'hdf5' the name of a h5py compression filter
+                                     (e.g. 'lzf') can be passed instead of True (gzip).
 
         1D data
         =======
@@ -334,6 +776,176 @@ class SaveLogic(GenericLogic):
         if timestamp is None:
             timestamp = datetime.datetime.now()
 
+        # try to trace back the functioncall to the class which was calling it.
+        module_name = self._get_calling_module_name()
+
+        saved = self._write_data_file(data=data,
+                                      module_name=module_name,
+                                      timestamp=timestamp,
+                                      poi_name=self.active_poi_name,
+                                      filepath=filepath,
+                                      parameters=parameters,
+                                      filename=filename,
+                                      filelabel=filelabel,
+                                      filetype=filetype,
+                                      fmt=fmt,
+                                      delimiter=delimiter,
+                                      compression=compression)
+        if saved is None:
+            return -1
+
+        # Save thumbnail figure of plot
+        if plotfig is not None:
+            if callable(plotfig):
+                plotfig = plotfig()
+            save_figure(plotfig,
+                        file_base=saved[1],
+                        metadata=self._figure_metadata(module_name, timestamp),
+                        save_pdf=self.save_pdf,
+                        save_png=self.save_png)
+            self.log.debug('Time needed to save data: {0:.2f}s'.format(time.time()-start_time))
+
+    def save_data_async(self, data, filepath=None, parameters=None, filename=None,
+                        filelabel=None, timestamp=None, filetype='text', fmt='%.15e',
+                        delimiter='\t', plotfig=None, compression=True):
+        """
+        Saves data like save_data, but writes the file and renders the figure in the background if
+        the config option async_save is set (synchronously otherwise).
+        The data arrays and parameters are copied right away, so the caller can continue to
+        change them after this method returns. sigDataSaved is emitted when the job has finished.
+
+        The parameters are the same as for save_data, except for:
+        @param matplotlib.figure.Figure|callable plotfig: optional, the figure to save or a callable
+                                                        without arguments returning the figure.
+                                                        The callable is called in the background
+                                                        and must only use data it was bound to
+                                                        (e.g. with functools.partial).
+
+        @return concurrent.futures.Future: future resolving to the path of the saved data file as
+                                           soon as the data file and the figure have been saved
+        """
+        if timestamp is None:
+            timestamp = datetime.datetime.now()
+        module_name = self._get_calling_module_name()
+
+        # Snapshot data and parameters of the calling module
+        data = OrderedDict((key, np.array(value)) for key, value in data.items())
+        try:
+            parameters = copy.deepcopy(parameters)
+        except (TypeError, copy.Error):
+            parameters = copy.copy(parameters)
+
+        future = concurrent.futures.Future()
+        job_args = (future, plotfig, module_name, timestamp)
+        job_kwargs = {'data': data,
+                      'poi_name': self.active_poi_name,
+                      'filepath': filepath,
+                      'parameters': parameters,
+                      'filename': filename,
+                      'filelabel': filelabel,
+                      'filetype': filetype,
+                      'fmt': fmt,
+                      'delimiter': delimiter,
+                      'compression': compression}
+        if self._write_executor is None:
+            self._save_job(*job_args, **job_kwargs)
+        else:
+            self._write_executor.submit(self._save_job, *job_args, **job_kwargs)
+        return future
+
+    @staticmethod
+    def call_when_saved(futures, callback):
+        """
+        Calls a function without arguments as soon as all given futures (returned by
+        save_data_async) are done. The function is called immediately if there are no futures.
+
+        @param list futures: the futures of the save jobs to wait for
+        @param callable callback: the function to call, e.g. the emit method of a signal
+        """
+        futures = list(futures)
+        if not futures:
+            callback()
+            return
+        lock = threading.Lock()
+        remaining = [len(futures)]
+
+        def future_done(future):
+            with lock:
+                remaining[0] -= 1
+                finished = remaining[0] == 0
+            if finished:
+                callback()
+
+        for future in futures:
+            future.add_done_callback(future_done)
+        return
+
+    def _save_job(self, future, plotfig, module_name, timestamp, **kwargs):
+        """
+        Saves data file and figure of a save_data_async call and resolves its future.
+        The figure is passed on to the figure rendering processes if possible.
+        """
+        file_path = ''
+        try:
+            saved = self._write_data_file(module_name=module_name, timestamp=timestamp, **kwargs)
+            if saved is None:
+                raise IOError('Saving data of module "{0}" failed.'.format(module_name))
+            file_path, file_base = saved
+
+            if plotfig is not None:
+                if callable(plotfig):
+                    plotfig = plotfig()
+                metadata = self._figure_metadata(module_name, timestamp)
+                if self._render_pool is not None:
+                    try:
+                        figure_bytes = pickle.dumps(plotfig)
+                    except Exception:
+                        self.log.debug('Figure can not be pickled. Rendering it in the writer '
+                                       'thread instead.')
+                    else:
+                        plt.close(plotfig)
+                        self._render_pool.apply_async(
+                            render_pickled_figure,
+                            (figure_bytes, file_base, metadata, self.save_pdf, self.save_png),
+                            callback=lambda result: self._finish_save_job(future, file_path),
+                            error_callback=lambda err: self._finish_save_job(future, file_path,
+                                                                             err))
+                        return
+                save_figure(plotfig,
+                            file_base=file_base,
+                            metadata=metadata,
+                            save_pdf=self.save_pdf,
+                            save_png=self.save_png)
+        except Exception as err:
+            self._finish_save_job(future, file_path, err)
+            return
+        self._finish_save_job(future, file_path)
+        return
+
+    def _finish_save_job(self, future, file_path, error=None):
+        """
+        Resolves the future of a save job and emits sigDataSaved.
+        """
+        if error is None:
+            future.set_result(file_path)
+        else:
+            self.log.error('Saving data in the background failed: {0}'.format(error))
+            future.set_exception(error)
+        self.sigDataSaved.emit(file_path, error is None)
+        return
+
+    def _write_data_file(self, data, module_name, timestamp, poi_name, filepath=None,
+                         parameters=None, filename=None, filelabel=None, filetype='text',
+                         fmt='%.15e', delimiter='\t', compression=True):
+        """
+        Writes the data file for save_data and save_data_async. See save_data for the parameters.
+
+        @param str module_name: name of the module the data is saved for
+        @param str poi_name: name of the active POI (prefix of the file label)
+
+        @return tuple: path of the written data file and base path (without ending) for the
+                       figure files, None if the data could not be saved
+        """
         # Try to cast data array into numpy.ndarray if it is not already one
         # Also collect information on arrays in the process and do sanity checks
         found_1d = False
@@ -351,7 +963,7 @@ class SaveLogic(GenericLogic):
                 except:
                     self.log.error('Casting data array of type "{0}" into numpy.ndarray failed. '
                                    'Could not save data.'.format(type(data[keyname])))
-                    return -1
+                    return None
 
             # determine dimensions
             if data[keyname].ndim < 3:
@@ -369,7 +981,7 @@ class SaveLogic(GenericLogic):
                     max_row_num += 1
             else:
                 self.log.error('Found data array with dimension >2. Unable to save data.')
-                return -1
+                return None
 
             # determine array data types
             if len(arr_dtype) > 0:
@@ -382,19 +994,7 @@ class SaveLogic(GenericLogic):
             self.log.error('Passed data dictionary contains 1D AND 2D arrays. This is not allowed. '
                            'Either fit all data arrays into a single 2D array or pass multiple 1D '
                            'arrays only. Saving data failed!')
-            return -1
-
-        # try to trace back the functioncall to the class which was calling it.
-        try:
-            frm = inspect.stack()[1]
-            # this will get the object, which called the save_data function.
-            mod = inspect.getmodule(frm[0])
-            # that will extract the name of the class.
-            module_name = mod.__name__.split('.')[-1]
-        except:
-            # Sometimes it is not possible to get the object which called the save_data function
-            # (such as when calling this from the console).
-            module_name = 'UNSPECIFIED'
+            return None
 
         # determine proper file path
         if filepath is None:
@@ -407,8 +1007,8 @@ class SaveLogic(GenericLogic):
         # create filelabel if none has been passed
         if filelabel is None:
             filelabel = module_name
-        if self.active_poi_name != '':
-            filelabel = self.active_poi_name.replace(' ', '_') + '_' + filelabel
+        if poi_name != '':
+            filelabel = poi_name.replace(' ', '_') + '_' + filelabel
 
         # determine proper unique filename to save if none has been passed
         if filename is None:
@@ -419,35 +1019,22 @@ class SaveLogic(GenericLogic):
             self.log.error('Length of list of format specifiers and number of data items differs. '
                            'Saving not possible. Please pass exactly as many format specifiers as '
                            'data arrays.')
-            return -1
+            return None
 
         # Create header string for the file
-        header = 'Saved Data from the class {0} on {1}.\n' \
-                 ''.format(module_name, timestamp.strftime('%d.%m.%Y at %Hh%Mm%Ss'))
-        header += '\nParameters:\n===========\n\n'
-        # Include the active POI name (if not empty) as a parameter in the header
-        if self.active_poi_name != '':
-            header += 'Measured at POI: {0}\n'.format(self.active_poi_name)
-        # add the parameters if specified:
-        if parameters is not None:
-            # check whether the format for the parameters have a dict type:
-            if isinstance(parameters, dict):
-                if isinstance(self._additional_parameters, dict):
-                    parameters = {**self._additional_parameters, **parameters}
-                for entry, param in parameters.items():
-                    if isinstance(param, float):
-                        header += '{0}: {1:.16e}\n'.format(entry, param)
-                    else:
-                        header += '{0}: {1}\n'.format(entry, param)
-            # make a hardcore string conversion and try to save the parameters directly:
-            else:
-                self.log.error('The parameters are not passed as a dictionary! The SaveLogic will '
-                               'try to save the parameters nevertheless.')
-                header += 'not specified parameters: {0}\n'.format(parameters)
-        header += '\nData:\n=====\n'
+        header, header_parameters = self._create_header(module_name, timestamp, parameters)
+
+        if filetype == 'hdf5' and h5py is None:
+            self.log.error('Saving data as HDF5 file requires the package "h5py". Saving as '
+                           'npz-file instead.')
+            filetype = 'npz'
+        elif filetype not in ('text', 'npz', 'hdf5'):
+            self.log.error('Only saving of data as textfile, npz-file and HDF5 file is implemented. '
+                           'Filetype "{0}" is not supported yet. Saving as textfile.'
+                           ''.format(filetype))
+            filetype = 'text'
 
         # write data to file
-        # FIXME: Implement other file formats
         # write to textfile
         if filetype == 'text':
             # Reshape data if multiple 1D arrays have been passed to this method.
@@ -491,80 +1078,29 @@ class SaveLogic(GenericLogic):
             self.save_array_as_text(data=data[identifier_str], filename=filename, filepath=filepath,
                                     fmt=fmt, header=header, delimiter=delimiter, comments='#',
                                     append=False)
+            file_path = os.path.join(filepath, filename)
         # write npz file and save parameters in textfile
         elif filetype == 'npz':
             header += str(list(data.keys()))[1:-1]
-            np.savez_compressed(filepath + '/' + filename[:-4], **data)
+            if compression:
+                np.savez_compressed(filepath + '/' + filename[:-4], **data)
+            else:
+                np.savez(filepath + '/' + filename[:-4], **data)
             self.save_array_as_text(data=[], filename=filename[:-4]+'_params.dat', filepath=filepath,
                                     fmt=fmt, header=header, delimiter=delimiter, comments='#',
                                     append=False)
+            file_path = os.path.join(filepath, filename[:-4] + '.npz')
+        # write HDF5 file with parameters as attributes
         else:
-            self.log.error('Only saving of data as textfile and npz-file is implemented. Filetype "{0}" is not '
-                           'supported yet. Saving as textfile.'.format(filetype))
-            self.save_array_as_text(data=data[identifier_str], filename=filename, filepath=filepath,
-                                    fmt=fmt, header=header, delimiter=delimiter, comments='#',
-                                    append=False)
+            attributes = OrderedDict()
+            attributes['Saved by'] = module_name
+            attributes['Timestamp'] = timestamp.isoformat()
+            attributes.update(header_parameters)
+            self.save_data_as_hdf5(data=data, filename=filename[:-4] + '.h5', filepath=filepath,
+                                   attributes=attributes, compression=compression)
+            file_path = os.path.join(filepath, filename[:-4] + '.h5')
 
-        #--------------------------------------------------------------------------------------------
-        # Save thumbnail figure of plot
-        if plotfig is not None:
-            # create Metadata
-            metadata = dict()
-            metadata['Title'] = 'Image produced by qudi: ' + module_name
-            metadata['Author'] = 'qudi - Software Suite'
-            metadata['Subject'] = 'Find more information on: https://github.com/Ulm-IQO/qudi'
-            metadata['Keywords'] = 'Python 3, Qt, experiment control, automation, measurement, software, framework, modular'
-            metadata['Producer'] = 'qudi - Software Suite'
-            if timestamp is not None:
-                metadata['CreationDate'] = timestamp
-                metadata['ModDate'] = timestamp
-            else:
-                metadata['CreationDate'] = time
-                metadata['ModDate'] = time
-            
-            if self.save_pdf:
-                # determine the PDF-Filename
-                fig_fname_vector = os.path.join(filepath, filename)[:-4] + '_fig.pdf'
-
-                # Create the PdfPages object to which we will save the pages:
-                # The with statement makes sure that the PdfPages object is closed properly at
-                # the end of the block, even if an Exception occurs.
-                with PdfPages(fig_fname_vector) as pdf:
-                    pdf.savefig(plotfig, bbox_inches='tight', pad_inches=0.05)
-
-                    # We can also set the file's metadata via the PdfPages object:
-                    pdf_metadata = pdf.infodict()
-                    for x in metadata:
-                        pdf_metadata[x] = metadata[x]
-
-            if self.save_png:
-                # determine the PNG-Filename and save the plain PNG
-                fig_fname_image = os.path.join(filepath, filename)[:-4] + '_fig.png'
-                plotfig.savefig(fig_fname_image, bbox_inches='tight', pad_inches=0.05)
-
-                # Use Pillow (an fork for PIL) to attach metadata to the PNG
-                png_image = Image.open(fig_fname_image)
-                png_metadata = PngImagePlugin.PngInfo()
-
-                # PIL can only handle Strings, so let's convert our times
-                metadata['CreationDate'] = metadata['CreationDate'].strftime('%Y%m%d-%H%M-%S')
-                metadata['ModDate'] = metadata['ModDate'].strftime('%Y%m%d-%H%M-%S')
-
-                for x in metadata:
-                    # make sure every value of the metadata is a string
-                    if not isinstance(metadata[x], str):
-                        metadata[x] = str(metadata[x])
-
-                    # add the metadata to the picture
-                    png_metadata.add_text(x, metadata[x])
-
-                # save the picture again, this time including the metadata
-                png_image.save(fig_fname_image, "png", pnginfo=png_metadata)
-
-            # close matplotlib figure
-            plt.close(plotfig)
-            self.log.debug('Time needed to save data: {0:.2f}s'.format(time.time()-start_time))
-            #----------------------------------------------------------------------------------
+        return file_path, os.path.join(filepath, filename)[:-4]
 
     def save_array_as_text(self, data, filename, filepath='', fmt='%.15e', header='',
                            delimiter='\t', comments='#', append=False):
@@ -583,6 +1119,218 @@ class SaveLogic(GenericLogic):
                            comments=comments)
         return
 
+    def save_data_as_hdf5(self, data, filename, filepath='', attributes=None, compression=True):
+        """
+        An independent method, which saves a dict of numpy.ndarrays as datasets of a HDF5 file.
+        The dict keys are stored as "header" attribute of each dataset. Since "/" separates groups
+        in HDF5, it is replaced by "_" in the dataset names.
+
+        @param dict data: data arrays to save with the keys being the data headers/descriptions
+        @param str filename: name of the file to create
+        @param str filepath: path to the directory of the file
+        @param dict attributes: optional, attributes (e.g. parameters) to save with the file
+        @param bool|str compression: optional, compress the datasets (True for gzip or the name of
+                                     the h5py compression filter)
+        """
+        if h5py is None:
+            raise ImportError('Saving data as HDF5 file requires the package "h5py".')
+        if compression is True:
+            compression = 'gzip'
+
+        with h5py.File(os.path.join(filepath, filename), 'w') as file:
+            if attributes:
+                for key, value in attributes.items():
+                    file.attrs[key] = hdf5_attribute_value(value)
+            for index, (key, arr) in enumerate(data.items()):
+                arr = np.asarray(arr)
+                if arr.dtype.kind == 'U':
+                    arr = arr.astype(h5py.string_dtype())
+                name = key.replace('/', '_') if key else 'data{0:d}'.format(index)
+                dataset = file.create_dataset(
+                    name,
+                    data=arr,
+                    compression=compression if compression and arr.ndim > 0 else None)
+                dataset.attrs['header'] = key
+        return
+
+    def open_data_stream(self, columns, filepath=None, parameters=None, filename=None,
+                         filelabel=None, timestamp=None, filetype='hdf5', dtype=float,
+                         compression=False, chunk_size=1024, fmt='%.15e', delimiter='\t',
+                         queue_size=0):
+        """
+        Creates a data file to stream rows of data into by calling append on the returned object
+        (see SaveDataStream). The data file must be closed by the caller after the last append.
+        File path and name are created the same way as in save_data.
+
+        @param list columns: names of the data columns (including units)
+        @param str filepath: optional, the path to the directory, where the file will be saved
+        @param dict parameters: optional, parameters to save in the file header/attributes
+        @param str filename: optional, fixed filename (including ending)
+        @param str filelabel: optional, label added to the generated filename
+        @param datetime timestamp: optional, timestamp for the generated filename
+        @param str filetype: optional, the file format to stream data to ('hdf5', 'npy' or
+                             'text'). Falls back to 'npy' if h5py is not installed.
+        @param dtype: optional, data type of the data (filetype 'hdf5' and 'npy' only)
+        @param bool|str compression: optional, compress the data (filetype 'hdf5' only)
+        @param int chunk_size: optional, number of rows per chunk (filetype 'hdf5' only)
+        @param str|list fmt: optional, format specifier(s) for the data (filetype 'text' only)
+        @param str delimiter: optional, column delimiter (filetype 'text' only)
+        @param int queue_size: optional, if > 0 the data is appended from a background thread
+                               with a queue for this number of data frames (see
+                               ThreadedDataStream). A figure passed to its close method is saved
+                               next to the data file by the writer thread.
+
+        @return SaveDataStream|ThreadedDataStream: the opened data file
+        """
+        if timestamp is None:
+            timestamp = datetime.datetime.now()
+        module_name = self._get_calling_module_name()
+
+        if filepath is None:
+            filepath = self.get_path_for_module(module_name)
+        elif not os.path.exists(filepath):
+            os.makedirs(filepath)
+            self.log.info('Custom filepath does not exist. Created directory "{0}"'
+                          ''.format(filepath))
+
+        if filetype == 'hdf5' and h5py is None:
+            self.log.error('Streaming data to HDF5 file requires the package "h5py". Streaming '
+                           'to npy-file instead.')
+            filetype = 'npy'
+
+        if filelabel is None:
+            filelabel = module_name
+        if self.active_poi_name != '':
+            filelabel = self.active_poi_name.replace(' ', '_') + '_' + filelabel
+        if filename is None:
+            extension = {'hdf5': '.h5', 'npy': '.npy'}.get(filetype, '.dat')
+            filename = timestamp.strftime('%Y%m%d-%H%M-%S' + '_' + filelabel + extension)
+
+        header, header_parameters = self._create_header(module_name, timestamp, parameters)
+        attributes = OrderedDict()
+        attributes['Saved by'] = module_name
+        attributes['Timestamp'] = timestamp.isoformat()
+        attributes.update(header_parameters)
+
+        stream = SaveDataStream(file_path=os.path.join(filepath, filename),
+                                columns=columns,
+                                header=header,
+                                attributes=attributes,
+                                filetype=filetype,
+                                dtype=dtype,
+                                compression=compression,
+                                chunk_size=chunk_size,
+                                fmt=fmt,
+                                delimiter=delimiter)
+        if queue_size > 0:
+            return ThreadedDataStream(
+                stream,
+                queue_size=queue_size,
+                on_closed=functools.partial(self._finish_data_stream, module_name, timestamp))
+        return stream
+
+    def _finish_data_stream(self, module_name, timestamp, stream, plotfig):
+        """
+        Saves the figure of a closed ThreadedDataStream and emits sigDataSaved. Called from the
+        writer thread of the stream.
+        """
+        error = stream.error
+        if plotfig is not None and error is None:
+            try:
+                if callable(plotfig):
+                    plotfig = plotfig()
+                save_figure(plotfig,
+                            file_base=os.path.splitext(stream.file_path)[0],
+                            metadata=self._figure_metadata(module_name, timestamp),
+                            save_pdf=self.save_pdf,
+                            save_png=self.save_png)
+            except Exception as err:
+                error = err
+        if error is not None:
+            self.log.error('Saving data stream "{0}" failed: {1}'.format(stream.file_path, error))
+        self.sigDataSaved.emit(stream.file_path, error is None)
+        return
+
+    def _create_header(self, module_name, timestamp, parameters):
+        """
+        Creates the text file header including the parameters to save.
+
+        @param str module_name: name of the module saving data
+        @param datetime timestamp: the timestamp of the data
+        @param dict parameters: the parameters to save (merged with the additional parameters)
+
+        @return (str, OrderedDict): the header string and the dict of all parameters in the header
+        """
+        header_parameters = OrderedDict()
+        header = 'Saved Data from the class {0} on {1}.\n' \
+                 ''.format(module_name, timestamp.strftime('%d.%m.%Y at %Hh%Mm%Ss'))
+        header += '\nParameters:\n===========\n\n'
+        # Include the active POI name (if not empty) as a parameter in the header
+        if self.active_poi_name != '':
+            header += 'Measured at POI: {0}\n'.format(self.active_poi_name)
+            header_parameters['Measured at POI'] = self.active_poi_name
+        # add the parameters if specified:
+        if parameters is not None:
+            # check whether the format for the parameters have a dict type:
+            if isinstance(parameters, dict):
+                if isinstance(self._additional_parameters, dict):
+                    parameters = {**self._additional_parameters, **parameters}
+                for entry, param in parameters.items():
+                    if isinstance(param, float):
+                        header += '{0}: {1:.16e}\n'.format(entry, param)
+                    else:
+                        header += '{0}: {1}\n'.format(entry, param)
+                    header_parameters[str(entry)] = param
+            # make a hardcore string conversion and try to save the parameters directly:
+            else:
+                self.log.error('The parameters are not passed as a dictionary! The SaveLogic will '
+                               'try to save the parameters nevertheless.')
+                header += 'not specified parameters: {0}\n'.format(parameters)
+                header_parameters['not specified parameters'] = str(parameters)
+        header += '\nData:\n=====\n'
+        return header, header_parameters
+
+    @staticmethod
+    def _figure_metadata(module_name, timestamp):
+        """
+        Creates the metadata attached to saved figures.
+
+        @param str module_name: name of the module the figure is saved for
+        @param datetime timestamp: creation time of the figure
+
+        @return dict: the metadata
+        """
+        metadata = dict()
+        metadata['Title'] = 'Image produced by qudi: ' + module_name
+        metadata['Author'] = 'qudi - Software Suite'
+        metadata['Subject'] = 'Find more information on: https://github.com/Ulm-IQO/qudi'
+        metadata['Keywords'] = 'Python 3, Qt, experiment control, automation, measurement, software, framework, modular'
+        metadata['Producer'] = 'qudi - Software Suite'
+        metadata['CreationDate'] = timestamp
+        metadata['ModDate'] = timestamp
+        return metadata
+
+    @staticmethod
+    def _get_calling_module_name(depth=2):
+        """
+        Returns the name (last part) of the module the caller of the calling SaveLogic method is
+        defined in. Only the frame objects are accessed since inspect.stack() would also read the
+        source code context of every frame on the stack, which is slow.
+
+        @param int depth: depth of the frame to inspect (2: caller of the calling method)
+
+        @return str: the module name or 'UNSPECIFIED' if it can not be inferred
+        """
+        try:
+            module_name = sys._getframe(depth).f_globals['__name__'].split('.')[-1]
+        except (ValueError, KeyError, AttributeError):
+            # Sometimes it is not possible to get the module which called the save_data function
+            return 'UNSPECIFIED'
+        # No module available (e.g. when calling this from the console)
+        if module_name == '__main__':
+            return 'UNSPECIFIED'
+        return module_name
+
     def get_daily_directory(self):
         """ Gets or creates daily save directory.
 
@@ -22,6 +22,7 @@ top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi
 from qtpy import QtCore
 import numpy as np
 import datetime as dt
+import functools
 import time
 import matplotlib.pyplot as plt
 
@@ -44,6 +45,9 @@ class TimeSeriesReaderLogic(GenericLogic):
         module.Class: 'time_series_reader_logic.TimeSeriesReaderLogic'
         max_frame_rate: 10  # optional (10Hz by default)
         calc_digital_freq: True  # optional (True by default)
+        record_file_type: 'hdf5'  # optional ('hdf5' by default, 'npy' or 'text')
+        record_queue_size: 1000  # optional (max. number of data frames waiting to be written)
+        max_read_frames: 10  # optional (max. number of frames read at once, sets buffer size)
         connect:
             _streamer_con: <streamer_name>
             _savelogic_con: <save_logic_name>
@@ -61,6 +65,9 @@ class TimeSeriesReaderLogic(GenericLogic):
     # config options
     _max_frame_rate = ConfigOption('max_frame_rate', default=10, missing='warn')
     _calc_digital_freq = ConfigOption('calc_digital_freq', default=True, missing='warn')
+    _record_file_type = ConfigOption('record_file_type', default='hdf5', missing='nothing')
+    _record_queue_size = ConfigOption('record_queue_size', default=1000, missing='nothing')
+    _max_read_frames = ConfigOption('max_read_frames', default=10, missing='nothing')
 
     # status vars
     _trace_window_size = StatusVar('trace_window_size', default=6)
@@ -70,6 +77,9 @@ class TimeSeriesReaderLogic(GenericLogic):
     _active_channels = StatusVar('active_channels', default=None)
     _averaged_channels = StatusVar('averaged_channels', default=None)
 
+    # maximum number of samples per channel kept for the figure of a recording
+    _record_preview_size = 100000
+
     def __init__(self, *args, **kwargs):
         """
         """
@@ -83,16 +93,36 @@ class TimeSeriesReaderLogic(GenericLogic):
         self._samples_per_frame = None
         self._stop_requested = True
 
-        # Data arrays
+        # Data arrays (circular buffers, see _write_ring_buffer)
         self._trace_data = None
         self._trace_times = None
         self._trace_data_averaged = None
-        self.__moving_filter = None
-
-        # for data recording
-        self._recorded_data = None
+        self._trace_head = 0
+        self._averaged_head = 0
+        self._last_data_update = 0
+
+        # Preallocated (double) buffers the streamer reads the raw data into and buffers for the
+        # oversampling reduction and the moving average (see _init_frame_buffers)
+        self._frame_buffers = None
+        self._frame_buffer_index = 0
+        self._reduced_buffer = None
+        self._average_window_buffer = None
+        self._running_sum_buffer = None
+        self._averaged_buffer = None
+        self._averaged_channel_indices = tuple()
+        self._frames_acquired = 0
+        self._buffer_allocations = 0
+        self._frame_allocations = 0
+
+        # for data recording (data is streamed to file by a background writer thread)
+        self._data_recorder = None
         self._data_recording_active = False
         self._record_start_time = None
+        self._recorded_samples = 0
+        # decimated copy of the recording (every _record_preview_step-th sample) for its figure
+        self._record_preview = None
+        self._record_preview_samples = 0
+        self._record_preview_step = 1
         return
 
     def on_activate(self):
@@ -166,10 +196,48 @@ class TimeSeriesReaderLogic(GenericLogic):
             [self.number_of_active_channels, window_size + self._moving_average_width // 2])
         self._trace_data_averaged = np.zeros(
             [len(self._averaged_channels), window_size - self._moving_average_width // 2])
+        self._trace_head = 0
+        self._averaged_head = 0
         self._trace_times = np.arange(window_size) / self.data_rate
-        self._recorded_data = list()
+        self._init_frame_buffers()
+        return
+
+    def _init_frame_buffers(self):
+        """
+        Allocates the buffers the raw data is read into. Two flat buffers are used in turn, so the
+        data of the previous frame stays valid while the next frame is read. Each holds up to
+        max_read_frames data frames (including oversampling) for all active channels.
+        The temporary arrays of the moving average are allocated here as well, so processing a
+        frame does not allocate any arrays.
+        """
+        capacity = self._frame_buffer_capacity
+        size = max(self.number_of_active_channels, 1) * capacity
+        self._frame_buffers = [np.zeros(size, dtype=self._streamer.data_type) for _ in range(2)]
+        self._reduced_buffer = np.zeros(size, dtype=np.float64)
+        self._frame_buffer_index = 0
+
+        # The moving average of at most one reduced frame is calculated per data frame
+        self._averaged_channel_indices = tuple(
+            self.active_channel_names.index(ch) for ch in self.averaged_channel_names)
+        averaged_channels = len(self._averaged_channel_indices)
+        averaged_samples = capacity // self.oversampling_factor
+        window_samples = averaged_samples + self._moving_average_width - 1
+        self._average_window_buffer = np.zeros((averaged_channels, window_samples))
+        # The first column of the running sums is always 0
+        self._running_sum_buffer = np.zeros((averaged_channels, window_samples + 1))
+        self._averaged_buffer = np.zeros((averaged_channels, averaged_samples))
+        self._buffer_allocations += 6
         return
 
+    @property
+    def _frame_buffer_capacity(self):
+        """
+        Maximum number of raw samples per channel to read in one frame (integer multiple of the
+        oversampling factor).
+        """
+        samples_per_frame = max(self._samples_per_frame or 1, 1)
+        return samples_per_frame * max(int(self._max_read_frames), 1) * self.oversampling_factor
+
     @property
     def trace_window_size_samples(self):
         return int(round(self._trace_window_size * self.data_rate))
@@ -214,6 +282,32 @@ class TimeSeriesReaderLogic(GenericLogic):
     def data_recording_active(self):
         return self._data_recording_active
 
+    @property
+    def recording_statistics(self):
+        """
+        Backpressure statistics of the current (or last) data recording.
+
+        @return dict: queue_depth, max_queue_depth, frames_written, rows_written, dropped_frames
+                      and dropped_rows (see ThreadedDataStream) or None if nothing was recorded
+        """
+        if self._data_recorder is None:
+            return None
+        return self._data_recorder.statistics
+
+    @property
+    def acquisition_statistics(self):
+        """
+        Statistics of the data acquisition into the preallocated frame buffers.
+
+        @return dict: frames_acquired, buffer_allocations (total number of allocated frame
+                      buffers) and frame_allocations (number of arrays allocated while acquiring
+                      and processing the last frame: 0, or 1 for the copy handed to the writer
+                      thread while recording, unless the frame buffers had to be enlarged)
+        """
+        return {'frames_acquired': self._frames_acquired,
+                'buffer_allocations': self._buffer_allocations,
+                'frame_allocations': self._frame_allocations}
+
     @property
     def oversampling_factor(self):
         """
@@ -279,8 +373,9 @@ class TimeSeriesReaderLogic(GenericLogic):
 
     @property
     def trace_data(self):
-        data_offset = self._trace_data.shape[1] - self._moving_average_width // 2
-        data = {ch: self._trace_data[i, :data_offset] for i, ch in
+        trace_data = self._read_ring_buffer(self._trace_data, self._trace_head, copy=True)
+        data_offset = trace_data.shape[1] - self._moving_average_width // 2
+        data = {ch: trace_data[i, :data_offset] for i, ch in
                 enumerate(self.active_channel_names)}
         return self._trace_times, data
 
@@ -288,9 +383,10 @@ class TimeSeriesReaderLogic(GenericLogic):
     def averaged_trace_data(self):
         if not self.averaged_channel_names or self.moving_average_width <= 1:
             return None, None
-        data = {ch: self._trace_data_averaged[i] for i, ch in
-                enumerate(self.averaged_channel_names)}
-        return self._trace_times[-self._trace_data_averaged.shape[1]:], data
+        averaged_data = self._read_ring_buffer(self._trace_data_averaged, self._averaged_head,
+                                               copy=True)
+        data = {ch: averaged_data[i] for i, ch in enumerate(self.averaged_channel_names)}
+        return self._trace_times[-averaged_data.shape[1]:], data
 
     @property
     def all_settings(self):
@@ -373,8 +469,6 @@ class TimeSeriesReaderLogic(GenericLogic):
                 if new_val / data_rate > self.trace_window_size:
                     if 'data_rate' in settings_dict or 'trace_window_size' in settings_dict:
                         self._moving_average_width = new_val
-                        self.__moving_filter = np.full(shape=self.moving_average_width,
-                                                       fill_value=1.0 / self.moving_average_width)
                     else:
                         self.log.warning('Moving average width to set ({0:d}) is smaller than the '
                                          'trace window size. Will adjust trace window size to '
@@ -382,8 +476,6 @@ class TimeSeriesReaderLogic(GenericLogic):
                         self._trace_window_size = float(new_val / data_rate)
                 else:
                     self._moving_average_width = new_val
-                    self.__moving_filter = np.full(shape=self.moving_average_width,
-                                                   fill_value=1.0 / self.moving_average_width)
 
             if 'data_rate' in settings_dict:
                 new_val = float(settings_dict['data_rate'])
@@ -505,8 +597,7 @@ class TimeSeriesReaderLogic(GenericLogic):
             # self.sigSettingsChanged.emit(settings)
 
             if self._data_recording_active:
-                self._record_start_time = dt.datetime.now()
-                self._recorded_data = list()
+                self._start_data_recorder()
 
             if self._streamer.start_stream() < 0:
                 self.log.error('Error while starting streaming device data acquisition.')
@@ -545,23 +636,26 @@ class TimeSeriesReaderLogic(GenericLogic):
                         self.log.error(
                             'Error while trying to stop streaming device data acquisition.')
                     if self._data_recording_active:
-                        self._save_recorded_data(to_file=True, save_figure=True)
-                        self._recorded_data = list()
+                        self._stop_data_recorder()
                     self._data_recording_active = False
                     self.module_state.unlock()
                     self.sigStatusChanged.emit(False, False)
+                    self.sigDataChanged.emit(*self.trace_data, *self.averaged_trace_data)
                     return
 
                 samples_to_read = max(
                     (self._streamer.available_samples // self._oversampling_factor) * self._oversampling_factor,
                     self._samples_per_frame * self._oversampling_factor)
+                # Remaining samples are read with the next frame
+                samples_to_read = min(samples_to_read, self._frame_buffer_capacity)
                 if samples_to_read < 1:
                     self._sigNextDataFrame.emit()
                     return
 
-                # read the current counter values
-                data = self._streamer.read_data(number_of_samples=samples_to_read)
-                if data.shape[1] != samples_to_read:
+                # read the current counter values into the next preallocated frame buffer
+                self._frame_allocations = 0
+                data = self._read_frame_data(samples_to_read)
+                if data is None:
                     self.log.error('Reading data from streamer went wrong; '
                                    'killing the stream with next data frame.')
                     self._stop_requested = True
@@ -571,25 +665,60 @@ class TimeSeriesReaderLogic(GenericLogic):
                 # Process data
                 self._process_trace_data(data)
 
-                # Emit update signal
-                self.sigDataChanged.emit(*self.trace_data, *self.averaged_trace_data)
+                # Emit update signal (the trace is only unwrapped for display with max frame rate)
+                now = time.perf_counter()
+                if now - self._last_data_update >= 1 / self._max_frame_rate:
+                    self._last_data_update = now
+                    self.sigDataChanged.emit(*self.trace_data, *self.averaged_trace_data)
                 self._sigNextDataFrame.emit()
         return
 
+    def _read_frame_data(self, number_of_samples):
+        """
+        Reads raw data from the streaming device into the next of the preallocated frame buffers
+        (see DataInStreamInterface.read_data_into_buffer).
+
+        @param int number_of_samples: number of samples per channel to read
+
+        @return numpy.ndarray: 2D view (channels, samples) on the frame buffer, None on error
+        """
+        channels = self.number_of_active_channels
+        if self._frame_buffers is None or \
+                self._frame_buffers[0].size < channels * number_of_samples or \
+                self._frame_buffers[0].dtype != self._streamer.data_type:
+            allocations = self._buffer_allocations
+            self._init_frame_buffers()
+            self._frame_allocations += self._buffer_allocations - allocations
+        self._frame_buffer_index = (self._frame_buffer_index + 1) % len(self._frame_buffers)
+        buffer = self._frame_buffers[self._frame_buffer_index][:channels * number_of_samples]
+
+        read_samples = self._streamer.read_data_into_buffer(buffer,
+                                                            number_of_samples=number_of_samples)
+        if read_samples != number_of_samples:
+            return None
+        self._frames_acquired += 1
+        return buffer.reshape((channels, number_of_samples))
+
     def _process_trace_data(self, data):
         """
-        Processes raw data from the streaming device
+        Processes raw data from the streaming device. The raw data array is altered in place.
         """
-        # Down-sample and average according to oversampling factor
-        if self.oversampling_factor > 1:
+        # Down-sample and average according to oversampling factor (in place into the
+        # preallocated reduction buffer)
+        if self.oversampling_factor > 1 or data.dtype != self._reduced_buffer.dtype:
             if data.shape[1] % self.oversampling_factor != 0:
                 self.log.error('Number of samples per channel not an integer multiple of the '
                                'oversampling factor.')
                 return -1
-            tmp = data.reshape((data.shape[0],
-                                data.shape[1] // self.oversampling_factor,
-                                self.oversampling_factor))
-            data = np.mean(tmp, axis=2)
+            reduced_samples = data.shape[1] // self.oversampling_factor
+            reduced = self._reduced_buffer[:data.shape[0] * reduced_samples].reshape(
+                (data.shape[0], reduced_samples))
+            if self.oversampling_factor > 1:
+                tmp = data.reshape((data.shape[0], reduced_samples, self.oversampling_factor))
+                np.mean(tmp, axis=2, out=reduced)
+            else:
+                np.copyto(reduced, data)
+            data = reduced
 
         digital_channels = [c for c, typ in self.active_channel_types.items() if
                             typ == StreamChannelType.DIGITAL]
@@ -597,27 +726,99 @@ class TimeSeriesReaderLogic(GenericLogic):
         if self._calc_digital_freq and digital_channels:
             data[:len(digital_channels)] *= self.sampling_rate
 
-        # Append data to save if necessary
-        if self._data_recording_active:
-            self._recorded_data.append(data.copy())
+        # Hand data over to the recorder writer thread (rows: samples, columns: channels)
+        if self._data_recording_active and self._data_recorder is not None:
+            self._frame_allocations += 1
+            self._data_recorder.append(data.transpose().copy())
+            self._add_to_record_preview(data)
 
         data = data[:, -self._trace_data.shape[1]:]
         new_samples = data.shape[1]
 
-        # Roll data array to have a continuously running time trace
-        self._trace_data = np.roll(self._trace_data, -new_samples, axis=1)
-        # Insert new data
-        self._trace_data[:, -new_samples:] = data
-
-        # Calculate moving average by using numpy.convolve with a normalized uniform filter
-        if self.moving_average_width > 1 and self.averaged_channel_names:
-            # Only convolve the new data and roll the previously calculated moving average
-            self._trace_data_averaged = np.roll(self._trace_data_averaged, -new_samples, axis=1)
-            offset = new_samples + len(self.__moving_filter) - 1
-            for i, ch in enumerate(self.averaged_channel_names):
-                data_index = self.active_channel_names.index(ch)
-                self._trace_data_averaged[i, -new_samples:] = np.convolve(
-                    self._trace_data[data_index, -offset:], self.__moving_filter, mode='valid')
+        # Insert new data into circular buffer to have a continuously running time trace
+        self._trace_head = self._write_ring_buffer(self._trace_data, self._trace_head, data)
+
+        # Calculate moving average of the new data points only by using running sums over the new
+        # data and the preceding (moving_average_width - 1) samples.
+        width = self.moving_average_width
+        if width > 1 and self._averaged_channel_indices:
+            new_averaged = min(new_samples, self._trace_data_averaged.shape[1])
+            window_samples = new_averaged + width - 1
+            window_data = self._average_window_buffer[:, :window_samples]
+            for row, channel in enumerate(self._averaged_channel_indices):
+                self._read_ring_buffer_into(self._trace_data[channel],
+                                            self._trace_head,
+                                            window_data[row])
+            running_sum = self._running_sum_buffer[:, :window_samples + 1]
+            np.cumsum(window_data, axis=1, out=running_sum[:, 1:])
+            averaged = self._averaged_buffer[:, :new_averaged]
+            np.subtract(running_sum[:, width:], running_sum[:, :-width], out=averaged)
+            averaged /= width
+            self._averaged_head = self._write_ring_buffer(self._trace_data_averaged,
+                                                          self._averaged_head,
+                                                          averaged)
+        return
+
+    @staticmethod
+    def _write_ring_buffer(buffer, head, data):
+        """
+        Writes data into a circular buffer. The oldest samples are overwritten.
+
+        @param numpy.ndarray buffer: 2D circular buffer (channels, samples)
+        @param int head: buffer index to write the next sample to (i.e. the oldest sample)
+        @param numpy.ndarray data: 2D array (channels, samples) to write into the buffer
+
+        @return int: the new head index of the buffer
+        """
+        size = buffer.shape[1]
+        data = data[:, -size:]
+        new_samples = data.shape[1]
+        first_samples = min(new_samples, size - head)
+        buffer[:, head:head + first_samples] = data[:, :first_samples]
+        buffer[:, :new_samples - first_samples] = data[:, first_samples:]
+        return (head + new_samples) % size
+
+    @staticmethod
+    def _read_ring_buffer(buffer, head, number_of_samples=None, copy=False):
+        """
+        Returns the latest samples of a circular buffer in chronological order.
+        If the samples are not wrapped around the buffer end and copy is False, a view into the
+        buffer is returned.
+
+        @param numpy.ndarray buffer: 2D circular buffer (channels, samples)
+        @param int head: buffer index of the oldest sample
+        @param int number_of_samples: optional, number of latest samples to return (default: all)
+        @param bool copy: optional, always return a copy (e.g. to hand data to another thread)
+
+        @return numpy.ndarray: 2D array (channels, samples) of the latest samples
+        """
+        size = buffer.shape[1]
+        if number_of_samples is None or number_of_samples > size:
+            number_of_samples = size
+        start = head - number_of_samples
+        if start >= 0:
+            samples = buffer[:, start:head]
+        elif head == 0:
+            samples = buffer[:, start:]
+        else:
+            return np.concatenate((buffer[:, start:], buffer[:, :head]), axis=1)
+        return samples.copy() if copy else samples
+
+    @staticmethod
+    def _read_ring_buffer_into(buffer, head, out):
+        """
+        Copies the latest samples of a 1D circular buffer in chronological order into out.
+
+        @param numpy.ndarray buffer: 1D circular buffer
+        @param int head: buffer index of the oldest sample
+        @param numpy.ndarray out: 1D array to fill with the latest len(out) samples
+        """
+        start = head - out.shape[0]
+        if start >= 0:
+            out[:] = buffer[start:head]
+        else:
+            out[:-start] = buffer[start:]
+            out[-start:] = buffer[:head]
         return
 
     @QtCore.Slot()
@@ -635,8 +836,7 @@ class TimeSeriesReaderLogic(GenericLogic):
 
             self._data_recording_active = True
             if self.module_state() == 'locked':
-                self._recorded_data = list()
-                self._record_start_time = dt.datetime.now()
+                self._start_data_recorder()
                 self.sigStatusChanged.emit(True, True)
             else:
                 self.start_reading()
@@ -645,7 +845,7 @@ class TimeSeriesReaderLogic(GenericLogic):
     @QtCore.Slot()
     def stop_recording(self):
         """
-        Stop the accumulative data recording and save data to file. Will not stop the data stream.
+        Stop the data recording and close the data file. Will not stop the data stream.
         Ignored if stream reading is inactive (module is in idle state).
 
         @return int: Error code (0: OK, -1: Error)
@@ -657,72 +857,112 @@ class TimeSeriesReaderLogic(GenericLogic):
 
             self._data_recording_active = False
             if self.module_state() == 'locked':
-                self._save_recorded_data(to_file=True, save_figure=True)
-                self._recorded_data = list()
+                self._stop_data_recorder()
                 self.sigStatusChanged.emit(True, False)
         return 0
 
-    def _save_recorded_data(self, to_file=True, name_tag='', save_figure=True):
-        """ Save the counter trace data and writes it to a file.
-
-        @param bool to_file: indicate, whether data have to be saved to file
-        @param str name_tag: an additional tag, which will be added to the filename upon save
-        @param bool save_figure: select whether png and pdf should be saved
-
-        @return dict parameters: Dictionary which contains the saving parameters
+    def _start_data_recorder(self):
         """
-        if not self._recorded_data:
-            self.log.error('No data has been recorded. Save to file failed.')
-            return np.empty(0), dict()
-
-        data_arr = np.concatenate(self._recorded_data, axis=1)
-        if data_arr.size == 0:
-            self.log.error('No data has been recorded. Save to file failed.')
-            return np.empty(0), dict()
-
-        saving_stop_time = self._record_start_time + dt.timedelta(
-            seconds=data_arr.shape[1] / self.data_rate)
+        Opens the data file for the recording and starts the writer thread streaming the recorded
+        data to it (see SaveLogic.open_data_stream).
+        """
+        self._record_start_time = dt.datetime.now()
 
         # write the parameters:
         parameters = dict()
         parameters['Start recoding time'] = self._record_start_time.strftime(
             '%d.%m.%Y, %H:%M:%S.%f')
-        parameters['Stop recoding time'] = saving_stop_time.strftime('%d.%m.%Y, %H:%M:%S.%f')
         parameters['Data rate (Hz)'] = self.data_rate
         parameters['Oversampling factor (samples)'] = self.oversampling_factor
         parameters['Sampling rate (Hz)'] = self.sampling_rate
 
-        if to_file:
-            # If there is a postfix then add separating underscore
-            filelabel = 'data_trace_{0}'.format(name_tag) if name_tag else 'data_trace'
+        self._recorded_samples = 0
+        self._record_preview = np.empty((self.number_of_active_channels,
+                                         self._record_preview_size))
+        self._record_preview_samples = 0
+        self._record_preview_step = 1
+
+        columns = ['{0} ({1})'.format(ch, unit) for ch, unit in self.active_channel_units.items()]
+        filepath = self._savelogic.get_path_for_module(module_name='TimeSeriesReader')
+        self._data_recorder = self._savelogic.open_data_stream(
+            columns=columns,
+            filepath=filepath,
+            parameters=parameters,
+            filelabel='data_trace',
+            timestamp=self._record_start_time,
+            filetype=self._record_file_type,
+            chunk_size=max(self._samples_per_frame, 1),
+            queue_size=max(self._record_queue_size, 1))
+        return
 
-            # prepare the data in a dict:
-            header = ', '.join(
-                '{0} ({1})'.format(ch, unit) for ch, unit in self.active_channel_units.items())
+    def _stop_data_recorder(self):
+        """
+        Stops the recording. Returns immediately, the writer thread writes the remaining data,
+        the stop time and the figure of the recording and closes the data file in the background.
+
+        @return dict: the recording statistics (see recording_statistics)
+        """
+        if self._data_recorder is None:
+            return None
+        saving_stop_time = self._record_start_time + dt.timedelta(
+            seconds=self._recorded_samples / self.data_rate)
+        parameters = {'Stop recoding time': saving_stop_time.strftime('%d.%m.%Y, %H:%M:%S.%f')}
+
+        plotfig = None
+        if self._record_preview_samples > 0:
+            unit_list = tuple(self.active_channel_units.values())
+            y_unit = max(set(unit_list), key=unit_list.count) if unit_list else 'arb.u.'
+            plotfig = functools.partial(
+                self._draw_figure,
+                self._record_preview[:, :self._record_preview_samples].copy(),
+                self.data_rate / self._record_preview_step,
+                y_unit)
+
+        self._data_recorder.close(parameters=parameters,
+                                  plotfig=plotfig,
+                                  callback=self._data_recorder_closed)
+        self._record_preview = None
+        statistics = self._data_recorder.statistics
+        if statistics['dropped_frames'] > 0:
+            self.log.warning('Data could not be written fast enough. {0:d} data frames '
+                             '({1:d} samples) have been dropped from the recording.'
+                             ''.format(statistics['dropped_frames'], statistics['dropped_rows']))
+        return statistics
+
+    def _data_recorder_closed(self, recorder):
+        """
+        Called from the writer thread of the recording once the data file has been closed.
+
+        @param ThreadedDataStream recorder: the closed recording
+        """
+        if recorder.error is None:
+            self.log.info('Time series saved to: {0}'.format(recorder.file_path))
+        return
 
-            data = {header: data_arr.transpose()}
-            filepath = self._savelogic.get_path_for_module(module_name='TimeSeriesReader')
-            set_of_units = set(self.active_channel_units.values())
-            unit_list = tuple(self.active_channel_units)
-            y_unit = 'arb.u.'
-            occurrences = 0
-            for unit in set_of_units:
-                count = unit_list.count(unit)
-                if count > occurrences:
-                    occurrences = count
-                    y_unit = unit
-
-            fig = self._draw_figure(data_arr, self.data_rate, y_unit) if save_figure else None
-
-            self._savelogic.save_data(data=data,
-                                      filepath=filepath,
-                                      parameters=parameters,
-                                      filelabel=filelabel,
-                                      plotfig=fig,
-                                      delimiter='\t',
-                                      timestamp=saving_stop_time)
-            self.log.info('Time series saved to: {0}'.format(filepath))
-        return data_arr, parameters
+    def _add_to_record_preview(self, data):
+        """
+        Adds every _record_preview_step-th sample of a recorded data frame to the preview of the
+        recording. If the preview is full, every second preview sample is discarded and the step
+        is doubled, i.e. the preview always spans the whole recording.
+
+        @param numpy.ndarray data: the recorded data frame (channels, samples)
+        """
+        first = -self._recorded_samples % self._record_preview_step
+        self._recorded_samples += data.shape[1]
+        new_data = data[:, first::self._record_preview_step]
+        while self._record_preview_samples + new_data.shape[1] > self._record_preview_size:
+            # The preview sample i is the recorded sample i * step and new_data continues the
+            # preview, so the samples at even preview indices are kept.
+            new_data = new_data[:, self._record_preview_samples % 2::2]
+            kept = (self._record_preview_samples + 1) // 2
+            self._record_preview[:, :kept] = \
+                self._record_preview[:, :self._record_preview_samples:2]
+            self._record_preview_samples = kept
+            self._record_preview_step *= 2
+        end = self._record_preview_samples + new_data.shape[1]
+        self._record_preview[:, self._record_preview_samples:end] = new_data
+        self._record_preview_samples = end
+        return
 
     def _draw_figure(self, data, timebase, y_unit):
         """ Draw figure to save with data file.
@@ -774,8 +1014,9 @@ class TimeSeriesReaderLogic(GenericLogic):
 
             header = ', '.join(
                 '{0} ({1})'.format(ch, unit) for ch, unit in self.active_channel_units.items())
-            data_offset = self._trace_data.shape[1] - self.moving_average_width // 2
-            data = {header: self._trace_data[:, :data_offset].transpose()}
+            trace_data = self._read_ring_buffer(self._trace_data, self._trace_head)
+            data_offset = trace_data.shape[1] - self.moving_average_width // 2
+            data = {header: trace_data[:, :data_offset].transpose()}
 
             if to_file:
                 filepath = self._savelogic.get_path_for_module(module_name='TimeSeriesReader')
@@ -806,8 +1047,7 @@ class TimeSeriesReaderLogic(GenericLogic):
                 self.log.error(
                     'Error while trying to stop streaming device data acquisition.')
             if self._data_recording_active:
-                self._save_recorded_data(to_file=True, save_figure=True)
-                self._recorded_data = list()
+                self._stop_data_recorder()
             self._data_recording_active = False
             self.module_state.unlock()
             self.sigStatusChanged.emit(False, False)
@@ -27,6 +27,136 @@ from core.connector import Connector
 from logic.generic_logic import GenericLogic
 
 
+class DwellTimeCounter:
+    """
+    Vectorized run-length analysis of a trace digitized with a threshold (value >= threshold is
+    the high/bright state). The state changes are found from the differences of the digital trace
+    instead of following the trace sample by sample.
+
+    The trace can be passed in several chunks by calling add_chunk repeatedly, e.g. if the trace
+    is read piece by piece from a file because it does not fit into memory. Runs spanning the
+    borders of the chunks are merged.
+    """
+
+    def __init__(self, threshold):
+        """
+        @param float threshold: samples >= threshold are in the high state
+        """
+        self.threshold = threshold
+        self._lengths = list()
+        self._states = list()
+        # The last run of the trace so far is still open (length 0: no data added yet)
+        self._open_length = 0
+        self._open_state = False
+
+    def add_chunk(self, trace):
+        """
+        Adds the next chunk of the trace.
+
+        @param numpy.ndarray trace: 1D chunk of the trace
+        """
+        digital = np.asarray(trace) >= self.threshold
+        if digital.size == 0:
+            return
+        change_points = np.flatnonzero(digital[1:] != digital[:-1]) + 1
+        starts = np.concatenate(([0], change_points))
+        lengths = np.diff(np.append(starts, digital.size))
+        states = digital[starts]
+
+        # Merge the first run with the open run of the previous chunk if the state is the same
+        if self._open_length > 0:
+            if states[0] == self._open_state:
+                lengths[0] += self._open_length
+            else:
+                self._lengths.append(np.array([self._open_length]))
+                self._states.append(np.array([self._open_state]))
+        self._lengths.append(lengths[:-1])
+        self._states.append(states[:-1])
+        self._open_length = int(lengths[-1])
+        self._open_state = bool(states[-1])
+        return
+
+    @property
+    def run_lengths(self):
+        """
+        Number of samples and state (True: high) of all runs of equal state in the trace so far.
+
+        @return tuple(numpy.ndarray, numpy.ndarray): run lengths and states
+        """
+        lengths = self._lengths + [np.array([self._open_length])]
+        states = self._states + [np.array([self._open_state])]
+        if self._open_length == 0:
+            lengths, states = lengths[:-1], states[:-1]
+        if not lengths:
+            return np.zeros(0, dtype=int), np.zeros(0, dtype=bool)
+        return np.concatenate(lengths).astype(int), np.concatenate(states).astype(bool)
+
+    def dwell_times(self, dt=1):
+        """
+        Dwell times in the high and in the low state.
+
+        @param float dt: time per sample
+
+        @return tuple(numpy.ndarray, numpy.ndarray): dwell times in the high and the low state
+        """
+        lengths, states = self.run_lengths
+        return lengths[states] * dt, lengths[~states] * dt
+
+
+class StateTransitionCounter:
+    """
+    Vectorized counting of the state transitions between consecutive samples of a trace.
+    A sample is initialized into the high (low) state if it is above init_threshold[1] (below
+    init_threshold[0]). The following sample is analyzed to be in the high (low) state if it is
+    above ana_threshold[1] (below ana_threshold[0]), where high takes precedence.
+
+    Like DwellTimeCounter the trace can be passed in several chunks.
+    """
+
+    def __init__(self, init_threshold, ana_threshold):
+        """
+        @param list init_threshold: [low, high] thresholds of the initialization
+        @param list ana_threshold: [low, high] thresholds of the analysis
+        """
+        self.init_threshold = init_threshold
+        self.ana_threshold = ana_threshold
+        self.counts = OrderedDict([('samples', 0),
+                                   ('init_high', 0),
+                                   ('init_low', 0),
+                                   ('high_high', 0),
+                                   ('high_low', 0),
+                                   ('low_high', 0),
+                                   ('low_low', 0)])
+        self._last_sample = None
+
+    def add_chunk(self, trace):
+        """
+        Adds the next chunk of the trace.
+
+        @param numpy.ndarray trace: 1D chunk of the trace
+        """
+        trace = np.asarray(trace)
+        if trace.size == 0:
+            return
+        self.counts['samples'] += trace.size
+        # Prepend the last sample of the previous chunk to count the transition in between
+        if self._last_sample is not None:
+            trace = np.concatenate((self._last_sample, trace))
+        self._last_sample = trace[-1:].copy()
+
+        init_high = trace[:-1] > self.init_threshold[1]
+        init_low = trace[:-1] < self.init_threshold[0]
+        ana_high = trace[1:] > self.ana_threshold[1]
+        ana_low = (trace[1:] < self.ana_threshold[0]) & ~ana_high
+        self.counts['init_high'] += np.count_nonzero(init_high)
+        self.counts['init_low'] += np.count_nonzero(init_low)
+        self.counts['high_high'] += np.count_nonzero(init_high & ana_high)
+        self.counts['high_low'] += np.count_nonzero(init_high & ana_low)
+        self.counts['low_high'] += np.count_nonzero(init_low & ana_high)
+        self.counts['low_low'] += np.count_nonzero(init_low & ana_low)
+        return
+
+
 class TraceAnalysisLogic(GenericLogic):
     """ Perform a gated counting measurement with the hardware.  """
 
@@ -232,37 +362,22 @@ class TraceAnalysisLogic(GenericLogic):
                       float lifetime_dark: the lifetime in the dark state in s
                       float lifetime_bright: lifetime in the bright state in s
         """
-        no_flip = 0.0
+        counts = self.count_state_transitions(trace, [threshold, threshold],
+                                              [threshold, threshold])
 
         if analyze_mode == 'full':
-            for ii in range(len(trace) - 1):
-                if trace[ii] > threshold and trace[ii + 1] > threshold:
-                    no_flip = no_flip + 1
-
-                elif trace[ii] < threshold and trace[ii + 1] < threshold:
-                    no_flip = no_flip + 1
-
+            no_flip = counts['high_high'] + counts['low_low']
             probability = 1.0 - (no_flip / len(trace))
             lost_events = 0.0
 
         if analyze_mode == 'dark':
-            dark_counter = 0.0
-            for ii in range(len(trace) - 1):
-                if trace[ii] < threshold:
-                    dark_counter = dark_counter + 1
-                    if trace[ii + 1] < threshold:
-                        no_flip = no_flip + 1
-            probability = 1.0 - (no_flip / dark_counter)
+            dark_counter = counts['init_low']
+            probability = 1.0 - (counts['low_low'] / dark_counter)
             lost_events = (1.0 - (dark_counter / len(trace))) * 100
 
         if analyze_mode == 'bright':
-            bright_counter = 0.0
-            for ii in range(len(trace) - 1):
-                if trace[ii] > threshold:
-                    bright_counter = bright_counter + 1
-                    if trace[ii + 1] > threshold:
-                        no_flip = no_flip + 1
-            probability = 1.0 - (no_flip / bright_counter)
+            bright_counter = counts['init_high']
+            probability = 1.0 - (counts['high_high'] / bright_counter)
             lost_events = (1.0 - (bright_counter / len(trace))) * 100
 
         return probability, lost_events
@@ -284,35 +399,7 @@ class TraceAnalysisLogic(GenericLogic):
         """
         init_threshold = init_threshold if init_threshold is not None else [1, 1]
         ana_threshold = ana_threshold if ana_threshold is not None else [1, 1]
-        no_flip = 0.0
-        flip = 0.0
-
-        # find all indices in the trace-array, where the value is above init_threshold[1]
-        init_high = np.where(trace[:-1] > init_threshold[1])[0]
-        # find all indices in the trace-array, where the value is below init_threshold[0]
-        init_low = np.where(trace[:-1] < init_threshold[0])[0]
-        # find all indices in the trace-array, where the value is above ana_threshold[1]
-        ana_high = np.where(trace > ana_threshold[1])[0]
-        # find all indices in the trace-array, where the value is below ana_threshold[0]
-        ana_low = np.where(trace < ana_threshold[0])[0]
-
-        if analyze_mode == 'bright' or analyze_mode == 'full':
-            # analyze the trace where the data were the nuclear was initalized into one direction
-            for index in init_high:
-                # check if the following data point is in the analysis array
-                if index + 1 in ana_high:
-                    no_flip = no_flip + 1
-                elif index + 1 in ana_low:
-                    flip = flip + 1
-
-        if analyze_mode == 'dark' or analyze_mode == 'full':
-            # repeat the same if the nucleus was initalized into the other array
-            for index in init_low:
-                # check if the following data point is in the analysis array
-                if index + 1 in ana_high:
-                    flip = flip + 1
-                elif index + 1 in ana_low:
-                    no_flip = no_flip + 1
+        no_flip, flip = self._count_flips(trace, init_threshold, ana_threshold, analyze_mode)
 
         # the flip probability is given by the number of flips divided by the total number of analyzed data points
         if (flip + no_flip) == 0:
@@ -366,33 +453,7 @@ class TraceAnalysisLogic(GenericLogic):
             self.log.warning('Not enough data points yet!')
 
         # calculate the flip probability
-        no_flip = 0.0
-        flip = 0.0
-        # find all indices in the trace-array, where the value is above init_threshold[1]
-        init_high = np.where(trace[:-1] > init_threshold[1])[0]
-        # find all indices in the trace-array, where the value is below init_threshold[0]
-        init_low = np.where(trace[:-1] < init_threshold[0])[0]
-        # find all indices in the trace-array, where the value is above ana_threshold[1]
-        ana_high = np.where(trace > ana_threshold[1])[0]
-        # find all indices in the trace-array, where the value is below ana_threshold[0]
-        ana_low = np.where(trace < ana_threshold[0])[0]
-
-        if analyze_mode == 'bright' or analyze_mode == 'full':
-            # analyze the trace where the data were the nuclear was initalized into one direction
-            for index in init_high:
-                # check if the following data point is in the analysis array
-                if index + 1 in ana_high:
-                    no_flip = no_flip + 1
-                elif index + 1 in ana_low:
-                    flip = flip + 1
-        if analyze_mode == 'dark' or analyze_mode == 'full':
-            # repeat the same if the nucleus was initalized into the other array
-            for index in init_low:
-                # check if the following data point is in the analysis array
-                if index + 1 in ana_high:
-                    flip = flip + 1
-                elif index + 1 in ana_low:
-                    no_flip = no_flip + 1
+        no_flip, flip = self._count_flips(trace, init_threshold, ana_threshold, analyze_mode)
 
         # the flip probability is given by the number of flips divided by the total number of analyzed data points
         if (flip + no_flip) == 0:
@@ -411,6 +472,72 @@ class TraceAnalysisLogic(GenericLogic):
 
         return self.spin_flip_prob, lost_events, hist_fit_x, hist_fit_y, fit_result
 
+    def _count_flips(self, trace, init_threshold, ana_threshold, analyze_mode='full'):
+        """ Counts the flips and no flips of the nuclear spin between consecutive data points
+            initialized in the bright and/or dark state (see StateTransitionCounter).
+        @param np.array trace: 1D trace of data
+        @param list init_threshold: [low, high] thresholds of the initialization
+        @param list ana_threshold: [low, high] thresholds of the analysis
+        @param str analyze_mode: 'bright', 'dark' or 'full'
+        @return tuple(no_flip, flip): number of no flips and flips
+        """
+        counts = self.count_state_transitions(trace, init_threshold, ana_threshold)
+        no_flip = 0.0
+        flip = 0.0
+        if analyze_mode == 'bright' or analyze_mode == 'full':
+            no_flip += counts['high_high']
+            flip += counts['high_low']
+        if analyze_mode == 'dark' or analyze_mode == 'full':
+            flip += counts['low_high']
+            no_flip += counts['low_low']
+        return no_flip, flip
+
+    def count_state_transitions(self, trace, init_threshold, ana_threshold, chunk_size=None):
+        """ Counts the state transitions between consecutive data points of a trace
+            (see StateTransitionCounter).
+        @param trace: 1D trace of data (see _trace_chunks for chunked traces)
+        @param list init_threshold: [low, high] thresholds of the initialization
+        @param list ana_threshold: [low, high] thresholds of the analysis
+        @param int chunk_size: optional, analyze the trace in chunks of this number of points
+        @return OrderedDict: number of samples, initialized samples ('init_high', 'init_low')
+                             and transitions ('high_high', 'high_low', 'low_high', 'low_low')
+        """
+        counter = StateTransitionCounter(init_threshold, ana_threshold)
+        for chunk in self._trace_chunks(trace, chunk_size):
+            counter.add_chunk(chunk)
+        return counter.counts
+
+    def calculate_dwell_times(self, trace, threshold, dt=1, chunk_size=None):
+        """ Calculates the times the trace stays in the bright state (>= threshold) and in the
+            dark state (< threshold) before switching (see DwellTimeCounter).
+        @param trace: 1D trace of data (see _trace_chunks for chunked traces)
+        @param float threshold: threshold between dark and bright state
+        @param float dt: time per data point
+        @param int chunk_size: optional, analyze the trace in chunks of this number of points
+        @return tuple(np.array, np.array): dwell times in the bright and in the dark state
+        """
+        counter = DwellTimeCounter(threshold)
+        for chunk in self._trace_chunks(trace, chunk_size):
+            counter.add_chunk(chunk)
+        return counter.dwell_times(dt)
+
+    @staticmethod
+    def _trace_chunks(trace, chunk_size=None):
+        """ Yields a trace in chunks to analyze traces not fitting into memory.
+        @param trace: 1D trace of data. Either an array-like supporting slicing (e.g. np.memmap or
+                      a HDF5 dataset) or an iterator yielding the chunks of the trace.
+        @param int chunk_size: optional, number of points per chunk for array-like traces.
+                               If None, the trace is analyzed at once.
+        """
+        if iter(trace) is trace:
+            yield from trace
+        elif chunk_size is None:
+            yield trace
+        else:
+            chunk_size = max(int(chunk_size), 1)
+            for start in range(0, len(trace), chunk_size):
+                yield np.asarray(trace[start:start + chunk_size])
+
     def analyze_flip_prob_postselect(self):
         """ Post select the data trace so that the flip probability is only
             calculated from a jump from below a threshold value to an value
@@ -483,7 +610,7 @@ class TraceAnalysisLogic(GenericLogic):
         return hist_fit_x, hist_fit_y, param_dict, fit_result
 
     def analyze_lifetime(self, trace, dt, method='postselect',
-                         distr='gaussian_normalized', state='|-1>', num_bins=50):
+                         distr='gaussian_normalized', state='|-1>', num_bins=50, chunk_size=None):
         """ Perform an lifetime analysis of a 1D time trace. The analysis is
             based on the method provided ( for now only post select is implemented ).
         @param numpy array trace: 1 D array
@@ -492,6 +619,8 @@ class TraceAnalysisLogic(GenericLogic):
         @param string state: State that the mw was applied to
         @param int num_bins: number of bins used in the histogram to determine the threshold before digitalisation
                              of data
+        @param int chunk_size: optional, determine the dwell times in chunks of this number of data points
+                               (see calculate_dwell_times)
         @return: dictionary containing the lifetimes of the different states |0>, |1>, |-1> in the case of the HMM method
                  For the postselect method only lifetime for bright and darkstate is returned, keys are 'bright_state' and
                  'dark_state'
@@ -506,69 +635,13 @@ class TraceAnalysisLogic(GenericLogic):
                                                                                distr='gaussian_normalized')
                 threshold = threshold_fit
 
-            # helper functions to get and analyze the timetrace
-            def analog_digitial_converter(cut_off, data):
-                new_digital_trace = []
-                for data_point in data:
-                    if data_point >= cut_off:
-                        new_digital_trace.append(1)
-                    else:
-                        new_digital_trace.append(0)
-                return new_digital_trace
-
-            def time_in_high_low(raw_digital_trace, local_dt):
-                """
-                What I need this function to do is to get all consecutive {1, ... , n} 1s or 0s and add
-                them up and put into a list to later make a histogram from them.
-                """
-                occurances = []
-                index = 0
-                index2 = 0
-
-                while index < len(raw_digital_trace):
-                    occurances.append(0)
-                    # start following the consecutive 1s
-                    while raw_digital_trace[index] == 1:
-                        occurances[index2] += 1
-                        if index == (len(raw_digital_trace) - 1):
-                            occurances = np.array(occurances)
-                            return occurances * local_dt
-                        else:
-                            index += 1
-                    if raw_digital_trace[index - 1] == 1:
-                        index2 += 1
-                        occurances.append(0)
-                    # start following the consecutive 0s
-                    while raw_digital_trace[index] == 0:
-                        occurances[index2] -= 1
-                        if index == (len(raw_digital_trace) - 1):
-                            occurances = np.array(occurances)
-                            return occurances * local_dt
-                        else:
-                            index += 1
-                    index2 += 1
-
-            digital_trace = analog_digitial_converter(threshold, trace)
-            time_array = time_in_high_low(digital_trace, dt)
-
-            # now we need to make a histogram as well as a fit
-            # what would be a good estimate for the number of bins
-
-            # longest = np.max(np.array(occurances))
-            # number of steps in between, rather not use that for now
-            # est_bins = np.int(longest/dt)
-
-            time_array_high = np.array([ii for ii in filter(lambda x: x > 0, time_array)])
-            time_array_low = np.array([ii for ii in filter(lambda x: x < 0, time_array)])
+            time_array_high, time_array_low = self.calculate_dwell_times(trace, threshold, dt,
+                                                                         chunk_size)
 
             # get lifetime of bright state
             time_hist_high = np.histogram(time_array_high, bins=num_bins)
-            vals = [i for i in filter(lambda x: x[1] > 0, enumerate(time_hist_high[0][0:num_bins]))]
-
-            indices = np.array([val[0] for val in vals])
-            indices = np.array([np.int(indice) for indice in indices])
+            indices = np.flatnonzero(time_hist_high[0][0:num_bins] > 0)
             self.log.debug('threshold {0}'.format(threshold))
-            self.log.debug('time_array:{0}'.format(time_array))
             self.log.debug('time_array_high:{0}'.format(time_array_high))
             self.log.debug('time_hist_high:{0}'.format(time_hist_high))
             self.log.debug('indices: {0}'.format(indices))
@@ -587,11 +660,10 @@ class TraceAnalysisLogic(GenericLogic):
             lifetime_dict['bright_raw'] = np.array([time_hist_high[1][indices], time_hist_high[0][indices]])
 
             # get lifetime of dark state
-            time_hist_low = np.histogram(time_array_low, bins=num_bins)
-            vals = [i for i in filter(lambda x: x[1] > 0, enumerate(time_hist_low[0][0:num_bins]))]
-            indices = np.array([val[0] for val in vals])
-            indices = np.array([np.int(indice) for indice in indices])
-            values = np.array([val[1] for val in vals])
+            # the histogram of the negative dark times is mirrored to a positive axis below
+            time_hist_low = np.histogram(-time_array_low, bins=num_bins)
+            indices = np.flatnonzero(time_hist_low[0][0:num_bins] > 0)
+            values = time_hist_low[0][indices]
             # positive axis
             mirror_axis = -time_hist_low[1][indices]
             result = self._fit_logic.make_decayexponential_fit(mirror_axis,
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+Measures the throughput of numpy array transfers from a remote module: plain rpyc obtain (pickle)
+compared to the array side channel of the module server (uncompressed and zlib compressed).
+
+A local module server with a dummy module is started in this process, the client connects to it
+through the loopback interface like a remote qudi instance would.
+
+Usage (from the Qudi main directory):
+    python tools/remote_array_benchmark.py [--sizes 1e3 1e5 1e7] [--repeat N]
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+sys.path.append(os.getcwd())
+
+import rpyc.utils.classic
+from rpyc.utils.server import ThreadedServer
+
+from core.remote import ArrayServer, RemoteConnectionPool, RemoteModule, RemoteObjectManager
+from core.util.models import DictTableModel
+from core.util.network import netobtain
+
+
+class DummyCounter:
+    """ Stands in for a fast counter hardware module returning count traces. """
+
+    def __init__(self):
+        self.traces = dict()
+
+    def get_data_trace(self, size):
+        size = int(size)
+        if size not in self.traces:
+            # counts with some structure, so compression has something to do
+            self.traces[size] = np.random.poisson(5, size).astype('int64')
+        return self.traces[size]
+
+
+def start_server(counter):
+    """ Starts a module server sharing the dummy module on free local ports.
+
+        @param DummyCounter counter: dummy module to share
+
+        @return tuple(int, ThreadedServer, ArrayServer): rpyc port and servers
+    """
+    shared = DictTableModel()
+    shared.add('dummycounter', counter)
+    service = RemoteObjectManager.makeRemoteService(
+        SimpleNamespace(sharedModules=shared, manager=None))
+    array_server = ArrayServer('localhost', 0)
+    service.array_server = array_server
+    threading.Thread(target=array_server.run, daemon=True).start()
+    server = ThreadedServer(service, hostname='localhost', port=0,
+                            protocol_config={'allow_all_attrs': True})
+    threading.Thread(target=server.start, daemon=True).start()
+    while not server.active:
+        time.sleep(0.01)
+    return server.port, server, array_server
+
+
+def measure(function, repeat):
+    """ Returns the best time of repeat calls of function. """
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Remote array transfer benchmark')
+    parser.add_argument('--sizes', type=float, nargs='+', default=[1e3, 1e5, 1e6, 1e7],
+                        help='number of int64 samples per transferred array')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='number of transfers per measurement, the fastest is reported')
+    args = parser.parse_args()
+
+    counter = DummyCounter()
+    port, server, array_server = start_server(counter)
+    plain_pool = RemoteConnectionPool('localhost', port)
+    compressed_pool = RemoteConnectionPool('localhost', port, array_compression='zlib')
+    plain = RemoteModule(plain_pool, 'dummycounter')
+    compressed = RemoteModule(compressed_pool, 'dummycounter')
+
+    print('{0:>10} {1:>10} {2:>16} {3:>16} {4:>16}'.format(
+        'samples', 'MB', 'rpyc obtain', 'side channel', 'side ch. (zlib)'))
+    for size in args.sizes:
+        size = int(size)
+        # netrefs of the same remote array through both connections
+        reference = plain.module.get_data_trace(size)
+        reference_zlib = compressed.module.get_data_trace(size)
+        nbytes = size * 8
+        results = list()
+        for function in (lambda: rpyc.utils.classic.obtain(reference),
+                         lambda: netobtain(reference),
+                         lambda: netobtain(reference_zlib)):
+            if not np.array_equal(function(), counter.get_data_trace(size)):
+                raise RuntimeError('Transferred array differs from the original.')
+            seconds = measure(function, args.repeat)
+            results.append('{0:8.1f} MB/s'.format(nbytes / seconds / 1e6))
+        print('{0:>10d} {1:>10.2f} {2:>16} {3:>16} {4:>16}'.format(
+            size, nbytes / 1e6, *results))
+
+    plain_pool.close()
+    compressed_pool.close()
+    array_server.close()
+    server.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""
+Measures the cost of calls to remote modules: one synchronous rpyc call after the other compared
+to batched calls (one round trip for all calls) and asynchronous calls through the connection pool
+of the module server.
+
+A local module server with dummy sensor modules is started in this process, the client connects
+to it through the loopback interface like a remote qudi instance would. Use --delay to simulate
+hardware that needs some time to answer (e.g. a slow instrument bus).
+
+Usage (from the Qudi main directory):
+    python tools/remote_call_benchmark.py [--sensors N] [--delay SECONDS] [--repeat N]
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+sys.path.append(os.getcwd())
+
+from rpyc.utils.server import ThreadedServer
+
+from core.remote import RemoteConnectionPool, RemoteModule, RemoteObjectManager
+from core.util.models import DictTableModel
+from core.util.network import netcall_async, netcall_batch
+
+
+class DummySensor:
+    """ Stands in for a hardware module reading a sensor value. """
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.value = 0.0
+
+    def get_value(self):
+        if self.delay > 0:
+            time.sleep(self.delay)
+        self.value += 1
+        return self.value
+
+    def get_unit(self):
+        return 'K'
+
+
+def start_server(sensors):
+    """ Starts a module server sharing the dummy modules on a free local port.
+
+        @param dict sensors: dummy modules by name
+
+        @return tuple(int, ThreadedServer): port and server
+    """
+    shared = DictTableModel()
+    for name, sensor in sensors.items():
+        shared.add(name, sensor)
+    service = RemoteObjectManager.makeRemoteService(
+        SimpleNamespace(sharedModules=shared, manager=None))
+    server = ThreadedServer(service, hostname='localhost', port=0,
+                            protocol_config={'allow_all_attrs': True})
+    threading.Thread(target=server.start, daemon=True).start()
+    while not server.active:
+        time.sleep(0.01)
+    return server.port, server
+
+
+def measure(function, repeat):
+    """ Returns the best time of repeat calls of function. """
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Remote module call benchmark')
+    parser.add_argument('--sensors', type=int, default=10,
+                        help='number of remote sensor modules polled per measurement')
+    parser.add_argument('--delay', type=float, default=0.0,
+                        help='time (s) each sensor needs to answer')
+    parser.add_argument('--repeat', type=int, default=20,
+                        help='number of measurements, the fastest is reported')
+    args = parser.parse_args()
+
+    names = ['sensor{0:d}'.format(i) for i in range(args.sensors)]
+    port, server = start_server({name: DummySensor(args.delay) for name in names})
+    pool = RemoteConnectionPool('localhost', port, size=args.sensors)
+    modules = [RemoteModule(pool, name).module for name in names]
+
+    def sequential():
+        return [(module.get_value(), module.get_unit()) for module in modules]
+
+    def batched():
+        return [netcall_batch(module, ('get_value', 'get_unit')) for module in modules]
+
+    def parallel():
+        futures = [(netcall_async(module, 'get_value'), netcall_async(module, 'get_unit'))
+                   for module in modules]
+        return [(value.result(), unit.result()) for value, unit in futures]
+
+    print('Polling value and unit of {0:d} remote sensors (delay {1:g} s):'.format(
+        args.sensors, args.delay))
+    for title, function in (('sequential calls', sequential),
+                            ('batch per sensor', batched),
+                            ('async calls', parallel)):
+        function()
+        seconds = measure(function, args.repeat)
+        requests = pool.stats.requests
+        function()
+        print('  {0:<20} {1:8.2f} ms {2:6d} requests'.format(
+            title + ':', seconds * 1e3, pool.stats.requests - requests))
+    stats = pool.stats.snapshot()
+    print('Mean latency {0:.3f} ms, {1:.0f} calls/s (last {2:g} s)'.format(
+        stats['latency'] * 1e3, stats['calls_per_second'], pool.stats.window))
+
+    pool.close()
+    server.close()
+
+
+if __name__ == '__main__':
+    main()
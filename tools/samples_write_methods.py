@@ -32,15 +32,35 @@ class SamplesWriteMethods:
     Collection of write-to-file methods used to create hardware compatible files for the pulse
     generator out of sample arrays.
     """
-    def __init__(self):
+    def __init__(self, write_backend='memmap'):
+        """
+        @param str write_backend: 'memmap' to preallocate the waveform files and write each chunk
+                                  at its final position via numpy.memmap,
+                                  'stream' to append chunks to the files (using temporary files
+                                  for the marker samples).
+        """
+        # Number of samples already written into the preallocated files of the memmap backend.
+        # Keys are the file paths.
+        self._samples_written = dict()
+
         # If you want to define a new file format, make a new method and add the
         # reference to this method to the _write_to_file dictionary:
         self._write_to_file = OrderedDict()
-        self._write_to_file['wfm'] = self._write_wfm
-        self._write_to_file['wfmx'] = self._write_wfmx
+        if write_backend == 'memmap':
+            self._write_to_file['wfm'] = self._write_wfm_memmap
+            self._write_to_file['wfmx'] = self._write_wfmx_memmap
+        elif write_backend == 'stream':
+            self._write_to_file['wfm'] = self._write_wfm
+            self._write_to_file['wfmx'] = self._write_wfmx
+        else:
+            raise ValueError('Unknown samples write backend "{0}". Valid backends are "memmap" and '
+                             '"stream".'.format(write_backend))
         self._write_to_file['seq'] = self._write_seq
         self._write_to_file['seqx'] = self._write_seqx
-        self._write_to_file['fpga'] = self._write_fpga
+        if write_backend == 'memmap':
+            self._write_to_file['fpga'] = self._write_fpga_memmap
+        else:
+            self._write_to_file['fpga'] = self._write_fpga
         self._write_to_file['pstream'] = self._write_pstream
         return
 
@@ -346,6 +366,254 @@ class SamplesWriteMethods:
 
         return created_files
 
+    def _write_wfmx_memmap(self, name, analog_samples, digital_samples, total_number_of_samples,
+                           is_first_chunk, is_last_chunk):
+        """
+        Writes a sampled chunk of a whole waveform into a wfmx-file. The file is created and
+        preallocated to its final size (header, analog samples and marker bytes) with the first
+        chunk. Each chunk is then written directly to its final position in the file via
+        numpy.memmap, so no temporary files are needed and the memory usage is bounded by the
+        chunk size.
+        If both flags (is_first_chunk, is_last_chunk) are set to TRUE it means
+        that the whole ensemble is written as a whole in one big chunk.
+
+        @param name: string, represents the name of the sampled ensemble
+        @param analog_samples: dict containing float32 numpy ndarrays, contains the
+                                       samples for the analog channels that
+                                       are to be written by this function call.
+        @param digital_samples: dict containing bool numpy ndarrays, contains the samples
+                                      for the digital channels that
+                                      are to be written by this function call.
+        @param total_number_of_samples: int, The total number of samples in the
+                                        entire waveform. Has to be known in advance.
+        @param is_first_chunk: bool, indicates if the current chunk is the
+                               first write to this file.
+        @param is_last_chunk: bool, indicates if the current chunk is the last
+                              write to this file.
+
+        @return list: the list contains the string names of the created files for the passed
+                      presampled arrays
+        """
+        # record the name of the created files
+        created_files = []
+        total_number_of_samples = int(total_number_of_samples)
+
+        for channel in analog_samples:
+            # get analog channel number as integer from string
+            a_chnl_number = int(channel.strip('a_ch'))
+            # get marker string descriptors for this analog channel
+            markers = ['d_ch' + str((a_chnl_number * 2) - 1), 'd_ch' + str(a_chnl_number * 2)]
+            markers_active = markers[0] in digital_samples or markers[1] in digital_samples
+
+            filename = name + channel[1:] + '.wfmx'
+            created_files.append(filename)
+            filepath = os.path.join(self.waveform_dir, filename)
+
+            # File layout: header, float32 analog samples, uint8 marker samples (if active)
+            header = self._create_xml_header(total_number_of_samples, markers_active)
+            analog_offset = len(header)
+            marker_offset = analog_offset + 4 * total_number_of_samples
+            if is_first_chunk:
+                # restart at the beginning, even if a previous upload was aborted
+                self._samples_written[filepath] = 0
+                file_size = marker_offset + (total_number_of_samples if markers_active else 0)
+                self._preallocate_file(filepath, file_size, header)
+
+            start_ind = self._samples_written.get(filepath, 0)
+            chunk_length = analog_samples[channel].size
+
+            analog_mmap = np.memmap(filepath, dtype='<f4', mode='r+',
+                                    offset=analog_offset + 4 * start_ind, shape=(chunk_length,))
+            analog_mmap[:] = analog_samples[channel]
+            del analog_mmap
+
+            if markers_active:
+                marker_mmap = np.memmap(filepath, dtype='uint8', mode='r+',
+                                        offset=marker_offset + start_ind, shape=(chunk_length,))
+                self._pack_bits(marker_mmap, digital_samples, markers)
+                del marker_mmap
+
+            self._update_samples_written(filepath, chunk_length, is_last_chunk)
+        return created_files
+
+    def _write_wfm_memmap(self, name, analog_samples, digital_samples, total_number_of_samples,
+                          is_first_chunk, is_last_chunk):
+        """
+        Writes a sampled chunk of a whole waveform into a wfm-file. The file is created and
+        preallocated to its final size (header, samples and footer) with the first chunk. Each
+        chunk is then written directly to its final position in the file via numpy.memmap.
+        If both flags (is_first_chunk, is_last_chunk) are set to TRUE it means
+        that the whole ensemble is written as a whole in one big chunk.
+
+        @param name: string, represents the name of the sampled ensemble
+        @param analog_samples: dict containing float32 numpy ndarrays, contains the
+                                       samples for the analog channels that
+                                       are to be written by this function call.
+        @param digital_samples: dict containing bool numpy ndarrays, contains the samples
+                                      for the digital channels that
+                                      are to be written by this function call.
+        @param total_number_of_samples: int, The total number of samples in the
+                                        entire waveform. Has to be known it advance.
+        @param is_first_chunk: bool, indicates if the current chunk is the
+                               first write to this file.
+        @param is_last_chunk: bool, indicates if the current chunk is the last
+                              write to this file.
+
+        @return list: the list contains the string names of the created files for the passed
+                      presampled arrays
+        """
+        # record the name of the created files
+        created_files = []
+        total_number_of_samples = int(total_number_of_samples)
+
+        # One sample consists of 4 bytes (float32) analog value followed by 1 byte markers.
+        sample_dtype = np.dtype([('f0', '<f4'), ('f1', 'uint8')])
+
+        # See _write_wfm for a description of the header and footer.
+        num_bytes = str(total_number_of_samples * sample_dtype.itemsize)
+        header = str.encode('MAGIC 1000\r\n#' + str(len(num_bytes)) + num_bytes)
+        footer = str.encode('CLOCK {0:16.10E}\r\n'.format(self.sample_rate))
+
+        for channel in analog_samples:
+            # get analog channel number as integer from string
+            a_chnl_number = int(channel.strip('a_ch'))
+            # get marker string descriptors for this analog channel
+            markers = ['d_ch' + str((a_chnl_number * 2) - 1), 'd_ch' + str(a_chnl_number * 2)]
+
+            filename = name + channel[1:] + '.wfm'
+            created_files.append(filename)
+            filepath = os.path.join(self.waveform_dir, filename)
+
+            if is_first_chunk:
+                # restart at the beginning, even if a previous upload was aborted
+                self._samples_written[filepath] = 0
+                samples_size = total_number_of_samples * sample_dtype.itemsize
+                self._preallocate_file(filepath, len(header) + samples_size + len(footer), header)
+                with open(filepath, 'r+b') as wfm_file:
+                    wfm_file.seek(len(header) + samples_size)
+                    wfm_file.write(footer)
+
+            start_ind = self._samples_written.get(filepath, 0)
+            chunk_length = analog_samples[channel].size
+
+            samples_mmap = np.memmap(filepath, dtype=sample_dtype, mode='r+',
+                                     offset=len(header) + sample_dtype.itemsize * start_ind,
+                                     shape=(chunk_length,))
+            samples_mmap['f0'] = analog_samples[channel]
+            self._pack_bits(samples_mmap['f1'], digital_samples, markers)
+            del samples_mmap
+
+            self._update_samples_written(filepath, chunk_length, is_last_chunk)
+        return created_files
+
+    def _write_fpga_memmap(self, name, analog_samples, digital_samples, total_number_of_samples,
+                           is_first_chunk, is_last_chunk):
+        """
+        Writes a sampled chunk of a whole waveform into a fpga-file. The file is created and
+        preallocated (zero-padded to an integer multiple of 32 samples) with the first chunk. The
+        digital channels of each chunk are encoded directly into the file via numpy.memmap.
+        If both flags (is_first_chunk, is_last_chunk) are set to TRUE it means
+        that the whole ensemble is written as a whole in one big chunk.
+
+        @param name: string, represents the name of the sampled ensemble
+        @param analog_samples: dict containing float32 numpy ndarrays, contains the
+                                       samples for the analog channels that
+                                       are to be written by this function call.
+        @param digital_samples: dict containing bool numpy ndarrays, contains the samples
+                                      for the digital channels that
+                                      are to be written by this function call.
+        @param total_number_of_samples: int, The total number of samples in the
+                                        entire waveform. Has to be known it advance.
+        @param is_first_chunk: bool, indicates if the current chunk is the
+                               first write to this file.
+        @param is_last_chunk: bool, indicates if the current chunk is the last
+                              write to this file.
+
+        @return list: the list contains the string names of the created files for the passed
+                      presampled arrays
+        """
+        # record the name of the created files
+        created_files = []
+        total_number_of_samples = int(total_number_of_samples)
+
+        if len(digital_samples) != 8:
+            self.log.warning('FPGA pulse generator needs 8 digital channels. ({0} given)\n'
+                             'All not specified channels will be set to logical low.'
+                             ''.format(len(digital_samples)))
+            return -1
+
+        filename = name + '.fpga'
+        created_files.append(filename)
+        filepath = os.path.join(self.waveform_dir, filename)
+
+        if is_first_chunk:
+            # restart at the beginning, even if a previous upload was aborted
+            self._samples_written[filepath] = 0
+            # The sequence length must be an integer multiple of 32 bins. The zero-samples to
+            # append are already contained in the preallocated file.
+            number_of_zeros = -total_number_of_samples % 32
+            if number_of_zeros != 0:
+                self.log.warning('FPGA pulse sequence length is no integer multiple of 32 samples. '
+                                 'Appending {0} zero-samples to the sequence.'
+                                 ''.format(number_of_zeros))
+            self._preallocate_file(filepath, total_number_of_samples + number_of_zeros)
+
+        start_ind = self._samples_written.get(filepath, 0)
+        chunk_length = len(digital_samples[list(digital_samples)[0]])
+
+        # Encode channels d_ch1..d_ch8 into bits 0..7 of the FPGA samples (bytes)
+        encoded_mmap = np.memmap(filepath, dtype='uint8', mode='r+', offset=start_ind,
+                                 shape=(chunk_length,))
+        self._pack_bits(encoded_mmap, digital_samples, ['d_ch' + str(i) for i in range(1, 9)])
+        del encoded_mmap
+
+        self._update_samples_written(filepath, chunk_length, is_last_chunk)
+        return created_files
+
+    @staticmethod
+    def _preallocate_file(filepath, file_size, header=b''):
+        """
+        Creates (or overwrites) a file with the given header and zero-fills it up to file_size
+        bytes. On most file systems the zero-filled part is allocated lazily.
+
+        @param str filepath: full path of the file to create
+        @param int file_size: final size of the file in bytes
+        @param bytes header: data to write at the beginning of the file
+        """
+        with open(filepath, 'wb') as file:
+            file.write(header)
+            file.truncate(file_size)
+        return
+
+    @staticmethod
+    def _pack_bits(out, digital_samples, channels):
+        """
+        Packs boolean channel samples into the bits of a uint8 array in place. The first channel
+        in channels is packed into bit 0, the second into bit 1 and so on. Channels not present in
+        digital_samples are set to logical low.
+
+        @param numpy.ndarray out: uint8 array to pack the bits into (e.g. a numpy.memmap)
+        @param dict digital_samples: bool numpy.ndarrays (values) for each channel (keys)
+        @param list channels: channel descriptors in order of the bit position
+        """
+        out[:] = 0
+        for bit, chnl in enumerate(channels):
+            if chnl in digital_samples:
+                # Represent bool values as np.uint8 and shift them to the bit position
+                np.bitwise_or(out, np.left_shift(digital_samples[chnl].view('uint8'), bit),
+                              out=out)
+        return
+
+    def _update_samples_written(self, filepath, chunk_length, is_last_chunk):
+        """
+        Keeps track of the write position in a preallocated file for the memmap write methods.
+        """
+        if is_last_chunk:
+            self._samples_written.pop(filepath, None)
+        else:
+            self._samples_written[filepath] = self._samples_written.get(filepath, 0) + chunk_length
+        return
+
     def _write_pstream(self, name, analog_samples, digital_samples, total_number_of_samples,
                        is_first_chunk, is_last_chunk):
         """
@@ -533,6 +801,20 @@ class SamplesWriteMethods:
         This function creates an xml file containing the header for the wfmx-file format using
         etree.
         """
+        filepath = os.path.join(temp_dir, 'header.xml')
+        with open(filepath, 'wb') as header_file:
+            header_file.write(self._create_xml_header(number_of_samples, True))
+
+    def _create_xml_header(self, number_of_samples, markers_active):
+        """
+        Creates the header for the wfmx-file format in memory using etree. The resulting header
+        is also used by _create_xml_file.
+
+        @param int number_of_samples: total number of samples in the waveform
+        @param bool markers_active: flag indicating if marker samples are appended to the file
+
+        @return bytes: the encoded header
+        """
         root = ET.Element('DataFile', offset='xxxxxxxxx', version="0.1")
         DataSetsCollection = ET.SubElement(root, 'DataSetsCollection',
                                            xmlns="http://www.tektronix.com")
@@ -544,7 +826,7 @@ class SamplesWriteMethods:
         SamplesType = ET.SubElement(DataDescription, 'SamplesType')
         SamplesType.text = 'AWGWaveformSample'
         MarkersIncluded = ET.SubElement(DataDescription, 'MarkersIncluded')
-        MarkersIncluded.text = 'true'
+        MarkersIncluded.text = 'true' if markers_active else 'false'
         NumberFormat = ET.SubElement(DataDescription, 'NumberFormat')
         NumberFormat.text = 'Single'
         Endian = ET.SubElement(DataDescription, 'Endian')
@@ -569,32 +851,10 @@ class SamplesWriteMethods:
                                           name='Basic Waveform')
         Setup = ET.SubElement(root, 'Setup')
 
-        filepath = os.path.join(temp_dir, 'header.xml')
-
-        ##### This command creates the first version of the file
-        tree = ET.ElementTree(root)
-        tree.write(filepath, pretty_print=True, xml_declaration=True)
-
-        # Calculates the length of the header:
-        # 40 is subtracted since the first line of the above created file has a length of 39 and is
-        # not included later and the last endline (\n) is also not neccessary.
-        # The for loop is needed to give a nine digit length: xxxxxxxxx
-        length_of_header = ''
-        size = str(os.path.getsize(filepath) - 40)
-
-        for ii in range(9 - len(size)):
-            length_of_header += '0'
-        length_of_header += size
-
-        # The header length is written into the file
-        # The first line is not included since it is redundant
-        # Also the last endline (\n) is excluded
-        text = open(filepath, "U").read()
-        text = text.replace("xxxxxxxxx", length_of_header)
-        text = bytes(text, 'UTF-8')
-        f = open(filepath, "wb")
-        f.write(text[39:-1])
-        f.close()
+        # The header is written without xml declaration and without the last endline (\n).
+        # The offset attribute holds the nine digit length of the header.
+        header = ET.tostring(root, pretty_print=True)[:-1]
+        return header.replace(b'xxxxxxxxx', str(len(header)).zfill(9).encode('UTF-8'))
 
 def _convert_to_bitmask(active_channels):
     """ Convert a list of channels into a bitmask.
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+"""
+Measures how long the cold start (python module import) of the modules in a Qudi configuration
+takes and how much time the lazy plugin registry saves for the plugin directories
+(fit methods, pulse extraction and pulse analysis methods).
+
+Every measurement runs in a fresh python interpreter, so nothing is cached in sys.modules.
+The times do however include the OS file cache, run the benchmark twice for "warm disk" numbers.
+
+Usage (from the Qudi main directory):
+    python tools/startup_benchmark.py [config file] [--repeat N] [--per-module]
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+sys.path.append(os.getcwd())
+
+from core.config import load
+
+PLUGIN_DIRS = [os.path.join('logic', 'fitmethods'),
+               os.path.join('logic', 'pulsed', 'pulse_extraction_methods'),
+               os.path.join('logic', 'pulsed', 'pulsed_analysis_methods')]
+
+# Runs in the child interpreter: imports the given modules and prints the times as JSON.
+IMPORT_SCRIPT = """
+import importlib, json, sys, time
+sys.path.insert(0, {main_dir!r})
+start = time.perf_counter()
+import core
+times = {{'core': time.perf_counter() - start}}
+failed = []
+for name in {modules!r}:
+    t = time.perf_counter()
+    try:
+        importlib.import_module(name)
+    except Exception as e:
+        failed.append('{{0}}: {{1!r}}'.format(name, e))
+    times[name] = time.perf_counter() - t
+times['total'] = time.perf_counter() - start
+print(json.dumps({{'times': times, 'failed': failed}}))
+"""
+
+# Runs in the child interpreter: eager import of all plugin modules vs. plugin registry index.
+PLUGIN_SCRIPT = """
+import importlib, json, os, sys, time
+sys.path.insert(0, {main_dir!r})
+import core
+from core.util.plugin_registry import PluginRegistry
+paths = [os.path.join({main_dir!r}, p) for p in {plugin_dirs!r}]
+if {eager!r}:
+    start = time.perf_counter()
+    for path in paths:
+        sys.path.append(path)
+        for name in sorted(os.listdir(path)):
+            if name.endswith('.py'):
+                importlib.import_module(name[:-3])
+else:
+    start = time.perf_counter()
+    PluginRegistry(paths, manifest_path={manifest!r})
+print(json.dumps({{'total': time.perf_counter() - start}}))
+"""
+
+
+def configured_modules(config_file):
+    """ Returns the python modules of all Qudi modules in a config file.
+
+        @param str config_file: path to the config file
+
+        @return list: module names (e.g. 'logic.fit_logic') in config order
+    """
+    config = load(config_file)
+    modules = list()
+    for base in ('hardware', 'logic', 'gui'):
+        for name, module_config in (config.get(base) or dict()).items():
+            if not isinstance(module_config, dict) or 'module.Class' not in module_config:
+                continue
+            module = '{0}.{1}'.format(base, module_config['module.Class'].rsplit('.', 1)[0])
+            if module not in modules:
+                modules.append(module)
+    return modules
+
+
+def run_child(script):
+    """ Runs a script in a fresh interpreter and returns the parsed JSON output. """
+    output = subprocess.check_output([sys.executable, '-c', script], cwd=os.getcwd())
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+
+def best_of(repeat, script):
+    """ Runs a script repeat times and returns the result with the shortest total time. """
+    results = [run_child(script) for _ in range(repeat)]
+    return min(results, key=lambda r: r['times']['total'] if 'times' in r else r['total'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Qudi startup time benchmark')
+    parser.add_argument('config', nargs='?',
+                        default=os.path.join('config', 'example', 'default.cfg'),
+                        help='config file to benchmark (default: config/example/default.cfg)')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='number of runs per measurement, the fastest is reported')
+    parser.add_argument('--per-module', action='store_true',
+                        help='also measure each module alone in a fresh interpreter')
+    args = parser.parse_args()
+    main_dir = os.getcwd()
+
+    modules = configured_modules(args.config)
+    print('Cold start of {0:d} modules from "{1}" (best of {2:d}):'.format(
+        len(modules), args.config, args.repeat))
+    result = best_of(args.repeat, IMPORT_SCRIPT.format(main_dir=main_dir, modules=modules))
+    times = result['times']
+    print('  {0:<20} {1:8.3f} s'.format('import core:', times['core']))
+    print('  {0:<20} {1:8.3f} s'.format('import all:', times['total']))
+    print('  slowest (incl. dependencies not imported before):')
+    slowest = sorted(modules, key=lambda m: times.get(m, 0), reverse=True)[:10]
+    for module in slowest:
+        print('    {0:<50} {1:8.3f} s'.format(module, times[module]))
+    for failure in result['failed']:
+        print('  FAILED: {0}'.format(failure))
+
+    if args.per_module:
+        print('\nEach module alone in a fresh interpreter:')
+        alone = dict()
+        for module in modules:
+            res = best_of(args.repeat, IMPORT_SCRIPT.format(main_dir=main_dir, modules=[module]))
+            alone[module] = res['times'][module]
+        for module in sorted(alone, key=alone.get, reverse=True):
+            print('    {0:<50} {1:8.3f} s'.format(module, alone[module]))
+
+    print('\nPlugin modules ({0}):'.format(', '.join(PLUGIN_DIRS)))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        manifest = os.path.join(tmp_dir, 'plugin_manifest.json')
+        eager = best_of(args.repeat, PLUGIN_SCRIPT.format(
+            main_dir=main_dir, plugin_dirs=PLUGIN_DIRS, eager=True, manifest=manifest))
+        # First run creates the manifest, the following runs only read it
+        first = run_child(PLUGIN_SCRIPT.format(
+            main_dir=main_dir, plugin_dirs=PLUGIN_DIRS, eager=False, manifest=manifest))
+        cached = best_of(args.repeat, PLUGIN_SCRIPT.format(
+            main_dir=main_dir, plugin_dirs=PLUGIN_DIRS, eager=False, manifest=manifest))
+    print('  {0:<20} {1:8.3f} s'.format('eager import:', eager['total']))
+    print('  {0:<20} {1:8.3f} s'.format('index (new):', first['total']))
+    print('  {0:<20} {1:8.3f} s'.format('index (manifest):', cached['total']))
+
+
+if __name__ == '__main__':
+    main()